@@ -0,0 +1,4 @@
+"""
+벤치마크 모듈
+실행: python -m benchmarks.<module>
+"""
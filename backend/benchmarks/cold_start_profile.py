@@ -0,0 +1,179 @@
+"""
+콜드 스타트 프로파일러
+serverless.yml의 각 Lambda 핸들러를 새 프로세스에서 import하여 초기화 비용 측정
+
+- import: 핸들러 모듈 import 시간 (-X importtime으로 상위 모듈별 누적 시간 분해)
+- init: 모듈 전역의 지연 테이블/클라이언트를 처음 사용할 때 드는 생성 시간
+- N회 반복 후 p50/p95 보고, --check 시 기준 파일 대비 p95 회귀 검사
+
+실행:
+    python -m benchmarks.cold_start_profile [--runs 10] [--top 8]
+    python -m benchmarks.cold_start_profile --update-baseline
+    python -m benchmarks.cold_start_profile --check [--tolerance 0.25]
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SERVERLESS_FILE = BACKEND_DIR / 'serverless.yml'
+BASELINE_FILE = Path(__file__).resolve().parent / 'cold_start_baseline.json'
+
+# 새 프로세스에서 실행: 핸들러 import → 지연 리소스 생성 → 결과 JSON 출력
+_PROBE = r'''
+import importlib, json, sys, time
+sys.stderr.write('--probe--\n')
+start = time.perf_counter()
+module = importlib.import_module(sys.argv[1])
+import_ms = (time.perf_counter() - start) * 1000
+
+from utils import aws_clients
+start = time.perf_counter()
+for value in list(vars(module).values()):
+    if isinstance(value, aws_clients.LazyTable):
+        value.resolve()
+init_ms = (time.perf_counter() - start) * 1000
+print(json.dumps({'import_ms': import_ms, 'init_ms': init_ms, 'init': aws_clients.INIT_TIMINGS}))
+'''
+
+_IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def discover_handlers() -> List[str]:
+    """serverless.yml의 handler 항목을 모듈 경로로 변환"""
+    handlers = re.findall(r'^\s*handler:\s*(\S+)\.handler\s*$', SERVERLESS_FILE.read_text(), re.M)
+    return [h.replace('/', '.') for h in handlers]
+
+
+def top_level_imports(stderr: str, top: int) -> List[Dict[str, Any]]:
+    """-X importtime 출력에서 가장 바깥 패키지별 누적 시간(ms)"""
+    totals: Dict[str, float] = {}
+    # 인터프리터 시작 시 import(site 등)는 제외
+    stderr = stderr.split('--probe--\n', 1)[-1]
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative_us, indent, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        if indent == 1:  # 핸들러가 직접 트리거한 최상위 import
+            root = name.split('.')[0]
+            totals[root] = totals.get(root, 0.0) + cumulative_us / 1000
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{'module': name, 'ms': round(ms, 1)} for name, ms in ranked]
+
+
+def probe(module: str) -> Dict[str, Any]:
+    """새 인터프리터에서 핸들러 1회 측정"""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    env.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _PROBE, module],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=120
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{module} probe failed:\n{result.stderr[-2000:]}")
+    measured = json.loads(result.stdout.strip().splitlines()[-1])
+    measured['stderr'] = result.stderr
+    return measured
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """최근접 순위 백분위수"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def profile(modules: List[str], runs: int, top: int) -> Dict[str, Dict[str, Any]]:
+    """핸들러별 N회 측정 요약"""
+    report = {}
+    for module in modules:
+        samples = [probe(module) for _ in range(runs)]
+        totals = [s['import_ms'] + s['init_ms'] for s in samples]
+        report[module] = {
+            'import_p50_ms': round(statistics.median(s['import_ms'] for s in samples), 1),
+            'init_p50_ms': round(statistics.median(s['init_ms'] for s in samples), 1),
+            'total_p50_ms': round(statistics.median(totals), 1),
+            'total_p95_ms': round(percentile(totals, 95), 1),
+            'init_breakdown_ms': {k: round(v, 1) for k, v in samples[-1]['init'].items()},
+            'top_imports': top_level_imports(samples[-1]['stderr'], top),
+        }
+    return report
+
+
+def environment() -> Dict[str, str]:
+    """기준 측정 환경 (다른 환경의 기준과 비교하면 의미 없음)"""
+    try:
+        import boto3
+        boto3_version = boto3.__version__
+    except ImportError:
+        boto3_version = 'missing'
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'boto3': boto3_version,
+        'recorded_at': datetime.utcnow().isoformat() + 'Z',
+    }
+
+
+def check(report: Dict[str, Dict[str, Any]], tolerance: float) -> List[str]:
+    """기준 파일 대비 p95 회귀 목록"""
+    baseline = json.loads(BASELINE_FILE.read_text())
+    failures = []
+    for module, stats in report.items():
+        expected = baseline.get('handlers', {}).get(module, {}).get('total_p95_ms')
+        if expected is None:
+            continue
+        limit = expected * (1 + tolerance)
+        if stats['total_p95_ms'] > limit:
+            failures.append(f"{module}: p95 {stats['total_p95_ms']}ms > {limit:.1f}ms (baseline {expected}ms)")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lambda 핸들러 콜드 스타트 프로파일러')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--top', type=int, default=8, help='핸들러별로 보여줄 상위 import 수')
+    parser.add_argument('--handler', action='append', help='특정 핸들러 모듈만 측정 (반복 가능)')
+    parser.add_argument('--check', action='store_true', help='기준 파일 대비 p95 회귀 시 실패')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='허용 p95 증가율')
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args()
+
+    modules = args.handler or discover_handlers()
+    report = profile(modules, args.runs, args.top)
+
+    print(f"{'handler':<36}{'import p50':>12}{'init p50':>10}{'total p50':>11}{'total p95':>11}")
+    for module, stats in report.items():
+        print(f"{module:<36}{stats['import_p50_ms']:>10.1f}ms{stats['init_p50_ms']:>8.1f}ms"
+              f"{stats['total_p50_ms']:>9.1f}ms{stats['total_p95_ms']:>9.1f}ms")
+        imports = ', '.join(f"{i['module']} {i['ms']}ms" for i in stats['top_imports'])
+        print(f"    imports: {imports}")
+        if stats['init_breakdown_ms']:
+            init = ', '.join(f"{k} {v}ms" for k, v in stats['init_breakdown_ms'].items())
+            print(f"    init:    {init}")
+
+    if args.update_baseline:
+        BASELINE_FILE.write_text(json.dumps(
+            {'environment': environment(), 'runs': args.runs, 'handlers': report},
+            ensure_ascii=False, indent=2
+        ) + '\n')
+        print(f"baseline written: {BASELINE_FILE}")
+
+    if args.check:
+        failures = check(report, args.tolerance)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
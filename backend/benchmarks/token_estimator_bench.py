@@ -0,0 +1,130 @@
+"""
+토큰 추정기 벤치마크 / 정확도 리포트
+
+- 속도: 기존 문자 단위 루프, split(), utils.token_estimator 비교 (수 KB 응답 기준)
+- 정확도: tokens.calibration 로그 샘플(실제 Bedrock 출력 토큰 수)로 기본 계수와
+  보정 계수의 오차(MAPE, p95) 비교 - 80%로 보정하고 20%로 검증
+
+실행:
+    python -m benchmarks.token_estimator_bench [--kb 8] [--repeat 200]
+    python -m benchmarks.token_estimator_bench --samples calibration.log [--write-coefficients coef.json]
+
+샘플 파일은 CloudWatch에서 내려받은 로그 그대로 사용 가능 (tokens.calibration JSON이 포함된 줄만 읽음).
+--write-coefficients로 만든 파일을 TOKEN_COEFFICIENTS_FILE로 지정하면 보정 계수가 적용된다.
+"""
+import argparse
+import json
+import random
+import timeit
+from datetime import datetime
+from typing import List, Sequence, Tuple
+
+from utils.token_estimator import (
+    DEFAULT_COEFFICIENTS, FEATURES, calibrate, estimate_from_features, estimate_tokens
+)
+
+SAMPLE_TEXT = (
+    "정부는 오늘 오전 국무회의에서 내년도 예산안을 의결했다. 총지출 규모는 전년 대비 3.2% 늘어난 "
+    "656조 원으로, 연구개발(R&D)과 저출생 대응 예산이 크게 확대됐다. 기획재정부는 \"건전재정 기조를 "
+    "유지하면서 민생 회복에 집중했다\"고 설명했다. The budget also allocates KRW 29.7 trillion to R&D. "
+)
+
+
+def legacy_estimate(text: str) -> int:
+    """handlers/api/usage.py의 기존 구현 (비교 기준)"""
+    if not text:
+        return 0
+    korean = english = numbers = spaces = 0
+    for char in text:
+        if '가' <= char <= '힣':
+            korean += 1
+        elif char.isalpha() and char.isascii():
+            english += 1
+        elif char.isdigit():
+            numbers += 1
+        elif char.isspace():
+            spaces += 1
+    special = len(text) - korean - english - numbers - spaces
+    return max(1, int(korean / 2.5 + english / 4 + numbers / 3.5 + spaces / 4 + special / 3))
+
+
+def speed(kb: int, repeat: int) -> None:
+    """구현별 1회 추정 시간"""
+    text = (SAMPLE_TEXT * (kb * 1024 // len(SAMPLE_TEXT.encode('utf-8')) + 1))
+    print(f"text: {len(text)} chars / {len(text.encode('utf-8'))} bytes")
+    for name, fn in [('legacy loop', legacy_estimate),
+                     ('str.split', lambda t: len(t.split())),
+                     ('token_estimator', estimate_tokens)]:
+        seconds = min(timeit.repeat(lambda: fn(text), number=repeat, repeat=3)) / repeat
+        print(f"  {name:<16}{seconds * 1e6:>10.1f} us/call   tokens={fn(text)}")
+
+
+def load_samples(path: str) -> List[Tuple[Sequence[int], int]]:
+    """로그 파일에서 tokens.calibration 레코드 추출"""
+    samples = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            start = line.find('{"event": "tokens.calibration"')
+            if start < 0:
+                continue
+            try:
+                record = json.loads(line[start:])
+            except ValueError:
+                continue
+            if len(record.get('features', [])) == len(FEATURES) and record.get('tokens'):
+                samples.append((record['features'], int(record['tokens'])))
+    return samples
+
+
+def errors(samples, coefficients) -> List[float]:
+    """샘플별 절대 백분율 오차"""
+    return [abs(estimate_from_features(vector, coefficients) - tokens) / tokens * 100
+            for vector, tokens in samples]
+
+
+def summarize(name: str, values: List[float]) -> None:
+    ordered = sorted(values)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(f"  {name:<12} MAPE {sum(values) / len(values):6.1f}%   p95 {p95:6.1f}%")
+
+
+def accuracy(path: str, write_path: str = None) -> None:
+    """기본 계수 vs 보정 계수 오차 리포트"""
+    samples = load_samples(path)
+    if len(samples) < 10:
+        print(f"samples: {len(samples)} (need at least 10 tokens.calibration records)")
+        return
+
+    random.Random(7).shuffle(samples)
+    split = int(len(samples) * 0.8)
+    train, holdout = samples[:split], samples[split:]
+    fitted = calibrate(train)
+
+    print(f"samples: {len(samples)} (train {len(train)}, holdout {len(holdout)})")
+    summarize('default', errors(holdout, DEFAULT_COEFFICIENTS))
+    summarize('calibrated', errors(holdout, fitted))
+    print("  coefficients: " + ', '.join(f"{k}={v:.4f}" for k, v in fitted.items()))
+
+    if write_path:
+        final = calibrate(samples)
+        with open(write_path, 'w', encoding='utf-8') as f:
+            json.dump({'coefficients': final, 'samples': len(samples),
+                       'calibrated_at': datetime.utcnow().isoformat() + 'Z'}, f, indent=2)
+        print(f"coefficients written: {write_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='토큰 추정기 벤치마크 / 정확도 리포트')
+    parser.add_argument('--kb', type=int, default=8, help='속도 측정 텍스트 크기 (KB)')
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--samples', help='tokens.calibration 로그 파일')
+    parser.add_argument('--write-coefficients', help='전체 샘플로 보정한 계수 JSON 저장 경로')
+    args = parser.parse_args()
+
+    speed(args.kb, args.repeat)
+    if args.samples:
+        accuracy(args.samples, args.write_coefficients)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+WebSocket 프레임 프로토콜 벤치마크
+출력 토큰 1K당 전송 바이트(verbose vs compact) 측정
+
+실행: python -m benchmarks.ws_protocol_bench [--tokens-per-delta 3] [--coalesce-bytes 2048]
+"""
+import argparse
+from datetime import datetime
+from typing import Dict, List
+
+from utils.ws_protocol import PROTOCOL_COMPACT_V1, PROTOCOL_VERBOSE, encode_frame
+
+SAMPLE_TEXT = (
+    "정부는 오늘 오전 국무회의에서 내년도 예산안을 의결했다. 총지출 규모는 전년 대비 3.2% 늘어난 "
+    "656조 원으로, 연구개발(R&D)과 저출생 대응 예산이 크게 확대됐다. 기획재정부는 \"건전재정 기조를 "
+    "유지하면서 민생 회복에 집중했다\"고 설명했다. The budget also allocates KRW 29.7 trillion to R&D. "
+)
+
+# 토큰 1개당 평균 문자 수 (한/영 혼합 기사 기준 근사치)
+CHARS_PER_TOKEN = 2.2
+
+
+def build_deltas(total_tokens: int, tokens_per_delta: int) -> List[str]:
+    """Bedrock text_delta와 비슷한 크기의 델타 목록 생성"""
+    total_chars = int(total_tokens * CHARS_PER_TOKEN)
+    text = (SAMPLE_TEXT * (total_chars // len(SAMPLE_TEXT) + 1))[:total_chars]
+    step = max(1, int(tokens_per_delta * CHARS_PER_TOKEN))
+    return [text[i:i + step] for i in range(0, len(text), step)]
+
+
+def coalesce(deltas: List[str], max_bytes: int) -> List[str]:
+    """델타를 max_bytes 단위로 합친 청크 목록"""
+    chunks, buffer, size = [], [], 0
+    for delta in deltas:
+        buffer.append(delta)
+        size += len(delta.encode('utf-8'))
+        if size >= max_bytes:
+            chunks.append(''.join(buffer))
+            buffer, size = [], 0
+    if buffer:
+        chunks.append(''.join(buffer))
+    return chunks
+
+
+def wire_bytes(chunks: List[str], protocol: str) -> int:
+    """한 응답 전체(start + chunks + end)의 전송 바이트"""
+    now = datetime.utcnow().isoformat() + 'Z'
+    frames = [{'type': 'ai_start', 'timestamp': now}]
+    for index, chunk in enumerate(chunks):
+        frames.append({
+            'type': 'ai_chunk',
+            'chunk': chunk,
+            'chunk_index': index,
+            'timestamp': now
+        })
+    frames.append({
+        'type': 'chat_end',
+        'engine': '11',
+        'conversationId': 'b1f0c7a2-3d9e-4f4e-9a51-2f1d8c7e6a10',
+        'total_chunks': len(chunks),
+        'response_length': sum(len(c) for c in chunks),
+        'message': '응답 생성이 완료되었습니다.',
+        'timestamp': now
+    })
+    return sum(len(encode_frame(frame, protocol).encode('utf-8')) for frame in frames)
+
+
+def run(total_tokens: int, tokens_per_delta: int, coalesce_bytes: int) -> Dict[str, Dict[str, float]]:
+    """시나리오별 1K 토큰당 전송 바이트"""
+    deltas = build_deltas(total_tokens, tokens_per_delta)
+    scenarios = {
+        f'per-delta ({tokens_per_delta} tok)': deltas,
+        f'coalesced ({coalesce_bytes} B)': coalesce(deltas, coalesce_bytes),
+    }
+    payload = sum(len(d.encode('utf-8')) for d in deltas)
+
+    results = {}
+    for name, chunks in scenarios.items():
+        results[name] = {
+            'frames': len(chunks) + 2,
+            'payload_per_1k': payload * 1000 / total_tokens,
+            PROTOCOL_VERBOSE: wire_bytes(chunks, PROTOCOL_VERBOSE) * 1000 / total_tokens,
+            PROTOCOL_COMPACT_V1: wire_bytes(chunks, PROTOCOL_COMPACT_V1) * 1000 / total_tokens,
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tokens', type=int, default=4000, help='시뮬레이션할 출력 토큰 수')
+    parser.add_argument('--tokens-per-delta', type=int, default=3)
+    parser.add_argument('--coalesce-bytes', type=int, default=2048)
+    args = parser.parse_args()
+
+    results = run(args.tokens, args.tokens_per_delta, args.coalesce_bytes)
+
+    print(f"출력 토큰 1K당 전송 바이트 (총 {args.tokens} 토큰)")
+    print(f"{'scenario':<24}{'frames':>8}{'payload':>10}{'verbose':>10}{'compact':>10}{'saved':>8}")
+    for name, row in results.items():
+        verbose = row[PROTOCOL_VERBOSE]
+        compact = row[PROTOCOL_COMPACT_V1]
+        saved = (1 - compact / verbose) * 100 if verbose else 0
+        print(f"{name:<24}{row['frames']:>8}{row['payload_per_1k']:>10.0f}"
+              f"{verbose:>10.0f}{compact:>10.0f}{saved:>7.1f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -39,9 +39,19 @@ TABLES = {
             }
         }
     },
+    'usage_events': {
+        'name': settings.get_table_name('usage_events'),
+        'partition_key': 'shard',
+        'sort_key': 'eventId'
+    },
     'websocket_connections': {
         'name': settings.get_table_name('websocket_connections'),
-        'partition_key': 'connectionId'
+        'partition_key': 'connectionId',
+        'indexes': {
+            'userId-index': {
+                'partition_key': 'userId'
+            }
+        }
     },
     'files': {
         'name': settings.get_table_name('files'),
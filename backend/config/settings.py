@@ -54,6 +54,7 @@ class Settings:
             'conversations': 'conversations',
             'prompts': 'prompts',
             'usage': 'usage',
+            'usage_events': 'usage-events',
             'websocket': 'websocket-connections',
             'websocket_connections': 'websocket-connections',
             'files': 'files',
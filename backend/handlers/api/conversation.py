@@ -9,7 +9,7 @@ from decimal import Decimal
 
 from services.conversation_service import ConversationService, Message
 from utils.response import APIResponse
-from utils.logger import setup_logger
+from utils.logger import log_lambda_event, setup_logger
 
 # 로깅 설정
 logger = setup_logger(__name__)
@@ -34,7 +34,7 @@ def handler(event, context):
     Returns:
         dict: API Gateway 응답 형식 (statusCode, headers, body)
     """
-    logger.info(f"Event: {json.dumps(event)}")
+    log_lambda_event(logger, event, 'api.conversation.event')
     
     # API Gateway v2 형식 처리
     if 'version' in event and event['version'] == '2.0':
@@ -2,44 +2,35 @@
 Prompt CRUD API Handler
 프롬프트 관리 REST API 엔드포인트
 """
+import base64
+import binascii
 import json
 import uuid
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import os
-import boto3
-from boto3.dynamodb.conditions import Key
 
-from utils.logger import setup_logger
+from services.file_store import get_file_store
+from services.ingestion import INGEST_SYNC_MAX_CHARS, ExtractionError, get_ingestion_service
+from services.prompt_preview import get_prompt_preview
+from services.prompt_registry import get_prompt_registry
+from services.prompt_snapshots import Snapshot, get_prompt_snapshots
+from utils.aws_clients import lazy_table
+from utils.logger import log_lambda_event, setup_logger
 from utils.response import APIResponse
-from config.settings import settings
-from config.database import get_table_name
 
 logger = setup_logger(__name__)
 
-# DynamoDB 테이블 초기화
-logger.info("Initializing DynamoDB resources...")
+# DynamoDB 테이블 - 첫 요청 시 생성 (콜드 스타트 단축)
+prompts_table = lazy_table('prompts')
 
-try:
-    dynamodb = boto3.resource('dynamodb', region_name=settings.AWS_REGION)
-    # 동적 테이블 이름 생성 (하드코딩 제거)
-    prompts_table_name = get_table_name('prompts')
-    files_table_name = get_table_name('files')
-
-    logger.info(f"Using prompts table: {prompts_table_name}")
-    logger.info(f"Using files table: {files_table_name}")
-
-    prompts_table = dynamodb.Table(prompts_table_name)
-    files_table = dynamodb.Table(files_table_name)
-
-    logger.info("DynamoDB tables initialized successfully")
-except Exception as e:
-    logger.error(f"Error initializing DynamoDB: {str(e)}", exc_info=True)
+# 일괄 추가/삭제 요청당 최대 파일 수
+FILE_BATCH_MAX_FILES = int(os.environ.get('FILE_BATCH_MAX_FILES', '100'))
 
 
 def handler(event, context):
     """Lambda 핸들러 - 프롬프트 관리 API"""
-    logger.info(f"Prompt API Event: {json.dumps(event)}")
+    log_lambda_event(logger, event, 'api.prompt.event')
     
     # API Gateway v2 형식 처리
     if 'version' in event and event['version'] == '2.0':
@@ -62,15 +53,19 @@ def handler(event, context):
         body = {}
         if event.get('body'):
             body = json.loads(event['body']) if isinstance(event['body'], str) else event['body']
-            logger.info(f"Request body: {body}")
+            # 문서 업로드 본문은 수 MB일 수 있으므로 필드 이름과 크기만
+            logger.info(f"Request body fields: {sorted(body)} ({len(event['body'])} chars)")
         
         logger.info(f"Method: {http_method}, Path: {path}, PathParams: {path_params}")
         
         # 라우팅
         if '/prompts' in path:
-            if '/files' in path:
+            if path.rstrip('/').endswith('/preview'):
+                # 시스템 프롬프트 토큰 예산 미리보기
+                return handle_preview(http_method, path_params, event.get('queryStringParameters') or {})
+            elif '/files' in path:
                 # 파일 관련 작업
-                return handle_files(http_method, path_params, body)
+                return handle_files(http_method, path_params, body, event.get('queryStringParameters') or {})
             else:
                 # 프롬프트 관련 작업
                 return handle_prompts(http_method, path_params, body)
@@ -82,6 +77,134 @@ def handler(event, context):
         return APIResponse.error(str(e))
 
 
+def capture_snapshot(engine_type: str, item: Optional[Dict] = None) -> Optional[Snapshot]:
+    """
+    저장 후 스냅샷 생성 + 역할별 시스템 프롬프트 렌더링 + 포인터 이동
+    (실패해도 저장 응답은 유지, 다음 저장 때 다시 생성)
+    """
+    try:
+        return get_prompt_snapshots().capture(engine_type, item)
+    except Exception as e:
+        logger.error(f"Error capturing prompt snapshot for {engine_type}: {e}")
+        return None
+
+
+def ingestion_job(engine_type: str, body: Dict) -> Dict:
+    """원본 문서(document: base64) 또는 큰 fileContent → 수집 작업 등록 (잘못된 문서는 ExtractionError/binascii.Error)"""
+    if 'document' in body:
+        data = base64.b64decode(body['document'], validate=True)
+    else:
+        data = body.get('fileContent', '').encode('utf-8')
+    return get_ingestion_service().submit(
+        engine_type, body.get('fileName', 'untitled.txt'), data,
+        body.get('contentType') or ('' if 'document' in body else 'text/plain'),
+        always_include=bool(body.get('alwaysInclude', False))
+    )
+
+
+def submit_ingestion(engine_type: str, body: Dict) -> Dict:
+    """수집 작업 등록 응답 (202, 진행 상황은 GET .../files/{jobId})"""
+    try:
+        return APIResponse.success({'ingestion': ingestion_job(engine_type, body)}, 202)
+    except (ExtractionError, binascii.Error) as e:
+        return APIResponse.error(str(e), 400)
+    except Exception as e:
+        logger.error(f"Error submitting ingestion for {engine_type}: {e}")
+        return APIResponse.error(str(e))
+
+
+def create_files(engine_type: str, files: List[Dict]) -> Dict:
+    """
+    파일 일괄 추가 - BatchWriteItem으로 저장하고 스냅샷은 한 번만 생성
+
+    원본 문서/큰 붙여넣기는 파일마다 수집 작업으로 (status=queued)
+    응답: 201 {results: [{fileId, status, file | ingestion | error}], snapshotId, renderedTokens}
+    (일부 실패 시 207)
+    """
+    if not files:
+        return APIResponse.error('files is empty', 400)
+    if len(files) > FILE_BATCH_MAX_FILES:
+        return APIResponse.error(f"Too many files (max {FILE_BATCH_MAX_FILES})", 400)
+
+    try:
+        results: List[Dict] = [{} for _ in files]
+        direct = []
+        for index, f in enumerate(files):
+            content = f.get('fileContent', '')
+            if 'document' in f or len(content) > INGEST_SYNC_MAX_CHARS:
+                try:
+                    job = ingestion_job(engine_type, f)
+                    results[index] = {'fileId': job['jobId'], 'status': 'queued', 'ingestion': job}
+                except Exception as e:
+                    logger.error(f"Error submitting ingestion for {engine_type}: {e}")
+                    results[index] = {'fileId': None, 'status': 'failed', 'error': str(e)}
+                continue
+            direct.append((index, {**f, 'fileId': str(uuid.uuid4())}))
+
+        stored = get_file_store().put_files(engine_type, [f for _, f in direct])
+        for (index, _), result in zip(direct, stored):
+            if 'item' in result:
+                result = {'fileId': result['fileId'], 'status': 'created', 'file': result['item']}
+            results[index] = result
+
+        # 저장된 파일이 있을 때만 스냅샷/포인터 1회 갱신 (응답 본문 채우기보다 먼저)
+        snapshot = capture_snapshot(engine_type) if any(r['status'] == 'created' for r in results) else None
+        # 응답에는 정규화된 본문
+        get_file_store().fill_content([r['file'] for r in results if 'file' in r])
+        failed = sum(1 for r in results if r['status'] == 'failed')
+        return APIResponse.success({'results': results, **snapshot_summary(snapshot)}, 207 if failed else 201)
+    except Exception as e:
+        logger.error(f"Error creating files for {engine_type}: {e}")
+        return APIResponse.error(str(e))
+
+
+def delete_files(engine_type: str, file_ids: List[str]) -> Dict:
+    """파일 일괄 삭제 - BatchWriteItem + 스냅샷 1회 (응답: {results: [{fileId, status}]}, 일부 실패 시 207)"""
+    if not file_ids:
+        return APIResponse.error('fileIds is empty', 400)
+    if len(file_ids) > FILE_BATCH_MAX_FILES:
+        return APIResponse.error(f"Too many files (max {FILE_BATCH_MAX_FILES})", 400)
+
+    try:
+        results = get_file_store().delete_files(engine_type, [str(file_id) for file_id in file_ids])
+        # 지운 파일이 있을 때만 스냅샷/포인터 1회 갱신
+        snapshot = capture_snapshot(engine_type) if any(r['status'] == 'deleted' for r in results) else None
+        failed = sum(1 for r in results if r['status'] == 'failed')
+        return APIResponse.success({'results': results, **snapshot_summary(snapshot)}, 207 if failed else 200)
+    except Exception as e:
+        logger.error(f"Error deleting files for {engine_type}: {e}")
+        return APIResponse.error(str(e))
+
+
+def snapshot_summary(snapshot: Optional[Snapshot]) -> Dict:
+    """저장 응답용 - 스냅샷 ID와 역할별 시스템 프롬프트 토큰 수"""
+    if snapshot is None:
+        return {}
+    return {
+        'snapshotId': snapshot.snapshot_id,
+        'renderedTokens': {role: block['tokens'] for role, block in snapshot.rendered.items()}
+    }
+
+
+def handle_preview(method: str, path_params: Dict, query: Dict) -> Dict:
+    """
+    현재 스냅샷의 블록/파일별 토큰, 캐시 지점, 1,000 메시지당 예상 비용 (?text=true면 블록 본문 포함)
+
+    GET이지만 스냅샷이 없거나 이전 템플릿 버전이면 스냅샷을 만들고 포인터/레지스트리를 갱신한다.
+    """
+    if method != 'GET':
+        return APIResponse.error('Method not allowed', 405)
+    engine_type = path_params.get('promptId') or path_params.get('engineType')
+    try:
+        preview = get_prompt_preview().preview(engine_type, include_text=query.get('text') == 'true')
+        if preview is None:
+            return APIResponse.error('Prompt not found', 404)
+        return APIResponse.success(preview)
+    except Exception as e:
+        logger.error(f"Error previewing prompt for {engine_type}: {e}")
+        return APIResponse.error(str(e))
+
+
 def handle_prompts(method: str, path_params: Dict, body: Dict) -> Dict:
     """프롬프트 (설명, 지침) CRUD 처리"""
 
@@ -99,31 +222,32 @@ def handle_prompts(method: str, path_params: Dict, body: Dict) -> Dict:
                 
                 # 해당 엔진의 파일들도 함께 조회
                 try:
-                    files_response = files_table.query(
-                        KeyConditionExpression=Key('promptId').eq(engine_type)
-                    )
-                    files = files_response.get('Items', [])
+                    files = get_file_store().list_files(engine_type)
                 except Exception as e:
                     logger.warning(f"Error getting files for {engine_type}: {e}")
                     files = []
+
+                # 롤백 대상 스냅샷 목록 (본문 제외)
+                try:
+                    snapshots = get_prompt_snapshots().history(engine_type)
+                except Exception as e:
+                    logger.warning(f"Error getting snapshots for {engine_type}: {e}")
+                    snapshots = []
                 
                 return APIResponse.success({
                     'prompt': item,
-                    'files': files
+                    'files': files,
+                    'snapshots': snapshots
                 })
             except Exception as e:
                 logger.error(f"Error getting prompt {engine_type}: {e}")
                 return APIResponse.error(str(e))
         else:
-            # 모든 프롬프트 조회
+            # 모든 프롬프트 조회 - 레지스트리 항목 1개 (컨테이너 캐시, 없으면 scan 후 생성)
             try:
-                response = prompts_table.scan()
-                items = response.get('Items', [])
-                # 중복 제거 (engineType과 promptId가 같은 경우)
-                unique_prompts = {item.get('engineType', item.get('promptId')): item for item in items}
-                return APIResponse.success({'prompts': list(unique_prompts.values())})
+                return APIResponse.success({'prompts': get_prompt_registry().list()})
             except Exception as e:
-                logger.error(f"Error scanning prompts: {e}")
+                logger.error(f"Error listing prompts: {e}")
                 return APIResponse.error(str(e))
     
     elif method == 'POST':
@@ -138,11 +262,17 @@ def handle_prompts(method: str, path_params: Dict, body: Dict) -> Dict:
                 'promptId': engine_type,     # RANGE key
                 'description': body.get('description', ''),
                 'instruction': body.get('instruction', ''),
+                **({'compactPrompt': bool(body['compactPrompt'])} if 'compactPrompt' in body else {}),
                 'createdAt': datetime.utcnow().isoformat() + 'Z',
                 'updatedAt': datetime.utcnow().isoformat() + 'Z'
             }
             prompts_table.put_item(Item=item)
-            return APIResponse.success({'message': 'Prompt created/updated successfully', 'promptId': engine_type})
+            snapshot = capture_snapshot(engine_type, item)
+            return APIResponse.success({
+                'message': 'Prompt created/updated successfully',
+                'promptId': engine_type,
+                **snapshot_summary(snapshot)
+            })
         except Exception as e:
             logger.error(f"Error creating prompt {engine_type}: {e}")
             return APIResponse.error(str(e))
@@ -153,6 +283,12 @@ def handle_prompts(method: str, path_params: Dict, body: Dict) -> Dict:
             return APIResponse.error('engineType is required', 400)
         
         try:
+            # 이전 스냅샷으로 롤백
+            if body.get('rollbackTo'):
+                if not get_prompt_snapshots().rollback(engine_type, body['rollbackTo']):
+                    return APIResponse.error('Snapshot not found', 404)
+                return APIResponse.success({'message': 'Prompt rolled back', 'snapshotId': body['rollbackTo']})
+
             logger.info(f"Updating prompt {engine_type} with body: {body}")
 
             update_expr = []
@@ -168,6 +304,11 @@ def handle_prompts(method: str, path_params: Dict, body: Dict) -> Dict:
                 expr_attr_values[':inst'] = body['instruction']
                 logger.info(f"Adding instruction update: {body['instruction'][:100]}...")
 
+            if 'compactPrompt' in body:
+                # 엔진별 압축 렌더링 (A/B 비교용 스위치)
+                update_expr.append('compactPrompt = :compact')
+                expr_attr_values[':compact'] = bool(body['compactPrompt'])
+
             if update_expr:
                 update_expr.append('updatedAt = :updated')
                 expr_attr_values[':updated'] = datetime.utcnow().isoformat() + 'Z'
@@ -189,13 +330,17 @@ def handle_prompts(method: str, path_params: Dict, body: Dict) -> Dict:
                     updated_item['description'] = body['description']
                 if 'instruction' in body:
                     updated_item['instruction'] = body['instruction']
+                if 'compactPrompt' in body:
+                    updated_item['compactPrompt'] = bool(body['compactPrompt'])
                 updated_item['updatedAt'] = datetime.utcnow().isoformat() + 'Z'
                 updated_item['engineType'] = engine_type  # HASH 키
                 updated_item['promptId'] = engine_type     # RANGE 키
 
                 logger.info(f"Putting updated item: {list(updated_item.keys())}")
                 prompts_table.put_item(Item=updated_item)
+                snapshot = capture_snapshot(engine_type, updated_item)
                 logger.info(f"Update successful for {engine_type}")
+                return APIResponse.success({'message': 'Prompt updated successfully', **snapshot_summary(snapshot)})
 
             return APIResponse.success({'message': 'Prompt updated successfully'})
         except Exception as e:
@@ -205,7 +350,7 @@ def handle_prompts(method: str, path_params: Dict, body: Dict) -> Dict:
     return APIResponse.error('Method not allowed', 405)
 
 
-def handle_files(method: str, path_params: Dict, body: Dict) -> Dict:
+def handle_files(method: str, path_params: Dict, body: Dict, query: Optional[Dict] = None) -> Dict:
     """파일 CRUD 처리"""
     
     # promptId와 engineType 둘 다 지원 (API Gateway 호환성)
@@ -213,13 +358,33 @@ def handle_files(method: str, path_params: Dict, body: Dict) -> Dict:
     file_id = path_params.get('fileId')
     
     if method == 'GET':
-        # 특정 엔진의 파일 목록 조회
+        # 수집 작업 진행 상황 또는 파일 1개
+        if engine_type and file_id:
+            try:
+                job = get_ingestion_service().status(engine_type, file_id)
+                if job is not None:
+                    return APIResponse.success({'ingestion': job})
+                item = get_file_store().get_file(engine_type, file_id)
+                if item is None:
+                    return APIResponse.error('File not found', 404)
+                if (query or {}).get('original') == 'true':
+                    # 정규화 전 원본
+                    item['fileContent'] = get_file_store().get_original(engine_type, file_id)
+                return APIResponse.success({'file': item})
+            except Exception as e:
+                logger.error(f"Error getting file {file_id} for {engine_type}: {e}")
+                return APIResponse.error(str(e))
+
+        # 특정 엔진의 파일 목록 조회 (+ 최근 수집 작업)
         if engine_type:
             try:
-                response = files_table.query(
-                    KeyConditionExpression=Key('promptId').eq(engine_type)
-                )
-                return APIResponse.success({'files': response.get('Items', [])})
+                try:
+                    ingestions = get_ingestion_service().jobs(engine_type)
+                except Exception as e:
+                    logger.warning(f"Error getting ingestion jobs for {engine_type}: {e}")
+                    ingestions = []
+                return APIResponse.success({'files': get_file_store().list_files(engine_type),
+                                            'ingestions': ingestions})
             except Exception as e:
                 logger.error(f"Error getting files for {engine_type}: {e}")
                 return APIResponse.error(str(e))
@@ -228,20 +393,27 @@ def handle_files(method: str, path_params: Dict, body: Dict) -> Dict:
         # 새 파일 추가
         if not engine_type:
             return APIResponse.error('engineType is required', 400)
+
+        if isinstance(body.get('files'), list):
+            # 여러 파일을 한 요청으로
+            return create_files(engine_type, body['files'])
+
+        content = body.get('fileContent', '')
+        if 'document' in body or len(content) > INGEST_SYNC_MAX_CHARS:
+            # 원본 문서/큰 붙여넣기는 수집 작업으로 (추출/정규화/저장/색인은 작업자가)
+            return submit_ingestion(engine_type, body)
         
         try:
-            new_file_id = str(uuid.uuid4())
-            item = {
-                'promptId': engine_type,
-                'fileId': new_file_id,
-                'fileName': body.get('fileName', 'untitled.txt'),
-                'fileContent': body.get('fileContent', ''),
-                'createdAt': datetime.utcnow().isoformat() + 'Z'
-            }
-            
-            files_table.put_item(Item=item)
-            
-            return APIResponse.success({'file': item}, 201)
+            # 큰 파일은 청크로 저장 (항목에는 청크 참조만)
+            item = get_file_store().put_file(
+                engine_type, str(uuid.uuid4()), body.get('fileName', 'untitled.txt'), content,
+                always_include=bool(body.get('alwaysInclude', False)), normalize=body.get('normalize')
+            )
+            snapshot = capture_snapshot(engine_type)
+
+            # 응답에는 정규화된 본문
+            file = get_file_store().fill_content([item])[0]
+            return APIResponse.success({'file': file, **snapshot_summary(snapshot)}, 201)
         except Exception as e:
             logger.error(f"Error creating file for {engine_type}: {e}")
             return APIResponse.error(str(e))
@@ -252,26 +424,23 @@ def handle_files(method: str, path_params: Dict, body: Dict) -> Dict:
             return APIResponse.error('engineType and fileId are required', 400)
         
         try:
-            update_expr = []
-            expr_attr_values = {}
-            
-            if 'fileName' in body:
-                update_expr.append('fileName = :name')
-                expr_attr_values[':name'] = body['fileName']
-            
-            if 'fileContent' in body:
-                update_expr.append('fileContent = :content')
-                expr_attr_values[':content'] = body['fileContent']
-            
-            if update_expr:
-                update_expr.append('updatedAt = :updated')
-                expr_attr_values[':updated'] = datetime.utcnow().isoformat() + 'Z'
-                
-                files_table.update_item(
-                    Key={'promptId': engine_type, 'fileId': file_id},
-                    UpdateExpression='SET ' + ', '.join(update_expr),
-                    ExpressionAttributeValues=expr_attr_values
+            content = body.get('fileContent')
+            normalize = body.get('normalize')
+            if body.get('restoreOriginal'):
+                # 정규화 되돌리기 - 원본을 그대로 저장
+                content = get_file_store().get_original(engine_type, file_id)
+                if content is None:
+                    return APIResponse.error('File not found', 404)
+                normalize = False
+            if 'fileName' in body or content is not None or 'alwaysInclude' in body:
+                # 본문이 바뀌면 다시 정규화하고 크기에 따라 인라인/청크 형식을 다시 결정
+                updated = get_file_store().update_file(
+                    engine_type, file_id, body.get('fileName'), content,
+                    bool(body['alwaysInclude']) if 'alwaysInclude' in body else None, normalize
                 )
+                if updated is None:
+                    return APIResponse.error('File not found', 404)
+                capture_snapshot(engine_type)
             
             return APIResponse.success({'message': 'File updated successfully'})
         except Exception as e:
@@ -280,13 +449,15 @@ def handle_files(method: str, path_params: Dict, body: Dict) -> Dict:
     
     elif method == 'DELETE':
         # 파일 삭제
+        if engine_type and not file_id and isinstance(body.get('fileIds'), list):
+            return delete_files(engine_type, body['fileIds'])
+
         if not engine_type or not file_id:
             return APIResponse.error('engineType and fileId are required', 400)
         
         try:
-            files_table.delete_item(
-                Key={'promptId': engine_type, 'fileId': file_id}
-            )
+            get_file_store().delete_file(engine_type, file_id)
+            capture_snapshot(engine_type)
             
             return APIResponse.success({'message': 'File deleted successfully'})
         except Exception as e:
@@ -4,28 +4,21 @@ Usage API Handler
 """
 
 import json
-import boto3
-from datetime import datetime, timezone
+from datetime import datetime
 from decimal import Decimal
 import logging
 from botocore.exceptions import ClientError
-from boto3.dynamodb.conditions import Key
 import os
 from urllib.parse import unquote
 
-from utils.logger import setup_logger
+from utils.logger import log_lambda_event, setup_logger
 from utils.response import APIResponse
-from config.settings import settings
-from config.database import get_table_name
+from utils.token_estimator import estimate_tokens_batch
+from services.usage_ledger import get_usage_ledger
 
 # 로깅 설정
 logger = setup_logger(__name__)
 
-# DynamoDB 초기화
-dynamodb = boto3.resource('dynamodb', region_name=settings.AWS_REGION)
-# 동적 테이블 이름 생성 (하드코딩 제거)
-usage_table = dynamodb.Table(get_table_name('usage'))
-
 
 def decimal_to_float(obj):
     """DynamoDB Decimal을 float로 변환"""
@@ -38,119 +31,35 @@ def decimal_to_float(obj):
     return obj
 
 
-def estimate_tokens(text):
-    """토큰 추정 (한글/영어 구분)"""
-    if not text:
-        return 0
-    
-    # 문자 타입별 카운트
-    korean_chars = 0
-    english_chars = 0
-    numbers = 0
-    spaces = 0
-    
-    for char in text:
-        if '가' <= char <= '힣':
-            korean_chars += 1
-        elif char.isalpha() and char.isascii():
-            english_chars += 1
-        elif char.isdigit():
-            numbers += 1
-        elif char.isspace():
-            spaces += 1
-    
-    # 나머지 특수문자
-    special_chars = len(text) - korean_chars - english_chars - numbers - spaces
-    
-    # 토큰 계산 (경험적 수치)
-    # Claude 기준 근사치
-    korean_tokens = korean_chars / 2.5  # 한글 2.5자당 1토큰
-    english_tokens = english_chars / 4  # 영어 4자당 1토큰  
-    number_tokens = numbers / 3.5       # 숫자 3.5자당 1토큰
-    space_tokens = spaces / 4           # 공백 4개당 1토큰
-    special_tokens = special_chars / 3  # 특수문자 3자당 1토큰
-    
-    total_tokens = (korean_tokens + english_tokens + 
-                   number_tokens + space_tokens + special_tokens)
-    
-    return max(1, int(total_tokens))
-
-
-def get_or_create_usage(user_id, engine_type):
-    """사용량 조회 또는 생성"""
-    year_month = datetime.now(timezone.utc).strftime('%Y-%m')
-    pk = f"user#{user_id}"
-    sk = f"engine#{engine_type}#{year_month}"
-    
-    try:
-        # 먼저 조회
-        response = usage_table.get_item(
-            Key={'PK': pk, 'SK': sk}
-        )
-        
-        if 'Item' in response:
-            return response['Item']
-        
-        # 없으면 새로 생성
-        new_item = {
-            'PK': pk,
-            'SK': sk,
-            'userId': user_id,
-            'engineType': engine_type,
-            'yearMonth': year_month,
-            'totalTokens': Decimal('0'),
-            'inputTokens': Decimal('0'),
-            'outputTokens': Decimal('0'),
-            'messageCount': Decimal('0'),
-            'createdAt': datetime.now(timezone.utc).isoformat(),
-            'updatedAt': datetime.now(timezone.utc).isoformat()
-        }
-        
-        usage_table.put_item(Item=new_item)
-        return new_item
-        
-    except ClientError as e:
-        logger.error(f"Error getting/creating usage: {e}")
-        raise
+def _engine_month(rollup, user_id, engine_type, year_month):
+    """월 롤업의 엔진별 카운터 → 기존 응답 형식"""
+    counters = rollup['by_engine'].get(engine_type, {})
+    return {
+        'userId': user_id,
+        'engineType': engine_type,
+        'yearMonth': year_month,
+        'totalTokens': counters.get('totalTokens', 0),
+        'inputTokens': counters.get('inputTokens', 0),
+        'outputTokens': counters.get('outputTokens', 0),
+        'messageCount': counters.get('messageCount', 0),
+        'updatedAt': rollup.get('updatedAt')
+    }
 
 
 def update_usage(user_id, engine_type, input_text, output_text, user_plan='free'):
-    """사용량 업데이트 (간단 버전)"""
+    """
+    이번 달 엔진 합계 반환 (조회만 - 월 롤업 get_item 1회)
+
+    메시지 사용량은 WebSocket 경로(WebSocketService.track_usage)가 Bedrock 보고 토큰으로 이미 원장에 기록하므로
+    채팅 종료 후 프론트엔드가 보내는 이 요청은 기록하지 않는다 (같은 메시지를 두 번 세지 않도록).
+    tokensUsed는 요청 본문 기준 추정값 (응답 표시용)
+    """
     try:
-        # 토큰 계산
-        input_tokens = estimate_tokens(input_text)
-        output_tokens = estimate_tokens(output_text)
+        input_tokens, output_tokens = estimate_tokens_batch([input_text, output_text])
         total_tokens = input_tokens + output_tokens
-        
-        year_month = datetime.now(timezone.utc).strftime('%Y-%m')
-        pk = f"user#{user_id}"
-        sk = f"engine#{engine_type}#{year_month}"
-        
-        # 먼저 레코드 확인/생성
-        get_or_create_usage(user_id, engine_type)
-        
-        # 간단한 업데이트 (ADD 사용으로 원자적 증가)
-        response = usage_table.update_item(
-            Key={'PK': pk, 'SK': sk},
-            UpdateExpression="""
-                ADD totalTokens :total,
-                    inputTokens :input,
-                    outputTokens :output,
-                    messageCount :one
-                SET updatedAt = :timestamp,
-                    lastUsedAt = :timestamp
-            """,
-            ExpressionAttributeValues={
-                ':total': Decimal(str(total_tokens)),
-                ':input': Decimal(str(input_tokens)),
-                ':output': Decimal(str(output_tokens)),
-                ':one': Decimal('1'),
-                ':timestamp': datetime.now(timezone.utc).isoformat()
-            },
-            ReturnValues='ALL_NEW'
-        )
-        
-        updated_item = decimal_to_float(response['Attributes'])
+        year_month = datetime.now().strftime('%Y-%m')
+
+        updated_item = _engine_month(get_usage_ledger().month(user_id, year_month), user_id, engine_type, year_month)
         
         # 플랜별 월간 한도 설정
         plan_limits = {
@@ -176,62 +85,25 @@ def update_usage(user_id, engine_type, input_text, output_text, user_plan='free'
 
 
 def get_usage(user_id, engine_type):
-    """사용량 조회"""
+    """이번 달 엔진별 사용량 조회 (월 롤업 get_item 1회)"""
     try:
-        year_month = datetime.now(timezone.utc).strftime('%Y-%m')
-        pk = f"user#{user_id}"
-        sk = f"engine#{engine_type}#{year_month}"
-        
-        response = usage_table.get_item(
-            Key={'PK': pk, 'SK': sk}
-        )
-        
-        if 'Item' in response:
-            return decimal_to_float(response['Item'])
-        
-        # 없으면 기본값 반환
-        return {
-            'userId': user_id,
-            'engineType': engine_type,
-            'yearMonth': year_month,
-            'totalTokens': 0,
-            'inputTokens': 0,
-            'outputTokens': 0,
-            'messageCount': 0
-        }
-        
+        year_month = datetime.now().strftime('%Y-%m')
+        return _engine_month(get_usage_ledger().month(user_id, year_month), user_id, engine_type, year_month)
+
     except ClientError as e:
         logger.error(f"사용량 조회 실패: {e}")
         return None
 
 
 def get_all_usage(user_id):
-    """모든 엔진의 사용량 조회"""
+    """모든 엔진의 월별 사용량 조회 (월 롤업 query 1회, 최근 월부터)"""
     try:
-        pk = f"user#{user_id}"
-        
-        # Key 조건 사용 (GPT 피드백 반영)
-        response = usage_table.query(
-            KeyConditionExpression=Key('PK').eq(pk)
-        )
-        
-        items = [decimal_to_float(item) for item in response.get('Items', [])]
-        
-        # 엔진별로 정리
         usage_by_engine = {}
-        for item in items:
-            engine_type = item.get('engineType', 'unknown')
-            year_month = item.get('yearMonth', '')
-            
-            if engine_type not in usage_by_engine:
-                usage_by_engine[engine_type] = []
-            
-            usage_by_engine[engine_type].append(item)
-        
-        # 각 엔진별로 월별 정렬
-        for engine in usage_by_engine:
-            usage_by_engine[engine].sort(key=lambda x: x.get('yearMonth', ''), reverse=True)
-        
+        for month in get_usage_ledger().months(user_id):
+            for engine_type in month['by_engine']:
+                usage_by_engine.setdefault(engine_type, []).append(
+                    _engine_month(month, user_id, engine_type, month['month'])
+                )
         return usage_by_engine
         
     except ClientError as e:
@@ -239,10 +111,29 @@ def get_all_usage(user_id):
         return {}
 
 
+def get_leaderboard(query):
+    """상위 사용자 조회 (date-index 일별 query, 컨테이너 캐시)"""
+    from services.usage_service import UsageService
+
+    try:
+        limit = min(100, max(1, int(query.get('top', 10))))
+        days = int(query.get('days', 30))
+    except ValueError:
+        return APIResponse.error('top, days는 숫자여야 합니다', 400)
+
+    metric = query.get('metric', 'tokens')
+    try:
+        users = UsageService().get_top_users(limit, days, metric)
+    except ValueError as e:
+        return APIResponse.error(str(e), 400)
+
+    return APIResponse.success({'success': True, 'data': decimal_to_float(users)})
+
+
 def handler(event, context):
     """Lambda 메인 핸들러"""
     try:
-        logger.info(f"Usage API Event: {json.dumps(event)}")
+        log_lambda_event(logger, event, 'api.usage.event')
         
         # API Gateway v2 형식 처리
         if 'version' in event and event['version'] == '2.0':
@@ -269,6 +160,10 @@ def handler(event, context):
                 user_id = unquote(user_id)
             
             if not user_id:
+                # GET /usage?top=10&days=30&metric=tokens - 기간 내 상위 사용자
+                query = event.get('queryStringParameters') or {}
+                if query.get('top'):
+                    return get_leaderboard(query)
                 return APIResponse.error('userId 필수', 400)
             
             if engine_type_or_all == 'all':
@@ -0,0 +1,38 @@
+"""
+지식 파일 수집 작업자 (SQS 트리거)
+원본 문서 추출/정규화/저장/색인 - services/ingestion.py 참고
+"""
+import json
+
+from services.ingestion import INGEST_MAX_RECEIVES, LocalIngestionQueue, get_ingestion_service
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def handler(event, context):
+    """
+    SQS 배치 처리 - 실패한 메시지만 batchItemFailures로 돌려 재시도
+    마지막 수신(ApproximateReceiveCount >= INGEST_MAX_RECEIVES)이면 작업을 failed로 끝냄
+    (Records 없이 호출하면 로컬 디렉터리 큐를 비움 - 로컬 개발용, 재전달이 없으므로 항상 마지막 수신)
+    """
+    service = get_ingestion_service()
+    records = (event or {}).get('Records')
+    if records is None:
+        queue = service.queue if isinstance(service.queue, LocalIngestionQueue) else LocalIngestionQueue()
+        processed = 0
+        for message in queue.receive(limit=int((event or {}).get('limit', 10))):
+            service.process(message['engineType'], message['jobId'], final_attempt=True)
+            processed += 1
+        return {'processed': processed}
+
+    failures = []
+    for record in records:
+        try:
+            message = json.loads(record['body'])
+            receives = int(record.get('attributes', {}).get('ApproximateReceiveCount', '1'))
+            service.process(message['engineType'], message['jobId'], final_attempt=receives >= INGEST_MAX_RECEIVES)
+        except Exception as e:
+            logger.error(f"Ingestion error for message {record.get('messageId')}: {str(e)}")
+            failures.append({'itemIdentifier': record.get('messageId')})
+    return {'batchItemFailures': failures}
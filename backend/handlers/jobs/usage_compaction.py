@@ -0,0 +1,17 @@
+"""
+사용량 이벤트 컴팩션 핸들러 (스케줄 실행)
+마감된 시간 버킷의 사용량 이벤트를 원본/롤업 카운터로 반영 - services/usage_events.py 참고
+"""
+from services.usage_events import run_compaction
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def handler(event, context):
+    """워터마크 이후 마감된 시간 버킷 컴팩션"""
+    try:
+        return run_compaction(dry_run=bool((event or {}).get('dryRun')))
+    except Exception as e:
+        logger.error(f"Usage compaction error: {str(e)}")
+        raise
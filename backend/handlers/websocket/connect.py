@@ -2,14 +2,13 @@
 WebSocket 연결 핸들러
 """
 import json
-import boto3
 from datetime import datetime
-from config.database import get_table_name
+from utils.aws_clients import get_table
 from utils.logger import get_logger
 from utils.response import create_response
+from utils.ws_protocol import negotiate_protocol
 
 logger = get_logger(__name__)
-dynamodb = boto3.resource('dynamodb')
 
 def handler(event, context):
     """WebSocket 연결 시 처리"""
@@ -20,20 +19,22 @@ def handler(event, context):
         query_params = event.get('queryStringParameters', {}) or {}
         user_id = query_params.get('userId', 'anonymous')
         engine_type = query_params.get('engineType', '11')
+        protocol = negotiate_protocol(query_params)
         
         # 연결 정보 저장
-        table = dynamodb.Table(get_table_name('websocket_connections'))
+        table = get_table('websocket_connections')
         table.put_item(
             Item={
                 'connectionId': connection_id,
                 'userId': user_id,
                 'engineType': engine_type,
+                'protocol': protocol,
                 'connectedAt': datetime.utcnow().isoformat(),
                 'ttl': int(datetime.utcnow().timestamp()) + 86400  # 24시간
             }
         )
         
-        logger.info(f"WebSocket connected: {connection_id} for user {user_id}")
+        logger.info(f"WebSocket connected: {connection_id} for user {user_id} (protocol: {protocol})")
         return create_response(200, {'message': 'Connected'})
         
     except Exception as e:
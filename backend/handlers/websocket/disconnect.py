@@ -1,13 +1,11 @@
 """
 WebSocket 연결 해제 핸들러
 """
-import boto3
-from config.database import get_table_name
+from utils.aws_clients import get_table
 from utils.logger import get_logger
 from utils.response import create_response
 
 logger = get_logger(__name__)
-dynamodb = boto3.resource('dynamodb')
 
 def handler(event, context):
     """WebSocket 연결 해제 시 처리"""
@@ -15,7 +13,7 @@ def handler(event, context):
         connection_id = event['requestContext']['connectionId']
         
         # 연결 정보 삭제
-        table = dynamodb.Table(get_table_name('websocket_connections'))
+        table = get_table('websocket_connections')
         table.delete_item(
             Key={'connectionId': connection_id}
         )
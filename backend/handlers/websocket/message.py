@@ -3,19 +3,27 @@ WebSocket Message Handler
 WebSocket 메시지 처리 Lambda 핸들러
 """
 import json
-import boto3
 import logging
 from datetime import datetime
 
-import sys
 import os
+import time
 
-
+from services.connection_fanout import BROADCAST_ENABLED, ConnectionFanout
+from services.quota_gate import get_quota_gate
+from services.usage_ledger import get_usage_ledger
 from services.websocket_service import WebSocketService
-from utils.logger import setup_logger
+from utils.aws_clients import get_client, get_table
+from utils.deadline import StreamDeadline
+from utils.logger import StreamLogSummary, log_event, log_lambda_event, setup_logger
+from utils.ws_protocol import DEFAULT_PROTOCOL, SUPPORTED_PROTOCOLS, encode_frame
 
 logger = setup_logger(__name__)
 
+# 연결별 협상된 프로토콜 캐시 - Lambda 컨테이너 재사용 시 유지됨
+CONNECTION_PROTOCOLS = {}
+CONNECTION_PROTOCOLS_MAX = 1024
+
 
 def handler(event, context):
     """
@@ -26,6 +34,7 @@ def handler(event, context):
     액션 타입:
     - sendMessage: AI와 대화 (기본)
     - clearHistory: 대화 기록 초기화
+    - continue: 시간 제한으로 잘린 응답 이어쓰기 (continuationToken 필요)
     
     Args:
         event: WebSocket 이벤트 객체
@@ -34,15 +43,15 @@ def handler(event, context):
     Returns:
         dict: WebSocket 응답 (statusCode, body)
     """
-    logger.info(f"Message event: {json.dumps(event)}")
+    log_lambda_event(logger, event, 'ws.message.event')
     
     # WebSocket 연결 정보
     connection_id = event['requestContext']['connectionId']
     domain_name = event['requestContext']['domainName']
     stage = event['requestContext']['stage']
     
-    # API Gateway Management API 클라이언트
-    apigateway_client = boto3.client(
+    # API Gateway Management API 클라이언트 (엔드포인트별로 컨테이너 재사용)
+    apigateway_client = get_client(
         'apigatewaymanagementapi',
         endpoint_url=f'https://{domain_name}/{stage}',
         region_name=os.environ.get('AWS_REGION', 'us-east-1')
@@ -50,6 +59,15 @@ def handler(event, context):
     
     # Service 초기화
     websocket_service = WebSocketService()
+
+    # $connect 시 협상된 프레임 프로토콜
+    protocol = get_connection_protocol(connection_id)
+
+    # Lambda 타임아웃 전에 스트리밍을 끊고 부분 응답을 저장하기 위한 마감 시간
+    deadline = StreamDeadline(context)
+    # 사용량 이벤트 ID (Lambda 요청 ID)
+    request_id = getattr(context, 'aws_request_id', None)
+    fanout = None
     
     try:
         # 요청 파싱
@@ -67,7 +85,7 @@ def handler(event, context):
                 send_message_to_client(connection_id, {
                     'type': 'history_cleared',
                     'message': '대화 기록이 초기화되었습니다.' if success else '초기화 실패'
-                }, apigateway_client)
+                }, apigateway_client, protocol)
                 
                 return {
                     'statusCode': 200,
@@ -84,59 +102,72 @@ def handler(event, context):
             conversation_history = body.get('conversationHistory', [])
             user_role = determine_user_role(user_id, body)
             
-            logger.info(f"Processing message for {engine_type}, user: {user_id}, role: {user_role}")
-            
-            # 1. 메시지 처리 시작
-            process_result = websocket_service.process_message(
-                user_message=user_message,
-                engine_type=engine_type,
-                conversation_id=conversation_id,
-                user_id=user_id,
-                conversation_history=conversation_history,
-                user_role=user_role
-            )
-            
-            conversation_id = process_result['conversation_id']
-            merged_history = process_result['merged_history']
+            log_event(logger, 'ws.message.start', engine=engine_type, user=user_id, role=user_role)
+
+            # 0. 월간 토큰 한도 확인 (입력 추정 토큰 선차감, 캐시된 잔여량으로 판정)
+            quota = get_quota_gate().acquire(user_id, user_message)
+            if not quota.allowed:
+                return reject_quota(connection_id, apigateway_client, protocol, quota)
             
-            # 2. AI 시작 알림
-            send_message_to_client(connection_id, {
-                'type': 'ai_start',
-                'timestamp': datetime.utcnow().isoformat() + 'Z'
-            }, apigateway_client)
+            used_tokens = 0
+            try:
+                # 1. 메시지 처리 시작
+                process_result = websocket_service.process_message(
+                    user_message=user_message,
+                    engine_type=engine_type,
+                    conversation_id=conversation_id,
+                    user_id=user_id,
+                    conversation_history=conversation_history,
+                    user_role=user_role
+                )
             
-            # 3. 스트리밍 응답 전송
-            chunk_index = 0
-            total_response = ""
+                conversation_id = process_result['conversation_id']
+                merged_history = process_result['merged_history']
             
-            for chunk in websocket_service.stream_response(
-                user_message=user_message,
-                engine_type=engine_type,
-                conversation_id=conversation_id,
-                user_id=user_id,
-                conversation_history=merged_history,
-                user_role=user_role
-            ):
-                total_response += chunk
-                
-                # 청크 전송
-                logger.info(f"Sending chunk {chunk_index} to {connection_id}, chunk length: {len(chunk)}")
-                send_message_to_client(connection_id, {
-                    'type': 'ai_chunk',
-                    'chunk': chunk,
-                    'chunk_index': chunk_index,
+                # 같은 사용자의 다른 기기 연결로도 전송 (broadcast 모드)
+                fanout = ConnectionFanout(
+                    apigateway_client, connection_id, protocol,
+                    user_id=user_id,
+                    broadcast=body.get('broadcast', BROADCAST_ENABLED)
+                )
+
+                # 2. AI 시작 알림
+                fanout.send({
+                    'type': 'ai_start',
+                    'conversationId': conversation_id,
                     'timestamp': datetime.utcnow().isoformat() + 'Z'
-                }, apigateway_client)
-                
-                chunk_index += 1
+                })
             
-            # 4. 사용량 추적
-            websocket_service.track_usage(
-                user_id=user_id,
-                engine_type=engine_type,
-                input_text=user_message,
-                output_text=total_response
-            )
+                # 3. 스트리밍 응답 전송 (Lambda 마감 임박 시 중단)
+                bedrock_usage = {}
+                started = time.perf_counter()
+                total_response, chunk_index, truncated = stream_to_client(
+                    websocket_service.stream_response(
+                        user_message=user_message,
+                        engine_type=engine_type,
+                        conversation_id=conversation_id,
+                        user_id=user_id,
+                        conversation_history=merged_history,
+                        user_role=user_role,
+                        usage=bedrock_usage
+                    ),
+                    fanout,
+                    deadline
+                )
+            
+                # 4. 사용량 추적 (중단된 경우에도 소비한 만큼 기록) 및 쿼터 보정
+                used_tokens = websocket_service.track_usage(
+                    user_id=user_id,
+                    engine_type=engine_type,
+                    input_text=user_message,
+                    output_text=total_response,
+                    usage=bedrock_usage,
+                    request_id=request_id,
+                    latency_ms=int((time.perf_counter() - started) * 1000)
+                )
+            finally:
+                # 실패/중단해도 선차감분 보정 (기록되지 않은 사용량은 0)
+                get_quota_gate().reconcile(user_id, quota.reserved, used_tokens, quota.generation)
 
             # 4.5. AI 응답 저장 - ConversationManager import 필요
             from services.conversation_manager import ConversationManager
@@ -148,10 +179,20 @@ def handler(event, context):
                 engine_type=engine_type,
                 user_id=user_id
             )
-            logger.info(f"AI response saved to conversation: {conversation_id}")
 
-            # 5. 완료 알림
-            send_message_to_client(connection_id, {
+            # 5. 완료 알림 (중단된 경우 이어쓰기 토큰 전달)
+            if truncated:
+                return notify_truncated(
+                    websocket_service, fanout,
+                    conversation_id=conversation_id,
+                    user_id=user_id,
+                    engine_type=engine_type,
+                    user_message=user_message,
+                    partial_response=total_response,
+                    chunk_count=chunk_index
+                )
+
+            fanout.send({
                 'type': 'chat_end',
                 'engine': engine_type,
                 'conversationId': conversation_id,
@@ -159,10 +200,8 @@ def handler(event, context):
                 'response_length': len(total_response),
                 'message': '응답 생성이 완료되었습니다.',
                 'timestamp': datetime.utcnow().isoformat() + 'Z'
-            }, apigateway_client)
-            
-            logger.info(f"Chat completed: {chunk_index} chunks, {len(total_response)} chars")
-            
+            })
+
             return {
                 'statusCode': 200,
                 'body': json.dumps({
@@ -171,13 +210,126 @@ def handler(event, context):
                     'response_length': len(total_response)
                 })
             }
+
+        # 이어쓰기 액션 - 시간 제한으로 잘린 응답을 저장된 부분 응답부터 이어서 생성
+        elif action == 'continue':
+            conversation_id = body.get('conversationId')
+            continuation_token = body.get('continuationToken')
+            user_id = body.get('userId', body.get('email', connection_id))
+            user_role = determine_user_role(user_id, body)
+
+            continuation = None
+            if conversation_id and continuation_token:
+                continuation = websocket_service.load_continuation(
+                    conversation_id, user_id, continuation_token
+                )
+
+            if not continuation:
+                send_message_to_client(connection_id, {
+                    'type': 'error',
+                    'message': '이어서 생성할 응답을 찾을 수 없습니다.'
+                }, apigateway_client, protocol)
+                return {
+                    'statusCode': 404,
+                    'body': json.dumps({'error': 'Continuation not found'})
+                }
+
+            engine_type = continuation.get('engineType', '11')
+            user_message = continuation.get('userMessage', '')
+            partial_response = continuation.get('partialResponse', '')
+
+            quota = get_quota_gate().acquire(user_id, user_message + partial_response)
+            if not quota.allowed:
+                return reject_quota(connection_id, apigateway_client, protocol, quota)
+
+            used_tokens = 0
+            try:
+                fanout = ConnectionFanout(
+                    apigateway_client, connection_id, protocol,
+                    user_id=user_id,
+                    broadcast=body.get('broadcast', BROADCAST_ENABLED)
+                )
+
+                fanout.send({
+                    'type': 'ai_start',
+                    'conversationId': conversation_id,
+                    'continuation': True,
+                    'timestamp': datetime.utcnow().isoformat() + 'Z'
+                })
+
+                bedrock_usage = {}
+                started = time.perf_counter()
+                continued, chunk_index, truncated = stream_to_client(
+                    websocket_service.stream_response(
+                        user_message=user_message,
+                        engine_type=engine_type,
+                        conversation_id=conversation_id,
+                        user_id=user_id,
+                        conversation_history=continuation['history'],
+                        user_role=user_role,
+                        assistant_prefill=partial_response,
+                        save_response=False,
+                        usage=bedrock_usage
+                    ),
+                    fanout,
+                    deadline
+                )
+
+                # prefill된 부분 응답은 입력 토큰으로 과금됨
+                used_tokens = websocket_service.track_usage(
+                    user_id=user_id,
+                    engine_type=engine_type,
+                    input_text=user_message + partial_response,
+                    output_text=continued,
+                    usage=bedrock_usage,
+                    request_id=request_id,
+                    latency_ms=int((time.perf_counter() - started) * 1000)
+                )
+            finally:
+                # 실패/중단해도 선차감분 보정 (기록되지 않은 사용량은 0)
+                get_quota_gate().reconcile(user_id, quota.reserved, used_tokens, quota.generation)
+
+            full_response = partial_response.rstrip() + continued
+            websocket_service.conversation_manager.complete_continuation(
+                conversation_id, user_id, full_response
+            )
+
+            if truncated:
+                return notify_truncated(
+                    websocket_service, fanout,
+                    conversation_id=conversation_id,
+                    user_id=user_id,
+                    engine_type=engine_type,
+                    user_message=user_message,
+                    partial_response=full_response,
+                    chunk_count=chunk_index
+                )
+
+            fanout.send({
+                'type': 'chat_end',
+                'engine': engine_type,
+                'conversationId': conversation_id,
+                'total_chunks': chunk_index,
+                'response_length': len(full_response),
+                'message': '응답 생성이 완료되었습니다.',
+                'timestamp': datetime.utcnow().isoformat() + 'Z'
+            })
+
+            return {
+                'statusCode': 200,
+                'body': json.dumps({
+                    'message': 'Continuation processed successfully',
+                    'chunks_sent': chunk_index,
+                    'response_length': len(full_response)
+                })
+            }
         
         else:
             # 알 수 없는 액션
             send_message_to_client(connection_id, {
                 'type': 'error',
                 'message': f'Unknown action: {action}'
-            }, apigateway_client)
+            }, apigateway_client, protocol)
             
             return {
                 'statusCode': 400,
@@ -192,7 +344,7 @@ def handler(event, context):
             send_message_to_client(connection_id, {
                 'type': 'error',
                 'message': f'처리 중 오류가 발생했습니다: {str(e)}'
-            }, apigateway_client)
+            }, apigateway_client, protocol)
         except:
             pass
         
@@ -201,6 +353,117 @@ def handler(event, context):
             'body': json.dumps({'error': str(e)})
         }
 
+    finally:
+        # 팬아웃 스레드 풀 정리 및 끊어진 연결 일괄 삭제
+        if fanout is not None:
+            fanout.close()
+        # 응답 전송이 끝난 뒤 집계된 사용량과 사용량 이벤트 반영
+        try:
+            get_usage_ledger().flush()
+        except Exception as e:
+            logger.error(f"Error flushing usage: {str(e)}")
+
+
+def stream_to_client(chunks, fanout, deadline):
+    """
+    응답 청크를 클라이언트로 전송 - 마감 임박 시 Bedrock 스트림 읽기 중단
+
+    Returns:
+        tuple: (전송한 전체 응답, 전송한 청크 수, 중단 여부)
+    """
+    chunk_index = 0
+    total_response = ""
+    truncated = False
+    summary = StreamLogSummary(connection_id=fanout.connection_id)
+
+    try:
+        for chunk in chunks:
+            total_response += chunk
+            summary.add(chunk)
+
+            # 청크 전송
+            fanout.send({
+                'type': 'ai_chunk',
+                'chunk': chunk,
+                'chunk_index': chunk_index,
+                'timestamp': datetime.utcnow().isoformat() + 'Z'
+            })
+
+            chunk_index += 1
+
+            if deadline.expired():
+                truncated = True
+                logger.warning(
+                    f"Stopping stream for {fanout.connection_id}: "
+                    f"{deadline.remaining_ms()}ms left (margin {deadline.margin_ms}ms)"
+                )
+                break
+    finally:
+        # 생성기를 닫아 Bedrock 스트림 연결까지 정리
+        chunks.close()
+        # 청크별 로그 대신 응답 1건당 요약 1개
+        summary.emit(logger, targets=len(fanout.targets), truncated=truncated)
+
+    return total_response, chunk_index, truncated
+
+
+def notify_truncated(
+    websocket_service,
+    fanout,
+    conversation_id,
+    user_id,
+    engine_type,
+    user_message,
+    partial_response,
+    chunk_count
+):
+    """이어쓰기 정보를 저장하고 chat_truncated 프레임 전송"""
+    continuation_token = websocket_service.save_continuation(
+        conversation_id=conversation_id,
+        user_id=user_id,
+        engine_type=engine_type,
+        user_message=user_message,
+        partial_response=partial_response
+    )
+
+    fanout.send({
+        'type': 'chat_truncated',
+        'engine': engine_type,
+        'conversationId': conversation_id,
+        'continuationToken': continuation_token,
+        'total_chunks': chunk_count,
+        'response_length': len(partial_response),
+        'message': '응답이 시간 제한으로 중단되었습니다. 이어서 생성할 수 있습니다.',
+        'timestamp': datetime.utcnow().isoformat() + 'Z'
+    })
+
+    logger.warning(f"Chat truncated: {chunk_count} chunks, {len(partial_response)} chars")
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'message': 'Response truncated',
+            'chunks_sent': chunk_count,
+            'response_length': len(partial_response),
+            'continuationToken': continuation_token
+        })
+    }
+
+
+def reject_quota(connection_id, apigateway_client, protocol, quota):
+    """월간 한도 초과 - Bedrock 호출 없이 error 프레임 전송"""
+    send_message_to_client(connection_id, {
+        'type': 'error',
+        'code': 'QUOTA_EXCEEDED',
+        'remainingTokens': max(0, quota.remaining),
+        'message': '이번 달 사용 한도를 초과했습니다.'
+    }, apigateway_client, protocol)
+
+    return {
+        'statusCode': 429,
+        'body': json.dumps({'error': 'Quota exceeded'})
+    }
+
 
 def determine_user_role(user_id, body):
     """사용자 역할 판단"""
@@ -215,23 +478,47 @@ def determine_user_role(user_id, body):
     return 'user'
 
 
-def send_message_to_client(connection_id, message, apigateway_client):
-    """클라이언트에게 메시지 전송"""
+def get_connection_protocol(connection_id):
+    """연결 정보에서 협상된 프레임 프로토콜 조회 (컨테이너 캐시)"""
+    if connection_id in CONNECTION_PROTOCOLS:
+        return CONNECTION_PROTOCOLS[connection_id]
+
+    protocol = DEFAULT_PROTOCOL
+    try:
+        connections_table = get_table('websocket_connections')
+        response = connections_table.get_item(
+            Key={'connectionId': connection_id},
+            ProjectionExpression='#p',
+            ExpressionAttributeNames={'#p': 'protocol'}
+        )
+        stored = response.get('Item', {}).get('protocol')
+        if stored in SUPPORTED_PROTOCOLS:
+            protocol = stored
+    except Exception as e:
+        logger.warning(f"Could not load protocol for {connection_id}: {str(e)}")
+        return protocol
+
+    if len(CONNECTION_PROTOCOLS) >= CONNECTION_PROTOCOLS_MAX:
+        CONNECTION_PROTOCOLS.clear()
+    CONNECTION_PROTOCOLS[connection_id] = protocol
+    return protocol
+
+
+def send_message_to_client(connection_id, message, apigateway_client, protocol=DEFAULT_PROTOCOL):
+    """클라이언트에게 메시지 전송 (협상된 프로토콜로 직렬화)"""
     try:
         apigateway_client.post_to_connection(
             ConnectionId=connection_id,
-            Data=json.dumps(message, ensure_ascii=False, default=str)
+            Data=encode_frame(message, protocol)
         )
-        logger.debug(f"Message sent to {connection_id}: {message.get('type', 'unknown')}")
+        logger.debug("Message sent to %s: %s", connection_id, message.get('type', 'unknown'))
         
     except apigateway_client.exceptions.GoneException:
         logger.warning(f"Connection {connection_id} is gone")
+        CONNECTION_PROTOCOLS.pop(connection_id, None)
         # 연결이 끊어진 경우 정리
         try:
-            from config.settings import settings
-            from config.database import get_table_name
-            dynamodb = boto3.resource('dynamodb', region_name=settings.AWS_REGION)
-            connections_table = dynamodb.Table(get_table_name('websocket_connections'))
+            connections_table = get_table('websocket_connections')
             connections_table.delete_item(Key={'connectionId': connection_id})
         except:
             pass
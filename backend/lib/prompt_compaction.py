@@ -0,0 +1,56 @@
+"""
+Prompt Compaction
+시스템 프롬프트 압축 - 엔진 프롬프트의 compactPrompt가 true일 때 렌더링에 적용
+
+- 기본 템플릿: 구분선(━━━) 줄, 이모지/체크박스 등 장식 문자 제거, 이미 나온 규칙 줄 제거, 공백 정리
+  보안 섹션은 역할별 보안 규칙(user/admin)으로 대체 (같은 내용이 두 번 들어가지 않도록)
+- 관리자 설명/지침, 지식 파일: 공백만 정리 (내용/기호는 그대로)
+- 절감량: python -m scripts.prompt_compaction_report (엔진별 압축 전후 토큰 수)
+"""
+import os
+import re
+
+# 엔진 프롬프트에 compactPrompt가 없을 때의 기본값
+PROMPT_COMPACTION_DEFAULT = os.environ.get('PROMPT_COMPACTION_DEFAULT', 'false').lower() == 'true'
+
+_RULER_RE = re.compile(r'^\s*[━─═=_*-]{3,}\s*$')
+# 이모지, 기호/딩뱃(⏰ ⚠ ✅ ❌), 도형(■), 변형 선택자/ZWJ
+_DECORATION_RE = re.compile('[\U0001F000-\U0001FAFF\u2300-\u23FF\u2600-\u27BF\u2B00-\u2BFF\u25A0\uFE0F\u200D]')
+# 체크박스/가운뎃점 목록은 '-' 목록으로
+_GLYPHS = str.maketrans({'【': '', '】': '', '•': '-', '□': '-'})
+_INNER_SPACES_RE = re.compile(r'(?<=\S)[ \t]{2,}')
+
+
+def is_compact(prompt: dict) -> bool:
+    """엔진 프롬프트 항목의 압축 여부"""
+    value = (prompt or {}).get('compactPrompt')
+    return PROMPT_COMPACTION_DEFAULT if value is None else bool(value)
+
+
+def normalize_whitespace(text: str) -> str:
+    """줄 끝 공백 제거, 줄 안의 연속 공백 1칸, 3줄 이상 빈 줄은 1줄로 (들여쓰기는 유지)"""
+    lines = [_INNER_SPACES_RE.sub(' ', line).rstrip() for line in (text or '').replace('\r\n', '\n').split('\n')]
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip()
+
+
+def compact_template(text: str) -> str:
+    """기본 템플릿 압축 (장식 제거 + 중복 규칙 제거 + 공백 정리)"""
+    lines = []
+    seen = set()
+    for raw in (text or '').split('\n'):
+        if _RULER_RE.match(raw):
+            continue
+        indent = raw[:len(raw) - len(raw.lstrip())]
+        stripped = _INNER_SPACES_RE.sub(' ', _DECORATION_RE.sub('', raw).translate(_GLYPHS).strip())
+        stripped = stripped.replace('[ ', '[')  # "[🔑 관리자 모드]" → "[관리자 모드]"
+        if stripped in ('-', '#', '##', '###'):
+            continue  # 장식만 있던 줄
+        line = indent + stripped
+        # 세션 변수 줄과 제목은 그대로, 규칙 줄은 처음 한 번만
+        key = re.sub(r'[\W_]+', '', stripped)
+        if key and not stripped.startswith('#') and '{{' not in stripped:
+            if key in seen:
+                continue
+            seen.add(key)
+        lines.append(line)
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip()
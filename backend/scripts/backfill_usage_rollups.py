@@ -0,0 +1,28 @@
+"""
+사용량 롤업 백필
+usage 테이블의 원본(일×엔진) 항목으로 일/월/누적 롤업을 다시 계산해 덮어쓴다.
+
+실행:
+    python -m scripts.backfill_usage_rollups [--user kim@sedaily.com] [--dry-run]
+
+집계기가 쓰는 동안 실행하면 그 사이 반영된 증분이 덮어써질 수 있으므로
+트래픽이 적은 시간에 실행하고, 필요하면 같은 사용자로 한 번 더 실행한다.
+"""
+import argparse
+
+from services.usage_rollups import rebuild_rollups
+from utils.aws_clients import get_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description='사용량 롤업 재계산')
+    parser.add_argument('--user', help='특정 사용자만 재계산 (생략 시 전체 scan)')
+    parser.add_argument('--dry-run', action='store_true', help='쓰지 않고 개수만 출력')
+    args = parser.parse_args()
+
+    count = rebuild_rollups(get_table('usage'), user_id=args.user, dry_run=args.dry_run)
+    print(f"{'would write' if args.dry_run else 'wrote'} {count} rollup items")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""
+사용량 이벤트 수동 컴팩션
+지정한 시간 범위(YYYY-MM-DDTHH)의 이벤트를 카운터로 반영한다. 스케줄 작업이 놓친 구간 복구용.
+
+실행:
+    python -m scripts.compact_usage_events --from 2026-10-01T00 --to 2026-10-01T23 [--dry-run]
+
+시간 버킷마다 flush#compact-<시간> 순번으로 반영하므로 이미 반영된 구간은 건너뛴다.
+--dry-run은 쓰지 않고 이벤트 수만 출력한다 (hot 모드에서 재집계 결과 확인용).
+"""
+import argparse
+from datetime import datetime, timedelta
+
+from services import usage_events
+from services.usage_events import HOUR_FORMAT, compact_hour
+from utils.aws_clients import get_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description='사용량 이벤트 컴팩션')
+    parser.add_argument('--from', dest='start', required=True, help='시작 시간 버킷 (YYYY-MM-DDTHH)')
+    parser.add_argument('--to', dest='end', help='끝 시간 버킷 (생략 시 시작과 같음)')
+    parser.add_argument('--dry-run', action='store_true', help='쓰지 않고 이벤트 수만 출력')
+    args = parser.parse_args()
+
+    if usage_events.USAGE_COUNTERS_SOURCE != 'events' and not args.dry_run:
+        parser.error('USAGE_COUNTERS_SOURCE=events가 아니면 이중 집계되므로 --dry-run만 가능')
+
+    events_table, usage_table = get_table('usage_events'), get_table('usage')
+    hour = datetime.strptime(args.start, HOUR_FORMAT)
+    end = datetime.strptime(args.end or args.start, HOUR_FORMAT)
+    while hour <= end:
+        bucket = hour.strftime(HOUR_FORMAT)
+        events, applied = compact_hour(events_table, usage_table, bucket, dry_run=args.dry_run)
+        print(f"{bucket}: events={events} applied={applied}")
+        hour += timedelta(hours=1)
+
+
+if __name__ == '__main__':
+    main()
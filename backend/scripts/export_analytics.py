@@ -0,0 +1,33 @@
+"""
+분석용 내보내기
+usage/conversations 테이블을 병렬 scan해 날짜 파티션 gzip CSV로 저장한다.
+
+실행:
+    python -m scripts.export_analytics --out ./exports [--dataset usage] [--segments 8] [--full]
+
+기본은 증분(지난 실행의 _watermark.json 이후 변경분)이며, --full은 워터마크를 무시하고 전체를 내보낸다.
+결과 디렉터리는 그대로 `aws s3 sync ./exports s3://<bucket>/analytics/`로 올릴 수 있다.
+"""
+import argparse
+
+from services.analytics_export import DATASETS, EXPORT_SEGMENTS, export_dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description='분석용 gzip CSV 내보내기')
+    parser.add_argument('--out', required=True, help='출력 디렉터리')
+    parser.add_argument('--dataset', choices=sorted(DATASETS), action='append',
+                        help='내보낼 데이터셋 (생략 시 전체)')
+    parser.add_argument('--segments', type=int, default=EXPORT_SEGMENTS, help='병렬 scan 세그먼트 수')
+    parser.add_argument('--full', action='store_true', help='워터마크 무시하고 전체 내보내기')
+    args = parser.parse_args()
+
+    for name in args.dataset or sorted(DATASETS):
+        result = export_dataset(DATASETS[name], args.out, segments=args.segments,
+                                incremental=not args.full)
+        print(f"{name}: {result['rows']} rows, {len(result['files'])} files "
+              f"(since {result['since'] or 'beginning'}, watermark {result['watermark']})")
+
+
+if __name__ == '__main__':
+    main()
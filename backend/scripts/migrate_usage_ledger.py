@@ -0,0 +1,30 @@
+"""
+사용량 원장 이관 (1회성)
+REST 핸들러의 PK=user#/SK=engine#..#YYYY-MM 항목과 increment_usage의 requestCount/cost 속성을
+userId + usageDate#engineType 원장으로 합치고 롤업을 다시 계산한다.
+
+실행:
+    python -m scripts.migrate_usage_ledger [--source-table <이전 REST 사용량 테이블>] [--dry-run]
+
+REST 항목이 별도 테이블에 있었다면 --source-table로 지정한다 (생략 시 usage 테이블).
+재실행해도 이미 반영된 만큼은 다시 더하지 않는다.
+"""
+import argparse
+
+from services.usage_ledger import migrate_legacy_usage
+from utils.aws_clients import get_dynamodb, get_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description='사용량 원장 이관')
+    parser.add_argument('--source-table', help='이전 REST 사용량 항목이 있는 테이블 이름')
+    parser.add_argument('--dry-run', action='store_true', help='쓰지 않고 개수만 출력')
+    args = parser.parse_args()
+
+    source = get_dynamodb().Table(args.source_table) if args.source_table else None
+    stats = migrate_legacy_usage(get_table('usage'), source_table=source, dry_run=args.dry_run)
+    print(f"{'would migrate' if args.dry_run else 'migrated'}: {stats}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+지식 파일 정규화 보고/적용
+엔진별 지식 파일을 추가 순서대로 정규화해 파일별 절감 토큰을 보여준다 (앞선 파일과 겹치는 문단은 뒤 파일에서 제거).
+
+실행:
+    python -m scripts.normalize_knowledge [--engine 11] [--apply]
+
+--apply면 원본(이미 정규화된 파일은 보관된 원본)에서 다시 정규화해 저장하고 엔진 스냅샷을 한 번 갱신한다.
+되돌리기: PUT /prompts/{engineType}/files/{fileId} {"restoreOriginal": true}
+"""
+import argparse
+
+from services.file_store import get_file_store
+from services.knowledge_normalizer import normalize_knowledge
+from services.prompt_registry import get_prompt_registry
+from services.prompt_snapshots import get_prompt_snapshots
+
+
+def main():
+    parser = argparse.ArgumentParser(description='지식 파일 정규화 절감량')
+    parser.add_argument('--engine', action='append', help='엔진 (여러 번 지정 가능, 생략 시 전체)')
+    parser.add_argument('--apply', action='store_true', help='정규화 결과 저장')
+    args = parser.parse_args()
+
+    store = get_file_store()
+    engines = args.engine or [prompt['engineType'] for prompt in get_prompt_registry().list()]
+    for engine_type in engines:
+        seen = set()
+        total_saved = 0
+        for item in store.list_files(engine_type, with_content=False):
+            original = store.get_original(engine_type, item['fileId']) or ''
+            if args.apply:
+                stored = store.put_file(engine_type, item['fileId'], item.get('fileName', ''), original,
+                                        item.get('createdAt'), bool(item.get('alwaysInclude')), seen=seen)
+                report = stored['normalization']
+            else:
+                report = normalize_knowledge(original, seen).report
+            total_saved += report['savedTokens']
+            print(f"{engine_type} {item.get('fileName', '')}: tokens {report['originalTokens']} -> {report['tokens']} "
+                  f"(saved {report['savedTokens']}, boilerplate lines {report['boilerplateLines']}, "
+                  f"duplicate paragraphs {report['duplicateParagraphs']})")
+        print(f"{engine_type}: saved {total_saved} tokens per request{'' if args.apply else ' (dry run)'}")
+        if args.apply:
+            get_prompt_snapshots().capture(engine_type)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+시스템 프롬프트 압축 절감량 보고
+엔진별로 현재 프롬프트/지식 파일을 압축 전후로 렌더링해 역할별 입력 토큰 수를 비교한다.
+
+실행:
+    python -m scripts.prompt_compaction_report [--engine 11] [--estimate]
+
+토큰 수는 Bedrock CountTokens로 센다 (--estimate면 호출 없이 추정값).
+엔진의 현재 설정(compactPrompt)과 관계없이 두 렌더링을 모두 비교하므로 켜기 전 A/B 판단에 사용한다.
+"""
+import argparse
+
+from lib.bedrock_client_enhanced import compaction_report
+from lib.prompt_compaction import is_compact
+from services.file_store import get_file_store
+from services.prompt_registry import get_prompt_registry
+from utils.aws_clients import get_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description='시스템 프롬프트 압축 절감량')
+    parser.add_argument('--engine', action='append', help='엔진 (여러 번 지정 가능, 생략 시 전체)')
+    parser.add_argument('--estimate', action='store_true', help='CountTokens 대신 추정값 사용')
+    args = parser.parse_args()
+
+    prompts_table = get_table('prompts')
+    engines = args.engine or [prompt['engineType'] for prompt in get_prompt_registry().list()]
+    for engine_type in engines:
+        prompt = prompts_table.get_item(Key={'engineType': engine_type, 'promptId': engine_type}).get('Item')
+        if prompt is None:
+            print(f"{engine_type}: prompt not found")
+            continue
+        report = compaction_report(
+            prompt.get('description', ''), prompt.get('instruction', ''),
+            get_file_store().list_files(engine_type), engine_type,
+            count_tokens=(lambda text: None) if args.estimate else None
+        )
+        state = 'on' if is_compact(prompt) else 'off'
+        for role, entry in report.items():
+            print(f"{engine_type} [{role}] enabled={state} full={entry['full']} compact={entry['compact']} "
+                  f"saved={entry['saved']} ({entry['savedPct']}%){'' if entry['counted'] else ' estimated'}")
+
+
+if __name__ == '__main__':
+    main()
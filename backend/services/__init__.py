@@ -1,13 +1,21 @@
 """
 서비스 패키지
 비즈니스 로직 계층
+
+서브모듈은 처음 접근할 때 import (핸들러가 쓰지 않는 서비스는 콜드 스타트에서 제외)
 """
-from .conversation_service import ConversationService
-from .prompt_service import PromptService
-from .usage_service import UsageService
-
-__all__ = [
-    'ConversationService',
-    'PromptService', 
-    'UsageService'
-]
\ No newline at end of file
+import importlib
+
+_EXPORTS = {
+    'ConversationService': '.conversation_service',
+    'PromptService': '.prompt_service',
+    'UsageService': '.usage_service',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
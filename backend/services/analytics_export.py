@@ -0,0 +1,234 @@
+"""
+Analytics Export
+usage/conversations 테이블을 날짜 파티션 gzip CSV로 내보내기 (오프라인 분석용)
+
+- 병렬 scan: 세그먼트마다 스레드 1개, 각자 자기 파일에만 쓰므로 잠금 없음
+- 메모리: scan 페이지(최대 1MB) × 세그먼트 수 + 열린 gzip 버퍼로 제한 (테이블 크기와 무관)
+  세그먼트당 열린 파티션 파일은 EXPORT_MAX_OPEN_FILES개까지, 넘으면 오래된 파일을 닫고 새 part로 이어씀
+- 출력: <out>/<dataset>/dt=YYYY-MM-DD/part-<run>-<segment>-<n>.csv.gz (파일마다 헤더 포함)
+- 증분: <out>/<dataset>/_watermark.json의 updatedAt 이후 항목만 (경계 누락 방지로 EXPORT_OVERLAP_S만큼 겹쳐 읽음)
+  같은 키가 여러 번 나올 수 있으므로 분석 시 키별 최신 updatedAt 행을 사용
+
+pyarrow를 배포 의존성에 넣지 않기 위해 열 순서가 고정된 CSV(gzip)를 사용한다.
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional
+
+from boto3.dynamodb.conditions import Attr
+
+from services.usage_rollups import SORT_KEY, is_raw
+from utils.aws_clients import get_table
+from utils.logger import log_event, setup_logger
+
+logger = setup_logger(__name__)
+
+EXPORT_SEGMENTS = int(os.environ.get('EXPORT_SEGMENTS', '8'))
+EXPORT_MAX_OPEN_FILES = int(os.environ.get('EXPORT_MAX_OPEN_FILES', '16'))
+EXPORT_OVERLAP_S = int(os.environ.get('EXPORT_OVERLAP_S', '300'))
+WATERMARK_FILE = '_watermark.json'
+
+
+class Dataset(NamedTuple):
+    """내보낼 테이블과 행 변환 규칙"""
+    name: str
+    table_type: str
+    columns: List[str]
+    rows: Callable[[Dict[str, Any]], Iterator[Dict[str, Any]]]
+    partition: str  # 파티션 날짜를 꺼낼 열 (YYYY-MM-DD로 시작)
+
+
+USAGE_COLUMNS = [
+    'usageDate', 'userId', 'engineType', 'inputTokens', 'outputTokens', 'cacheReadTokens',
+    'cacheWriteTokens', 'totalTokens', 'messageCount', 'costMicros', 'cacheSavingsMicros',
+    'priceVersion', 'updatedAt'
+]
+
+
+def usage_rows(item: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """원본(사용자×날짜×엔진) 항목만 - 롤업은 원본에서 다시 계산 가능하므로, 반영 순번 항목은 내부용이므로 제외"""
+    sort_key = item.get(SORT_KEY, '')
+    if not is_raw(sort_key):
+        return
+    usage_date, engine_type = sort_key.split('#', 1)
+    yield {**item, 'usageDate': usage_date, 'engineType': engine_type}
+
+
+CONVERSATION_COLUMNS = [
+    'createdAt', 'conversationId', 'userId', 'engineType', 'messageCount', 'userMessages',
+    'assistantMessages', 'userChars', 'assistantChars', 'avgResponseSeconds', 'maxResponseSeconds',
+    'updatedAt'
+]
+
+
+def _parse_timestamp(value: str) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(value.rstrip('Z'))
+    except (AttributeError, ValueError):
+        return None
+
+
+def conversation_rows(item: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """대화 1건 → 지표 1행 (본문은 내보내지 않음)"""
+    counts = {'user': [0, 0], 'assistant': [0, 0]}
+    latencies = []
+    asked_at = None
+    for message in item.get('messages', []):
+        role = message.get('role', message.get('type', 'user'))
+        stats = counts.setdefault(role, [0, 0])
+        stats[0] += 1
+        stats[1] += len(message.get('content', ''))
+        timestamp = _parse_timestamp(message.get('timestamp', ''))
+        if role == 'user':
+            asked_at = timestamp
+        elif role == 'assistant' and asked_at and timestamp:
+            # 사용자 메시지 저장 → 응답 저장까지 (스트리밍 전체 시간)
+            latencies.append((timestamp - asked_at).total_seconds())
+            asked_at = None
+
+    yield {
+        **item,
+        'messageCount': len(item.get('messages', [])),
+        'userMessages': counts['user'][0],
+        'assistantMessages': counts['assistant'][0],
+        'userChars': counts['user'][1],
+        'assistantChars': counts['assistant'][1],
+        'avgResponseSeconds': round(sum(latencies) / len(latencies), 3) if latencies else '',
+        'maxResponseSeconds': round(max(latencies), 3) if latencies else ''
+    }
+
+
+DATASETS = {
+    'usage': Dataset('usage', 'usage', USAGE_COLUMNS, usage_rows, 'usageDate'),
+    'conversations': Dataset('conversations', 'conversations', CONVERSATION_COLUMNS,
+                             conversation_rows, 'createdAt'),
+}
+
+
+class _PartitionWriters:
+    """세그먼트 1개의 파티션별 gzip CSV 파일 (열린 파일 수 제한)"""
+
+    def __init__(self, root: str, run_id: str, segment: int, columns: List[str], max_open: int):
+        self.root = root
+        self.prefix = f"part-{run_id}-{segment:03d}"
+        self.columns = columns
+        self.max_open = max_open
+        self._open: 'OrderedDict[str, Any]' = OrderedDict()
+        self._parts: Dict[str, int] = {}
+        self.files: List[str] = []
+
+    def write(self, partition: str, row: Dict[str, Any]) -> None:
+        writer = self._open.get(partition)
+        if writer is None:
+            writer = self._open_partition(partition)
+        else:
+            self._open.move_to_end(partition)
+        writer[1].writerow(row)
+
+    def _open_partition(self, partition: str):
+        if len(self._open) >= self.max_open:
+            _, (handle, _) = self._open.popitem(last=False)
+            handle.close()
+        part = self._parts.get(partition, 0)
+        self._parts[partition] = part + 1
+        directory = os.path.join(self.root, f"dt={partition}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.prefix}-{part:04d}.csv.gz")
+        handle = io.TextIOWrapper(gzip.open(path, 'wb'), encoding='utf-8', newline='')
+        writer = csv.DictWriter(handle, fieldnames=self.columns, extrasaction='ignore', restval='')
+        writer.writeheader()
+        self._open[partition] = (handle, writer)
+        self.files.append(path)
+        return handle, writer
+
+    def close(self) -> None:
+        while self._open:
+            _, (handle, _) = self._open.popitem()
+            handle.close()
+
+
+def read_watermark(root: str) -> Optional[str]:
+    path = os.path.join(root, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f).get('updatedAt')
+
+
+def _with_overlap(watermark: str, overlap_s: int) -> str:
+    """워터마크를 overlap_s만큼 앞당김 (원래 형식 유지)"""
+    parsed = _parse_timestamp(watermark)
+    if parsed is None:
+        return watermark
+    shifted = (parsed - timedelta(seconds=overlap_s)).isoformat()
+    return shifted + 'Z' if watermark.endswith('Z') else shifted
+
+
+def export_dataset(
+    dataset: Dataset,
+    out_dir: str,
+    table=None,
+    segments: int = EXPORT_SEGMENTS,
+    incremental: bool = True,
+    max_open_files: int = EXPORT_MAX_OPEN_FILES,
+    overlap_s: int = EXPORT_OVERLAP_S
+) -> Dict[str, Any]:
+    """
+    데이터셋 1개 내보내기
+
+    Returns:
+        dict: rows, files, watermark(이번 실행 후 워터마크), since(사용한 필터)
+    """
+    table = table or get_table(dataset.table_type)
+    root = os.path.join(out_dir, dataset.name)
+    os.makedirs(root, exist_ok=True)
+
+    previous = read_watermark(root) if incremental else None
+    since = _with_overlap(previous, overlap_s) if previous else None
+    run_id = datetime.utcnow().strftime('%Y%m%dT%H%M%S')
+    started = time.perf_counter()
+
+    def scan_segment(segment: int) -> Dict[str, Any]:
+        writers = _PartitionWriters(root, run_id, segment, dataset.columns, max_open_files)
+        kwargs: Dict[str, Any] = {'Segment': segment, 'TotalSegments': segments}
+        if since:
+            kwargs['FilterExpression'] = Attr('updatedAt').gt(since)
+        rows = 0
+        latest = ''
+        try:
+            while True:
+                response = table.scan(**kwargs)
+                for item in response.get('Items', []):
+                    for row in dataset.rows(item):
+                        partition = str(row.get(dataset.partition) or '')[:10] or 'unknown'
+                        writers.write(partition, row)
+                        rows += 1
+                        latest = max(latest, str(row.get('updatedAt') or ''))
+                if 'LastEvaluatedKey' not in response:
+                    break
+                kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        finally:
+            writers.close()
+        return {'rows': rows, 'files': writers.files, 'latest': latest}
+
+    with ThreadPoolExecutor(max_workers=segments) as executor:
+        results = list(executor.map(scan_segment, range(segments)))
+
+    rows = sum(result['rows'] for result in results)
+    files = [path for result in results for path in result['files']]
+    watermark = max([previous or ''] + [result['latest'] for result in results]) or None
+    if watermark:
+        with open(os.path.join(root, WATERMARK_FILE), 'w', encoding='utf-8') as f:
+            json.dump({'updatedAt': watermark, 'run': run_id, 'rows': rows}, f)
+
+    log_event(logger, 'export.dataset', dataset=dataset.name, rows=rows, files=len(files),
+              segments=segments, since=since,
+              duration_ms=round((time.perf_counter() - started) * 1000, 1))
+    return {'rows': rows, 'files': files, 'watermark': watermark, 'since': since}
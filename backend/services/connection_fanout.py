@@ -0,0 +1,154 @@
+"""
+Connection Fan-out
+같은 사용자의 모든 활성 WebSocket 연결로 스트리밍 프레임 전송
+
+- 사용자 연결 목록은 connections 테이블의 userId-index로 조회하고 스트림 동안 캐시
+- 프레임은 프로토콜별로 한 번만 직렬화하여 제한된 스레드 풀에서 병렬 전송
+- 끊어진(Gone) 연결은 모아서 스트림 종료 시 일괄 삭제
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from boto3.dynamodb.conditions import Key
+
+from utils.aws_clients import get_table
+from utils.logger import setup_logger
+from utils.ws_protocol import DEFAULT_PROTOCOL, SUPPORTED_PROTOCOLS, encode_frame
+
+logger = setup_logger(__name__)
+
+CONNECTIONS_USER_INDEX = 'userId-index'
+BROADCAST_ENABLED = os.environ.get('WS_BROADCAST_ENABLED', 'false').lower() == 'true'
+FANOUT_MAX_WORKERS = int(os.environ.get('WS_FANOUT_MAX_WORKERS', '8'))
+FANOUT_MAX_CONNECTIONS = int(os.environ.get('WS_FANOUT_MAX_CONNECTIONS', '10'))
+
+
+class ConnectionFanout:
+    """발신 연결 + (broadcast 모드 시) 같은 사용자의 다른 연결로 프레임 전송"""
+
+    def __init__(
+        self,
+        apigateway_client,
+        connection_id: str,
+        protocol: str = DEFAULT_PROTOCOL,
+        user_id: Optional[str] = None,
+        broadcast: bool = False,
+        connections_table=None,
+        max_workers: int = FANOUT_MAX_WORKERS
+    ):
+        self.apigateway_client = apigateway_client
+        self.connection_id = connection_id
+        self.protocol = protocol
+        self.user_id = user_id
+        self.broadcast = broadcast and bool(user_id) and user_id not in ('anonymous', connection_id)
+        self.max_workers = max_workers
+        self._connections_table = connections_table
+        self._targets: Optional[List[Tuple[str, str]]] = None
+        self._gone: List[str] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def targets(self) -> List[Tuple[str, str]]:
+        """(connectionId, protocol) 목록 - 스트림 동안 한 번만 조회"""
+        if self._targets is None:
+            self._targets = self._load_targets()
+        return self._targets
+
+    def send(self, message: Dict[str, Any]) -> None:
+        """모든 대상 연결로 프레임 전송 (발신 연결 실패는 예외 전파)"""
+        targets = self.targets
+        if len(targets) == 1:
+            self._post(targets[0][0], encode_frame(message, targets[0][1]))
+            return
+
+        frames = {protocol: encode_frame(message, protocol) for protocol in {p for _, p in targets}}
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=min(self.max_workers, len(targets)),
+                thread_name_prefix='ws-fanout'
+            )
+
+        futures = {
+            connection_id: self._executor.submit(self._post, connection_id, frames[protocol])
+            for connection_id, protocol in targets
+        }
+        for connection_id, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                if connection_id == self.connection_id:
+                    raise
+                logger.warning(f"Fan-out to {connection_id} failed: {str(e)}")
+
+        if self._gone:
+            gone = set(self._gone)
+            self._targets = [t for t in targets if t[0] not in gone]
+
+    def close(self) -> None:
+        """스레드 풀 정리 및 끊어진 연결 일괄 삭제"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+        if not self._gone:
+            return
+        try:
+            with self._table().batch_writer() as batch:
+                for connection_id in set(self._gone):
+                    batch.delete_item(Key={'connectionId': connection_id})
+            logger.info(f"Pruned {len(set(self._gone))} gone connections")
+        except Exception as e:
+            logger.warning(f"Could not prune gone connections: {str(e)}")
+        self._gone = []
+
+    def _post(self, connection_id: str, data: str) -> None:
+        """단일 연결로 전송 - Gone은 기록만 하고 무시"""
+        try:
+            self.apigateway_client.post_to_connection(ConnectionId=connection_id, Data=data)
+        except self.apigateway_client.exceptions.GoneException:
+            logger.warning(f"Connection {connection_id} is gone")
+            self._gone.append(connection_id)
+
+    def _load_targets(self) -> List[Tuple[str, str]]:
+        """발신 연결과 같은 사용자의 활성 연결 조회"""
+        origin = [(self.connection_id, self.protocol)]
+        if not self.broadcast:
+            return origin
+
+        try:
+            connections = []
+            query_kwargs = {
+                'IndexName': CONNECTIONS_USER_INDEX,
+                'KeyConditionExpression': Key('userId').eq(self.user_id),
+                'ProjectionExpression': 'connectionId, #p',
+                'ExpressionAttributeNames': {'#p': 'protocol'}
+            }
+            while True:
+                response = self._table().query(**query_kwargs)
+                connections.extend(response.get('Items', []))
+                if 'LastEvaluatedKey' not in response:
+                    break
+                query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        except Exception as e:
+            logger.warning(f"Could not load connections for {self.user_id}: {str(e)}")
+            return origin
+
+        # 발신 연결이 이 사용자로 등록되어 있지 않으면 다른 연결로 보내지 않음
+        if not any(c.get('connectionId') == self.connection_id for c in connections):
+            logger.warning(f"Connection {self.connection_id} is not registered for {self.user_id} - broadcast skipped")
+            return origin
+
+        targets = list(origin)
+        for connection in connections:
+            connection_id = connection.get('connectionId')
+            if connection_id and connection_id != self.connection_id:
+                protocol = connection.get('protocol')
+                targets.append((connection_id, protocol if protocol in SUPPORTED_PROTOCOLS else DEFAULT_PROTOCOL))
+
+        return targets[:FANOUT_MAX_CONNECTIONS]
+
+    def _table(self):
+        if self._connections_table is None:
+            self._connections_table = get_table('websocket_connections')
+        return self._connections_table
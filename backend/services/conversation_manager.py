@@ -1,7 +1,6 @@
 """
 대화 관리자 - DynamoDB에 대화 내역 저장/조회
 """
-import boto3
 import json
 import logging
 from datetime import datetime
@@ -10,12 +9,10 @@ import os
 
 logger = logging.getLogger(__name__)
 
-# DynamoDB 설정
-from config.settings import settings
-from config.database import get_table_name
+# DynamoDB 설정 - 첫 조회 시 테이블 생성
+from utils.aws_clients import lazy_table
 
-dynamodb = boto3.resource('dynamodb', region_name=settings.AWS_REGION)
-conversations_table = dynamodb.Table(get_table_name('conversations'))
+conversations_table = lazy_table('conversations')
 
 class ConversationManager:
     """대화 내역을 DynamoDB에서 관리"""
@@ -208,4 +205,70 @@ class ConversationManager:
             
         except Exception as e:
             logger.error(f"Error creating/updating conversation: {str(e)}")
-            return False
\ No newline at end of file
+            return False
+
+    @staticmethod
+    def save_continuation(conversation_id: str, user_id: str, continuation: dict) -> bool:
+        """잘린 응답의 이어쓰기 정보 저장 (대화 아이템의 pendingContinuation)"""
+        try:
+            conversations_table.update_item(
+                Key={'userId': user_id, 'conversationId': conversation_id},
+                UpdateExpression='SET pendingContinuation = :cont, updatedAt = :updated',
+                ExpressionAttributeValues={
+                    ':cont': continuation,
+                    ':updated': datetime.utcnow().isoformat() + 'Z'
+                }
+            )
+            logger.info(f"Continuation saved: {conversation_id}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error saving continuation: {str(e)}")
+            return False
+
+    @staticmethod
+    def get_continuation(conversation_id: str, user_id: str):
+        """저장된 이어쓰기 정보 조회"""
+        try:
+            response = conversations_table.get_item(
+                Key={'userId': user_id, 'conversationId': conversation_id},
+                ProjectionExpression='pendingContinuation'
+            )
+            return response.get('Item', {}).get('pendingContinuation')
+
+        except Exception as e:
+            logger.error(f"Error getting continuation: {str(e)}")
+            return None
+
+    @staticmethod
+    def complete_continuation(conversation_id: str, user_id: str, content: str) -> bool:
+        """이어쓰기 완료 - 마지막 assistant 메시지를 전체 응답으로 교체하고 이어쓰기 정보 삭제"""
+        try:
+            response = conversations_table.get_item(
+                Key={'userId': user_id, 'conversationId': conversation_id}
+            )
+            item = response.get('Item')
+            if not item:
+                return False
+
+            messages = item.get('messages', [])
+            for message in reversed(messages):
+                if message.get('role') == 'assistant':
+                    message['content'] = content
+                    message['timestamp'] = datetime.utcnow().isoformat() + 'Z'
+                    break
+
+            conversations_table.update_item(
+                Key={'userId': user_id, 'conversationId': conversation_id},
+                UpdateExpression='SET messages = :msgs, updatedAt = :updated REMOVE pendingContinuation',
+                ExpressionAttributeValues={
+                    ':msgs': messages,
+                    ':updated': datetime.utcnow().isoformat() + 'Z'
+                }
+            )
+            logger.info(f"Continuation completed: {conversation_id}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error completing continuation: {str(e)}")
+            return False
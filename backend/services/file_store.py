@@ -0,0 +1,534 @@
+"""
+Knowledge File Store
+지식 파일 저장소 - 작은 파일은 files 항목에 그대로, 큰 파일은 청크로 나눠 해시 키로 저장(중복 제거)
+
+- 파일 항목: promptId=<엔진>, fileId, fileName, createdAt, size, contentHash (+ alwaysInclude: 검색 모드에서도 항상 포함)
+  - FILE_INLINE_MAX_CHARS 이하: fileContent에 본문 (기존 형식)
+  - 초과: chunks=[청크 해시...] (본문 없음)
+- 청크: 본문을 FILE_CHUNK_CHARS 글자씩 자른 조각, 키는 sha256(조각)
+  - FILE_OBJECT_BUCKET이 있으면 S3(<FILE_OBJECT_PREFIX>/<해시>), 없으면 files 테이블(promptId=blob#<해시>)
+  - 한 청크짜리 본문의 청크 해시 = 본문 해시 → 스냅샷의 기존 blob#<해시> 항목도 그대로 읽힘
+- 조회: 엔진 파일 query는 페이지 끝까지, 필요한 속성만 projection, 청크는 스레드 풀로 병렬 조회
+- 정규화(services/knowledge_normalizer.py): 저장 시 NFC/공백/머리글 정리 + 엔진의 다른 파일과 겹치는 문단 제거
+  항목에 normalization(토큰 절감 보고서), paragraphHashes(문단 지문), original(원본 blob 참조 - 바뀐 경우만)
+  파일을 지우거나 본문을 바꿔 어떤 문단 지문이 엔진에서 사라지면, 그 문단이 중복으로 빠졌던 다른 파일을 원본에서 다시 정규화
+- 일괄 추가/삭제: BatchWriteItem 25개씩, 미처리 항목은 지수 백오프로 FILE_BATCH_MAX_RETRIES번까지 재요청
+  끝까지 처리되지 않은 항목, 요청 오류가 난 묶음의 남은 항목만 실패로 돌려줌 (항목별 결과, 앞 묶음은 이미 저장됨)
+
+스냅샷/사전 렌더링 본문(services/prompt_snapshots.py)도 put_blob/get_blobs로 같은 청크 저장소를 사용한다.
+"""
+import hashlib
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+from services.knowledge_normalizer import (
+    KB_NORMALIZE_ON_SAVE, fingerprints, normalize_knowledge, seen_fingerprints
+)
+from utils.aws_clients import get_client, get_table
+from utils.logger import log_event, setup_logger
+
+logger = setup_logger(__name__)
+
+# 한글 1글자 = UTF-8 3바이트 → 64K 글자도 항목 한도(400KB) 안쪽
+FILE_INLINE_MAX_CHARS = int(os.environ.get('FILE_INLINE_MAX_CHARS', '32768'))
+FILE_CHUNK_CHARS = int(os.environ.get('FILE_CHUNK_CHARS', '65536'))
+FILE_FETCH_WORKERS = int(os.environ.get('FILE_FETCH_WORKERS', '8'))
+FILE_OBJECT_BUCKET = os.environ.get('FILE_OBJECT_BUCKET', '')
+FILE_OBJECT_PREFIX = os.environ.get('FILE_OBJECT_PREFIX', 'knowledge-chunks')
+FILE_BATCH_MAX_RETRIES = int(os.environ.get('FILE_BATCH_MAX_RETRIES', '5'))
+FILE_BATCH_BACKOFF_S = float(os.environ.get('FILE_BATCH_BACKOFF_S', '0.05'))
+# BatchWriteItem 요청당 최대 항목 수
+BATCH_WRITE_SIZE = 25
+
+BLOB_PREFIX = 'blob#'
+BLOB_FILE_ID = 'content'
+# 목록/본문 조회 projection
+LIST_ATTRIBUTES = ('fileId', 'fileName', 'createdAt', 'updatedAt', 'size', 'contentHash', 'chunks', 'alwaysInclude',
+                   'normalization')
+# 정규화 상태 (본문을 바꾸지 않는 변경/스냅샷 복원 시 유지)
+NORMALIZATION_ATTRIBUTES = ('normalization', 'paragraphHashes', 'original')
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256((content or '').encode('utf-8')).hexdigest()
+
+
+def split_chunks(content: str, chunk_chars: int = FILE_CHUNK_CHARS) -> List[str]:
+    return [content[start:start + chunk_chars] for start in range(0, len(content), chunk_chars)] or ['']
+
+
+class DynamoChunkStore:
+    """files 테이블 청크 저장소 (promptId=blob#<해시>, fileId=content)"""
+
+    def __init__(self, table_factory: Callable = None):
+        self._table_factory = table_factory or (lambda: get_table('files'))
+
+    def put(self, digest: str, text: str) -> None:
+        try:
+            self._table_factory().put_item(
+                Item={'promptId': f"{BLOB_PREFIX}{digest}", 'fileId': BLOB_FILE_ID, 'fileContent': text},
+                ConditionExpression='attribute_not_exists(promptId)'
+            )
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                raise
+
+    def get_many(self, digests: List[str]) -> Dict[str, str]:
+        """BatchGetItem 100개씩, 미처리 키 재요청"""
+        table = self._table_factory()
+        keys = [{'promptId': f"{BLOB_PREFIX}{digest}", 'fileId': BLOB_FILE_ID} for digest in digests]
+        found: Dict[str, str] = {}
+        for start in range(0, len(keys), 100):
+            request = {table.name: {'Keys': keys[start:start + 100]}}
+            while request:
+                response = table.meta.client.batch_get_item(RequestItems=request)
+                for item in response.get('Responses', {}).get(table.name, []):
+                    found[item['promptId'][len(BLOB_PREFIX):]] = item.get('fileContent', '')
+                request = response.get('UnprocessedKeys') or None
+        return found
+
+
+class ObjectChunkStore:
+    """객체 저장소 청크 저장소 - S3(bucket 지정) 또는 로컬 디렉터리(root 지정, 테스트/로컬 개발용)"""
+
+    def __init__(self, bucket: str = '', prefix: str = FILE_OBJECT_PREFIX, root: Optional[str] = None):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.root = Path(root) if root else None
+
+    def _key(self, digest: str) -> str:
+        return f"{self.prefix}/{digest[:2]}/{digest}"
+
+    def put(self, digest: str, text: str) -> None:
+        data = text.encode('utf-8')
+        if self.root is not None:
+            path = self.root / self._key(digest)
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_suffix('.tmp')
+                tmp.write_bytes(data)
+                tmp.replace(path)
+            return
+        s3 = get_client('s3')
+        try:
+            s3.head_object(Bucket=self.bucket, Key=self._key(digest))
+        except ClientError:
+            s3.put_object(Bucket=self.bucket, Key=self._key(digest), Body=data,
+                          ContentType='text/plain; charset=utf-8')
+
+    def get(self, digest: str) -> Optional[str]:
+        try:
+            if self.root is not None:
+                return (self.root / self._key(digest)).read_bytes().decode('utf-8')
+            response = get_client('s3').get_object(Bucket=self.bucket, Key=self._key(digest))
+            return response['Body'].read().decode('utf-8')
+        except (FileNotFoundError, ClientError):
+            return None
+
+    def get_many(self, digests: List[str]) -> Dict[str, str]:
+        with ThreadPoolExecutor(max_workers=max(1, min(FILE_FETCH_WORKERS, len(digests)))) as executor:
+            results = dict(zip(digests, executor.map(self.get, digests)))
+        return {digest: text for digest, text in results.items() if text is not None}
+
+
+class FileStore:
+    """엔진 지식 파일 + 해시 청크 저장소"""
+
+    def __init__(self, table_factory: Callable = None, chunk_store=None, fallback_store=None,
+                 inline_max_chars: int = FILE_INLINE_MAX_CHARS, chunk_chars: int = FILE_CHUNK_CHARS,
+                 normalize: bool = KB_NORMALIZE_ON_SAVE):
+        self._table_factory = table_factory or (lambda: get_table('files'))
+        dynamo_store = DynamoChunkStore(self._table_factory)
+        if chunk_store is None:
+            chunk_store = ObjectChunkStore(FILE_OBJECT_BUCKET) if FILE_OBJECT_BUCKET else dynamo_store
+        self.chunk_store = chunk_store
+        # 객체 저장소 도입 전 files 테이블에 저장된 청크(blob#)도 읽기 위한 보조 저장소
+        self.fallback_store = fallback_store if fallback_store is not None else (
+            dynamo_store if chunk_store is not dynamo_store else None
+        )
+        self.inline_max_chars = inline_max_chars
+        self.chunk_chars = chunk_chars
+        self.normalize = normalize
+
+    @property
+    def table(self):
+        return self._table_factory()
+
+    # 해시 청크 (파일/스냅샷/렌더링 본문 공용)
+
+    def put_blob(self, content: str) -> Dict[str, Any]:
+        """본문 → 청크 저장 (이미 있는 청크는 건너뜀) → {hash, size, chunks}"""
+        chunks = split_chunks(content or '', self.chunk_chars)
+        digests = [content_hash(chunk) for chunk in chunks]
+        for digest, chunk in {d: c for d, c in zip(digests, chunks)}.items():
+            self.chunk_store.put(digest, chunk)
+        return {'hash': content_hash(content), 'size': len(content or ''), 'chunks': digests}
+
+    def get_blobs(self, refs: Iterable[Dict[str, Any]]) -> Dict[str, str]:
+        """{hash, chunks} 목록 → 본문 해시별 본문 (청크 병렬 조회, 빠진 청크가 있는 본문은 제외)"""
+        refs = list(refs)
+        # chunks가 없는 참조 = 한 청크짜리 (스냅샷 초기 형식)
+        wanted = sorted({digest for ref in refs for digest in (ref.get('chunks') or [ref['hash']])})
+        found = self._get_chunks(wanted)
+        blobs = {}
+        for ref in refs:
+            digests = ref.get('chunks') or [ref['hash']]
+            if all(digest in found for digest in digests):
+                blobs[ref['hash']] = ''.join(found[digest] for digest in digests)
+        return blobs
+
+    def _get_chunks(self, digests: List[str]) -> Dict[str, str]:
+        if not digests:
+            return {}
+        found = self.chunk_store.get_many(digests)
+        missing = [digest for digest in digests if digest not in found]
+        if missing and self.fallback_store is not None:
+            found.update(self.fallback_store.get_many(missing))
+        return found
+
+    # 엔진 파일
+
+    def file_item(self, engine_type: str, file_id: str, file_name: str, content: str,
+                  created_at: Optional[str] = None, always_include: bool = False,
+                  seen: Optional[Set[str]] = None, restored: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        파일 항목 (작으면 본문 포함, 크면 청크 참조만)
+
+        Args:
+            seen: 주어지면 정규화해서 저장 (다른 파일 문단 지문, 이 파일 지문이 추가됨) - 원본은 blob으로 보관
+            restored: 이미 정규화된 본문의 {normalization, original} (스냅샷 복원) - 그대로 두고 문단 지문만 본문에서 계산
+        """
+        content = content or ''
+        normalized = None
+        if seen is not None:
+            normalized = normalize_knowledge(content, seen)
+            original, content = content, normalized.text
+        item = {
+            'promptId': engine_type,
+            'fileId': file_id,
+            'fileName': file_name,
+            'size': len(content),
+            'contentHash': content_hash(content),
+            'createdAt': created_at or datetime.utcnow().isoformat() + 'Z'
+        }
+        if always_include:
+            item['alwaysInclude'] = True
+        if normalized is not None:
+            item['normalization'] = normalized.report
+            item['paragraphHashes'] = normalized.fingerprints
+            if content != original:
+                ref = self.put_blob(original)
+                item['original'] = {'hash': ref['hash'], 'chunks': ref['chunks']}
+        elif restored and 'normalization' in restored:
+            item['normalization'] = restored['normalization']
+            item['paragraphHashes'] = fingerprints(content)
+            if 'original' in restored:
+                item['original'] = {'hash': restored['original']['hash'], 'chunks': restored['original']['chunks']}
+        if len(content) <= self.inline_max_chars:
+            item['fileContent'] = content
+        else:
+            item['chunks'] = self.put_blob(content)['chunks']
+        return item
+
+    def put_file(self, engine_type: str, file_id: str, file_name: str, content: str,
+                 created_at: Optional[str] = None, always_include: bool = False,
+                 normalize: Optional[bool] = None, seen: Optional[Set[str]] = None) -> Dict[str, Any]:
+        """
+        파일 저장
+
+        Args:
+            normalize: 정규화 여부 (None이면 KB_NORMALIZE_ON_SAVE)
+            seen: 중복 비교할 문단 지문 (None이면 엔진의 다른 파일 전체)
+        """
+        if seen is None:
+            seen = self._seen(engine_type, normalize, exclude=(file_id,))
+        item = self.file_item(engine_type, file_id, file_name, content, created_at, always_include, seen)
+        self.table.put_item(Item=item)
+        log_event(logger, 'file.stored', engine=engine_type, file=file_id, size=item['size'],
+                  chunks=len(item.get('chunks', [])),
+                  savedTokens=item.get('normalization', {}).get('savedTokens', 0))
+        return item
+
+    def update_file(self, engine_type: str, file_id: str, file_name: Optional[str] = None,
+                    content: Optional[str] = None, always_include: Optional[bool] = None,
+                    normalize: Optional[bool] = None) -> Optional[Dict[str, Any]]:
+        """이름/본문/alwaysInclude 변경 (본문이 바뀌면 다시 정규화하고 인라인/청크 형식을 다시 결정)"""
+        current = self.get_file(engine_type, file_id)
+        if current is None:
+            return None
+        kept = {}
+        if content is None:
+            # 본문 그대로 - 정규화 보고서/원본 참조 유지
+            kept = {key: current[key] for key in NORMALIZATION_ATTRIBUTES if key in current}
+            seen = None
+        else:
+            seen = self._seen(engine_type, normalize, exclude=(file_id,))
+        item = self.file_item(
+            engine_type, file_id,
+            file_name if file_name is not None else current.get('fileName', ''),
+            content if content is not None else current.get('fileContent', ''),
+            current.get('createdAt'),
+            always_include if always_include is not None else bool(current.get('alwaysInclude')),
+            seen
+        )
+        item.update(kept)
+        item['updatedAt'] = datetime.utcnow().isoformat() + 'Z'
+        self.table.put_item(Item=item)
+        if content is not None:
+            self.restore_duplicates(engine_type, seen_fingerprints([current]) - seen_fingerprints([item]))
+        return item
+
+    def get_original(self, engine_type: str, file_id: str) -> Optional[str]:
+        """정규화 전 원본 (정규화로 바뀌지 않았거나 정규화 전 항목이면 현재 본문)"""
+        item = self.table.get_item(Key={'promptId': engine_type, 'fileId': file_id}).get('Item')
+        if item is None:
+            return None
+        if 'original' in item:
+            original = self.get_blobs([item['original']]).get(item['original']['hash'])
+            if original is not None:
+                return original
+            logger.error(f"Missing original chunks for file {file_id}")
+        return self.fill_content([item])[0].get('fileContent', '')
+
+    def _seen(self, engine_type: str, normalize: Optional[bool], exclude=()) -> Optional[Set[str]]:
+        """정규화할 때 비교할 엔진 파일 문단 지문 (정규화하지 않으면 None)"""
+        if not (self.normalize if normalize is None else normalize):
+            return None
+        items = [item for item in self._query(engine_type, ('fileId', 'paragraphHashes'))
+                 if item['fileId'] not in exclude]
+        # paragraphHashes가 없는 정규화 전 항목은 본문에서 계산
+        legacy = [item['fileId'] for item in items if 'paragraphHashes' not in item]
+        items = [item for item in items if 'paragraphHashes' in item]
+        items.extend(filter(None, (self.get_file(engine_type, file_id) for file_id in legacy)))
+        return seen_fingerprints(items)
+
+    def delete_file(self, engine_type: str, file_id: str) -> None:
+        # 청크는 다른 파일/스냅샷이 같이 쓸 수 있으므로 지우지 않음
+        old = self.table.delete_item(Key={'promptId': engine_type, 'fileId': file_id},
+                                     ReturnValues='ALL_OLD').get('Attributes')
+        if old:
+            self.restore_duplicates(engine_type, seen_fingerprints([old]))
+
+    def restore_duplicates(self, engine_type: str, lost: Set[str]) -> List[str]:
+        """
+        엔진에서 사라진 문단 지문(지운 파일/바뀐 본문에만 있던 문단)을 중복으로 빼 두었던 파일을 원본에서 다시 정규화
+
+        추가 순서대로 처리하고, 비교 대상은 엔진의 나머지 파일 전체 (앞서 다시 정규화한 결과 포함)
+        남은 다른 파일에 같은 문단이 있으면 결과가 같으므로 쓰지 않는다.
+
+        Returns:
+            다시 저장한 fileId 목록
+        """
+        if not lost:
+            return []
+        items = self._query(engine_type, LIST_ATTRIBUTES + NORMALIZATION_ATTRIBUTES + ('fileContent',))
+        items.sort(key=lambda item: (str(item.get('createdAt', '')), str(item.get('fileId', ''))))
+        candidates = [item for item in items
+                      if 'original' in item and item.get('normalization', {}).get('duplicateParagraphs')]
+        if not candidates:
+            return []
+        originals = self.get_blobs(item['original'] for item in candidates)
+        # paragraphHashes가 없는 정규화 전 항목은 본문에서 계산
+        self.fill_content([item for item in items if 'paragraphHashes' not in item])
+        hashes = {item['fileId']: seen_fingerprints([item]) for item in items}
+
+        restored = []
+        for item in candidates:
+            original = originals.get(item['original']['hash'])
+            if original is None:
+                logger.error(f"Missing original chunks for file {item['fileId']}")
+                continue
+            if not lost & set(fingerprints(original)):
+                continue
+            seen = set().union(*(h for file_id, h in hashes.items() if file_id != item['fileId']))
+            new = self.file_item(engine_type, item['fileId'], item.get('fileName', ''), original,
+                                 item.get('createdAt'), bool(item.get('alwaysInclude')), seen)
+            if new['contentHash'] == item.get('contentHash'):
+                continue
+            new['updatedAt'] = datetime.utcnow().isoformat() + 'Z'
+            self.table.put_item(Item=new)
+            hashes[item['fileId']] = set(new['paragraphHashes'])
+            restored.append(item['fileId'])
+        log_event(logger, 'file.renormalized', engine=engine_type, lost=len(lost), files=len(restored))
+        return restored
+
+    def put_files(self, engine_type: str, files: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        파일 여러 개 추가 (BatchWriteItem)
+
+        Args:
+            files: [{fileId, fileName, fileContent, alwaysInclude}] - 목록 순서가 추가 순서
+
+        Returns:
+            입력 순서대로 {fileId, status: created|failed, item | error}
+        """
+        # 정규화하는 파일은 엔진 기존 파일 + 앞선 배치 파일과 문단 중복 비교
+        seen = self._seen(engine_type, True) if any(f.get('normalize', self.normalize) for f in files) else None
+        # 같은 시각에 추가돼도 목록 순서(createdAt, fileId)가 입력 순서가 되도록 1µs씩
+        started = datetime.utcnow()
+        results: List[Dict[str, Any]] = []
+        items = []
+        unprepared: Set[str] = set()
+        for index, f in enumerate(files):
+            created_at = (started + timedelta(microseconds=index)).isoformat() + 'Z'
+            try:
+                item = self.file_item(engine_type, f['fileId'], f.get('fileName', 'untitled.txt'),
+                                      f.get('fileContent', ''), created_at, bool(f.get('alwaysInclude', False)),
+                                      seen if f.get('normalize', self.normalize) else None)
+            except Exception as e:
+                logger.error(f"Error preparing file {f.get('fileId')} for {engine_type}: {str(e)}")
+                results.append({'fileId': f.get('fileId'), 'status': 'failed', 'error': str(e)})
+                # 정규화 도중 실패했어도 seen에 지문이 들어갔을 수 있음
+                unprepared.update(fingerprints(f.get('fileContent', '')))
+                continue
+            items.append(item)
+            results.append({'fileId': item['fileId'], 'status': 'created', 'item': item})
+
+        failed = self._batch_write([{'PutRequest': {'Item': item}} for item in items])
+        for result in results:
+            if result['fileId'] in failed:
+                result.update(status='failed', error=failed[result['fileId']])
+                result.pop('item', None)
+        log_event(logger, 'file.batch_stored', engine=engine_type, files=len(files), failed=len(failed),
+                  chunks=sum(len(item.get('chunks', [])) for item in items))
+        # 저장되지 않은 파일 문단을 중복으로 뺀 뒤 파일은 원본에서 다시 정규화 (seen은 쓰기 전에 채워짐)
+        lost = unprepared | seen_fingerprints(item for item in items if item['fileId'] in failed)
+        if seen is not None and lost:
+            try:
+                restored = set(self.restore_duplicates(engine_type, lost))
+            except Exception as e:
+                logger.error(f"Error restoring deduplicated paragraphs for {engine_type}: {str(e)}")
+                restored = set()
+            for result in results:
+                if result['fileId'] in restored and 'item' in result:
+                    result['item'] = self.table.get_item(
+                        Key={'promptId': engine_type, 'fileId': result['fileId']}
+                    ).get('Item') or result['item']
+        return results
+
+    def delete_files(self, engine_type: str, file_ids: List[str]) -> List[Dict[str, Any]]:
+        """파일 여러 개 삭제 (BatchWriteItem, 없는 파일도 deleted) → {fileId, status: deleted|failed}"""
+        file_ids = list(dict.fromkeys(file_ids))  # 한 요청에 같은 키가 두 번 있으면 거부됨
+        # 지운 파일의 문단 지문 (BatchWriteItem은 이전 값을 돌려주지 않으므로 먼저 조회)
+        targets = set(file_ids)
+        old = [item for item in self._query(engine_type, ('fileId', 'paragraphHashes')) if item['fileId'] in targets]
+        # paragraphHashes가 없는 정규화 전 항목은 본문에서 계산
+        old = [item if 'paragraphHashes' in item else self.get_file(engine_type, item['fileId']) or item
+               for item in old]
+        failed = self._batch_write([
+            {'DeleteRequest': {'Key': {'promptId': engine_type, 'fileId': file_id}}} for file_id in file_ids
+        ])
+        log_event(logger, 'file.batch_deleted', engine=engine_type, files=len(file_ids), failed=len(failed))
+        try:
+            self.restore_duplicates(engine_type,
+                                    seen_fingerprints(item for item in old if item['fileId'] not in failed))
+        except Exception as e:
+            # 삭제는 이미 끝남 - 항목별 결과는 그대로 돌려줌
+            logger.error(f"Error restoring deduplicated paragraphs for {engine_type}: {str(e)}")
+        return [
+            {'fileId': file_id, 'status': 'failed', 'error': failed[file_id]} if file_id in failed
+            else {'fileId': file_id, 'status': 'deleted'}
+            for file_id in file_ids
+        ]
+
+    def _batch_write(self, requests: List[Dict[str, Any]]) -> Dict[str, str]:
+        """
+        BatchWriteItem 25개씩 + 미처리 항목 지수 백오프 재요청 → 처리되지 않은 fileId별 오류
+
+        묶음 하나의 요청 오류(스로틀 한도 초과, 검증 오류 등)는 그 묶음의 남은 항목만 실패로 두고 다음 묶음을 계속 쓴다.
+        """
+        table = self.table
+        failed: Dict[str, str] = {}
+        for start in range(0, len(requests), BATCH_WRITE_SIZE):
+            pending = requests[start:start + BATCH_WRITE_SIZE]
+            try:
+                for attempt in range(FILE_BATCH_MAX_RETRIES + 1):
+                    if attempt:
+                        # 전체 지터 (0 ~ base * 2^attempt)
+                        time.sleep(random.uniform(0, FILE_BATCH_BACKOFF_S * (2 ** attempt)))
+                    response = table.meta.client.batch_write_item(RequestItems={table.name: pending})
+                    pending = (response.get('UnprocessedItems') or {}).get(table.name, [])
+                    if not pending:
+                        break
+                else:
+                    failed.update((_request_file_id(request), 'Unprocessed after retries') for request in pending)
+                    logger.error(f"BatchWriteItem left {len(pending)} unprocessed items "
+                                 f"after {FILE_BATCH_MAX_RETRIES} retries")
+            except Exception as e:
+                failed.update((_request_file_id(request), str(e)) for request in pending)
+                logger.error(f"BatchWriteItem failed for {len(pending)} items: {str(e)}")
+        return failed
+
+    def get_file(self, engine_type: str, file_id: str) -> Optional[Dict[str, Any]]:
+        item = self.table.get_item(Key={'promptId': engine_type, 'fileId': file_id}).get('Item')
+        return self.fill_content([item])[0] if item else None
+
+    def list_files(self, engine_type: str, with_content: bool = True,
+                   attributes: Iterable[str] = ()) -> List[Dict[str, Any]]:
+        """
+        엔진 파일 목록 (추가 순서)
+
+        Args:
+            with_content: False면 본문 없이 메타데이터만 (fileContent도 projection에서 제외)
+            attributes: 추가로 가져올 속성 (예: 스냅샷용 original)
+        """
+        items = self._query(engine_type, LIST_ATTRIBUTES + tuple(attributes)
+                            + (('fileContent',) if with_content else ()))
+        items.sort(key=lambda item: (str(item.get('createdAt', '')), str(item.get('fileId', ''))))
+        for item in items:
+            item['promptId'] = engine_type
+        return self.fill_content(items) if with_content else items
+
+    def _query(self, engine_type: str, attributes) -> List[Dict[str, Any]]:
+        """엔진 파일 query (필요한 속성만 projection, 페이지 끝까지)"""
+        names = {f"#a{index}": name for index, name in enumerate(attributes)}
+        kwargs: Dict[str, Any] = {
+            'KeyConditionExpression': Key('promptId').eq(engine_type),
+            'ProjectionExpression': ', '.join(names),
+            'ExpressionAttributeNames': names
+        }
+        items: List[Dict[str, Any]] = []
+        while True:
+            response = self.table.query(**kwargs)
+            items.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                break
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        return items
+
+    def fill_content(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """청크 파일의 본문 채우기 (모든 청크 한 번에 병렬 조회)"""
+        chunked = [item for item in items if item.get('chunks') and 'fileContent' not in item]
+        if chunked:
+            blobs = self.get_blobs({'hash': item['contentHash'], 'chunks': item['chunks']} for item in chunked)
+            for item in chunked:
+                content = blobs.get(item['contentHash'])
+                if content is None:
+                    logger.error(f"Missing chunks for file {item.get('fileId')}")
+                item['fileContent'] = content or ''
+        return items
+
+
+def _request_file_id(request: Dict[str, Any]) -> str:
+    if 'PutRequest' in request:
+        return request['PutRequest']['Item']['fileId']
+    return request['DeleteRequest']['Key']['fileId']
+
+
+_file_store: Optional[FileStore] = None
+
+
+def get_file_store() -> FileStore:
+    """컨테이너 공용 파일 저장소"""
+    global _file_store
+    if _file_store is None:
+        _file_store = FileStore()
+    return _file_store
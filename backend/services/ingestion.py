@@ -0,0 +1,343 @@
+"""
+Knowledge File Ingestion
+지식 파일 비동기 수집 - 원본 문서 업로드 → (큐) → 추출/정규화/저장/색인
+
+- 업로드: POST /prompts/{engineType}/files 에 document(base64) 또는 INGEST_SYNC_MAX_CHARS를 넘는 fileContent
+  원본은 services/file_store.py 청크 저장소에 저장하고 작업 항목을 만든 뒤 큐에 작업 ID만 넣음 (202 응답)
+- 작업 항목: files 테이블 promptId=ingest#<엔진>, fileId=<작업 ID>
+  status: queued → extracting → storing → indexing → done / failed, progress 0~100, 완료 시 fileId/chars/tokens
+  GET /prompts/{engineType}/files/{작업 ID} 또는 파일 목록의 ingestions로 진행 상황 조회, INGEST_JOB_TTL_DAYS 후 만료
+- 큐: INGEST_QUEUE_URL(SQS)이 있으면 SQS, 없으면 INGEST_LOCAL_DIR 디렉터리 큐 (로컬 개발/테스트용)
+- 작업자: handlers/jobs/file_ingestion.py - 결과 파일 ID = 작업 ID라 재전달(at-least-once)돼도 같은 파일을 덮어씀
+  추출 실패(지원하지 않는 형식 등)는 failed로 끝내고, 그 외 오류는 다시 던져 큐가 재시도
+  마지막 수신(ApproximateReceiveCount >= INGEST_MAX_RECEIVES, DLQ로 가기 직전)의 오류도 failed로 끝냄 - 진행 중 상태로 남지 않도록
+- 업로드 한도: API 요청 본문(Lambda 6MB)에 base64(4/3배) + JSON으로 들어가야 하므로 원본 INGEST_MAX_BYTES 4MB
+"""
+import base64
+import html.parser
+import io
+import json
+import os
+import re
+import time
+import unicodedata
+import uuid
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from xml.etree import ElementTree
+
+from boto3.dynamodb.conditions import Key
+
+from services.file_store import get_file_store
+from utils.aws_clients import get_client, get_table
+from utils.logger import log_event, setup_logger
+from utils.token_estimator import estimate_tokens
+
+logger = setup_logger(__name__)
+
+INGEST_QUEUE_URL = os.environ.get('INGEST_QUEUE_URL', '')
+INGEST_LOCAL_DIR = os.environ.get('INGEST_LOCAL_DIR', '/tmp/nexus-ingest')
+# 이보다 긴 fileContent 붙여넣기는 요청 안에서 처리하지 않고 수집 작업으로
+INGEST_SYNC_MAX_CHARS = int(os.environ.get('INGEST_SYNC_MAX_CHARS', '200000'))
+# base64 인코딩 후 Lambda 요청 한도(6MB) 안쪽
+INGEST_MAX_BYTES = int(os.environ.get('INGEST_MAX_BYTES', str(4 * 1024 * 1024)))
+# 큐 재전달 한도 (serverless.yml IngestionQueue maxReceiveCount와 같게)
+INGEST_MAX_RECEIVES = int(os.environ.get('INGEST_MAX_RECEIVES', '3'))
+INGEST_JOB_TTL_DAYS = int(os.environ.get('INGEST_JOB_TTL_DAYS', '7'))
+
+JOB_PREFIX = 'ingest#'
+TEXT_EXTENSIONS = ('.txt', '.md', '.markdown', '.csv', '.tsv', '.json', '.log')
+HTML_EXTENSIONS = ('.html', '.htm')
+# 작업 단계별 진행률
+PROGRESS = {'queued': 0, 'extracting': 10, 'storing': 60, 'indexing': 80, 'done': 100, 'failed': 100}
+
+
+class ExtractionError(ValueError):
+    """재시도해도 같은 결과인 추출 실패 (지원하지 않는 형식, 깨진 문서)"""
+
+
+# 추출/정규화
+
+class _HTMLText(html.parser.HTMLParser):
+    """태그 제거 (script/style 제외, 블록 태그는 줄바꿈)"""
+    BLOCKS = {'p', 'div', 'br', 'li', 'tr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'section', 'article', 'table'}
+
+    def __init__(self):
+        super().__init__()
+        self.parts: List[str] = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('script', 'style'):
+            self._skip += 1
+        elif tag in self.BLOCKS:
+            self.parts.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in ('script', 'style'):
+            self._skip = max(0, self._skip - 1)
+        elif tag in self.BLOCKS:
+            self.parts.append('\n')
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+
+def _decode_text(data: bytes) -> str:
+    # 한글 문서는 UTF-8 외에 CP949(EUC-KR)로 저장된 경우가 많음
+    for encoding in ('utf-8-sig', 'cp949'):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    raise ExtractionError('텍스트 인코딩을 인식할 수 없습니다 (UTF-8/CP949)')
+
+
+def _extract_docx(data: bytes) -> str:
+    namespace = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+    try:
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            root = ElementTree.fromstring(archive.read('word/document.xml'))
+    except (zipfile.BadZipFile, KeyError, ElementTree.ParseError) as e:
+        raise ExtractionError(f"DOCX 문서를 읽을 수 없습니다: {str(e)}")
+    paragraphs = []
+    for paragraph in root.iter(f"{namespace}p"):
+        texts = []
+        for node in paragraph.iter():
+            if node.tag == f"{namespace}t":
+                texts.append(node.text or '')
+            elif node.tag == f"{namespace}tab":
+                texts.append('\t')
+        paragraphs.append(''.join(texts))
+    return '\n\n'.join(paragraphs)
+
+
+def _extract_pdf(data: bytes) -> str:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise ExtractionError('PDF 추출에는 pypdf 패키지가 필요합니다')
+    try:
+        reader = PdfReader(io.BytesIO(data))
+        return '\n\n'.join((page.extract_text() or '') for page in reader.pages)
+    except Exception as e:
+        raise ExtractionError(f"PDF 문서를 읽을 수 없습니다: {str(e)}")
+
+
+def extract_text(data: bytes, file_name: str, content_type: str = '') -> str:
+    """원본 문서 → 텍스트 (확장자, 없으면 content type 기준)"""
+    name = (file_name or '').lower()
+    content_type = (content_type or '').lower()
+    if name.endswith('.docx') or 'wordprocessingml' in content_type:
+        return _extract_docx(data)
+    if name.endswith('.pdf') or content_type == 'application/pdf':
+        return _extract_pdf(data)
+    if name.endswith(HTML_EXTENSIONS) or content_type == 'text/html':
+        parser = _HTMLText()
+        parser.feed(_decode_text(data))
+        return ''.join(parser.parts)
+    if name.endswith(TEXT_EXTENSIONS) or content_type.startswith('text/') or content_type == 'application/json':
+        return _decode_text(data)
+    raise ExtractionError(f"지원하지 않는 파일 형식입니다: {file_name}")
+
+
+def normalize_text(text: str) -> str:
+    """NFC 정규화, 줄바꿈 통일, 제어 문자/줄 끝 공백 제거, 3줄 이상 빈 줄은 1줄로"""
+    text = unicodedata.normalize('NFC', text or '').replace('\r\n', '\n').replace('\r', '\n')
+    text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f\u200b\ufeff]', '', text)
+    text = re.sub(r'[ \t\u00a0]+\n', '\n', text)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    return text.strip()
+
+
+# 큐
+
+class SqsIngestionQueue:
+    """SQS 큐 (배포 환경)"""
+
+    def __init__(self, queue_url: str):
+        self.queue_url = queue_url
+
+    def send(self, message: Dict[str, Any]) -> None:
+        get_client('sqs').send_message(QueueUrl=self.queue_url, MessageBody=json.dumps(message))
+
+
+class LocalIngestionQueue:
+    """디렉터리 큐 (메시지 1개 = JSON 파일 1개) - 로컬 개발/테스트용 SQS 대체"""
+
+    def __init__(self, root: str = INGEST_LOCAL_DIR):
+        self.root = Path(root)
+
+    def send(self, message: Dict[str, Any]) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.root / f"{time.time_ns()}-{message['jobId']}.json"
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(message), encoding='utf-8')
+        tmp.replace(path)
+
+    def receive(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """오래된 순으로 꺼내기 (꺼낸 메시지는 삭제)"""
+        if not self.root.exists():
+            return []
+        messages = []
+        for path in sorted(self.root.glob('*.json'))[:limit]:
+            try:
+                messages.append(json.loads(path.read_text(encoding='utf-8')))
+                path.unlink()
+            except FileNotFoundError:
+                continue  # 다른 작업자가 먼저 가져감
+        return messages
+
+
+# 작업
+
+class IngestionService:
+    """수집 작업 생성/조회/처리"""
+
+    def __init__(self, table_factory: Callable = None, queue=None, file_store=None,
+                 capture: Optional[Callable[[str], Any]] = None):
+        self._table_factory = table_factory or (lambda: get_table('files'))
+        self.queue = queue or (SqsIngestionQueue(INGEST_QUEUE_URL) if INGEST_QUEUE_URL else LocalIngestionQueue())
+        self._file_store = file_store
+        self._capture = capture
+
+    @property
+    def table(self):
+        return self._table_factory()
+
+    @property
+    def file_store(self):
+        return self._file_store or get_file_store()
+
+    def submit(self, engine_type: str, file_name: str, data: bytes, content_type: str = '',
+               always_include: bool = False) -> Dict[str, Any]:
+        """원본 저장 + 작업 항목 생성 + 큐 등록"""
+        if len(data) > INGEST_MAX_BYTES:
+            raise ExtractionError(f"파일 크기는 {INGEST_MAX_BYTES // (1024 * 1024)}MB를 초과할 수 없습니다")
+        # 원본은 base64 텍스트로 청크 저장소에 (바이너리 문서도 같은 저장소 사용)
+        raw = self.file_store.put_blob(base64.b64encode(data).decode('ascii'))
+        now = datetime.utcnow().isoformat() + 'Z'
+        job = {
+            'promptId': f"{JOB_PREFIX}{engine_type}",
+            'fileId': uuid.uuid4().hex,
+            'engineType': engine_type,
+            'fileName': file_name,
+            'contentType': content_type,
+            'alwaysInclude': always_include,
+            'raw': {'hash': raw['hash'], 'chunks': raw['chunks']},
+            'bytes': len(data),
+            'status': 'queued',
+            'progress': PROGRESS['queued'],
+            'createdAt': now,
+            'updatedAt': now,
+            'ttl': int(time.time()) + INGEST_JOB_TTL_DAYS * 86400
+        }
+        self.table.put_item(Item=job)
+        self.queue.send({'engineType': engine_type, 'jobId': job['fileId']})
+        log_event(logger, 'ingest.submitted', engine=engine_type, job=job['fileId'], bytes=len(data),
+                  name=file_name)
+        return public_job(job)
+
+    def status(self, engine_type: str, job_id: str) -> Optional[Dict[str, Any]]:
+        item = self.table.get_item(Key={'promptId': f"{JOB_PREFIX}{engine_type}", 'fileId': job_id}).get('Item')
+        return public_job(item) if item else None
+
+    def jobs(self, engine_type: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """엔진의 최근 작업 (최근 순)"""
+        kwargs = {'KeyConditionExpression': Key('promptId').eq(f"{JOB_PREFIX}{engine_type}")}
+        items = []
+        while True:
+            response = self.table.query(**kwargs)
+            items.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                break
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        items.sort(key=lambda item: item.get('createdAt', ''), reverse=True)
+        return [public_job(item) for item in items[:limit]]
+
+    def process(self, engine_type: str, job_id: str, final_attempt: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        작업 1개 처리 (이미 끝난 작업은 건너뜀)
+
+        Args:
+            final_attempt: 마지막 수신 - 추출 외 오류도 다시 던지지 않고 failed로 끝냄
+        """
+        key = {'promptId': f"{JOB_PREFIX}{engine_type}", 'fileId': job_id}
+        job = self.table.get_item(Key=key).get('Item')
+        if job is None or job.get('status') in ('done', 'failed'):
+            return public_job(job) if job else None
+
+        start_time = time.perf_counter()
+        try:
+            self._update(key, 'extracting')
+            payload = self.file_store.get_blobs([job['raw']]).get(job['raw']['hash'])
+            if payload is None:
+                raise RuntimeError(f"Raw document for ingestion job {job_id} not found")
+            text = normalize_text(extract_text(base64.b64decode(payload), job.get('fileName', ''),
+                                               job.get('contentType', '')))
+            if not text:
+                raise ExtractionError('문서에서 텍스트를 찾을 수 없습니다')
+
+            self._update(key, 'storing')
+            # 큰 문서는 file_store가 청크로 저장
+            self.file_store.put_file(engine_type, job_id, job.get('fileName', ''), text,
+                                     job.get('createdAt'), bool(job.get('alwaysInclude')))
+
+            # 스냅샷 생성 = 사전 렌더링 + (검색 모드) 색인
+            self._update(key, 'indexing')
+            if self._capture:
+                self._capture(engine_type)
+            else:
+                from services.prompt_snapshots import get_prompt_snapshots
+                get_prompt_snapshots().capture(engine_type)
+
+            result = {'chars': len(text), 'tokens': estimate_tokens(text)}
+            self._update(key, 'done', **result)
+        except ExtractionError as e:
+            self._update(key, 'failed', error=str(e))
+            log_event(logger, 'ingest.failed', engine=engine_type, job=job_id, error=str(e))
+            return self.status(engine_type, job_id)
+        except Exception as e:
+            if not final_attempt:
+                raise
+            self._update(key, 'failed', error=str(e))
+            log_event(logger, 'ingest.failed', engine=engine_type, job=job_id, error=str(e), final=True)
+            return self.status(engine_type, job_id)
+
+        log_event(logger, 'ingest.done', engine=engine_type, job=job_id,
+                  elapsed_ms=round((time.perf_counter() - start_time) * 1000), **result)
+        return self.status(engine_type, job_id)
+
+    def _update(self, key: Dict[str, str], status: str, **fields) -> None:
+        values = {'status': status, 'progress': PROGRESS[status],
+                  'updatedAt': datetime.utcnow().isoformat() + 'Z', **fields}
+        names = {f"#f{index}": name for index, name in enumerate(values)}
+        self.table.update_item(
+            Key=key,
+            UpdateExpression='SET ' + ', '.join(f"{name} = :v{index}" for index, name in enumerate(names)),
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues={f":v{index}": value for index, value in enumerate(values.values())}
+        )
+
+
+def public_job(item: Dict[str, Any]) -> Dict[str, Any]:
+    """API 응답용 작업 상태 (원본 참조/TTL 제외, 완료 시 fileId = 작업 ID)"""
+    job = {name: value for name, value in item.items() if name not in ('promptId', 'fileId', 'raw', 'ttl')}
+    job['jobId'] = item['fileId']
+    if item.get('status') == 'done':
+        job['fileId'] = item['fileId']
+    return job
+
+
+_ingestion: Optional[IngestionService] = None
+
+
+def get_ingestion_service() -> IngestionService:
+    """컨테이너 공용 수집 서비스"""
+    global _ingestion
+    if _ingestion is None:
+        _ingestion = IngestionService()
+    return _ingestion
@@ -0,0 +1,194 @@
+"""
+Knowledge Index
+지식 파일 BM25 검색 - 큰 지식베이스는 질문과 관련된 구간만 프롬프트에 넣음
+
+- 색인: 프롬프트 저장(스냅샷 생성) 시 1회. 파일을 문단 단위 구간(KB_PASSAGE_CHARS 이하)으로 나누고
+  한글은 글자 n-gram(KB_NGRAM), 영문/숫자는 단어 단위로 토큰화해 구간별 단어 빈도와 문서 빈도를 저장
+  색인 JSON은 services/file_store.py 청크 저장소에, 참조({hash, chunks, passages, chars})는 스냅샷 항목에
+- 검색: 메시지마다 질문으로 BM25 점수 → 상위 KB_TOP_K개를 KB_TOKEN_BUDGET 토큰 안에서 선택, 원래 순서로 정렬
+- 대상: KB_RETRIEVAL_ENABLED이고 색인 대상 파일 본문 합계가 KB_RETRIEVAL_MIN_CHARS 이상인 엔진
+  alwaysInclude 파일은 색인하지 않고 캐시되는 시스템 프롬프트에 그대로 포함
+"""
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from services.file_store import get_file_store
+from utils.logger import setup_logger
+from utils.token_estimator import estimate_tokens_batch
+
+logger = setup_logger(__name__)
+
+KB_RETRIEVAL_ENABLED = os.environ.get('KB_RETRIEVAL_ENABLED', 'false').lower() == 'true'
+KB_RETRIEVAL_MIN_CHARS = int(os.environ.get('KB_RETRIEVAL_MIN_CHARS', '40000'))
+KB_PASSAGE_CHARS = int(os.environ.get('KB_PASSAGE_CHARS', '1200'))
+KB_TOP_K = int(os.environ.get('KB_TOP_K', '8'))
+KB_TOKEN_BUDGET = int(os.environ.get('KB_TOKEN_BUDGET', '4000'))
+KB_NGRAM = int(os.environ.get('KB_NGRAM', '2'))
+KB_INDEX_CACHE_SIZE = int(os.environ.get('KB_INDEX_CACHE_SIZE', '16'))
+
+INDEX_VERSION = 1
+# BM25 파라미터
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_WORD_RE = re.compile(r'[0-9a-z]+|[가-힣]+')
+
+
+def tokenize(text: str, n: int = KB_NGRAM) -> List[str]:
+    """한글 단어는 글자 n-gram (조사/어미가 붙어도 어간이 겹치도록), 영문/숫자는 단어"""
+    terms = []
+    for word in _WORD_RE.findall((text or '').lower()):
+        if '가' <= word[0] <= '힣' and len(word) > n:
+            terms.extend(word[start:start + n] for start in range(len(word) - n + 1))
+        else:
+            terms.append(word)
+    return terms
+
+
+def split_passages(text: str, max_chars: int = KB_PASSAGE_CHARS) -> List[str]:
+    """빈 줄 기준 문단을 max_chars 이하 구간으로 묶음 (긴 문단은 잘라서)"""
+    passages: List[str] = []
+    current = ''
+    for paragraph in re.split(r'\n\s*\n', (text or '').strip()):
+        paragraph = paragraph.strip()
+        while len(paragraph) > max_chars:
+            if current:
+                passages.append(current)
+                current = ''
+            passages.append(paragraph[:max_chars])
+            paragraph = paragraph[max_chars:]
+        if not paragraph:
+            continue
+        if current and len(current) + len(paragraph) + 2 > max_chars:
+            passages.append(current)
+            current = paragraph
+        else:
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        passages.append(current)
+    return passages
+
+
+def use_retrieval(files: List[Dict[str, Any]], enabled: Optional[bool] = None,
+                  min_chars: Optional[int] = None) -> bool:
+    """검색 모드 적용 여부 (색인 대상 파일 본문 합계 기준)"""
+    enabled = KB_RETRIEVAL_ENABLED if enabled is None else enabled
+    min_chars = KB_RETRIEVAL_MIN_CHARS if min_chars is None else min_chars
+    indexed_chars = sum(len(f.get('fileContent', '') or '') for f in files if not f.get('alwaysInclude'))
+    return enabled and indexed_chars >= min_chars
+
+
+class Passage(NamedTuple):
+    """검색 단위 구간"""
+    file_name: str
+    position: int  # 파일 순서 * 10000 + 파일 내 순서 (원래 순서 복원용)
+    text: str
+    tokens: int  # 추정 토큰 수 (예산 계산용)
+    terms: Dict[str, int]
+
+
+class KnowledgeIndex:
+    """구간 BM25 색인"""
+
+    def __init__(self, passages: List[Passage], df: Dict[str, int]):
+        self.passages = passages
+        self.df = df
+        self.avg_length = (sum(sum(p.terms.values()) for p in passages) / len(passages)) if passages else 0.0
+        self._lengths = [sum(p.terms.values()) for p in passages]
+
+    @classmethod
+    def build(cls, files: List[Dict[str, Any]], passage_chars: int = KB_PASSAGE_CHARS) -> 'KnowledgeIndex':
+        """파일(추가 순서) → 색인"""
+        texts = []
+        for file_index, f in enumerate(files):
+            for passage_index, text in enumerate(split_passages(f.get('fileContent', ''), passage_chars)):
+                texts.append((f.get('fileName', ''), file_index * 10000 + passage_index, text))
+        tokens = estimate_tokens_batch([text for _, _, text in texts])
+        passages = [
+            Passage(name, position, text, count, dict(Counter(tokenize(text))))
+            for (name, position, text), count in zip(texts, tokens)
+        ]
+        df: Counter = Counter()
+        for passage in passages:
+            df.update(passage.terms.keys())
+        return cls(passages, dict(df))
+
+    def to_json(self) -> str:
+        return json.dumps({
+            'version': INDEX_VERSION,
+            'passages': [[p.file_name, p.position, p.text, p.tokens, p.terms] for p in self.passages],
+            'df': self.df
+        }, ensure_ascii=False, separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, payload: str) -> 'KnowledgeIndex':
+        data = json.loads(payload)
+        return cls([Passage(*entry) for entry in data['passages']], data['df'])
+
+    def search(self, query: str, top_k: int = KB_TOP_K, token_budget: int = KB_TOKEN_BUDGET) -> List[Passage]:
+        """질문과 관련된 구간 (점수 순으로 top_k/토큰 예산까지 고른 뒤 원래 순서로)"""
+        query_terms = set(tokenize(query)) & set(self.df)
+        if not query_terms or not self.passages:
+            return []
+
+        count = len(self.passages)
+        idf = {term: math.log(1 + (count - self.df[term] + 0.5) / (self.df[term] + 0.5)) for term in query_terms}
+        scored = []
+        for index, passage in enumerate(self.passages):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[index] / (self.avg_length or 1))
+            score = 0.0
+            for term in query_terms:
+                tf = passage.terms.get(term)
+                if tf:
+                    score += idf[term] * tf * (BM25_K1 + 1) / (tf + norm)
+            if score > 0:
+                scored.append((score, index))
+
+        selected = []
+        used = 0
+        for score, index in sorted(scored, reverse=True):
+            passage = self.passages[index]
+            if used + passage.tokens > token_budget:
+                continue
+            selected.append(passage)
+            used += passage.tokens
+            if len(selected) >= top_k:
+                break
+        return sorted(selected, key=lambda passage: passage.position)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'passages': len(self.passages),
+            'chars': sum(len(p.text) for p in self.passages),
+            'tokens': sum(p.tokens for p in self.passages)
+        }
+
+
+_index_cache: 'OrderedDict[str, KnowledgeIndex]' = OrderedDict()
+_index_lock = threading.Lock()
+
+
+def load_index(ref: Dict[str, Any], file_store=None) -> Optional[KnowledgeIndex]:
+    """스냅샷의 색인 참조 → 색인 (컨테이너 LRU 캐시, 키 = 색인 해시)"""
+    digest = ref['hash']
+    with _index_lock:
+        if digest in _index_cache:
+            _index_cache.move_to_end(digest)
+            return _index_cache[digest]
+
+    payload = (file_store or get_file_store()).get_blobs([ref]).get(digest)
+    if payload is None:
+        logger.error(f"Knowledge index {digest[:12]} not found")
+        return None
+    index = KnowledgeIndex.from_json(payload)
+
+    with _index_lock:
+        _index_cache[digest] = index
+        while len(_index_cache) > KB_INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index
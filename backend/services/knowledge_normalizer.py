@@ -0,0 +1,148 @@
+"""
+Knowledge Normalizer
+지식 파일 저장 시 정규화 - Word/HWP에서 붙여넣은 텍스트의 토큰 낭비 제거
+
+- 유니코드 NFC (자모 분리 한글 → 완성형), 전각/NBSP/제로폭 공백 정리, 줄 안 연속 공백 1칸, 빈 줄 정리
+- 머리글/바닥글: 쪽 번호 줄 제거, 문단 경계(앞뒤가 빈 줄/쪽 번호 줄/파일 처음·끝)의 짧은 줄이 글자 그대로
+  KB_BOILERPLATE_MIN_REPEAT번 이상 반복되면 첫 줄만 남김 - 숫자가 다른 줄, 표/목록 안쪽 줄은 내용이므로 유지
+- 중복 문단: 공백/대소문자를 무시한 문단 지문(sha256 앞 16자) - 같은 파일 안, 엔진의 다른 파일과 겹치면 제거
+  KB_DEDUP_MIN_CHARS보다 짧은 문단(제목, 짧은 목록)은 비교하지 않음
+- 결과: 정규화 본문 + 보고서 {originalTokens, tokens, savedTokens, boilerplateLines, duplicateParagraphs}
+  원본은 services/file_store.py가 blob으로 보관 (되돌리기용)
+"""
+import hashlib
+import os
+import re
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from lib.prompt_compaction import normalize_whitespace
+from utils.token_estimator import estimate_tokens_batch
+
+KB_NORMALIZE_ON_SAVE = os.environ.get('KB_NORMALIZE_ON_SAVE', 'true').lower() == 'true'
+KB_DEDUP_MIN_CHARS = int(os.environ.get('KB_DEDUP_MIN_CHARS', '60'))
+KB_BOILERPLATE_MIN_REPEAT = int(os.environ.get('KB_BOILERPLATE_MIN_REPEAT', '3'))
+KB_BOILERPLATE_MAX_CHARS = int(os.environ.get('KB_BOILERPLATE_MAX_CHARS', '80'))
+
+NORMALIZE_VERSION = 1
+
+# 전각 공백, NBSP, 기타 유니코드 공백 → 일반 공백 / 제로폭 문자, 제어 문자 → 제거
+_SPACES_RE = re.compile('[\u00a0\u2000-\u200a\u202f\u205f\u3000\t]')
+_INVISIBLE_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\x7f\u00ad\u200b-\u200d\u2060\ufeff]')
+# 쪽 번호 줄: "- 3 -", "3 / 12", "Page 3 of 12", "3쪽", "3 페이지"
+_PAGE_NUMBER_RE = re.compile(
+    r'^\s*(?:-\s*\d+\s*-|\d+\s*/\s*\d+|page\s*\d+(?:\s*(?:of|/)\s*\d+)?|\d+\s*(?:쪽|페이지))\s*$', re.IGNORECASE
+)
+# 머리글 후보에서 제외 - 제목/목록/라벨 줄은 반복돼도 내용
+_STRUCTURAL_RE = re.compile(r'^(?:#|[-*•□]|\d+[.)]|\(\d+\))|:$')
+_FINGERPRINT_STRIP_RE = re.compile(r'\s+')
+
+
+class NormalizedText(NamedTuple):
+    """정규화 결과"""
+    text: str
+    report: Dict[str, Any]
+    fingerprints: List[str]  # 남은 문단 지문 (다른 파일 중복 검사용)
+
+
+def clean_text(text: str) -> str:
+    """NFC + 공백 문자 정리 + 줄 안 연속 공백/빈 줄 정리"""
+    text = unicodedata.normalize('NFC', text or '').replace('\r\n', '\n').replace('\r', '\n')
+    text = _SPACES_RE.sub(' ', _INVISIBLE_RE.sub('', text))
+    return normalize_whitespace(text)
+
+
+def paragraph_fingerprint(paragraph: str) -> str:
+    """공백/대소문자 무시 문단 지문 (줄바꿈 위치만 다른 문단도 같은 지문)"""
+    key = _FINGERPRINT_STRIP_RE.sub('', unicodedata.normalize('NFC', paragraph)).lower()
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+
+
+def paragraphs(text: str) -> List[str]:
+    return [p.strip() for p in re.split(r'\n\s*\n', text or '') if p.strip()]
+
+
+def fingerprints(text: str, min_chars: int = KB_DEDUP_MIN_CHARS) -> List[str]:
+    """비교 대상 문단 지문 (정규화 전 본문이어도 같은 결과)"""
+    return [paragraph_fingerprint(p) for p in paragraphs(clean_text(text)) if len(p) >= min_chars]
+
+
+def strip_boilerplate(text: str, min_repeat: int = KB_BOILERPLATE_MIN_REPEAT,
+                      max_chars: int = KB_BOILERPLATE_MAX_CHARS) -> Tuple[str, int]:
+    """쪽 번호 줄 제거 + 반복 머리글/바닥글은 첫 줄만 → (본문, 제거한 줄 수)"""
+    lines = text.split('\n')
+
+    def blank(index: int) -> bool:
+        return index < 0 or index >= len(lines) or not lines[index].strip() or bool(_PAGE_NUMBER_RE.match(lines[index]))
+
+    def pattern(index: int) -> Optional[str]:
+        # 문단 경계 줄만 후보 (표 행처럼 연속된 줄의 안쪽은 제외), 글자 그대로 같은 줄끼리만 반복으로 셈
+        stripped = lines[index].strip()
+        if len(stripped) < 4 or len(stripped) > max_chars or _STRUCTURAL_RE.search(stripped):
+            return None
+        return stripped if blank(index - 1) or blank(index + 1) else None
+
+    keys = [pattern(index) for index in range(len(lines))]
+    counts = Counter(key for key in keys if key)
+    repeated = {key for key, count in counts.items() if count >= min_repeat}
+    kept = []
+    seen = set()
+    removed = 0
+    for line, key in zip(lines, keys):
+        if _PAGE_NUMBER_RE.match(line) or (key in repeated and key in seen):
+            removed += 1
+            continue
+        if key in repeated:
+            seen.add(key)
+        kept.append(line)
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(kept)).strip(), removed
+
+
+def normalize_knowledge(text: str, seen: Optional[Set[str]] = None,
+                        min_chars: int = KB_DEDUP_MIN_CHARS) -> NormalizedText:
+    """
+    지식 파일 본문 정규화
+
+    Args:
+        seen: 엔진의 다른(앞선) 파일 문단 지문 - 이 파일의 남은 문단 지문이 추가됨
+    """
+    seen = set() if seen is None else seen
+    cleaned, boilerplate = strip_boilerplate(clean_text(text))
+
+    kept = []
+    kept_fingerprints = []
+    duplicates = 0
+    for paragraph in paragraphs(cleaned):
+        if len(paragraph) >= min_chars:
+            fingerprint = paragraph_fingerprint(paragraph)
+            if fingerprint in seen:
+                duplicates += 1
+                continue
+            seen.add(fingerprint)
+            kept_fingerprints.append(fingerprint)
+        kept.append(paragraph)
+    normalized = '\n\n'.join(kept)
+
+    original_tokens, tokens = estimate_tokens_batch([text or '', normalized])
+    return NormalizedText(normalized, {
+        'version': NORMALIZE_VERSION,
+        'originalChars': len(text or ''),
+        'chars': len(normalized),
+        'originalTokens': original_tokens,
+        'tokens': tokens,
+        'savedTokens': original_tokens - tokens,
+        'boilerplateLines': boilerplate,
+        'duplicateParagraphs': duplicates
+    }, kept_fingerprints)
+
+
+def seen_fingerprints(items: Iterable[Dict[str, Any]]) -> Set[str]:
+    """파일 항목들의 문단 지문 (paragraphHashes가 없는 이전 항목은 본문에서 계산)"""
+    seen: Set[str] = set()
+    for item in items:
+        if 'paragraphHashes' in item:
+            seen.update(item['paragraphHashes'])
+        else:
+            seen.update(fingerprints(item.get('fileContent', '')))
+    return seen
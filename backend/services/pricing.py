@@ -0,0 +1,161 @@
+"""
+Pricing Engine
+Bedrock 모델별 토큰 단가 (입력/출력/캐시 읽기/캐시 쓰기) - 모델 ID + 적용일 버전 관리
+
+- 단가는 100만 토큰당 USD, 모델 계열마다 적용 시작일 순 목록
+- 계산 시점(기본 오늘)에 유효한 마지막 단가를 사용하고 버전(`계열@적용일`)을 함께 반환
+- 프롬프트 캐싱 절감액 = 캐시 토큰을 일반 입력 단가로 냈을 때 - 실제 캐시 읽기/쓰기 비용
+- PRICING_FILE(JSON)로 단가 추가/교체 가능: {"claude-opus-4-1": [{"effective": "2025-08-05", "input": 15, ...}]}
+"""
+import json
+import os
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from config.aws import BEDROCK_CONFIG
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+PER_TOKENS = Decimal(1_000_000)
+MICROS = Decimal(1_000_000)
+
+
+class ModelPrice(NamedTuple):
+    """100만 토큰당 USD"""
+    input: Decimal
+    output: Decimal
+    cache_write: Decimal
+    cache_read: Decimal
+
+
+class TokenUsage(NamedTuple):
+    """Bedrock usage 필드 (input은 캐시되지 않은 입력만)"""
+    input: int = 0
+    output: int = 0
+    cache_read: int = 0
+    cache_write: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.input + self.output + self.cache_read + self.cache_write
+
+
+class CostBreakdown(NamedTuple):
+    """항목별 비용 (USD)"""
+    version: str
+    input: Decimal
+    output: Decimal
+    cache_read: Decimal
+    cache_write: Decimal
+    savings: Decimal
+
+    @property
+    def total(self) -> Decimal:
+        return self.input + self.output + self.cache_read + self.cache_write
+
+    @property
+    def micros(self) -> int:
+        """총 비용 (마이크로 USD 정수 - DynamoDB ADD용)"""
+        return int((self.total * MICROS).to_integral_value())
+
+    @property
+    def savings_micros(self) -> int:
+        return int((self.savings * MICROS).to_integral_value())
+
+    def to_dict(self) -> Dict[str, str]:
+        return {
+            'version': self.version,
+            'input': str(self.input),
+            'output': str(self.output),
+            'cacheRead': str(self.cache_read),
+            'cacheWrite': str(self.cache_write),
+            'total': str(self.total),
+            'savings': str(self.savings)
+        }
+
+
+def _price(input_: str, output: str, cache_write: str, cache_read: str) -> ModelPrice:
+    return ModelPrice(Decimal(input_), Decimal(output), Decimal(cache_write), Decimal(cache_read))
+
+
+# 모델 계열 → [(적용 시작일, 단가)] (캐시 쓰기는 5분 TTL 기준)
+PRICE_TABLES: Dict[str, List[Tuple[str, ModelPrice]]] = {
+    'claude-opus-4-1': [('2025-08-05', _price('15', '75', '18.75', '1.50'))],
+    'claude-opus-4': [('2025-05-22', _price('15', '75', '18.75', '1.50'))],
+    'claude-sonnet-4': [('2025-05-22', _price('3', '15', '3.75', '0.30'))],
+    'claude-3-7-sonnet': [('2025-02-24', _price('3', '15', '3.75', '0.30'))],
+    'claude-3-5-haiku': [('2024-11-04', _price('0.80', '4', '1', '0.08'))],
+}
+
+DEFAULT_MODEL_ID = BEDROCK_CONFIG['opus_model_id']
+
+
+def model_family(model_id: str) -> str:
+    """'us.anthropic.claude-opus-4-1-20250805-v1:0' → 'claude-opus-4-1' (가장 긴 일치 계열)"""
+    name = model_id.split('anthropic.', 1)[-1]
+    matches = [family for family in PRICE_TABLES if name.startswith(family)]
+    return max(matches, key=len) if matches else name
+
+
+def _load_overrides() -> None:
+    """PRICING_FILE 단가 병합 (같은 적용일은 교체)"""
+    path = os.environ.get('PRICING_FILE')
+    if not path:
+        return
+    try:
+        with open(path, encoding='utf-8') as f:
+            loaded = json.load(f)
+        for family, entries in loaded.items():
+            table = dict(PRICE_TABLES.get(family, []))
+            for entry in entries:
+                table[entry['effective']] = _price(
+                    str(entry['input']), str(entry['output']),
+                    str(entry['cache_write']), str(entry['cache_read'])
+                )
+            PRICE_TABLES[family] = sorted(table.items())
+    except Exception as e:
+        logger.error(f"Error loading pricing from {path}: {str(e)}")
+
+
+_load_overrides()
+
+
+def price_for(model_id: Optional[str] = None, at: Optional[str] = None) -> Tuple[str, ModelPrice]:
+    """
+    계산 시점의 단가와 버전
+
+    Args:
+        model_id: Bedrock 모델 ID (기본 BEDROCK_OPUS_MODEL_ID)
+        at: YYYY-MM-DD (기본 오늘) - 적용일 이전이면 해당 계열의 첫 단가
+    """
+    family = model_family(model_id or DEFAULT_MODEL_ID)
+    table = PRICE_TABLES.get(family)
+    if not table:
+        logger.warning(f"No price table for {model_id}, using {DEFAULT_MODEL_ID}")
+        family = model_family(DEFAULT_MODEL_ID)
+        table = PRICE_TABLES[family]
+
+    at = at or datetime.now().strftime('%Y-%m-%d')
+    effective, price = table[0]
+    for candidate_date, candidate in table:
+        if candidate_date <= at:
+            effective, price = candidate_date, candidate
+    return f"{family}@{effective}", price
+
+
+def calculate(usage: TokenUsage, model_id: Optional[str] = None, at: Optional[str] = None) -> CostBreakdown:
+    """토큰 사용량 → 항목별 비용"""
+    version, price = price_for(model_id, at)
+    cache_read = Decimal(usage.cache_read) * price.cache_read / PER_TOKENS
+    cache_write = Decimal(usage.cache_write) * price.cache_write / PER_TOKENS
+    uncached = Decimal(usage.cache_read + usage.cache_write) * price.input / PER_TOKENS
+    return CostBreakdown(
+        version=version,
+        input=Decimal(usage.input) * price.input / PER_TOKENS,
+        output=Decimal(usage.output) * price.output / PER_TOKENS,
+        cache_read=cache_read,
+        cache_write=cache_write,
+        savings=uncached - cache_read - cache_write
+    )
@@ -0,0 +1,191 @@
+"""
+Prompt Preview
+엔진별 시스템 프롬프트 토큰 예산 분석 - 관리자 미리보기 (GET /prompts/{engineType}/preview)
+
+- 메시지 경로가 보내는 시스템 블록을 그대로 재현: 역할별 사전 렌더링 템플릿(캐시 지점) + 검색 모드의 질문별 발췌 블록
+- 블록별/파일별 토큰 수, 캐시 지점 위치(블록 번호, 캐시 prefix 토큰), 최소 캐시 길이(PROMPT_CACHE_MIN_TOKENS) 미달 여부
+- 1,000 메시지당 예상 시스템 블록 입력 비용 (services/pricing.py) - 캐시 없음 / 적중률 PREVIEW_CACHE_HIT_RATE 기준
+  사용자 메시지, 대화 맥락, 출력 토큰은 질문마다 달라 제외
+- PROMPT_FILE_TOKEN_BUDGET을 넘는 파일은 overBudget으로 표시
+- 스냅샷은 불변이므로 결과는 (스냅샷 ID, 예산, 적중률, 단가 버전)을 키로 컨테이너 LRU 캐시
+  렌더링 본문 저장에 실패한 역할은 missingRoles로 알리고 (메시지 경로가 파일로 렌더링) 그 결과는 캐시하지 않음
+- 조회지만 쓰기가 있을 수 있음: 스냅샷이 없거나 현재 템플릿 버전이 아니면 capture()로 스냅샷을 만들고
+  포인터/레지스트리를 갱신한다 (저장 시와 같은 결과라 내용은 바뀌지 않음)
+"""
+import os
+import threading
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+from lib.bedrock_client_enhanced import CLAUDE_MODEL_ID, RENDER_ROLES
+from lib.prompt_compaction import normalize_whitespace
+from services.knowledge_index import KB_TOKEN_BUDGET
+from services.pricing import TokenUsage, calculate, price_for
+from services.prompt_snapshots import PromptSnapshots, _blob_ref, get_prompt_snapshots, has_current_render
+from utils.logger import log_event, setup_logger
+from utils.token_estimator import estimate_tokens_batch
+
+logger = setup_logger(__name__)
+
+PROMPT_FILE_TOKEN_BUDGET = int(os.environ.get('PROMPT_FILE_TOKEN_BUDGET', '20000'))
+# Bedrock 프롬프트 캐싱 최소 길이 (Claude Opus/Sonnet) - 미만이면 cache_control이 무시됨
+PROMPT_CACHE_MIN_TOKENS = int(os.environ.get('PROMPT_CACHE_MIN_TOKENS', '1024'))
+PREVIEW_CACHE_HIT_RATE = float(os.environ.get('PREVIEW_CACHE_HIT_RATE', '0.8'))
+PREVIEW_CACHE_SIZE = int(os.environ.get('PREVIEW_CACHE_SIZE', '32'))
+
+MESSAGES = 1000
+COST_PRECISION = Decimal('0.0001')
+
+
+class PromptPreview:
+    """스냅샷 → 블록/파일별 토큰, 캐시 지점, 1,000 메시지당 비용"""
+
+    def __init__(self, snapshots: Optional[PromptSnapshots] = None, file_budget: int = None,
+                 hit_rate: float = None, model_id: str = None):
+        self._snapshots = snapshots
+        self.file_budget = PROMPT_FILE_TOKEN_BUDGET if file_budget is None else file_budget
+        self.hit_rate = PREVIEW_CACHE_HIT_RATE if hit_rate is None else hit_rate
+        self.model_id = model_id or CLAUDE_MODEL_ID
+        self._cache: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def snapshots(self) -> PromptSnapshots:
+        if self._snapshots is None:
+            self._snapshots = get_prompt_snapshots()
+        return self._snapshots
+
+    def preview(self, engine_type: str, include_text: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        엔진 현재 스냅샷의 토큰 예산 분석
+
+        스냅샷이 없거나 현재 템플릿 버전으로 렌더링되지 않았으면 먼저 스냅샷을 만든다
+        (GET이지만 스냅샷 항목, 엔진 포인터, 레지스트리 버전을 쓸 수 있음).
+        include_text면 역할별 시스템 블록 본문(세션 변수 치환 전)도 포함 (캐시하지 않음)
+
+        Returns:
+            분석 결과 (엔진 프롬프트가 없으면 None)
+        """
+        base = self.snapshots.prompts_table.get_item(
+            Key={'engineType': engine_type, 'promptId': engine_type}
+        ).get('Item')
+        if base is None:
+            return None
+
+        sid = base.get('snapshotId')
+        item = self.snapshots.get_item(engine_type, sid) if sid else None
+        if item is None or not has_current_render(item):
+            snapshot = self.snapshots.capture(engine_type, base)
+            sid = snapshot.snapshot_id
+            item = self.snapshots.get_item(engine_type, sid)
+
+        price_version, _ = price_for(self.model_id)
+        key = f"{engine_type}:{sid}:{self.file_budget}:{self.hit_rate}:{price_version}"
+        with self._lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+        if result is None:
+            result = self._analyze(engine_type, sid, item)
+            # 빠진 역할은 다음 조회에서 다시 렌더링될 수 있으므로 캐시하지 않음
+            if not result['missingRoles']:
+                with self._lock:
+                    self._cache[key] = result
+                    while len(self._cache) > PREVIEW_CACHE_SIZE:
+                        self._cache.popitem(last=False)
+            log_event(logger, 'prompt.preview', engine=engine_type, snapshot=sid[:12],
+                      files=len(result['files']), overBudget=len(result['overBudget']),
+                      missingRoles=result['missingRoles'])
+
+        if include_text:
+            rendered = item.get('rendered') or {}
+            blobs = self.snapshots.file_store.get_blobs(_blob_ref(rendered[role]) for role in result['roles'])
+            result = {**result, 'roles': {
+                role: {**entry, 'text': blobs.get(rendered[role]['hash'], '')}
+                for role, entry in result['roles'].items()
+            }}
+        return result
+
+    def _analyze(self, engine_type: str, sid: str, item: Dict[str, Any]) -> Dict[str, Any]:
+        compact = bool(item.get('compactPrompt'))
+        retrieval = bool(item.get('knowledgeIndex'))
+        refs = item.get('files', [])
+        blobs = self.snapshots.file_store.get_blobs(_blob_ref(f) for f in refs)
+        # 템플릿에 들어가는 형태 그대로 (압축 렌더링은 공백 정리 후)
+        texts = [blobs.get(f['hash'], '') for f in refs]
+        if compact:
+            texts = [normalize_whitespace(text) for text in texts]
+
+        files = []
+        for ref, text, tokens in zip(refs, texts, estimate_tokens_batch(texts)):
+            files.append({
+                'fileId': ref.get('fileId', ''),
+                'fileName': ref.get('fileName', ''),
+                'chars': len(text),
+                'tokens': tokens,
+                # system: 캐시되는 시스템 블록에 포함, index: 검색 모드에서 질문별 발췌로만
+                'placement': 'system' if not retrieval or ref.get('alwaysInclude') else 'index',
+                'overBudget': tokens > self.file_budget
+            })
+
+        rendered = item.get('rendered') or {}
+        roles = {role: self._role(rendered[role], retrieval) for role in RENDER_ROLES if role in rendered}
+        return {
+            'engineType': engine_type,
+            'snapshotId': sid,
+            'compactPrompt': compact,
+            'retrieval': retrieval,
+            'fileTokenBudget': self.file_budget,
+            'files': files,
+            'overBudget': [f['fileId'] for f in files if f['overBudget']],
+            'roles': roles,
+            # 렌더링 본문이 없는 역할 (저장소 오류) - 메시지 경로가 파일로 렌더링하므로 분석에서 제외
+            'missingRoles': [role for role in RENDER_ROLES if role not in rendered]
+        }
+
+    def _role(self, block: Dict[str, Any], retrieval: bool) -> Dict[str, Any]:
+        """역할 하나의 시스템 블록 (_build_cached_system_blocks와 같은 구성)"""
+        cached = int(block['tokens'])
+        blocks = [{'index': 0, 'kind': 'system', 'tokens': cached, 'counted': bool(block.get('counted')),
+                   'chars': int(block.get('chars', 0)), 'cacheControl': True}]
+        if retrieval:
+            # 질문마다 바뀌는 발췌 블록 - 토큰 예산이 상한
+            blocks.append({'index': 1, 'kind': 'knowledge', 'tokens': KB_TOKEN_BUDGET, 'variable': True,
+                           'cacheControl': False})
+        dynamic = KB_TOKEN_BUDGET if retrieval else 0
+        cacheable = cached >= PROMPT_CACHE_MIN_TOKENS
+        return {
+            'blocks': blocks,
+            'totalTokens': cached + dynamic,
+            'cachedTokens': cached if cacheable else 0,
+            'cacheBreakpoints': [{'block': 0, 'prefixTokens': cached, 'active': cacheable}],
+            'costPer1kMessages': self._cost(cached, dynamic, cacheable)
+        }
+
+    def _cost(self, cached: int, dynamic: int, cacheable: bool) -> Dict[str, Any]:
+        """1,000 메시지 시스템 블록 입력 비용 (USD) - 캐시 미적중은 캐시 쓰기, 적중은 캐시 읽기"""
+        no_cache = calculate(TokenUsage(input=MESSAGES * (cached + dynamic)), self.model_id)
+        if cacheable:
+            hits = round(MESSAGES * self.hit_rate)
+            expected = calculate(TokenUsage(input=MESSAGES * dynamic, cache_read=hits * cached,
+                                            cache_write=(MESSAGES - hits) * cached), self.model_id)
+        else:
+            expected = no_cache
+        return {
+            'priceVersion': no_cache.version,
+            'hitRate': self.hit_rate if cacheable else 0.0,
+            'noCache': str(no_cache.total.quantize(COST_PRECISION)),
+            'expected': str(expected.total.quantize(COST_PRECISION))
+        }
+
+
+_prompt_preview: Optional[PromptPreview] = None
+
+
+def get_prompt_preview() -> PromptPreview:
+    """컨테이너 공유 미리보기 분석기 (LRU 캐시 유지)"""
+    global _prompt_preview
+    if _prompt_preview is None:
+        _prompt_preview = PromptPreview()
+    return _prompt_preview
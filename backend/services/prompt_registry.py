@@ -0,0 +1,181 @@
+"""
+Prompt Registry
+엔진별 현재 프롬프트 목록을 prompts 테이블의 항목 1개에 유지 - GET /prompts는 get_item 1회
+
+레지스트리 항목 (engineType = promptId = _registry)
+- engine#<엔진>: 프롬프트 요약 (지침 본문/파일 제외 - 항목 400KB 제한, 본문은 GET /prompts/{id})
+- version#<엔진>: 엔진 프롬프트 버전 (쓰기마다 +1)
+- version: 레지스트리 전체 버전 (쓰기마다 +1)
+
+- 엔진 기본 프롬프트(promptId == engineType)를 쓰는 모든 경로(handlers/api/prompt.py, PromptRepository.save)가 record() 호출
+- 컨테이너 캐시: PROMPT_REGISTRY_TTL_S 동안 그대로 사용, 이후에는 version만 읽어 바뀌었을 때만 다시 읽음
+- 레지스트리 항목이 없으면(이관 전) prompts 테이블을 페이지 끝까지 scan해 목록을 만들고 레지스트리를 채움
+"""
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.aws_clients import get_table
+from utils.logger import log_event, setup_logger
+
+logger = setup_logger(__name__)
+
+PROMPT_REGISTRY_TTL_S = float(os.environ.get('PROMPT_REGISTRY_TTL_S', '30'))
+
+REGISTRY_ID = '_registry'
+REGISTRY_KEY = {'engineType': REGISTRY_ID, 'promptId': REGISTRY_ID}
+ENGINE_PREFIX = 'engine#'
+VERSION_PREFIX = 'version#'
+# services/prompt_snapshots.py의 불변 스냅샷 항목 (목록 대상 아님)
+SNAPSHOT_PREFIX = 'snapshot#'
+# 레지스트리에 넣지 않는 큰 속성
+DETAIL_ATTRIBUTES = ('engineType', 'instruction', 'files')
+
+
+def summarize(item: Dict[str, Any]) -> Dict[str, Any]:
+    """프롬프트 항목 → 레지스트리 요약"""
+    summary = {name: value for name, value in item.items() if name not in DETAIL_ATTRIBUTES}
+    summary['instructionChars'] = len(item.get('instruction', '') or '')
+    return summary
+
+
+def parse_registry(item: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """레지스트리 항목 → 엔진별 프롬프트 목록 (엔진 순)"""
+    prompts = []
+    for name, entry in item.items():
+        if not name.startswith(ENGINE_PREFIX):
+            continue
+        engine_type = name[len(ENGINE_PREFIX):]
+        prompts.append({
+            **entry,
+            'engineType': engine_type,
+            'promptId': entry.get('promptId', engine_type),
+            'version': int(item.get(f"{VERSION_PREFIX}{engine_type}", 0))
+        })
+    return sorted(prompts, key=lambda prompt: prompt['engineType'])
+
+
+def scan_prompts(table) -> List[Dict[str, Any]]:
+    """prompts 테이블 전체 scan (페이지네이션, 레지스트리 항목 제외, 엔진별 1개)"""
+    prompts: Dict[str, Dict[str, Any]] = {}
+    kwargs: Dict[str, Any] = {}
+    while True:
+        response = table.scan(**kwargs)
+        for item in response.get('Items', []):
+            engine_type = item.get('engineType', item.get('promptId'))
+            if engine_type == REGISTRY_ID or str(item.get('promptId', '')).startswith(SNAPSHOT_PREFIX):
+                continue
+            current = prompts.get(engine_type)
+            # 엔진 기본 프롬프트(promptId == engineType) 우선, 같으면 최근 수정본
+            rank = (item.get('promptId') == engine_type, str(item.get('updatedAt', '')))
+            if current is None or rank >= (current.get('promptId') == engine_type,
+                                           str(current.get('updatedAt', ''))):
+                prompts[engine_type] = item
+        if 'LastEvaluatedKey' not in response:
+            return list(prompts.values())
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+class PromptRegistry:
+    """엔진 → 현재 프롬프트 레지스트리 (컨테이너 캐시 + 버전 확인)"""
+
+    def __init__(self, table_factory: Callable = None, ttl_s: float = PROMPT_REGISTRY_TTL_S,
+                 clock: Callable[[], float] = time.monotonic):
+        self._table_factory = table_factory or (lambda: get_table('prompts'))
+        self.ttl_s = ttl_s
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._cached: Optional[List[Dict[str, Any]]] = None
+        self._version: Optional[int] = None
+        self._checked_at = 0.0
+
+    @property
+    def table(self):
+        return self._table_factory()
+
+    def record(self, item: Dict[str, Any]) -> None:
+        """프롬프트 1개 쓰기를 레지스트리에 반영 (엔진/전체 버전 +1)"""
+        engine_type = item['engineType']
+        entry = summarize(item)
+        try:
+            self.table.update_item(
+                Key=REGISTRY_KEY,
+                UpdateExpression='SET #entry = :entry ADD #engine_version :one, #version :one',
+                ExpressionAttributeNames={
+                    '#entry': f"{ENGINE_PREFIX}{engine_type}",
+                    '#engine_version': f"{VERSION_PREFIX}{engine_type}",
+                    '#version': 'version'
+                },
+                ExpressionAttributeValues={':entry': entry, ':one': 1}
+            )
+        except Exception as e:
+            # 레지스트리가 어긋나면 rebuild로 복구 - 프롬프트 쓰기 자체는 실패시키지 않음
+            logger.error(f"Error updating prompt registry for {engine_type}: {str(e)}")
+        self.invalidate()
+
+    def list(self) -> List[Dict[str, Any]]:
+        """엔진별 현재 프롬프트 목록"""
+        with self._lock:
+            if self._cached is not None and self._clock() - self._checked_at < self.ttl_s:
+                return self._cached
+
+        if self._cached is not None and self._current_version() == self._version:
+            with self._lock:
+                self._checked_at = self._clock()
+            log_event(logger, 'prompt.registry', result='unchanged', version=self._version)
+            return self._cached
+
+        item = self.table.get_item(Key=REGISTRY_KEY).get('Item')
+        if item is None:
+            prompts = self.rebuild()
+            version = None
+        else:
+            prompts = parse_registry(item)
+            version = int(item.get('version', 0))
+
+        with self._lock:
+            self._cached, self._version, self._checked_at = prompts, version, self._clock()
+        log_event(logger, 'prompt.registry', result='loaded' if item else 'rebuilt',
+                  version=version, engines=len(prompts))
+        return prompts
+
+    def get(self, engine_type: str) -> Optional[Dict[str, Any]]:
+        """엔진 1개의 요약 (snapshotId 포인터 포함)"""
+        return next((prompt for prompt in self.list() if prompt['engineType'] == engine_type), None)
+
+    def rebuild(self) -> List[Dict[str, Any]]:
+        """prompts 테이블 scan으로 레지스트리 다시 만들기 (이관/복구용)"""
+        prompts = scan_prompts(self.table)
+        for prompt in prompts:
+            self.record(prompt)
+        return parse_registry({
+            **{f"{ENGINE_PREFIX}{prompt['engineType']}": summarize(prompt) for prompt in prompts},
+            **{f"{VERSION_PREFIX}{prompt['engineType']}": 1 for prompt in prompts}
+        })
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._cached, self._version = None, None
+
+    def _current_version(self) -> Optional[int]:
+        try:
+            # version은 예약어
+            response = self.table.get_item(Key=REGISTRY_KEY, ProjectionExpression='#version',
+                                           ExpressionAttributeNames={'#version': 'version'})
+        except Exception as e:
+            logger.error(f"Error checking prompt registry version: {str(e)}")
+            return None
+        item = response.get('Item')
+        return int(item['version']) if item and 'version' in item else None
+
+
+_registry: Optional[PromptRegistry] = None
+
+
+def get_prompt_registry() -> PromptRegistry:
+    """컨테이너 공용 레지스트리"""
+    global _registry
+    if _registry is None:
+        _registry = PromptRegistry()
+    return _registry
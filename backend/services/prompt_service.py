@@ -8,7 +8,7 @@ import logging
 from dataclasses import dataclass, field
 from datetime import datetime
 import uuid
-import boto3
+from utils.aws_clients import get_table
 
 @dataclass
 class PromptConfig:
@@ -40,9 +40,7 @@ class PromptRepository:
     """프롬프트 저장소"""
     
     def __init__(self):
-        from config.database import get_table_name
-        self.dynamodb = boto3.resource('dynamodb')
-        self.table = self.dynamodb.Table(get_table_name('prompts'))
+        self.table = get_table('prompts')
     
     def save(self, prompt: Prompt) -> Prompt:
         """프롬프트 저장"""
@@ -69,6 +67,12 @@ class PromptRepository:
             'updatedAt': prompt.updated_at
         }
         self.table.put_item(Item=item)
+
+        # 엔진 목록(GET /prompts) 레지스트리 갱신 - 엔진 기본 프롬프트만
+        # (uuid 프롬프트가 엔진 항목과 snapshotId 포인터를 덮어쓰지 않도록)
+        if item['promptId'] == item['engineType']:
+            from services.prompt_registry import get_prompt_registry
+            get_prompt_registry().record(item)
         
         # 캐시 무효화 - 프롬프트가 업데이트되면 캐시 삭제
         self._invalidate_prompt_cache(prompt.engine_type)
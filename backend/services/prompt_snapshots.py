@@ -0,0 +1,346 @@
+"""
+Prompt Snapshots
+프롬프트 저장마다 불변 스냅샷 생성 + 엔진 포인터(snapshotId) 갱신
+
+- 파일 해시: 본문 sha256, 본문은 services/file_store.py 청크 저장소에 1번만 저장 (스냅샷에는 {hash, chunks})
+- 스냅샷 ID: sha256(description, instruction, 순서대로의 (파일 이름, 파일 해시))
+  내용이 같으면 ID도 같으므로 같은 스냅샷을 다시 쓰지 않음
+- 스냅샷 항목: prompts 테이블 engineType=<엔진>, promptId=snapshot#<ID>
+- 포인터: 엔진 기본 항목(engineType = promptId = <엔진>)의 snapshotId, 레지스트리 요약에도 포함
+  메시지 경로 캐시/Bedrock 캐시 블록/응답 캐시는 snapshotId를 키로 사용 → 무효화는 포인터 비교
+- 롤백: 포인터를 이전 스냅샷으로 옮기고 편집용 기본 항목/파일을 스냅샷 내용으로 복원
+  파일의 정규화 보고서/원본 참조도 스냅샷 files에 함께 저장해 복원 (되돌리기 유지)
+- 사전 렌더링: 저장 시 역할별 시스템 프롬프트 템플릿(lib/bedrock_client_enhanced.py)을 한 번 만들어
+  본문은 blob으로, {hash, tokens, counted, chars}는 스냅샷의 rendered에 저장 - 메시지 경로는 블록만 읽고 세션 변수만 치환
+  토큰 수는 Bedrock CountTokens 결과 (호출 실패 시 추정값, counted=False)
+  템플릿 코드가 바뀌면 RENDER_VERSION을 올려 이전 렌더링을 쓰지 않게 한다
+- 검색 모드(services/knowledge_index.py): 큰 지식베이스는 alwaysInclude 파일만 템플릿에 넣고 나머지는 BM25 색인으로
+  저장(knowledgeIndex) - 메시지 경로가 질문마다 관련 구간만 골라 캐시 블록 뒤에 붙인다
+"""
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+from lib.bedrock_client_enhanced import (
+    RENDER_ROLES, RENDER_VERSION, count_system_tokens, render_system_templates
+)
+from lib.prompt_compaction import is_compact
+from services.file_store import FileStore
+from services.knowledge_index import KnowledgeIndex, use_retrieval
+from services.prompt_registry import get_prompt_registry
+from utils.aws_clients import get_table
+from utils.logger import log_event, setup_logger
+from utils.token_estimator import estimate_tokens
+
+logger = setup_logger(__name__)
+
+SNAPSHOT_PREFIX = 'snapshot#'
+# 스냅샷 본문 필드 (해시 대상)
+PROMPT_FIELDS = ('description', 'instruction')
+
+
+class Snapshot(NamedTuple):
+    """저장된 스냅샷 ID + 역할별 렌더링 정보 ({hash, tokens, chars})"""
+    snapshot_id: str
+    rendered: Dict[str, Dict[str, Any]]
+
+
+def snapshot_id(description: str, instruction: str, files: List[Dict[str, str]], compact: bool = False) -> str:
+    """설명/지침 + 순서대로의 (파일 이름, 파일 해시) (+ 압축 렌더링 여부) 해시"""
+    payload = json.dumps({
+        'description': description or '',
+        'instruction': instruction or '',
+        # 압축 렌더링은 켰을 때만 포함 (기존 ID 유지)
+        **({'compact': True} if compact else {}),
+        # alwaysInclude는 검색 모드의 렌더링을 바꾸므로 포함 (기존 ID가 바뀌지 않도록 True일 때만)
+        'files': [[f.get('fileName', ''), f['hash']] + ([True] if f.get('alwaysInclude') else []) for f in files]
+    }, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _blob_ref(ref: Dict[str, Any]) -> Dict[str, Any]:
+    return {'hash': ref['hash'], 'chunks': ref.get('chunks') or [ref['hash']]}
+
+
+def render_version(retrieval: bool) -> str:
+    """스냅샷 렌더링 버전 (검색 모드 렌더링은 파일 구성이 달라 따로 구분)"""
+    return f"{RENDER_VERSION}+kb" if retrieval else RENDER_VERSION
+
+
+def has_current_render(item: Dict[str, Any]) -> bool:
+    """스냅샷 항목에 현재 템플릿 버전으로 렌더링된 역할별 블록이 모두 있는지"""
+    rendered = item.get('rendered') or {}
+    return (item.get('renderVersion') == render_version(bool(item.get('knowledgeIndex')))
+            and set(rendered) >= set(RENDER_ROLES))
+
+
+class PromptSnapshots:
+    """엔진 프롬프트 스냅샷 생성/조회/롤백"""
+
+    def __init__(self, prompts_table_factory: Callable = None, files_table_factory: Callable = None,
+                 registry=None, file_store: Optional[FileStore] = None):
+        self._prompts_factory = prompts_table_factory or (lambda: get_table('prompts'))
+        self._files_factory = files_table_factory or (lambda: get_table('files'))
+        self._registry = registry
+        self.file_store = file_store or FileStore(self._files_factory)
+
+    @property
+    def prompts_table(self):
+        return self._prompts_factory()
+
+    @property
+    def files_table(self):
+        return self._files_factory()
+
+    @property
+    def registry(self):
+        if self._registry is None:
+            self._registry = get_prompt_registry()
+        return self._registry
+
+    def capture(self, engine_type: str, prompt: Optional[Dict[str, Any]] = None) -> Optional[Snapshot]:
+        """
+        현재 기본 항목 + 파일로 스냅샷을 만들고 역할별 시스템 프롬프트를 렌더링한 뒤 포인터 이동
+
+        Returns:
+            Snapshot (기본 항목이 없으면 None)
+        """
+        base_key = {'engineType': engine_type, 'promptId': engine_type}
+        if prompt is None:
+            prompt = self.prompts_table.get_item(Key=base_key).get('Item')
+            if prompt is None:
+                return None
+
+        # 추가 순서(createdAt, fileId)대로 - 렌더링 순서와 해시 순서를 맞춤
+        file_items = self.file_store.list_files(engine_type, attributes=('original',))
+        files = []
+        for item in file_items:
+            if item.get('chunks'):
+                # 이미 청크로 저장된 큰 파일
+                ref = {'hash': item['contentHash'], 'chunks': item['chunks']}
+            else:
+                ref = self.file_store.put_blob(item.get('fileContent', ''))
+            files.append({'fileId': item['fileId'], 'fileName': item.get('fileName', ''), 'hash': ref['hash'],
+                          'chunks': ref['chunks'], 'createdAt': item.get('createdAt', ''),
+                          **({'alwaysInclude': True} if item.get('alwaysInclude') else {}),
+                          # 정규화 보고서/원본 참조 - 롤백 시 복원 (ID 해시에는 포함하지 않음)
+                          **{key: item[key] for key in ('normalization', 'original') if key in item}})
+
+        compact = is_compact(prompt)
+        sid = snapshot_id(prompt.get('description', ''), prompt.get('instruction', ''), files, compact)
+        retrieval = use_retrieval(file_items)
+        index_ref = None
+        if retrieval:
+            # 템플릿에는 alwaysInclude 파일만, 나머지는 색인
+            index_ref = self._build_index(engine_type, [f for f in file_items if not f.get('alwaysInclude')])
+            retrieval = index_ref is not None
+        rendered = self._render(engine_type, prompt,
+                                [f for f in file_items if f.get('alwaysInclude')] if retrieval else file_items,
+                                compact)
+        now = datetime.utcnow().isoformat() + 'Z'
+        try:
+            self.prompts_table.put_item(
+                Item={
+                    'engineType': engine_type,
+                    'promptId': f"{SNAPSHOT_PREFIX}{sid}",
+                    **{field: prompt.get(field, '') for field in PROMPT_FIELDS},
+                    'files': files,
+                    'compactPrompt': compact,
+                    'rendered': rendered,
+                    'renderVersion': render_version(retrieval),
+                    **({'knowledgeIndex': index_ref} if index_ref else {}),
+                    'createdAt': now
+                },
+                ConditionExpression='attribute_not_exists(promptId)'
+            )
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                raise
+            # 같은 내용의 기존 스냅샷 - 템플릿 버전/검색 모드가 바뀐 경우에만 렌더링 갱신
+            self._update_rendered(engine_type, sid, rendered, index_ref)
+
+        tokens = {role: block['tokens'] for role, block in rendered.items()}
+        if prompt.get('snapshotId') != sid or prompt.get('renderedTokens') != tokens:
+            self.prompts_table.update_item(
+                Key=base_key,
+                UpdateExpression='SET snapshotId = :sid, snapshotAt = :now, renderedTokens = :tokens',
+                ExpressionAttributeValues={':sid': sid, ':now': now, ':tokens': tokens}
+            )
+        self.registry.record({**prompt, 'snapshotId': sid, 'snapshotAt': now, 'renderedTokens': tokens})
+        log_event(logger, 'prompt.snapshot', engine=engine_type, snapshot=sid[:12], files=len(files),
+                  tokens=tokens, retrieval=retrieval)
+        return Snapshot(sid, rendered)
+
+    def get_item(self, engine_type: str, sid: str) -> Optional[Dict[str, Any]]:
+        """스냅샷 항목 원본 (files는 {fileName, hash, chunks} 참조, rendered는 역할별 블록 정보)"""
+        return self.prompts_table.get_item(
+            Key={'engineType': engine_type, 'promptId': f"{SNAPSHOT_PREFIX}{sid}"}
+        ).get('Item')
+
+    def load(self, engine_type: str, sid: str) -> Optional[Dict[str, Any]]:
+        """
+        스냅샷 → 메시지 경로 prompt_data (description, instruction, files, rendered, snapshotId, knowledgeIndex)
+
+        현재 템플릿 버전으로 렌더링된 블록이 있으면 파일 본문은 읽지 않고 블록만 읽는다.
+        검색 모드 스냅샷은 alwaysInclude 파일만 files로 돌려주고 나머지는 knowledgeIndex로 검색한다.
+        """
+        item = self.get_item(engine_type, sid)
+        if item is None:
+            return None
+        prompt_data = {
+            **{field: item.get(field, '') for field in PROMPT_FIELDS},
+            'files': [],
+            'fileCount': len(item.get('files', [])),
+            'compactPrompt': bool(item.get('compactPrompt')),
+            'snapshotId': sid
+        }
+        index_ref = item.get('knowledgeIndex')
+        if index_ref:
+            prompt_data['knowledgeIndex'] = index_ref
+
+        rendered = item.get('rendered') or {}
+        if has_current_render(item):
+            blobs = self.file_store.get_blobs(_blob_ref(block) for block in rendered.values())
+            if all(block['hash'] in blobs for block in rendered.values()):
+                prompt_data['rendered'] = {role: blobs[block['hash']] for role, block in rendered.items()}
+                return prompt_data
+
+        prefix_files = [f for f in item.get('files', []) if f.get('alwaysInclude') or not index_ref]
+        blobs = self.file_store.get_blobs(_blob_ref(f) for f in prefix_files)
+        prompt_data['files'] = [
+            {'fileName': f.get('fileName', ''), 'fileContent': blobs.get(f['hash'], ''), 'fileType': 'text'}
+            for f in prefix_files
+        ]
+        return prompt_data
+
+    def _render(self, engine_type: str, prompt: Dict[str, Any], file_items: List[Dict[str, Any]],
+                compact: bool = False) -> Dict[str, Dict[str, Any]]:
+        """역할별 시스템 프롬프트 템플릿 렌더링 + 본문 저장 → {역할: {hash, chunks, tokens, chars}}"""
+        templates = render_system_templates(
+            prompt.get('description', ''), prompt.get('instruction', ''), file_items, engine_type, compact
+        )
+        rendered = {}
+        for role, text in templates.items():
+            try:
+                ref = self.file_store.put_blob(text)
+            except Exception as e:
+                # 저장소 오류 - 이 역할은 메시지 경로에서 렌더링
+                logger.error(f"Error storing rendered prompt for {engine_type}/{role}: {str(e)}")
+                continue
+            counted = count_system_tokens(text)
+            rendered[role] = {
+                'hash': ref['hash'],
+                'chunks': ref['chunks'],
+                'tokens': counted if counted is not None else estimate_tokens(text),
+                'counted': counted is not None,  # False면 추정값
+                'chars': len(text)
+            }
+        return rendered
+
+    def _build_index(self, engine_type: str, file_items: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """지식 파일 BM25 색인 저장 → {hash, chunks, passages, chars} (실패 시 None - 전체 파일 포함으로 렌더링)"""
+        try:
+            index = KnowledgeIndex.build(file_items)
+            ref = self.file_store.put_blob(index.to_json())
+        except Exception as e:
+            logger.error(f"Error building knowledge index for {engine_type}: {str(e)}")
+            return None
+        summary = index.summary()
+        log_event(logger, 'kb.indexed', engine=engine_type, **summary)
+        return {'hash': ref['hash'], 'chunks': ref['chunks'],
+                'passages': summary['passages'], 'chars': summary['chars']}
+
+    def _update_rendered(self, engine_type: str, sid: str, rendered: Dict[str, Dict[str, Any]],
+                         index_ref: Optional[Dict[str, Any]] = None) -> None:
+        version = render_version(index_ref is not None)
+        values = {':rendered': rendered, ':version': version}
+        if index_ref:
+            values[':index'] = index_ref
+        try:
+            self.prompts_table.update_item(
+                Key={'engineType': engine_type, 'promptId': f"{SNAPSHOT_PREFIX}{sid}"},
+                UpdateExpression='SET rendered = :rendered, renderVersion = :version'
+                                 + (', knowledgeIndex = :index' if index_ref else ' REMOVE knowledgeIndex'),
+                ConditionExpression='attribute_not_exists(renderVersion) OR renderVersion <> :version',
+                ExpressionAttributeValues=values
+            )
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                raise
+
+    def history(self, engine_type: str) -> List[Dict[str, Any]]:
+        """엔진의 스냅샷 목록 (최근 순, 본문 제외)"""
+        kwargs = {
+            'KeyConditionExpression': Key('engineType').eq(engine_type) & Key('promptId').begins_with(SNAPSHOT_PREFIX),
+            'ProjectionExpression': 'promptId, createdAt'
+        }
+        snapshots = []
+        while True:
+            response = self.prompts_table.query(**kwargs)
+            snapshots.extend(
+                {'snapshotId': item['promptId'][len(SNAPSHOT_PREFIX):], 'createdAt': item.get('createdAt', '')}
+                for item in response.get('Items', [])
+            )
+            if 'LastEvaluatedKey' not in response:
+                break
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        return sorted(snapshots, key=lambda snapshot: snapshot['createdAt'], reverse=True)
+
+    def rollback(self, engine_type: str, sid: str) -> bool:
+        """포인터를 이전 스냅샷으로 이동하고 기본 항목/파일을 스냅샷 내용으로 복원"""
+        item = self.prompts_table.get_item(
+            Key={'engineType': engine_type, 'promptId': f"{SNAPSHOT_PREFIX}{sid}"}
+        ).get('Item')
+        if item is None:
+            return False
+
+        now = datetime.utcnow().isoformat() + 'Z'
+        response = self.prompts_table.update_item(
+            Key={'engineType': engine_type, 'promptId': engine_type},
+            UpdateExpression='SET description = :description, instruction = :instruction, compactPrompt = :compact, '
+                             'snapshotId = :sid, snapshotAt = :now, updatedAt = :now, renderedTokens = :tokens',
+            ExpressionAttributeValues={
+                ':description': item.get('description', ''),
+                ':instruction': item.get('instruction', ''),
+                ':compact': bool(item.get('compactPrompt')),
+                ':sid': sid,
+                ':now': now,
+                ':tokens': {role: block['tokens'] for role, block in (item.get('rendered') or {}).items()}
+            },
+            ReturnValues='ALL_NEW'
+        )
+
+        snapshot_files = item.get('files', [])
+        blobs = self.file_store.get_blobs(_blob_ref(f) for f in snapshot_files)
+        keep = {f['fileId'] for f in snapshot_files}
+        with self.files_table.batch_writer() as batch:
+            for current in self.file_store.list_files(engine_type, with_content=False):
+                if current['fileId'] not in keep:
+                    batch.delete_item(Key={'promptId': engine_type, 'fileId': current['fileId']})
+            for f in snapshot_files:
+                # 큰 파일은 청크가 이미 있으므로 참조만 다시 씀
+                batch.put_item(Item={
+                    **self.file_store.file_item(engine_type, f['fileId'], f.get('fileName', ''),
+                                                blobs.get(f['hash'], ''), f.get('createdAt') or now,
+                                                bool(f.get('alwaysInclude')), restored=f),
+                    'updatedAt': now
+                })
+
+        self.registry.record(response['Attributes'])
+        log_event(logger, 'prompt.rollback', engine=engine_type, snapshot=sid[:12])
+        return True
+
+
+_snapshots: Optional[PromptSnapshots] = None
+
+
+def get_prompt_snapshots() -> PromptSnapshots:
+    """컨테이너 공용 스냅샷 저장소"""
+    global _snapshots
+    if _snapshots is None:
+        _snapshots = PromptSnapshots()
+    return _snapshots
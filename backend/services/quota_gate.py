@@ -0,0 +1,162 @@
+"""
+Quota Gate
+Bedrock 호출 전 월간 토큰 한도 확인 (컨테이너 캐시 잔여량 버킷)
+
+- 사용자별 잔여 토큰 = 월 한도 - 월 롤업 totalTokens (get_item 1회)
+- 버킷은 QUOTA_REFRESH_TTL_S 동안 재사용하고, 그 사이에는 메모리에서만 차감
+- acquire: 입력 추정 토큰만큼 선차감 (잔여량이 모자라면 거부)
+- reconcile: 스트리밍 종료 후 실제 사용량(입력+출력)으로 보정 (실패해도 호출 - 메시지 경로의 finally)
+  선차감은 버킷 세대(generation)와 함께 돌려주고, 그 사이 버킷이 새로 만들어졌으면 선차감분은 돌려주지 않고
+  실제 사용량만 차감 (새 버킷은 선차감하지 않았으므로)
+- 롤업 조회 실패 시에는 허용 (check_usage_limit과 동일하게 fail-open)
+
+다른 컨테이너의 사용량은 TTL마다 롤업으로만 반영되므로 초과 허용 폭은 TTL 동안의 사용량으로 제한된다.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, NamedTuple, Optional
+
+from services.usage_rollups import month_key
+from services.usage_service import DEFAULT_USAGE_LIMITS, UsageRepository
+from utils.logger import log_event, setup_logger
+from utils.token_estimator import estimate_tokens
+
+logger = setup_logger(__name__)
+
+QUOTA_GATE_ENABLED = os.environ.get('QUOTA_GATE_ENABLED', 'true').lower() == 'true'
+QUOTA_MONTHLY_TOKENS = int(os.environ.get(
+    'QUOTA_MONTHLY_TOKENS', str(DEFAULT_USAGE_LIMITS['monthly']['tokens'])
+))
+QUOTA_REFRESH_TTL_S = float(os.environ.get('QUOTA_REFRESH_TTL_S', '60'))
+QUOTA_MAX_USERS = int(os.environ.get('QUOTA_MAX_USERS', '4096'))
+
+
+class QuotaDecision(NamedTuple):
+    """게이트 판정 결과 (reserved, generation은 reconcile에 그대로 넘김)"""
+    allowed: bool
+    remaining: int
+    reserved: int
+    reason: Optional[str] = None
+    generation: int = 0
+
+
+class _Bucket:
+    __slots__ = ('month', 'remaining', 'refreshed_at', 'generation')
+
+    def __init__(self, month: str, remaining: int, refreshed_at: float, generation: int = 0):
+        self.month = month
+        self.remaining = remaining
+        self.refreshed_at = refreshed_at
+        self.generation = generation
+
+
+class QuotaGate:
+    """사용자별 잔여 토큰 버킷"""
+
+    def __init__(
+        self,
+        repository_factory: Callable = None,
+        monthly_tokens: int = QUOTA_MONTHLY_TOKENS,
+        ttl_s: float = QUOTA_REFRESH_TTL_S,
+        max_users: int = QUOTA_MAX_USERS,
+        enabled: bool = QUOTA_GATE_ENABLED,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self._repository_factory = repository_factory or UsageRepository
+        self._repository = None
+        self.monthly_tokens = monthly_tokens
+        self.ttl_s = ttl_s
+        self.max_users = max_users
+        self.enabled = enabled
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, _Bucket] = {}
+        self._generation = 0
+        self._month = datetime.now().strftime('%Y-%m')
+        self._month_checked = clock()
+
+    def acquire(self, user_id: str, text: str = '', estimated_tokens: Optional[int] = None) -> QuotaDecision:
+        """입력 추정 토큰 선차감 - 캐시가 유효하면 DynamoDB 호출 없음"""
+        if not self.enabled:
+            return QuotaDecision(True, -1, 0)
+        if estimated_tokens is None:
+            estimated_tokens = estimate_tokens(text)
+
+        now = self._clock()
+        month = self._current_month(now)
+        bucket = self._buckets.get(user_id)
+        if bucket is None or bucket.month != month or now - bucket.refreshed_at >= self.ttl_s:
+            bucket = self._refresh(user_id, month, now)
+            if bucket is None:
+                return QuotaDecision(True, -1, 0, 'unavailable')
+
+        with self._lock:
+            if bucket.remaining <= 0 or bucket.remaining < estimated_tokens:
+                log_event(logger, 'quota.denied', user=user_id,
+                          remaining=bucket.remaining, estimated=estimated_tokens)
+                return QuotaDecision(False, bucket.remaining, 0, 'monthly_tokens')
+            bucket.remaining -= estimated_tokens
+            return QuotaDecision(True, bucket.remaining, estimated_tokens, generation=bucket.generation)
+
+    def reconcile(self, user_id: str, reserved: int, actual_tokens: int, generation: Optional[int] = None) -> None:
+        """
+        선차감분을 실제 사용량으로 보정
+
+        Args:
+            generation: acquire 시 버킷 세대 - 다르면 새 버킷이므로 선차감분은 돌려주지 않고 실제 사용량만 차감
+        """
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            return
+        with self._lock:
+            if generation is not None and generation != bucket.generation:
+                bucket.remaining -= actual_tokens
+            else:
+                bucket.remaining += reserved - actual_tokens
+
+    def invalidate(self, user_id: Optional[str] = None) -> None:
+        """버킷 폐기 (다음 acquire에서 롤업 재조회)"""
+        with self._lock:
+            if user_id is None:
+                self._buckets.clear()
+            else:
+                self._buckets.pop(user_id, None)
+
+    def _current_month(self, now: float) -> str:
+        """월 경계 확인은 1초에 한 번만 (datetime 생성 비용 회피)"""
+        if now - self._month_checked >= 1.0:
+            self._month = datetime.now().strftime('%Y-%m')
+            self._month_checked = now
+        return self._month
+
+    def _refresh(self, user_id: str, month: str, now: float) -> Optional[_Bucket]:
+        """월 롤업으로 잔여량 재계산"""
+        try:
+            if self._repository is None:
+                self._repository = self._repository_factory()
+            rollup = self._repository.get_rollup(user_id, month_key(month))
+        except Exception as e:
+            logger.error(f"Error refreshing quota for {user_id}: {str(e)}")
+            return None
+
+        with self._lock:
+            self._generation += 1
+            bucket = _Bucket(month, self.monthly_tokens - rollup['totals']['totalTokens'], now, self._generation)
+            if user_id not in self._buckets and len(self._buckets) >= self.max_users:
+                # 가장 먼저 들어온 사용자부터 제거 (dict 삽입 순서)
+                self._buckets.pop(next(iter(self._buckets)))
+            self._buckets[user_id] = bucket
+        return bucket
+
+
+_gate: Optional[QuotaGate] = None
+
+
+def get_quota_gate() -> QuotaGate:
+    """컨테이너 공용 쿼터 게이트"""
+    global _gate
+    if _gate is None:
+        _gate = QuotaGate()
+    return _gate
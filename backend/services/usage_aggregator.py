@@ -0,0 +1,207 @@
+"""
+Usage Aggregator
+컨테이너 내 사용량 집계 후 키별 ADD 1회로 일괄 반영
+
+- (userId, 날짜, 엔진) 단위로 토큰/메시지 수를 누적
+- 키 수(USAGE_FLUSH_MAX_KEYS) 또는 경과 시간(USAGE_FLUSH_INTERVAL_S) 초과 시, 그리고 호출 종료 시 flush
+- at-least-once: 실패한 배치는 같은 flush 토큰으로 다음 flush에서 재시도
+- 멱등성: 원본 키마다 별도 항목(정렬 키 flush#<컨테이너 ID>#<날짜>#<엔진>)에 마지막 반영 순번을 기록하고,
+  그보다 큰 순번만 반영 (응답 유실 후 재시도해도 이중 집계되지 않음)
+  순번은 같은 컨테이너의 재시도에만 필요하므로 USAGE_FLUSH_MARKER_TTL_DAYS 뒤 TTL로 삭제
+  (원본 항목에 컨테이너/컴팩션 시간마다 속성이 쌓이지 않도록)
+- 원본 항목과 일/월/누적 롤업(services/usage_rollups.py)은 한 트랜잭션으로 함께 증가
+- 캐시 읽기/쓰기 토큰과 비용(services/pricing.py)도 같은 카운터로 누적, 원본에는 단가 버전 기록
+"""
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from services.pricing import CostBreakdown
+from services.usage_rollups import COUNTERS, SORT_KEY, flush_key, rollup_keys, rollup_update
+from utils.aws_clients import get_table
+from utils.logger import log_event, setup_logger
+
+logger = setup_logger(__name__)
+
+USAGE_FLUSH_MAX_KEYS = int(os.environ.get('USAGE_FLUSH_MAX_KEYS', '25'))
+USAGE_FLUSH_INTERVAL_S = float(os.environ.get('USAGE_FLUSH_INTERVAL_S', '30'))
+# 컨테이너 수명과 컴팩션 재실행 범위(최근 72시간)보다 길게
+USAGE_FLUSH_MARKER_TTL_DAYS = int(os.environ.get('USAGE_FLUSH_MARKER_TTL_DAYS', '7'))
+
+UsageKey = Tuple[str, str, str]  # (userId, usageDate, engineType)
+
+
+class UsageAggregator:
+    """사용량 증분 누적 + 멱등 flush"""
+
+    def __init__(
+        self,
+        table_factory: Callable = None,
+        max_keys: int = USAGE_FLUSH_MAX_KEYS,
+        interval_s: float = USAGE_FLUSH_INTERVAL_S,
+        container_id: Optional[str] = None
+    ):
+        self._table_factory = table_factory or (lambda: get_table('usage'))
+        self.max_keys = max_keys
+        self.interval_s = interval_s
+        self.container_id = container_id or uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+        self._pending: Dict[UsageKey, Dict[str, int]] = {}
+        # 반영 실패한 배치: 같은 순번으로 재시도해야 멱등성이 유지됨
+        self._retry: Dict[UsageKey, Tuple[int, Dict[str, int], str]] = {}
+        self._seq = 0
+        self._oldest: Optional[float] = None
+
+    def record(self, user_id: str, engine_type: str, input_tokens: int, output_tokens: int,
+               usage_date: Optional[str] = None, cache_read_tokens: int = 0,
+               cache_write_tokens: int = 0, cost: Optional[CostBreakdown] = None) -> None:
+        """메시지 1건 사용량 누적 (임계값을 넘으면 즉시 flush)"""
+        key = (user_id, usage_date or datetime.now().strftime('%Y-%m-%d'), engine_type)
+        with self._lock:
+            counters = self._pending.setdefault(key, dict.fromkeys(COUNTERS, 0))
+            counters['inputTokens'] += input_tokens
+            counters['outputTokens'] += output_tokens
+            counters['cacheReadTokens'] += cache_read_tokens
+            counters['cacheWriteTokens'] += cache_write_tokens
+            counters['totalTokens'] += input_tokens + output_tokens + cache_read_tokens + cache_write_tokens
+            counters['messageCount'] += 1
+            if cost is not None:
+                counters['costMicros'] += cost.micros
+                counters['cacheSavingsMicros'] += cost.savings_micros
+                counters['priceVersion'] = cost.version
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            due = (len(self._pending) >= self.max_keys
+                   or time.monotonic() - self._oldest >= self.interval_s)
+
+        if due:
+            self.flush()
+
+    def pending_keys(self) -> int:
+        """반영 대기 중인 키 수 (재시도 포함)"""
+        with self._lock:
+            return len(self._pending) + len(self._retry)
+
+    def flush(self) -> int:
+        """
+        대기 중인 증분 반영
+
+        Returns:
+            int: 이번에 반영된 키 수
+        """
+        with self._lock:
+            batches = list(self._retry.items())
+            retrying = set(self._retry)
+            self._retry = {}
+            for key, counters in self._pending.items():
+                if key in retrying:
+                    # 이전 배치가 확정되기 전에는 새 순번을 쓰지 않음 (남겨두고 다음에 반영)
+                    continue
+                self._seq += 1
+                batches.append((key, (self._seq, counters, datetime.now().isoformat())))
+            self._pending = {key: c for key, c in self._pending.items() if key in retrying}
+            self._oldest = time.monotonic() if self._pending else None
+
+        if not batches:
+            return 0
+
+        table = self._table_factory()
+        applied = 0
+        failed: List[Tuple[UsageKey, Tuple[int, Dict[str, int], str]]] = []
+        for key, batch in batches:
+            try:
+                if self.apply(table, key, *batch):
+                    applied += 1
+            except Exception as e:
+                logger.error(f"Error flushing usage for {key}: {str(e)}")
+                failed.append((key, batch))
+
+        if failed:
+            with self._lock:
+                self._retry.update(failed)
+                if self._oldest is None:
+                    self._oldest = time.monotonic()
+
+        log_event(logger, 'usage.flushed', keys=len(batches), applied=applied, failed=len(failed))
+        return applied
+
+    def apply(self, table, key: UsageKey, seq: int, counters: Dict[str, int], timestamp: str) -> bool:
+        """키 1개 ADD + 일/월/누적 롤업 + 반영 순번 항목을 한 트랜잭션으로 - 이미 반영된 순번이면 False"""
+        user_id, usage_date, engine_type = key
+        names = {}
+        values = {
+            ':timestamp': timestamp,
+            ':engineType': engine_type,
+            ':usageDate': usage_date
+        }
+        adds = []
+        for index, counter in enumerate(COUNTERS):
+            names[f'#c{index}'] = counter
+            values[f':c{index}'] = Decimal(counters[counter])
+            adds.append(f"#c{index} :c{index}")
+        sets = [
+            'updatedAt = :timestamp',
+            'lastUsedAt = :timestamp',
+            'engineType = if_not_exists(engineType, :engineType)',
+            'usageDate = if_not_exists(usageDate, :usageDate)'
+        ]
+        if counters.get('priceVersion'):
+            sets.append('priceVersion = :priceVersion')
+            values[':priceVersion'] = counters['priceVersion']
+
+        raw_update = {
+            'Key': {
+                'userId': user_id,
+                'usageDate#engineType': f"{usage_date}#{engine_type}"
+            },
+            'UpdateExpression': f"ADD {', '.join(adds)} SET {', '.join(sets)}",
+            'ExpressionAttributeNames': names,
+            'ExpressionAttributeValues': values
+        }
+        # 조건 검사 항목을 맨 앞에 (취소 사유 첫 번째로 판별)
+        marker_update = {
+            'Key': {'userId': user_id, SORT_KEY: flush_key(self.container_id, usage_date, engine_type)},
+            'UpdateExpression': 'SET #seq = :seq, #ttl = :ttl, updatedAt = :timestamp',
+            'ConditionExpression': 'attribute_not_exists(#seq) OR #seq < :seq',
+            'ExpressionAttributeNames': {'#seq': 'flushSeq', '#ttl': 'ttl'},
+            'ExpressionAttributeValues': {
+                ':seq': seq,
+                ':ttl': int(time.time()) + USAGE_FLUSH_MARKER_TTL_DAYS * 86400,
+                ':timestamp': timestamp
+            }
+        }
+        items = [marker_update, raw_update] + [
+            rollup_update(user_id, sort_key, engine_type, counters, timestamp)
+            for sort_key in rollup_keys(usage_date)
+        ]
+
+        try:
+            table.meta.client.transact_write_items(TransactItems=[
+                {'Update': {'TableName': table.name, **item}} for item in items
+            ])
+            return True
+        except ClientError as e:
+            error = e.response.get('Error', {})
+            reasons = e.response.get('CancellationReasons') or []
+            if (error.get('Code') == 'TransactionCanceledException'
+                    and reasons and reasons[0].get('Code') == 'ConditionalCheckFailed'):
+                logger.warning(f"Usage batch {seq} for {key} already applied - skipped")
+                return False
+            raise
+
+
+_aggregator: Optional[UsageAggregator] = None
+
+
+def get_usage_aggregator() -> UsageAggregator:
+    """컨테이너 공용 집계기"""
+    global _aggregator
+    if _aggregator is None:
+        _aggregator = UsageAggregator()
+    return _aggregator
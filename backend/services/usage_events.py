@@ -0,0 +1,241 @@
+"""
+Usage Events
+생성 1건 = 사용량 이벤트 1개 (append-only, 시간 샤딩, TTL) + 이벤트 → 카운터 컴팩션
+
+이벤트 테이블 키
+- shard: YYYY-MM-DDTHH#NN (시간 버킷 + 요청 ID 해시 샤드, USAGE_EVENT_SHARDS개로 분산)
+- eventId: <ISO 시각>#<요청 ID> (같은 요청 재기록은 조건부 put으로 무시)
+
+카운터 반영 방식 (USAGE_COUNTERS_SOURCE)
+- hot(기본): 메시지 경로의 집계기가 카운터를 갱신하고 이벤트는 감사/재집계용으로만 기록
+- events: 메시지 경로는 이벤트만 기록, 컴팩션 작업(handlers/jobs/usage_compaction.py)이 닫힌 시간 버킷을
+  원본/롤업 카운터로 접어 넣음. 키마다 `flush#compact-<시간>#...` 순번 항목 1로 반영하므로 재실행해도 한 번만 반영됨
+- 비용은 컴팩션 시점 단가(services/pricing.py)로 다시 계산 - 이벤트에는 토큰과 모델 ID만 있으면 된다
+"""
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+from services import pricing
+from services.pricing import TokenUsage
+from services.usage_aggregator import UsageAggregator, UsageKey
+from services.usage_rollups import COUNTERS
+from utils.aws_clients import get_table
+from utils.logger import log_event, setup_logger
+
+logger = setup_logger(__name__)
+
+USAGE_EVENTS_ENABLED = os.environ.get('USAGE_EVENTS_ENABLED', 'true').lower() == 'true'
+USAGE_COUNTERS_SOURCE = os.environ.get('USAGE_COUNTERS_SOURCE', 'hot')
+USAGE_EVENT_SHARDS = int(os.environ.get('USAGE_EVENT_SHARDS', '16'))
+USAGE_EVENT_TTL_DAYS = int(os.environ.get('USAGE_EVENT_TTL_DAYS', '90'))
+# 시간 버킷이 끝난 뒤 컴팩션까지 기다리는 시간 (늦게 flush되는 이벤트 대기, Lambda 최대 실행 시간 이상)
+COMPACTION_GRACE_S = int(os.environ.get('USAGE_COMPACTION_GRACE_S', '900'))
+
+HOUR_FORMAT = '%Y-%m-%dT%H'
+STATE_KEY = {'shard': 'compaction', 'eventId': 'watermark'}
+
+
+class UsageEvent(NamedTuple):
+    """생성 1건의 사용량"""
+    request_id: str
+    user_id: str
+    engine_type: str
+    model_id: str
+    tokens: TokenUsage
+    latency_ms: Optional[int] = None
+    reported: bool = False  # 토큰 수가 Bedrock 보고값인지 (False면 추정)
+    created_at: Optional[datetime] = None
+
+
+def shard_for(hour: str, request_id: str, shards: int = USAGE_EVENT_SHARDS) -> str:
+    digest = hashlib.md5(request_id.encode('utf-8')).digest()
+    return f"{hour}#{int.from_bytes(digest[:4], 'big') % shards:02d}"
+
+
+def to_item(event: UsageEvent, shards: int = USAGE_EVENT_SHARDS,
+            ttl_days: int = USAGE_EVENT_TTL_DAYS) -> Dict[str, Any]:
+    created = event.created_at or datetime.now()
+    item = {
+        'shard': shard_for(created.strftime(HOUR_FORMAT), event.request_id, shards),
+        'eventId': f"{created.isoformat()}#{event.request_id}",
+        'requestId': event.request_id,
+        'userId': event.user_id,
+        'engineType': event.engine_type,
+        'modelId': event.model_id,
+        'usageDate': created.strftime('%Y-%m-%d'),
+        'inputTokens': event.tokens.input,
+        'outputTokens': event.tokens.output,
+        'cacheReadTokens': event.tokens.cache_read,
+        'cacheWriteTokens': event.tokens.cache_write,
+        'reported': event.reported,
+        'createdAt': created.isoformat(),
+        'ttl': int(time.time()) + ttl_days * 86400
+    }
+    if event.latency_ms is not None:
+        item['latencyMs'] = int(event.latency_ms)
+    return item
+
+
+class UsageEventLog:
+    """이벤트 버퍼 + 일괄 append"""
+
+    def __init__(self, table_factory: Callable = None, shards: int = USAGE_EVENT_SHARDS):
+        self._table_factory = table_factory or (lambda: get_table('usage_events'))
+        self.shards = shards
+        self._lock = threading.Lock()
+        self._pending: List[Dict[str, Any]] = []
+
+    def append(self, event: UsageEvent) -> None:
+        with self._lock:
+            self._pending.append(to_item(event, self.shards))
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """버퍼의 이벤트 기록 (실패분은 다음 flush에서 재시도)"""
+        with self._lock:
+            items, self._pending = self._pending, []
+        if not items:
+            return 0
+
+        table = self._table_factory()
+        written = 0
+        failed = []
+        for item in items:
+            try:
+                table.put_item(Item=item, ConditionExpression='attribute_not_exists(eventId)')
+                written += 1
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                    logger.error(f"Error appending usage event {item['eventId']}: {str(e)}")
+                    failed.append(item)
+            except Exception as e:
+                logger.error(f"Error appending usage event {item['eventId']}: {str(e)}")
+                failed.append(item)
+
+        if failed:
+            with self._lock:
+                self._pending = failed + self._pending
+        return written
+
+
+def hour_events(table, hour: str, shards: int = USAGE_EVENT_SHARDS) -> Iterator[Dict[str, Any]]:
+    """시간 버킷 1개의 전체 이벤트 (샤드별 query)"""
+    for shard in range(shards):
+        kwargs = {'KeyConditionExpression': Key('shard').eq(f"{hour}#{shard:02d}")}
+        while True:
+            response = table.query(**kwargs)
+            yield from response.get('Items', [])
+            if 'LastEvaluatedKey' not in response:
+                break
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def fold_events(events) -> Dict[UsageKey, Dict[str, Any]]:
+    """이벤트 → (userId, 날짜, 엔진)별 카운터 (비용은 현재 단가로 재계산)"""
+    folded: Dict[UsageKey, Dict[str, Any]] = {}
+    for event in events:
+        key = (event['userId'], event['usageDate'], event['engineType'])
+        tokens = TokenUsage(
+            int(event.get('inputTokens', 0)), int(event.get('outputTokens', 0)),
+            int(event.get('cacheReadTokens', 0)), int(event.get('cacheWriteTokens', 0))
+        )
+        cost = pricing.calculate(tokens, event.get('modelId'), event['usageDate'])
+        counters = folded.setdefault(key, dict.fromkeys(COUNTERS, 0))
+        counters['inputTokens'] += tokens.input
+        counters['outputTokens'] += tokens.output
+        counters['cacheReadTokens'] += tokens.cache_read
+        counters['cacheWriteTokens'] += tokens.cache_write
+        counters['totalTokens'] += tokens.total
+        counters['messageCount'] += 1
+        counters['costMicros'] += cost.micros
+        counters['cacheSavingsMicros'] += cost.savings_micros
+        counters['priceVersion'] = cost.version
+    return folded
+
+
+def closed_hours(since: Optional[str], now: Optional[datetime] = None,
+                 grace_s: int = COMPACTION_GRACE_S, max_hours: int = 72) -> List[str]:
+    """since 다음 시간부터 마감(+grace)된 시간 버킷 목록"""
+    now = now or datetime.now()
+    last = (now - timedelta(seconds=grace_s)).replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+    # 워터마크가 없거나 오래됐으면 최근 max_hours만 (TTL 이전 이벤트라도 한 번에 너무 많이 읽지 않도록)
+    start = last - timedelta(hours=max_hours - 1)
+    if since:
+        start = max(start, datetime.strptime(since, HOUR_FORMAT) + timedelta(hours=1))
+    hours = []
+    while start <= last:
+        hours.append(start.strftime(HOUR_FORMAT))
+        start += timedelta(hours=1)
+    return hours
+
+
+def compact_hour(events_table, usage_table, hour: str, shards: int = USAGE_EVENT_SHARDS,
+                 dry_run: bool = False) -> Tuple[int, int]:
+    """
+    시간 버킷 1개를 원본/롤업 카운터로 반영
+
+    Returns:
+        (이벤트 수, 새로 반영된 키 수)
+    """
+    folded = fold_events(hour_events(events_table, hour, shards))
+    events = sum(counters['messageCount'] for counters in folded.values())
+    if dry_run:
+        return events, 0
+
+    writer = UsageAggregator(lambda: usage_table, container_id=f"compact-{hour}")
+    timestamp = datetime.now().isoformat()
+    applied = 0
+    for key, counters in folded.items():
+        if writer.apply(usage_table, key, 1, counters, timestamp):
+            applied += 1
+    return events, applied
+
+
+def run_compaction(events_table=None, usage_table=None, now: Optional[datetime] = None,
+                   shards: int = USAGE_EVENT_SHARDS, dry_run: bool = False,
+                   source: Optional[str] = None) -> Dict[str, Any]:
+    """워터마크 이후 마감된 시간 버킷을 순서대로 컴팩션하고 워터마크 전진"""
+    source = source or USAGE_COUNTERS_SOURCE
+    totals = {'hours': 0, 'events': 0, 'applied': 0}
+    if source != 'events':
+        # hot 모드에서는 메시지 경로가 이미 카운터를 올렸으므로 반영하면 이중 집계
+        log_event(logger, 'usage.compaction', skipped=source, **totals)
+        return totals
+
+    events_table = events_table or get_table('usage_events')
+    usage_table = usage_table or get_table('usage')
+
+    state = events_table.get_item(Key=STATE_KEY).get('Item') or {}
+    hours = closed_hours(state.get('hour'), now)
+    for hour in hours:
+        events, applied = compact_hour(events_table, usage_table, hour, shards, dry_run)
+        totals['hours'] += 1
+        totals['events'] += events
+        totals['applied'] += applied
+        if not dry_run:
+            events_table.put_item(Item={**STATE_KEY, 'hour': hour, 'updatedAt': datetime.now().isoformat()})
+
+    log_event(logger, 'usage.compaction', dry_run=dry_run,
+              last_hour=hours[-1] if hours else state.get('hour'), **totals)
+    return totals
+
+
+_event_log: Optional[UsageEventLog] = None
+
+
+def get_usage_event_log() -> UsageEventLog:
+    """컨테이너 공용 이벤트 로그"""
+    global _event_log
+    if _event_log is None:
+        _event_log = UsageEventLog()
+    return _event_log
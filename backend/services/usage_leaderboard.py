@@ -0,0 +1,135 @@
+"""
+Usage Leaderboard
+기간 내 상위 사용자 (date-index GSI 일별 병렬 query + top-k 힙)
+
+- 기간의 날짜마다 date-index(usageDate → userId)를 병렬로 query, 기본 테이블 scan 없음
+- 원본 항목만 usageDate 속성을 가지므로 롤업 항목은 인덱스에 들어가지 않음 (sparse index)
+- 사용자별 합계는 날짜별 결과를 도착 순서대로 누적하고, 상위 k명은 크기 k 힙으로 선택
+- 기간별 합계는 LEADERBOARD_CACHE_TTL_S 동안 컨테이너에 캐시 (지표/인원만 다른 요청은 재집계 없음)
+"""
+import heapq
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.logger import log_event, setup_logger
+
+logger = setup_logger(__name__)
+
+LEADERBOARD_CACHE_TTL_S = float(os.environ.get('LEADERBOARD_CACHE_TTL_S', '300'))
+LEADERBOARD_MAX_WORKERS = int(os.environ.get('LEADERBOARD_MAX_WORKERS', '8'))
+LEADERBOARD_MAX_DAYS = 92
+
+METRICS = ('tokens', 'cost', 'requests')
+
+
+def period_dates(period_days: int, end_date: Optional[str] = None) -> List[str]:
+    """end_date(기본 오늘)까지 period_days일의 YYYY-MM-DD 목록"""
+    end = datetime.strptime(end_date, '%Y-%m-%d') if end_date else datetime.now()
+    return [(end - timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(period_days)]
+
+
+def top_k(totals: Dict[str, Dict[str, Any]], limit: int, metric: str = 'tokens') -> List[Dict[str, Any]]:
+    """사용자별 합계에서 지표 상위 limit명 (크기 limit 힙)"""
+    if metric not in METRICS:
+        raise ValueError(f"Unknown leaderboard metric: {metric}")
+    heap: List[Tuple[Any, str]] = []
+    for user_id, summary in totals.items():
+        entry = (summary[metric], user_id)
+        if len(heap) < limit:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+
+    return [
+        {'userId': user_id, 'rank': rank, **_public(totals[user_id])}
+        for rank, (_, user_id) in enumerate(sorted(heap, reverse=True), start=1)
+    ]
+
+
+def _public(summary: Dict[str, Any]) -> Dict[str, Any]:
+    return {**summary, 'cost': str(summary['cost'])}
+
+
+class UsageLeaderboard:
+    """기간별 사용자 합계 캐시 + 상위 사용자 조회"""
+
+    def __init__(
+        self,
+        query_day: Callable[[str], List[Dict[str, Any]]],
+        cost_fn: Callable[[str, Dict[str, Any]], Decimal],
+        ttl_s: float = LEADERBOARD_CACHE_TTL_S,
+        max_workers: int = LEADERBOARD_MAX_WORKERS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self._query_day = query_day
+        self._cost_fn = cost_fn
+        self.ttl_s = ttl_s
+        self.max_workers = max_workers
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._cache: Dict[Tuple[str, int], Tuple[float, Dict[str, Dict[str, Any]]]] = {}
+
+    def top_users(
+        self,
+        limit: int = 10,
+        period_days: int = 30,
+        metric: str = 'tokens',
+        end_date: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """기간 내 지표 상위 사용자"""
+        period_days = max(1, min(period_days, LEADERBOARD_MAX_DAYS))
+        return top_k(self.period_totals(period_days, end_date), limit, metric)
+
+    def period_totals(self, period_days: int, end_date: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """기간의 사용자별 합계 (TTL 캐시)"""
+        dates = period_dates(period_days, end_date)
+        key = (dates[0], period_days)
+        now = self._clock()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached and now - cached[0] < self.ttl_s:
+                return cached[1]
+
+        started = time.perf_counter()
+        totals: Dict[str, Dict[str, Any]] = {}
+        items = 0
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(dates))) as executor:
+            futures = [executor.submit(self._query_day, date) for date in dates]
+            for future in as_completed(futures):
+                day_items = future.result()
+                items += len(day_items)
+                for item in day_items:
+                    self._accumulate(totals, item)
+
+        with self._lock:
+            # 만료된 기간 정리 후 저장
+            self._cache = {k: v for k, v in self._cache.items() if now - v[0] < self.ttl_s}
+            self._cache[key] = (now, totals)
+
+        log_event(logger, 'usage.leaderboard', days=period_days, items=items, users=len(totals),
+                  duration_ms=round((time.perf_counter() - started) * 1000, 1))
+        return totals
+
+    def _accumulate(self, totals: Dict[str, Dict[str, Any]], item: Dict[str, Any]) -> None:
+        """인덱스 항목 1개(사용자/날짜/엔진)를 사용자 합계에 더함"""
+        input_tokens = int(item.get('inputTokens', 0) or 0)
+        output_tokens = int(item.get('outputTokens', 0) or 0)
+        summary = totals.get(item['userId'])
+        if summary is None:
+            summary = totals[item['userId']] = {
+                'tokens': 0, 'inputTokens': 0, 'outputTokens': 0, 'requests': 0, 'cost': Decimal('0')
+            }
+        summary['tokens'] += int(item.get('totalTokens', 0) or 0)
+        summary['inputTokens'] += input_tokens
+        summary['outputTokens'] += output_tokens
+        summary['requests'] += int(item.get('messageCount', 0) or 0)
+        summary['cost'] += self._cost_fn(item.get('engineType', ''), item)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
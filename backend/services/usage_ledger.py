@@ -0,0 +1,274 @@
+"""
+Usage Ledger
+사용량 기록/조회 단일 진입점 - 모든 작성자(WebSocket, REST, UsageService)가 같은 키 설계를 사용
+
+키: userId + usageDate#engineType
+- 원본: YYYY-MM-DD#엔진 (이관된 월 단위 항목은 YYYY-MM#엔진)
+- 롤업: rollup#day#YYYY-MM-DD / rollup#month#YYYY-MM / rollup#lifetime (엔진별 평탄화 속성 포함)
+
+쓰기는 UsageAggregator(컨테이너 집계 + 원본/롤업 멱등 트랜잭션), 응답에 합계가 필요하면 flush=True.
+생성 1건마다 사용량 이벤트도 함께 남긴다 (services/usage_events.py). USAGE_COUNTERS_SOURCE=events면
+카운터는 컴팩션 작업만 올리므로 합계는 마감된 시간 버킷까지만 반영된다.
+읽기는 월/일/누적 모두 롤업 get_item 또는 query 1회.
+
+migrate_legacy_usage: 이전 두 스키마(REST의 PK=user#/SK=engine#..#YYYY-MM, increment_usage의
+requestCount/cost 속성)를 원장으로 합치는 1회성 이관 (scripts/migrate_usage_ledger.py)
+"""
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from boto3.dynamodb.conditions import Key
+
+from services import usage_events
+from services.pricing import DEFAULT_MODEL_ID, CostBreakdown, TokenUsage
+from services.usage_aggregator import UsageAggregator, get_usage_aggregator
+from services.usage_events import UsageEvent, UsageEventLog, get_usage_event_log
+from services.usage_rollups import (
+    COUNTERS, LIFETIME, ROLLUP_PREFIX, SORT_KEY, day_key, is_raw, month_key, parse_rollup,
+    rebuild_rollups
+)
+from utils.aws_clients import get_table
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# 이전 REST 스키마가 기록하던 카운터
+LEGACY_COUNTERS = ('inputTokens', 'outputTokens', 'totalTokens', 'messageCount')
+
+
+class UsageLedger:
+    """사용량 원장 (usage 테이블 1개, 키 설계 1개)"""
+
+    def __init__(self, table_factory: Callable = None, aggregator: Optional[UsageAggregator] = None,
+                 event_log: Optional[UsageEventLog] = None):
+        self._table_factory = table_factory or (lambda: get_table('usage'))
+        self._aggregator = aggregator
+        self._event_log = event_log
+
+    @property
+    def table(self):
+        return self._table_factory()
+
+    @property
+    def aggregator(self) -> UsageAggregator:
+        if self._aggregator is None:
+            self._aggregator = get_usage_aggregator()
+        return self._aggregator
+
+    @property
+    def event_log(self) -> UsageEventLog:
+        if self._event_log is None:
+            self._event_log = get_usage_event_log()
+        return self._event_log
+
+    def record(
+        self,
+        user_id: str,
+        engine_type: str,
+        input_tokens: int,
+        output_tokens: int,
+        cache_read_tokens: int = 0,
+        cache_write_tokens: int = 0,
+        cost: Optional[CostBreakdown] = None,
+        usage_date: Optional[str] = None,
+        flush: bool = False,
+        request_id: Optional[str] = None,
+        model_id: Optional[str] = None,
+        latency_ms: Optional[int] = None,
+        reported: bool = False
+    ) -> None:
+        """메시지 1건 기록 (flush=True면 즉시 반영)"""
+        if usage_events.USAGE_EVENTS_ENABLED:
+            self.event_log.append(UsageEvent(
+                request_id=request_id or uuid.uuid4().hex,
+                user_id=user_id,
+                engine_type=engine_type,
+                model_id=model_id or DEFAULT_MODEL_ID,
+                tokens=TokenUsage(input_tokens, output_tokens, cache_read_tokens, cache_write_tokens),
+                latency_ms=latency_ms,
+                reported=reported
+            ))
+        if usage_events.USAGE_COUNTERS_SOURCE != 'events':
+            self.aggregator.record(
+                user_id, engine_type, input_tokens, output_tokens,
+                usage_date=usage_date,
+                cache_read_tokens=cache_read_tokens,
+                cache_write_tokens=cache_write_tokens,
+                cost=cost
+            )
+        if flush:
+            self.flush()
+
+    def flush(self) -> None:
+        """집계된 카운터와 대기 중인 이벤트 반영"""
+        if usage_events.USAGE_COUNTERS_SOURCE != 'events':
+            self.aggregator.flush()
+        if usage_events.USAGE_EVENTS_ENABLED:
+            self.event_log.flush()
+
+    def raw(self, user_id: str, usage_date: str, engine_type: str) -> Dict[str, int]:
+        """원본 항목 1개의 카운터"""
+        response = self.table.get_item(Key={'userId': user_id, SORT_KEY: f"{usage_date}#{engine_type}"})
+        item = response.get('Item') or {}
+        return {counter: int(item.get(counter, 0)) for counter in COUNTERS}
+
+    def rollup(self, user_id: str, sort_key: str) -> Dict[str, Any]:
+        """롤업 항목 1개 (get_item 1회)"""
+        response = self.table.get_item(Key={'userId': user_id, SORT_KEY: sort_key})
+        return parse_rollup(response.get('Item'))
+
+    def month(self, user_id: str, month: Optional[str] = None) -> Dict[str, Any]:
+        """월 합계 (기본 이번 달)"""
+        return self.rollup(user_id, month_key(month or datetime.now().strftime('%Y-%m')))
+
+    def lifetime(self, user_id: str) -> Dict[str, Any]:
+        return self.rollup(user_id, LIFETIME)
+
+    def days(self, user_id: str, month: str) -> List[Dict[str, Any]]:
+        """월의 일별 롤업 (query 1회, 최대 31개)"""
+        prefix = day_key('')
+        return [
+            {'date': item[SORT_KEY][len(prefix):], **parse_rollup(item)}
+            for item in self._query_prefix(user_id, day_key(month))
+        ]
+
+    def months(self, user_id: str) -> List[Dict[str, Any]]:
+        """전체 월 롤업 (최근 월부터)"""
+        prefix = month_key('')
+        months = [
+            {'month': item[SORT_KEY][len(prefix):], **parse_rollup(item)}
+            for item in self._query_prefix(user_id, f"{ROLLUP_PREFIX}month#")
+        ]
+        return sorted(months, key=lambda entry: entry['month'], reverse=True)
+
+    def _query_prefix(self, user_id: str, prefix: str) -> List[Dict[str, Any]]:
+        kwargs = {'KeyConditionExpression': Key('userId').eq(user_id) & Key(SORT_KEY).begins_with(prefix)}
+        items = []
+        while True:
+            response = self.table.query(**kwargs)
+            items.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                return items
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+_ledger: Optional[UsageLedger] = None
+
+
+def get_usage_ledger() -> UsageLedger:
+    """컨테이너 공용 원장"""
+    global _ledger
+    if _ledger is None:
+        _ledger = UsageLedger()
+    return _ledger
+
+
+def _scan(table):
+    kwargs: Dict[str, Any] = {}
+    while True:
+        response = table.scan(**kwargs)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def _legacy_key(item: Dict[str, Any]) -> Optional[Tuple[str, str, str]]:
+    """PK=user#<id>, SK=engine#<엔진>#YYYY-MM → (userId, YYYY-MM, 엔진)"""
+    pk, sk = str(item.get('PK', '')), str(item.get('SK', ''))
+    if not pk.startswith('user#') or not sk.startswith('engine#'):
+        return None
+    engine_type, _, year_month = sk[len('engine#'):].rpartition('#')
+    return pk[len('user#'):], year_month, engine_type
+
+
+def migrate_legacy_usage(table, source_table=None, dry_run: bool = False) -> Dict[str, int]:
+    """
+    이전 스키마 항목을 원장으로 병합 (재실행해도 중복 반영 없음)
+
+    1. increment_usage 시절 원본의 requestCount/cost를 messageCount/costMicros로 합치고 제거
+    2. REST 항목(월×엔진)은 같은 월×엔진 원장 합계보다 큰 만큼만 월 단위 원본(YYYY-MM#엔진)으로 추가
+       - 두 경로가 같은 메시지를 중복 집계해 왔으므로 더하지 않고 큰 값에 맞춘다
+    3. 영향받은 사용자의 롤업 재계산 후 REST 항목 삭제
+
+    Returns:
+        dict: folded, legacy, adjusted, users
+    """
+    source_table = source_table or table
+    ledger_sums: Dict[Tuple[str, str, str], Dict[str, int]] = defaultdict(lambda: dict.fromkeys(LEGACY_COUNTERS, 0))
+    legacy_sums: Dict[Tuple[str, str, str], Dict[str, int]] = defaultdict(lambda: dict.fromkeys(LEGACY_COUNTERS, 0))
+    legacy_items: List[Dict[str, Any]] = []
+    folds: List[Dict[str, Any]] = []
+
+    for item in _scan(table):
+        sort_key = item.get(SORT_KEY, '')
+        if not is_raw(sort_key):
+            continue
+        usage_date, engine_type = sort_key.split('#', 1)
+        sums = ledger_sums[(item['userId'], usage_date[:7], engine_type)]
+        for counter in LEGACY_COUNTERS:
+            sums[counter] += int(item.get(counter, 0) or 0)
+        if 'requestCount' in item or 'cost' in item:
+            sums['messageCount'] += int(item.get('requestCount', 0) or 0)
+            folds.append(item)
+
+    for item in _scan(source_table):
+        key = _legacy_key(item)
+        if key:
+            legacy_items.append(item)
+            for counter in LEGACY_COUNTERS:
+                legacy_sums[key][counter] += int(item.get(counter, 0) or 0)
+
+    adjustments = {}
+    for key, legacy in legacy_sums.items():
+        delta = {counter: max(0, legacy[counter] - ledger_sums[key][counter]) for counter in LEGACY_COUNTERS}
+        if any(delta.values()):
+            adjustments[key] = delta
+
+    users = {item['userId'] for item in folds} | {key[0] for key in legacy_sums}
+    stats = {'folded': len(folds), 'legacy': len(legacy_items), 'adjusted': len(adjustments), 'users': len(users)}
+    logger.info(f"Usage ledger migration: {stats}")
+    if dry_run:
+        return stats
+
+    now = datetime.now().isoformat()
+    for item in folds:
+        table.update_item(
+            Key={'userId': item['userId'], SORT_KEY: item[SORT_KEY]},
+            UpdateExpression='ADD messageCount :requests, costMicros :cost REMOVE requestCount, #cost, #date',
+            ConditionExpression='attribute_exists(requestCount) OR attribute_exists(#cost)',
+            ExpressionAttributeNames={'#cost': 'cost', '#date': 'date'},
+            ExpressionAttributeValues={
+                ':requests': Decimal(int(item.get('requestCount', 0) or 0)),
+                ':cost': (Decimal(item.get('cost', 0) or 0) * Decimal(1_000_000)).to_integral_value()
+            }
+        )
+
+    for (user_id, year_month, engine_type), delta in adjustments.items():
+        table.update_item(
+            Key={'userId': user_id, SORT_KEY: f"{year_month}#{engine_type}"},
+            UpdateExpression=(
+                'ADD ' + ', '.join(f"{counter} :{counter}" for counter in LEGACY_COUNTERS) +
+                ' SET engineType = :engine, usageDate = :month, updatedAt = :now, migratedFrom = :source'
+            ),
+            ExpressionAttributeValues={
+                **{f":{counter}": Decimal(value) for counter, value in delta.items()},
+                ':engine': engine_type,
+                ':month': year_month,
+                ':now': now,
+                ':source': 'rest-usage'
+            }
+        )
+
+    for user_id in sorted(users):
+        rebuild_rollups(table, user_id=user_id)
+
+    key_names = [key['AttributeName'] for key in source_table.key_schema]
+    with source_table.batch_writer() as batch:
+        for item in legacy_items:
+            batch.delete_item(Key={name: item[name] for name in key_names})
+
+    return stats
@@ -0,0 +1,177 @@
+"""
+Usage Rollups
+사용자별 일/월/누적 사용량 롤업 항목 (대시보드/한도 조회를 get_item 1회로)
+
+원본 항목과 같은 usage 테이블에 정렬 키만 달리해 저장한다.
+- rollup#day#YYYY-MM-DD / rollup#month#YYYY-MM / rollup#lifetime
+- 전체 합계: 토큰(입력/출력/캐시 읽기/캐시 쓰기/전체), messageCount, 비용/캐시 절감액(마이크로 USD)
+- 엔진별 합계: `engine#<엔진>#<카운터>` 평탄화 속성 (중첩 맵 없이 ADD 가능)
+
+원본 정렬 키(YYYY-MM-DD#엔진)는 숫자로 시작하므로 날짜 범위 조회에 롤업이 섞이지 않는다.
+집계기 멱등성 표식(flush#<컨테이너 ID>#YYYY-MM-DD#엔진, TTL)도 같은 테이블에 있으며 원본/롤업이 아니다.
+"""
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from boto3.dynamodb.conditions import Key
+
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+SORT_KEY = 'usageDate#engineType'
+ROLLUP_PREFIX = 'rollup#'
+LIFETIME = 'rollup#lifetime'
+FLUSH_PREFIX = 'flush#'
+
+# totalTokens = input + output + cacheRead + cacheWrite, 비용은 정수 ADD를 위해 마이크로 USD
+COUNTERS = (
+    'inputTokens', 'outputTokens', 'totalTokens', 'messageCount',
+    'cacheReadTokens', 'cacheWriteTokens', 'costMicros', 'cacheSavingsMicros'
+)
+
+
+def day_key(usage_date: str) -> str:
+    return f"{ROLLUP_PREFIX}day#{usage_date}"
+
+
+def month_key(usage_date: str) -> str:
+    """YYYY-MM 또는 YYYY-MM-DD"""
+    return f"{ROLLUP_PREFIX}month#{usage_date[:7]}"
+
+
+def rollup_keys(usage_date: str) -> List[str]:
+    """원본 1건이 반영되는 롤업 정렬 키 (월 단위 이관 항목 YYYY-MM은 일 롤업 없음)"""
+    if len(usage_date) == 7:
+        return [month_key(usage_date), LIFETIME]
+    return [day_key(usage_date), month_key(usage_date), LIFETIME]
+
+
+def engine_attribute(engine_type: str, counter: str) -> str:
+    return f"engine#{engine_type}#{counter}"
+
+
+def is_rollup(sort_key: str) -> bool:
+    return sort_key.startswith(ROLLUP_PREFIX)
+
+
+def flush_key(writer_id: str, usage_date: str, engine_type: str) -> str:
+    """집계기(컨테이너/컴팩션) 1개의 원본 키별 마지막 반영 순번 항목 정렬 키"""
+    return f"{FLUSH_PREFIX}{writer_id}#{usage_date}#{engine_type}"
+
+
+def is_raw(sort_key: str) -> bool:
+    """원본 항목 정렬 키 (롤업/반영 순번 항목 제외)"""
+    return '#' in sort_key and not is_rollup(sort_key) and not sort_key.startswith(FLUSH_PREFIX)
+
+
+def rollup_update(
+    user_id: str,
+    sort_key: str,
+    engine_type: str,
+    counters: Dict[str, int],
+    timestamp: str
+) -> Dict[str, Any]:
+    """롤업 1개 증분 update 파라미터 (update_item / TransactWriteItems 공용)"""
+    names = {'#kind': 'rollupType'}
+    values = {':timestamp': timestamp}
+    adds = []
+    for index, counter in enumerate(COUNTERS):
+        names[f'#t{index}'] = counter
+        names[f'#e{index}'] = engine_attribute(engine_type, counter)
+        values[f':v{index}'] = Decimal(counters.get(counter, 0))
+        adds.append(f"#t{index} :v{index}, #e{index} :v{index}")
+
+    return {
+        'Key': {'userId': user_id, SORT_KEY: sort_key},
+        'UpdateExpression': f"ADD {', '.join(adds)} SET updatedAt = :timestamp, #kind = :kind",
+        'ExpressionAttributeNames': names,
+        'ExpressionAttributeValues': {**values, ':kind': sort_key.split('#')[1]},
+    }
+
+
+def parse_rollup(item: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """롤업 항목 → {'totals': {...}, 'by_engine': {engine: {...}}}"""
+    totals = dict.fromkeys(COUNTERS, 0)
+    by_engine: Dict[str, Dict[str, int]] = {}
+    for name, value in (item or {}).items():
+        if name in totals:
+            totals[name] = int(value)
+        elif name.startswith('engine#'):
+            _, engine, counter = name.split('#', 2)
+            if counter in COUNTERS:
+                by_engine.setdefault(engine, dict.fromkeys(COUNTERS, 0))[counter] = int(value)
+    return {
+        'totals': totals,
+        'by_engine': by_engine,
+        'updatedAt': (item or {}).get('updatedAt')
+    }
+
+
+def build_rollups(raw_items: Iterable[Dict[str, Any]]) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """원본 항목으로 롤업 항목 전체 재계산 (백필용)"""
+    rollups: Dict[Tuple[str, str], Dict[str, Any]] = defaultdict(dict)
+    for item in raw_items:
+        sort_key = item.get(SORT_KEY, '')
+        if not is_raw(sort_key):
+            continue
+        usage_date, engine_type = sort_key.split('#', 1)
+        for key in rollup_keys(usage_date):
+            rollup = rollups[(item['userId'], key)]
+            for counter in COUNTERS:
+                value = Decimal(item.get(counter, 0) or 0)
+                rollup[counter] = rollup.get(counter, Decimal(0)) + value
+                attribute = engine_attribute(engine_type, counter)
+                rollup[attribute] = rollup.get(attribute, Decimal(0)) + value
+    return rollups
+
+
+def rebuild_rollups(table, user_id: Optional[str] = None, dry_run: bool = False) -> int:
+    """
+    원본 항목으로 롤업 재작성 (전체 scan 또는 사용자 1명 query)
+
+    Returns:
+        int: 작성한 롤업 항목 수
+    """
+    if user_id:
+        kwargs = {'KeyConditionExpression': Key('userId').eq(user_id)}
+        read = table.query
+    else:
+        kwargs = {}
+        read = table.scan
+
+    raw_items = []
+    existing = set()
+    while True:
+        response = read(**kwargs)
+        for item in response.get('Items', []):
+            if is_rollup(item.get(SORT_KEY, '')):
+                existing.add((item['userId'], item[SORT_KEY]))
+            else:
+                raw_items.append(item)
+        if 'LastEvaluatedKey' not in response:
+            break
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    rollups = build_rollups(raw_items)
+    stale = existing - set(rollups)
+    logger.info(f"Rebuilding {len(rollups)} rollups from {len(raw_items)} raw items "
+                f"({len(stale)} stale rollups removed)")
+    if dry_run:
+        return len(rollups)
+
+    now = datetime.now().isoformat()
+    with table.batch_writer() as batch:
+        for (owner, sort_key), attributes in rollups.items():
+            batch.put_item(Item={
+                'userId': owner,
+                SORT_KEY: sort_key,
+                'rollupType': sort_key.split('#')[1],
+                'updatedAt': now,
+                **attributes
+            })
+        for owner, sort_key in stale:
+            batch.delete_item(Key={'userId': owner, SORT_KEY: sort_key})
+    return len(rollups)
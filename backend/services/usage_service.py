@@ -8,9 +8,29 @@ import logging
 
 # 사용량 관련 모델들 (로컬 정의)
 from dataclasses import dataclass
-import boto3
+from utils.aws_clients import get_table
+from services import pricing
+from services.pricing import CostBreakdown, TokenUsage
+from services.usage_ledger import UsageLedger
+from services.usage_leaderboard import UsageLeaderboard
+from services.usage_rollups import LIFETIME, month_key
+from utils.token_estimator import estimate_tokens
 from boto3.dynamodb.conditions import Key
 
+# 기본 사용량 제한 (메시지 경로의 쿼터 게이트도 월 토큰 한도로 사용)
+DEFAULT_USAGE_LIMITS = {
+    'daily': {
+        'requests': 1000,
+        'tokens': 1000000,
+        'cost': '100.00'
+    },
+    'monthly': {
+        'requests': 30000,
+        'tokens': 30000000,
+        'cost': '3000.00'
+    }
+}
+
 @dataclass
 class Usage:
     """사용량 모델"""
@@ -42,66 +62,60 @@ class UsageRepository:
     """사용량 저장소"""
     
     def __init__(self):
-        from config.database import get_table_name
-        self.dynamodb = boto3.resource('dynamodb')
-        self.table = self.dynamodb.Table(get_table_name('usage'))
+        self.table = get_table('usage')
     
+    @property
+    def ledger(self) -> UsageLedger:
+        """같은 테이블을 쓰는 사용량 원장"""
+        return UsageLedger(lambda: self.table)
+
     def increment_usage(
         self,
         user_id: str,
         engine_type: str,
         input_tokens: int,
         output_tokens: int,
-        cost: Decimal
+        cost: Optional[CostBreakdown] = None
     ) -> Usage:
-        """사용량 증가 (원자적 업데이트)"""
+        """사용량 증가 (원장에 즉시 반영 - 원본과 롤업을 한 트랜잭션으로)"""
         today = datetime.now().strftime('%Y-%m-%d')
-        date_key = f"{today}#{engine_type}"
-        
-        response = self.table.update_item(
-            Key={
-                'userId': user_id,
-                'usageDate#engineType': date_key
-            },
-            UpdateExpression="""
-                ADD inputTokens :input_tokens,
-                    outputTokens :output_tokens,
-                    totalTokens :total_tokens,
-                    requestCount :one,
-                    cost :cost
-                SET updatedAt = :now,
-                    #date = :date,
-                    engineType = :engine_type
-            """,
-            ExpressionAttributeNames={
-                '#date': 'date'
-            },
-            ExpressionAttributeValues={
-                ':input_tokens': Decimal(input_tokens),
-                ':output_tokens': Decimal(output_tokens),
-                ':total_tokens': Decimal(input_tokens + output_tokens),
-                ':one': Decimal(1),
-                ':cost': cost,
-                ':now': datetime.utcnow().isoformat() + 'Z',
-                ':date': today,
-                ':engine_type': engine_type
-            },
-            ReturnValues='ALL_NEW'
-        )
-        
-        item = response['Attributes']
+        ledger = self.ledger
+        ledger.record(user_id, engine_type, input_tokens, output_tokens, cost=cost, flush=True)
+
+        counters = ledger.raw(user_id, today, engine_type)
         return Usage(
-            user_id=item['userId'],
-            date=item['date'],
-            engine_type=item['engineType'],
-            input_tokens=int(item.get('inputTokens', 0)),
-            output_tokens=int(item.get('outputTokens', 0)),
-            total_tokens=int(item.get('totalTokens', 0)),
-            request_count=int(item.get('requestCount', 0)),
-            cost=item.get('cost', Decimal('0')),
-            updated_at=item.get('updatedAt')
+            user_id=user_id,
+            date=today,
+            engine_type=engine_type,
+            input_tokens=counters['inputTokens'],
+            output_tokens=counters['outputTokens'],
+            total_tokens=counters['totalTokens'],
+            request_count=counters['messageCount'],
+            cost=Decimal(counters['costMicros']) / pricing.MICROS
         )
-    
+
+    def get_rollup(self, user_id: str, sort_key: str) -> Dict[str, Any]:
+        """롤업 항목 1개 조회 (get_item 1회)"""
+        return self.ledger.rollup(user_id, sort_key)
+
+    def query_by_date(self, usage_date: str) -> List[Dict[str, Any]]:
+        """date-index로 하루치 원본 항목 조회 (페이지네이션 포함, 기본 테이블 scan 없음)"""
+        kwargs = {
+            'IndexName': 'date-index',
+            'KeyConditionExpression': Key('usageDate').eq(usage_date)
+        }
+        items = []
+        while True:
+            response = self.table.query(**kwargs)
+            items.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                return items
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def get_daily_rollups(self, user_id: str, month: str) -> List[Dict[str, Any]]:
+        """월의 일별 롤업 목록 (query 1회, 최대 31개)"""
+        return self.ledger.days(user_id, month)
+
     def get_usage_by_date(
         self,
         user_id: str,
@@ -135,23 +149,29 @@ class UsageRepository:
 
 logger = logging.getLogger(__name__)
 
+_shared_leaderboard: Optional[UsageLeaderboard] = None
+
 
 class UsageService:
     """사용량 관련 비즈니스 로직"""
     
-    # 토큰당 예상 비용 (USD)
-    COST_PER_1K_INPUT_TOKENS = {
-        '11': Decimal('0.003'),   # **** 입력 토큰 비용
-        '22': Decimal('0.015')    # **** 입력 토큰 비용
-    }
-
-    COST_PER_1K_OUTPUT_TOKENS = {
-        '11': Decimal('0.015'),   # **** 출력 토큰 비용
-        '22': Decimal('0.075')    # **** 출력 토큰 비용
-    }
-    
-    def __init__(self, repository: Optional[UsageRepository] = None):
+    def __init__(
+        self,
+        repository: Optional[UsageRepository] = None,
+        leaderboard: Optional[UsageLeaderboard] = None
+    ):
         self.repository = repository or UsageRepository()
+        self._leaderboard = leaderboard
+
+    @property
+    def leaderboard(self) -> UsageLeaderboard:
+        """상위 사용자 집계기 (기본은 컨테이너 공용 - 기간별 캐시 공유)"""
+        global _shared_leaderboard
+        if self._leaderboard is None:
+            if _shared_leaderboard is None:
+                _shared_leaderboard = UsageLeaderboard(self.repository.query_by_date, self.recorded_cost)
+            self._leaderboard = _shared_leaderboard
+        return self._leaderboard
     
     def track_usage(
         self,
@@ -162,10 +182,10 @@ class UsageService:
     ) -> Usage:
         """사용량 추적"""
         try:
-            # 비용 계산
-            cost = self.calculate_cost(engine_type, input_tokens, output_tokens)
+            # 비용 계산 (단가 버전 포함 내역)
+            cost = pricing.calculate(TokenUsage(input_tokens, output_tokens))
             
-            # 사용량 증가 (원자적 업데이트)
+            # 사용량 증가 (원장 - 원본/롤업 원자적 업데이트)
             usage = self.repository.increment_usage(
                 user_id=user_id,
                 engine_type=engine_type,
@@ -176,7 +196,7 @@ class UsageService:
             
             logger.info(
                 f"Usage tracked for {user_id}: {input_tokens} input, "
-                f"{output_tokens} output tokens, cost: ${cost}"
+                f"{output_tokens} output tokens, cost: ${cost.total}"
             )
             
             return usage
@@ -189,33 +209,43 @@ class UsageService:
         self,
         engine_type: str,
         input_tokens: int,
-        output_tokens: int
+        output_tokens: int,
+        cache_read_tokens: int = 0,
+        cache_write_tokens: int = 0,
+        model_id: Optional[str] = None,
+        usage_date: Optional[str] = None
     ) -> Decimal:
-        """토큰 사용량에 따른 비용 계산"""
+        """
+        토큰 사용량에 따른 비용 계산 (services/pricing.py 버전별 단가)
+
+        모든 엔진이 같은 Bedrock 모델을 호출하므로 model_id를 주지 않으면 기본 모델 단가를 사용.
+        usage_date를 주면 그 날짜에 유효했던 단가로 계산.
+        """
         try:
-            # 입력 토큰 비용
-            input_cost_rate = self.COST_PER_1K_INPUT_TOKENS.get(
-                engine_type, 
-                Decimal('0.003')
-            )
-            input_cost = (Decimal(input_tokens) / 1000) * input_cost_rate
-            
-            # 출력 토큰 비용
-            output_cost_rate = self.COST_PER_1K_OUTPUT_TOKENS.get(
-                engine_type,
-                Decimal('0.015')
+            cost = pricing.calculate(
+                TokenUsage(input_tokens, output_tokens, cache_read_tokens, cache_write_tokens),
+                model_id,
+                usage_date
             )
-            output_cost = (Decimal(output_tokens) / 1000) * output_cost_rate
-            
-            total_cost = input_cost + output_cost
-            
             # 소수점 4자리까지 반올림
-            return total_cost.quantize(Decimal('0.0001'))
-            
+            return cost.total.quantize(Decimal('0.0001'))
+
         except Exception as e:
             logger.error(f"Error calculating cost: {str(e)}")
             return Decimal('0.0000')
-    
+
+    def recorded_cost(self, engine_type: str, counters: Dict[str, int]) -> Decimal:
+        """롤업/원본 카운터의 비용 - 기록된 costMicros 우선, 없으면(이전 데이터) 토큰으로 계산"""
+        if counters.get('costMicros'):
+            return (Decimal(counters['costMicros']) / pricing.MICROS).quantize(Decimal('0.0001'))
+        return self.calculate_cost(
+            engine_type,
+            int(counters.get('inputTokens', 0)),
+            int(counters.get('outputTokens', 0)),
+            int(counters.get('cacheReadTokens', 0)),
+            int(counters.get('cacheWriteTokens', 0))
+        )
+
     def get_usage_by_date(
         self,
         user_id: str,
@@ -265,101 +295,70 @@ class UsageService:
             logger.error(f"Error getting usage summary: {str(e)}")
             raise
     
-    def get_current_month_usage(self, user_id: str) -> Dict[str, Any]:
-        """현재 월 사용량 조회"""
+    def get_current_month_usage(self, user_id: str, include_daily: bool = False) -> Dict[str, Any]:
+        """현재 월 사용량 조회 (월 롤업 get_item 1회, include_daily 시 일별 롤업 query 1회 추가)"""
         try:
-            # 이번 달 시작일
-            now = datetime.now()
-            start_date = datetime(now.year, now.month, 1)
-            
-            # 사용량 조회
-            usages = self.repository.find_by_user(
-                user_id=user_id,
-                start_date=start_date.strftime('%Y-%m-%d'),
-                end_date=now.strftime('%Y-%m-%d')
-            )
-            
-            # 집계
+            month = datetime.now().strftime('%Y-%m')
+            rollup = self.repository.get_rollup(user_id, month_key(month))
+
             result = {
-                'month': now.strftime('%Y-%m'),
-                'total_requests': 0,
-                'total_tokens': 0,
+                'month': month,
+                'total_requests': rollup['totals']['messageCount'],
+                'total_tokens': rollup['totals']['totalTokens'],
                 'total_cost': Decimal('0'),
                 'by_engine': {},
                 'daily_usage': []
             }
-            
-            by_date = {}
-            for usage in usages:
-                # 전체 집계
-                result['total_requests'] += usage.request_count
-                result['total_tokens'] += usage.total_tokens
-                result['total_cost'] += usage.estimated_cost
-                
-                # 엔진별 집계
-                engine = usage.engine_type
-                if engine not in result['by_engine']:
-                    result['by_engine'][engine] = {
-                        'requests': 0,
-                        'tokens': 0,
-                        'cost': Decimal('0')
-                    }
-                
-                result['by_engine'][engine]['requests'] += usage.request_count
-                result['by_engine'][engine]['tokens'] += usage.total_tokens
-                result['by_engine'][engine]['cost'] += usage.estimated_cost
-                
-                # 일별 집계
-                date = usage.usage_date
-                if date not in by_date:
-                    by_date[date] = {
-                        'date': date,
-                        'requests': 0,
-                        'tokens': 0,
-                        'cost': Decimal('0')
-                    }
-                
-                by_date[date]['requests'] += usage.request_count
-                by_date[date]['tokens'] += usage.total_tokens
-                by_date[date]['cost'] += usage.estimated_cost
-            
-            # 일별 데이터 정렬
-            result['daily_usage'] = sorted(
-                by_date.values(),
-                key=lambda x: x['date']
-            )
-            
-            # Decimal을 문자열로 변환
+
+            totals = rollup['totals']
+            result['cache'] = {
+                'read_tokens': totals['cacheReadTokens'],
+                'write_tokens': totals['cacheWriteTokens'],
+                'savings': str((Decimal(totals['cacheSavingsMicros']) / pricing.MICROS).quantize(Decimal('0.0001')))
+            }
+
+            for engine, counters in rollup['by_engine'].items():
+                cost = self.recorded_cost(engine, counters)
+                result['total_cost'] += cost
+                result['by_engine'][engine] = {
+                    'requests': counters['messageCount'],
+                    'tokens': counters['totalTokens'],
+                    'cost': str(cost)
+                }
+
+            if include_daily:
+                for daily in self.repository.get_daily_rollups(user_id, month):
+                    cost = sum(
+                        (self.recorded_cost(engine, c) for engine, c in daily['by_engine'].items()),
+                        Decimal('0')
+                    )
+                    result['daily_usage'].append({
+                        'date': daily['date'],
+                        'requests': daily['totals']['messageCount'],
+                        'tokens': daily['totals']['totalTokens'],
+                        'cost': str(cost)
+                    })
+
             result['total_cost'] = str(result['total_cost'])
-            for engine in result['by_engine']:
-                result['by_engine'][engine]['cost'] = str(
-                    result['by_engine'][engine]['cost']
-                )
-            for daily in result['daily_usage']:
-                daily['cost'] = str(daily['cost'])
-            
             return result
-            
+
         except Exception as e:
             logger.error(f"Error getting current month usage: {str(e)}")
             raise
-    
+
+    def get_lifetime_usage(self, user_id: str) -> Dict[str, Any]:
+        """누적 사용량 조회 (롤업 get_item 1회)"""
+        try:
+            return self.repository.get_rollup(user_id, LIFETIME)
+        except Exception as e:
+            logger.error(f"Error getting lifetime usage: {str(e)}")
+            raise
+
     def get_usage_limits(self, user_id: str) -> Dict[str, Any]:
         """사용자의 사용량 제한 조회"""
         try:
             # 기본 제한 (추후 사용자별 커스텀 제한 구현 가능)
-            limits = {
-                'daily': {
-                    'requests': 1000,
-                    'tokens': 1000000,
-                    'cost': '100.00'
-                },
-                'monthly': {
-                    'requests': 30000,
-                    'tokens': 30000000,
-                    'cost': '3000.00'
-                }
-            }
+            limits = DEFAULT_USAGE_LIMITS
             
             # 현재 사용량 포함
             current = self.get_current_month_usage(user_id)
@@ -387,10 +386,13 @@ class UsageService:
     def check_usage_limit(
         self,
         user_id: str,
-        estimated_tokens: int
+        estimated_tokens: int = 0,
+        text: Optional[str] = None
     ) -> bool:
-        """사용량 제한 확인"""
+        """사용량 제한 확인 (text를 주면 토큰 수를 추정해 더함)"""
         try:
+            if text:
+                estimated_tokens += estimate_tokens(text)
             limits = self.get_usage_limits(user_id)
             
             # 토큰 제한 확인
@@ -412,11 +414,12 @@ class UsageService:
     def get_top_users(
         self,
         limit: int = 10,
-        period_days: int = 30
+        period_days: int = 30,
+        metric: str = 'tokens'
     ) -> List[Dict[str, Any]]:
-        """상위 사용자 조회"""
+        """상위 사용자 조회 (metric: tokens | cost | requests)"""
         try:
-            return self.repository.get_top_users(limit, period_days)
+            return self.leaderboard.top_users(limit, period_days, metric)
         except Exception as e:
             logger.error(f"Error getting top users: {str(e)}")
             raise
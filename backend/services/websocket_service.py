@@ -4,20 +4,25 @@ WebSocket 메시지 처리 및 Bedrock 통합 서비스
 Application-level Prompt Caching 적용
 """
 import json
-import boto3
 import logging
 import time
 from datetime import datetime
 from typing import List, Dict, Any, Optional, Generator, Tuple
 import uuid
 import os
-import sys
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config.aws import AWS_REGION, DYNAMODB_TABLES
 
+from config.database import get_table_name
 from services.conversation_manager import ConversationManager
-from lib.bedrock_client_enhanced import BedrockClientEnhanced
-from utils.logger import setup_logger
+from services.file_store import get_file_store
+from services.knowledge_index import load_index
+from services.pricing import TokenUsage, calculate as calculate_cost
+from services.prompt_registry import get_prompt_registry
+from services.prompt_snapshots import get_prompt_snapshots
+from services.usage_ledger import get_usage_ledger
+from lib.bedrock_client_enhanced import BedrockClientEnhanced, render_role
+from utils.aws_clients import lazy_table
+from utils.logger import log_event, setup_logger
+from utils.token_estimator import estimate_tokens_batch
 
 logger = setup_logger(__name__)
 
@@ -33,21 +38,22 @@ CACHE_STATS = {
     'invalidations': 0
 }
 
-# DynamoDB 클라이언트 - 프롬프트 테이블 접근용
-from config.settings import settings
-from config.database import get_table_name
-
-dynamodb = boto3.resource('dynamodb', region_name=settings.AWS_REGION)
+# 대화 컨텍스트에 포함할 이전 메시지 토큰 예산
+CONTEXT_MAX_TOKENS = int(os.environ.get('CONTEXT_MAX_TOKENS', '12000'))
 
 # 동적 테이블 이름 생성 (하드코딩 제거)
 PROMPTS_TABLE_NAME = get_table_name('prompts')
 FILES_TABLE_NAME = get_table_name('files')
 
-prompts_table = dynamodb.Table(PROMPTS_TABLE_NAME)
-files_table = dynamodb.Table(FILES_TABLE_NAME)
+# 프롬프트/파일 테이블 - 첫 조회 시 생성 (콜드 스타트 단축)
+prompts_table = lazy_table('prompts')
+files_table = lazy_table('files')
 
-logger.info(f"Using prompts table: {PROMPTS_TABLE_NAME}")
-logger.info(f"Using files table: {FILES_TABLE_NAME}")
+
+def _cache_hit_rate() -> float:
+    """프롬프트 캐시 적중률 (%)"""
+    lookups = CACHE_STATS['hits'] + CACHE_STATS['misses']
+    return round(CACHE_STATS['hits'] / lookups * 100, 1) if lookups else 0.0
 
 
 class WebSocketService:
@@ -58,7 +64,6 @@ class WebSocketService:
         self.conversation_manager = ConversationManager()
         self.prompts_table = prompts_table
         self.files_table = files_table
-        logger.info("WebSocketService initialized with fixed table references")
 
     def process_message(
         self,
@@ -127,39 +132,66 @@ class WebSocketService:
         """
         DynamoDB에서 프롬프트와 파일 로드 (인메모리 캐싱 적용)
 
-        캐시 히트 시 DB 조회를 생략하여 성능 향상
+        엔진 포인터(snapshotId)가 있으면 캐시된 스냅샷 ID와 비교만 하고(TTL 없음),
+        바뀌었을 때만 새 스냅샷을 읽는다. 포인터가 없는 엔진(이관 전)은 TTL 캐시.
         """
         global PROMPT_CACHE
         now = time.time()
+        pointer = self._current_snapshot(engine_type)
 
         # 캐시 확인
         if engine_type in PROMPT_CACHE:
             cached_data, cached_time = PROMPT_CACHE[engine_type]
             age = now - cached_time
 
-            if age < CACHE_TTL:
+            if pointer and cached_data.get('snapshotId') == pointer:
+                CACHE_STATS['hits'] += 1
+                log_event(logger, 'prompt.cache', engine=engine_type, result='hit',
+                          snapshot=pointer[:12], hit_rate=_cache_hit_rate)
+                return cached_data
+            elif pointer:
+                CACHE_STATS['invalidations'] += 1
+                log_event(logger, 'prompt.cache', engine=engine_type, result='stale', snapshot=pointer[:12])
+            elif age < CACHE_TTL:
                 CACHE_STATS['hits'] += 1
-                hit_rate = CACHE_STATS['hits'] / (CACHE_STATS['hits'] + CACHE_STATS['misses']) * 100 if (CACHE_STATS['hits'] + CACHE_STATS['misses']) > 0 else 0
-                logger.info(f"Cache HIT for {engine_type} (age: {age:.1f}s, hit_rate: {hit_rate:.1f}%) - DB query skipped")
+                log_event(logger, 'prompt.cache', engine=engine_type, result='hit',
+                          age_s=round(age, 1), hit_rate=_cache_hit_rate)
                 return cached_data
             else:
                 CACHE_STATS['expirations'] += 1
-                logger.info(f"Cache EXPIRED for {engine_type} (age: {age:.1f}s) - refetching")
+                log_event(logger, 'prompt.cache', engine=engine_type, result='expired', age_s=round(age, 1))
         else:
             CACHE_STATS['misses'] += 1
-            logger.info(f"Cache MISS for {engine_type} - initial fetch")
-
-        # 캐시 미스 또는 만료 - DB에서 로드
-        prompt_data = self._fetch_prompt_from_db(engine_type)
+            log_event(logger, 'prompt.cache', engine=engine_type, result='miss')
+
+        # 캐시 미스/만료/포인터 변경 - 스냅샷(없으면 기본 항목+파일)에서 로드
+        prompt_data = None
+        if pointer:
+            try:
+                prompt_data = get_prompt_snapshots().load(engine_type, pointer)
+            except Exception as e:
+                logger.error(f"Error loading prompt snapshot {pointer} for {engine_type}: {str(e)}")
+        if prompt_data is None:
+            prompt_data = self._fetch_prompt_from_db(engine_type)
 
         # 캐시 업데이트
         PROMPT_CACHE[engine_type] = (prompt_data, now)
-        logger.info(f"Cached prompt for {engine_type} "
-                   f"({len(prompt_data.get('files', []))} files, "
-                   f"{len(str(prompt_data))} bytes)")
+        log_event(logger, 'prompt.cached', engine=engine_type,
+                  files=len(prompt_data.get('files', [])),
+                  snapshot=(prompt_data.get('snapshotId') or '')[:12],
+                  chars=lambda: len(str(prompt_data)))
 
         return prompt_data
 
+    def _current_snapshot(self, engine_type: str) -> Optional[str]:
+        """엔진 포인터 (레지스트리 컨테이너 캐시 - 대부분 호출 없음)"""
+        try:
+            entry = get_prompt_registry().get(engine_type)
+        except Exception as e:
+            logger.error(f"Error reading prompt pointer for {engine_type}: {str(e)}")
+            return None
+        return entry.get('snapshotId') if entry else None
+
     def _fetch_prompt_from_db(self, engine_type: str) -> Dict[str, Any]:
         """
         실제 DB 조회 로직 (캐싱 전용)
@@ -181,35 +213,26 @@ class WebSocketService:
                 prompt_data = {
                     'instruction': item.get('instruction', ''),
                     'description': item.get('description', ''),
-                    'files': []
+                    'files': [],
+                    'compactPrompt': item.get('compactPrompt'),
+                    'snapshotId': item.get('snapshotId')
                 }
 
-                # files 테이블에서 관련 파일들 로드
+                # files 테이블에서 관련 파일들 로드 (페이지 끝까지, 청크 파일은 병렬 조회)
                 try:
-                    # promptId를 기반으로 파일 조회 (GSI 또는 query 사용 추천)
-                    # 현재는 임시로 특정 promptId에 해당하는 파일만 조회
-                    # TODO: files 테이블에 promptId GSI 추가 후 query로 변경
-                    files_response = self.files_table.query(
-                        KeyConditionExpression='promptId = :pid',
-                        ExpressionAttributeValues={
-                            ':pid': engine_type  # engine_type을 promptId로 사용
-                        }
-                    ) if hasattr(self.files_table, 'query') else {'Items': []}
-
-                    if 'Items' in files_response:
-                        for file_item in files_response['Items']:
-                            prompt_data['files'].append({
-                                'fileName': file_item.get('fileName', ''),
-                                'fileContent': file_item.get('fileContent', ''),
-                                'fileType': 'text'  # 기본값
-                            })
+                    for file_item in get_file_store().list_files(engine_type):
+                        prompt_data['files'].append({
+                            'fileName': file_item.get('fileName', ''),
+                            'fileContent': file_item.get('fileContent', ''),
+                            'fileType': 'text'  # 기본값
+                        })
                 except Exception as fe:
                     # Query 실패 시 파일 없이 진행
                     logger.warning(f"Could not load files for prompt {engine_type}: {str(fe)}")
 
                 elapsed = (time.time() - start_time) * 1000
-                logger.info(f"DB fetch for {engine_type}: "
-                          f"{len(prompt_data['files'])} files in {elapsed:.0f}ms")
+                log_event(logger, 'prompt.fetched', engine=engine_type,
+                          files=len(prompt_data['files']), elapsed_ms=round(elapsed))
 
                 return prompt_data
             else:
@@ -227,11 +250,19 @@ class WebSocketService:
         conversation_id: str,
         user_id: str,
         conversation_history: List[Dict],
-        user_role: str = 'user'
+        user_role: str = 'user',
+        assistant_prefill: Optional[str] = None,
+        save_response: bool = True,
+        usage: Optional[Dict] = None
     ) -> Generator[str, None, None]:
         """
         Bedrock 스트리밍 응답 생성
 
+        Args:
+            assistant_prefill: 이어쓰기할 부분 응답 (continue 액션)
+            save_response: 완료 시 응답을 대화에 저장할지 여부
+            usage: Bedrock 보고 토큰 수를 채울 dict (track_usage에 그대로 전달)
+
         Yields:
             str: 응답 청크
         """
@@ -242,14 +273,18 @@ class WebSocketService:
             # DynamoDB에서 프롬프트 로드 (수정된 메서드 사용)
             prompt_data = self._load_prompt_from_dynamodb(engine_type)
 
-            # 로드된 데이터 상세 로깅
-            logger.info(f"=== Prompt Data Loaded for {engine_type} ===")
-            logger.info(f"Instruction length: {len(prompt_data.get('instruction', ''))} chars")
-            logger.info(f"Description length: {len(prompt_data.get('description', ''))} chars")
-            logger.info(f"Files count: {len(prompt_data.get('files', []))}")
+            log_event(
+                logger, 'prompt.loaded', logging.DEBUG,
+                engine=engine_type,
+                instruction_chars=len(prompt_data.get('instruction', '')),
+                description_chars=len(prompt_data.get('description', '')),
+                files=prompt_data.get('fileCount', len(prompt_data.get('files', []))),
+                prerendered='rendered' in prompt_data,
+                history_messages=len(formatted_history)
+            )
 
-            logger.info(f"Streaming response for engine {engine_type}")
-            logger.info(f"Conversation context: {len(formatted_history)} messages")
+            # 검색 모드 엔진 - 질문과 관련된 지식 구간만 선택
+            passages = self._retrieve_knowledge(engine_type, prompt_data, user_message)
 
             # Bedrock 스트리밍 호출
             total_response = ""
@@ -260,13 +295,19 @@ class WebSocketService:
                 user_role=user_role,
                 guidelines=prompt_data.get('instruction'),  # DynamoDB instruction 전달
                 description=prompt_data.get('description'),  # DynamoDB description 전달
-                files=prompt_data.get('files', [])  # DynamoDB files 전달
+                files=prompt_data.get('files', []),  # DynamoDB files 전달
+                assistant_prefill=assistant_prefill,
+                usage=usage,
+                # 저장 시 렌더링된 역할별 템플릿 (스냅샷에 있으면 렌더링 생략)
+                system_template=prompt_data.get('rendered', {}).get(render_role(user_role)),
+                knowledge_passages=passages,
+                compact_prompt=prompt_data.get('compactPrompt')
             ):
                 total_response += chunk
                 yield chunk
 
             # AI 응답을 대화에 저장
-            if total_response:
+            if total_response and save_response:
                 self.conversation_manager.save_message(
                     conversation_id=conversation_id,
                     role='assistant',
@@ -280,6 +321,73 @@ class WebSocketService:
             logger.error(f"Error streaming response: {str(e)}")
             raise
 
+    def _retrieve_knowledge(self, engine_type: str, prompt_data: Dict[str, Any],
+                            user_message: str) -> Optional[List[Dict[str, str]]]:
+        """스냅샷 색인(knowledgeIndex)이 있으면 BM25 검색 구간 ({fileName, text})"""
+        ref = prompt_data.get('knowledgeIndex')
+        if not ref:
+            return None
+        start_time = time.perf_counter()
+        try:
+            index = load_index(ref)
+            passages = index.search(user_message) if index else []
+        except Exception as e:
+            # 색인을 못 읽으면 alwaysInclude 파일만으로 답변
+            logger.error(f"Error retrieving knowledge for {engine_type}: {str(e)}")
+            return None
+        log_event(logger, 'kb.retrieval', engine=engine_type, passages=len(passages),
+                  indexed=ref.get('passages'), tokens=sum(p.tokens for p in passages),
+                  elapsed_ms=round((time.perf_counter() - start_time) * 1000, 1))
+        return [{'fileName': p.file_name, 'text': p.text} for p in passages]
+
+    def save_continuation(
+        self,
+        conversation_id: str,
+        user_id: str,
+        engine_type: str,
+        user_message: str,
+        partial_response: str
+    ) -> Optional[str]:
+        """
+        마감 시간으로 잘린 응답의 이어쓰기 정보 저장
+
+        Returns:
+            continue 액션에 사용할 이어쓰기 토큰 (저장 실패 시 None)
+        """
+        token = uuid.uuid4().hex
+        saved = self.conversation_manager.save_continuation(
+            conversation_id=conversation_id,
+            user_id=user_id,
+            continuation={
+                'token': token,
+                'engineType': engine_type,
+                'userMessage': user_message,
+                'partialResponse': partial_response,
+                'createdAt': datetime.utcnow().isoformat() + 'Z'
+            }
+        )
+        return token if saved else None
+
+    def load_continuation(
+        self,
+        conversation_id: str,
+        user_id: str,
+        token: str
+    ) -> Optional[Dict[str, Any]]:
+        """토큰이 일치하는 이어쓰기 정보와 원래 질문 이전의 대화 히스토리 조회"""
+        continuation = self.conversation_manager.get_continuation(conversation_id, user_id)
+        if not continuation or continuation.get('token') != token:
+            return None
+
+        # 저장된 히스토리 끝의 (원래 질문, 부분 응답)은 프롬프트에서 별도로 전달
+        history = self.conversation_manager.get_conversation_history(conversation_id)
+        if history and history[-1].get('role') == 'assistant':
+            history = history[:-1]
+        if history and history[-1].get('role') == 'user':
+            history = history[:-1]
+
+        return {**continuation, 'history': history}
+
     def clear_history(self, conversation_id: str, user_id: str = None) -> bool:
         """대화 히스토리 초기화"""
         try:
@@ -300,56 +408,54 @@ class WebSocketService:
         user_id: str,
         engine_type: str,
         input_text: str,
-        output_text: str
-    ) -> None:
-        """사용량 추적"""
-        try:
-            # 토큰 계산 (간단한 추정)
-            input_tokens = len(input_text.split())
-            output_tokens = len(output_text.split())
-
-            logger.info(f"Usage tracked - User: {user_id}, Engine: {engine_type}")
-            logger.info(f"Tokens - Input: {input_tokens}, Output: {output_tokens}")
-
-            # DynamoDB에 사용량 저장
-            usage_table = dynamodb.Table(get_table_name('usage'))
-            today = datetime.now().strftime('%Y-%m-%d')
-
-            # date 키 생성 (테이블 스키마: userId, usageDate#engineType)
-            date_key = f"{today}#{engine_type}"
+        output_text: str,
+        usage: Optional[Dict] = None,
+        request_id: Optional[str] = None,
+        latency_ms: Optional[int] = None
+    ) -> int:
+        """
+        사용량 추적 (총 토큰 수 반환 - 쿼터 보정용)
 
-            # 원자적 업데이트로 사용량 증가
-            from decimal import Decimal
-            usage_table.update_item(
-                Key={
-                    'userId': user_id,
-                    'usageDate#engineType': date_key
-                },
-                UpdateExpression="""
-                    ADD totalTokens :total,
-                        inputTokens :input,
-                        outputTokens :output,
-                        messageCount :one
-                    SET updatedAt = :timestamp,
-                        lastUsedAt = :timestamp,
-                        engineType = if_not_exists(engineType, :engineType),
-                        usageDate = if_not_exists(usageDate, :usageDate)
-                """,
-                ExpressionAttributeValues={
-                    ':total': Decimal(str(input_tokens + output_tokens)),
-                    ':input': Decimal(str(input_tokens)),
-                    ':output': Decimal(str(output_tokens)),
-                    ':one': Decimal('1'),
-                    ':timestamp': datetime.now().isoformat(),
-                    ':engineType': engine_type,
-                    ':usageDate': today
-                }
+        usage(stream_response가 채운 Bedrock 보고값)가 있으면 실제 토큰 수를, 없는 항목은
+        텍스트 추정값을 사용하고 캐시 읽기/쓰기를 구분한 비용을 함께 기록한다.
+        request_id/latency_ms는 사용량 이벤트에 그대로 남는다.
+        """
+        try:
+            usage = usage or {}
+            # 토큰 계산 (Bedrock 보고값 우선, 없으면 한글/영문 혼합 추정)
+            estimated_input, estimated_output = estimate_tokens_batch([
+                input_text if 'input' not in usage else '',
+                output_text if 'output' not in usage else ''
+            ])
+            tokens = TokenUsage(
+                input=int(usage.get('input', estimated_input)),
+                output=int(usage.get('output', estimated_output)),
+                cache_read=int(usage.get('cache_read', 0)),
+                cache_write=int(usage.get('cache_write', 0))
+            )
+            cost = calculate_cost(tokens, usage.get('model_id'))
+
+            # 사용량 원장 - 컨테이너에서 집계 후 호출 종료 시(또는 임계값 초과 시) 키별 1회 반영
+            get_usage_ledger().record(
+                user_id, engine_type, tokens.input, tokens.output,
+                cache_read_tokens=tokens.cache_read,
+                cache_write_tokens=tokens.cache_write,
+                cost=cost,
+                request_id=request_id,
+                model_id=usage.get('model_id'),
+                latency_ms=latency_ms,
+                reported='input' in usage
             )
 
-            logger.info(f"Usage saved to DynamoDB - Table: {usage_table.name}, userId: {user_id}, date: {date_key}")
+            log_event(logger, 'usage.tracked', user=user_id, engine=engine_type,
+                      input_tokens=tokens.input, output_tokens=tokens.output,
+                      cache_read=tokens.cache_read, cache_write=tokens.cache_write,
+                      reported='input' in usage, cost=cost.to_dict)
+            return tokens.total
 
         except Exception as e:
             logger.error(f"Error tracking usage: {str(e)}", exc_info=True)
+            return 0
 
     def _merge_conversation_history(
         self,
@@ -400,16 +506,26 @@ class WebSocketService:
         if not conversation_history:
             return ""
 
+        recent = [
+            msg for msg in conversation_history[-10:]  # 최근 10개 메시지만 사용 #대화기억기능
+            if msg.get('content') and msg.get('role', 'user') in ('user', 'assistant')
+        ]
+
+        # 토큰 예산 안에서 최신 메시지부터 포함
+        budget = CONTEXT_MAX_TOKENS
+        kept = 0
+        for tokens in reversed(estimate_tokens_batch([msg['content'] for msg in recent])):
+            if tokens > budget:
+                break
+            budget -= tokens
+            kept += 1
+        if kept < len(recent):
+            log_event(logger, 'context.trimmed', kept=kept, dropped=len(recent) - kept)
+
         formatted_messages = []
-        for msg in conversation_history[-10:]:  # 최근 10개 메시지만 사용 #대화기억기능
-            role = msg.get('role', 'user')
-            content = msg.get('content', '')
-
-            if content:
-                if role == 'user':
-                    formatted_messages.append(f"사용자: {content}")
-                elif role == 'assistant':
-                    formatted_messages.append(f"AI: {content}")
+        for msg in recent[len(recent) - kept:]:
+            prefix = '사용자' if msg.get('role', 'user') == 'user' else 'AI'
+            formatted_messages.append(f"{prefix}: {msg['content']}")
 
         if formatted_messages:
             return "\n\n=== 이전 대화 내용 ===\n" + "\n\n".join(formatted_messages) + "\n\n=== 현재 질문 ==="
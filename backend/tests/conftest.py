@@ -6,7 +6,7 @@ import os
 import sys
 from unittest.mock import Mock, patch
 import boto3
-from moto import mock_dynamodb, mock_bedrock
+from moto import mock_dynamodb
 
 # 프로젝트 경로 추가
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
@@ -92,6 +92,71 @@ def prompts_table(dynamodb_resource):
     return table
 
 
+@pytest.fixture
+def files_table(dynamodb_resource):
+    """Files 테이블 생성 (엔진 지식 파일 + blob#/ingest# 항목)"""
+    table = dynamodb_resource.create_table(
+        TableName='nexus-test-files-test',
+        KeySchema=[
+            {'AttributeName': 'promptId', 'KeyType': 'HASH'},
+            {'AttributeName': 'fileId', 'KeyType': 'RANGE'}
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'promptId', 'AttributeType': 'S'},
+            {'AttributeName': 'fileId', 'AttributeType': 'S'}
+        ],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    return table
+
+
+@pytest.fixture
+def usage_table(dynamodb_resource):
+    """Usage 테이블 생성 (원본/롤업/반영 순번 항목 + date-index)"""
+    table = dynamodb_resource.create_table(
+        TableName='nexus-test-usage-test',
+        KeySchema=[
+            {'AttributeName': 'userId', 'KeyType': 'HASH'},
+            {'AttributeName': 'usageDate#engineType', 'KeyType': 'RANGE'}
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'userId', 'AttributeType': 'S'},
+            {'AttributeName': 'usageDate#engineType', 'AttributeType': 'S'},
+            {'AttributeName': 'usageDate', 'AttributeType': 'S'}
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                'IndexName': 'date-index',
+                'KeySchema': [
+                    {'AttributeName': 'usageDate', 'KeyType': 'HASH'},
+                    {'AttributeName': 'userId', 'KeyType': 'RANGE'}
+                ],
+                'Projection': {'ProjectionType': 'ALL'}
+            }
+        ],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    return table
+
+
+@pytest.fixture
+def usage_events_table(dynamodb_resource):
+    """Usage events 테이블 생성 (시간 샤드 + 이벤트 ID)"""
+    table = dynamodb_resource.create_table(
+        TableName='nexus-test-usage-events-test',
+        KeySchema=[
+            {'AttributeName': 'shard', 'KeyType': 'HASH'},
+            {'AttributeName': 'eventId', 'KeyType': 'RANGE'}
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'shard', 'AttributeType': 'S'},
+            {'AttributeName': 'eventId', 'AttributeType': 'S'}
+        ],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    return table
+
+
 @pytest.fixture
 def api_gateway_event():
     """API Gateway 이벤트 모킹"""
@@ -0,0 +1,47 @@
+"""
+AWS 클라이언트 지연 생성 단위 테스트
+"""
+from unittest.mock import patch
+
+import pytest
+
+from utils import aws_clients
+
+
+@pytest.fixture(autouse=True)
+def reset():
+    aws_clients.reset_clients()
+    yield
+    aws_clients.reset_clients()
+
+
+class TestAwsClients:
+    """지연 생성/재사용 테스트"""
+
+    def test_lazy_table_does_not_create_resource(self):
+        """프록시 생성만으로는 boto3 리소스를 만들지 않음"""
+        with patch('boto3.resource') as resource:
+            aws_clients.lazy_table('usage')
+        resource.assert_not_called()
+
+    def test_table_created_once_and_reused(self):
+        """첫 사용 시 한 번 생성 후 재사용"""
+        with patch('boto3.resource') as resource:
+            table = aws_clients.lazy_table('usage')
+            table.get_item(Key={'userId': 'kim'})
+            table.get_item(Key={'userId': 'lee'})
+            assert aws_clients.get_table('usage') is table.resolve()
+
+        resource.assert_called_once()
+        resource.return_value.Table.assert_called_once()
+        assert 'table:usage' in aws_clients.INIT_TIMINGS
+
+    def test_clients_cached_per_arguments(self):
+        """엔드포인트가 다르면 별도 클라이언트"""
+        with patch('boto3.client', side_effect=lambda *a, **kw: object()):
+            first = aws_clients.get_client('apigatewaymanagementapi', endpoint_url='https://a/dev')
+            again = aws_clients.get_client('apigatewaymanagementapi', endpoint_url='https://a/dev')
+            other = aws_clients.get_client('apigatewaymanagementapi', endpoint_url='https://b/dev')
+
+        assert first is again
+        assert first is not other
@@ -0,0 +1,99 @@
+"""
+ConnectionFanout 단위 테스트
+"""
+import json
+from unittest.mock import Mock
+
+import pytest
+
+from services.connection_fanout import ConnectionFanout
+
+
+class GoneException(Exception):
+    """API Gateway GoneException 대체"""
+
+
+@pytest.fixture
+def connections_table(dynamodb_resource):
+    """userId-index가 있는 연결 테이블"""
+    table = dynamodb_resource.create_table(
+        TableName='nexus-test-connections-test',
+        KeySchema=[{'AttributeName': 'connectionId', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[
+            {'AttributeName': 'connectionId', 'AttributeType': 'S'},
+            {'AttributeName': 'userId', 'AttributeType': 'S'}
+        ],
+        GlobalSecondaryIndexes=[{
+            'IndexName': 'userId-index',
+            'KeySchema': [{'AttributeName': 'userId', 'KeyType': 'HASH'}],
+            'Projection': {'ProjectionType': 'ALL'}
+        }],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    table.put_item(Item={'connectionId': 'laptop', 'userId': 'kim@sedaily.com', 'protocol': 'verbose'})
+    table.put_item(Item={'connectionId': 'phone', 'userId': 'kim@sedaily.com', 'protocol': 'c1'})
+    table.put_item(Item={'connectionId': 'other', 'userId': 'lee@sedaily.com'})
+    return table
+
+
+def _client(gone=()):
+    client = Mock()
+    client.exceptions.GoneException = GoneException
+
+    def post(ConnectionId, Data):
+        if ConnectionId in gone:
+            raise GoneException()
+
+    client.post_to_connection.side_effect = post
+    return client
+
+
+class TestConnectionFanout:
+    """팬아웃 전송 테스트"""
+
+    def test_single_connection_without_broadcast(self, connections_table):
+        """broadcast가 꺼져 있으면 발신 연결로만 전송"""
+        client = _client()
+        fanout = ConnectionFanout(client, 'laptop', user_id='kim@sedaily.com',
+                                  connections_table=connections_table)
+
+        fanout.send({'type': 'ai_chunk', 'chunk': '안녕', 'chunk_index': 0})
+
+        assert fanout.targets == [('laptop', 'verbose')]
+        assert client.post_to_connection.call_count == 1
+
+    def test_broadcast_to_user_connections(self, connections_table):
+        """같은 사용자의 모든 연결로 각 프로토콜에 맞게 전송"""
+        client = _client()
+        fanout = ConnectionFanout(client, 'laptop', user_id='kim@sedaily.com', broadcast=True,
+                                  connections_table=connections_table)
+
+        fanout.send({'type': 'ai_chunk', 'chunk': '안녕', 'chunk_index': 0})
+        fanout.close()
+
+        sent = {c.kwargs['ConnectionId']: json.loads(c.kwargs['Data'])
+                for c in client.post_to_connection.call_args_list}
+        assert set(sent) == {'laptop', 'phone'}
+        assert sent['laptop']['type'] == 'ai_chunk'
+        assert sent['phone'] == {'t': 'c', 'd': '안녕', 'i': 0}
+
+    def test_unregistered_origin_does_not_broadcast(self, connections_table):
+        """발신 연결이 해당 사용자로 등록되지 않았으면 다른 연결로 전송하지 않음"""
+        fanout = ConnectionFanout(_client(), 'other', user_id='kim@sedaily.com', broadcast=True,
+                                  connections_table=connections_table)
+
+        assert fanout.targets == [('other', 'verbose')]
+
+    def test_gone_connections_pruned_in_batch(self, connections_table):
+        """끊어진 연결은 이후 전송에서 제외되고 종료 시 삭제"""
+        client = _client(gone={'phone'})
+        fanout = ConnectionFanout(client, 'laptop', user_id='kim@sedaily.com', broadcast=True,
+                                  connections_table=connections_table)
+
+        fanout.send({'type': 'ai_start'})
+        fanout.send({'type': 'ai_chunk', 'chunk': '다음', 'chunk_index': 0})
+        fanout.close()
+
+        assert client.post_to_connection.call_count == 3
+        assert 'Item' not in connections_table.get_item(Key={'connectionId': 'phone'})
+        assert 'Item' in connections_table.get_item(Key={'connectionId': 'laptop'})
@@ -0,0 +1,124 @@
+"""
+지식 파일 저장소 단위 테스트
+"""
+from services import file_store
+from services.file_store import FileStore, ObjectChunkStore, content_hash
+
+
+class TestFileStore:
+    """인라인/청크 저장 + 조회 테스트"""
+
+    def test_large_files_are_chunked_and_deduplicated(self, files_table, tmp_path):
+        """한도를 넘는 파일은 객체 저장소 청크로, 같은 청크는 한 번만 저장"""
+        store = FileStore(lambda: files_table, chunk_store=ObjectChunkStore(root=str(tmp_path)),
+                          inline_max_chars=8, chunk_chars=4)
+        small = store.put_file('11', 'a', 'a.txt', '짧은 글', '2025-01-01T00:00:00Z')
+        large = store.put_file('11', 'b', 'b.txt', '가나다라가나다라마', '2025-01-02T00:00:00Z')
+
+        assert small['fileContent'] == '짧은 글' and 'chunks' not in small
+        assert 'fileContent' not in large
+        assert large['chunks'] == [content_hash('가나다라'), content_hash('가나다라'), content_hash('마')]
+        assert len([path for path in tmp_path.rglob('*') if path.is_file()]) == 2
+
+        files = store.list_files('11')
+        assert [f['fileContent'] for f in files] == ['짧은 글', '가나다라가나다라마']
+        assert [f['fileId'] for f in store.list_files('11', with_content=False)] == ['a', 'b']
+
+        updated = store.update_file('11', 'b', content='작음')
+        assert updated['fileContent'] == '작음' and updated['fileName'] == 'b.txt'
+        assert store.update_file('11', 'missing', content='x') is None
+
+    def test_list_files_pages_and_reads_legacy_blobs(self, files_table, tmp_path):
+        """query 페이지 끝까지 읽고, 객체 저장소에 없는 청크는 files 테이블 blob#에서 읽음"""
+        store = FileStore(lambda: files_table, chunk_store=ObjectChunkStore(root=str(tmp_path)))
+        filler = 'x' * 300000
+        for index in range(5):
+            files_table.put_item(Item={'promptId': '22', 'fileId': f"f{index}", 'fileName': f"f{index}.txt",
+                                       'fileContent': filler, 'createdAt': f"2025-01-0{index + 1}"})
+        digest = content_hash('이전 형식')
+        files_table.put_item(Item={'promptId': f"blob#{digest}", 'fileId': 'content', 'fileContent': '이전 형식'})
+
+        assert len(store.list_files('22', with_content=False)) == 5
+        assert store.get_blobs([{'hash': digest}]) == {digest: '이전 형식'}
+
+    def test_batch_write_retries_unprocessed_items(self, files_table, tmp_path, monkeypatch):
+        """BatchWriteItem 25개씩, 미처리 항목은 재요청, 끝까지 남은 항목만 failed, 목록 순서 = 입력 순서"""
+        monkeypatch.setattr(file_store, 'FILE_BATCH_BACKOFF_S', 0)
+        monkeypatch.setattr(file_store, 'FILE_BATCH_MAX_RETRIES', 2)
+        client = files_table.meta.client
+        real = client.batch_write_item
+        calls = []
+
+        def flaky(RequestItems):
+            """매 요청의 마지막 항목은 처음 한 번 미처리, 'stuck'은 항상 미처리"""
+            requests = RequestItems[files_table.name]
+            calls.append(len(requests))
+            keep = [r for r in requests if file_store._request_file_id(r) != 'stuck']
+            unprocessed = [r for r in requests if r not in keep]
+            if len(calls) == 1:
+                unprocessed.append(keep.pop())
+            if keep:
+                real(RequestItems={files_table.name: keep})
+            return {'UnprocessedItems': {files_table.name: unprocessed} if unprocessed else {}}
+
+        monkeypatch.setattr(client, 'batch_write_item', flaky)
+        store = FileStore(lambda: files_table, chunk_store=ObjectChunkStore(root=str(tmp_path)))
+        files = [{'fileId': f"f{index:02d}", 'fileName': f"{index}.txt", 'fileContent': str(index)}
+                 for index in range(30)] + [{'fileId': 'stuck', 'fileContent': 'x'}]
+
+        results = store.put_files('11', files)
+        assert calls[:2] == [25, 1]
+        assert [r['status'] for r in results] == ['created'] * 30 + ['failed']
+        assert [f['fileId'] for f in store.list_files('11', with_content=False)] == [f['fileId'] for f in files[:30]]
+
+        deleted = store.delete_files('11', ['f00', 'f01', 'f01', 'stuck'])
+        assert [(r['fileId'], r['status']) for r in deleted] == [('f00', 'deleted'), ('f01', 'deleted'), ('stuck', 'failed')]
+        assert len(store.list_files('11', with_content=False)) == 28
+
+    def test_batch_write_group_error_fails_only_that_group(self, files_table, tmp_path, monkeypatch):
+        """한 묶음의 요청 오류는 그 묶음 항목만 failed - 앞 묶음은 저장된 채로 항목별 결과를 돌려줌"""
+        client = files_table.meta.client
+        real = client.batch_write_item
+        calls = []
+
+        def failing(RequestItems):
+            calls.append(len(RequestItems[files_table.name]))
+            if len(calls) == 2:
+                raise RuntimeError('ProvisionedThroughputExceededException')
+            return real(RequestItems=RequestItems)
+
+        monkeypatch.setattr(client, 'batch_write_item', failing)
+        store = FileStore(lambda: files_table, chunk_store=ObjectChunkStore(root=str(tmp_path)))
+        files = [{'fileId': f"f{index:02d}", 'fileName': f"{index}.txt", 'fileContent': str(index)}
+                 for index in range(30)]
+
+        results = store.put_files('11', files)
+        assert calls == [25, 5]
+        assert [r['status'] for r in results] == ['created'] * 25 + ['failed'] * 5
+        assert results[-1]['error'] == 'ProvisionedThroughputExceededException'
+        assert len(store.list_files('11', with_content=False)) == 25
+
+    def test_failed_item_does_not_dedup_later_files(self, files_table, tmp_path, monkeypatch):
+        """저장에 실패한 파일과 겹쳐 빠졌던 문단은 뒤 파일에 다시 들어감 (엔진에서 사라지지 않음)"""
+        monkeypatch.setattr(file_store, 'FILE_BATCH_BACKOFF_S', 0)
+        monkeypatch.setattr(file_store, 'FILE_BATCH_MAX_RETRIES', 0)
+        client = files_table.meta.client
+        real = client.batch_write_item
+
+        def drop_a(RequestItems):
+            requests = RequestItems[files_table.name]
+            keep = [r for r in requests if file_store._request_file_id(r) != 'a']
+            real(RequestItems={files_table.name: keep})
+            return {'UnprocessedItems': {files_table.name: [r for r in requests if r not in keep]}}
+
+        monkeypatch.setattr(client, 'batch_write_item', drop_a)
+        store = FileStore(lambda: files_table, chunk_store=ObjectChunkStore(root=str(tmp_path)), normalize=True)
+        paragraph = '코스피 지수는 외국인 순매수에 힘입어 전 거래일보다 오른 2,650선에서 마감했다. 반도체 업종이 상승을 이끌었다.'
+
+        results = store.put_files('11', [{'fileId': 'a', 'fileContent': paragraph},
+                                         {'fileId': 'b', 'fileContent': f"{paragraph}\n\n추가 문단"}])
+        assert [r['status'] for r in results] == ['failed', 'created']
+        assert results[1]['item']['fileContent'] == f"{paragraph}\n\n추가 문단"
+        b = store.get_file('11', 'b')
+        assert b['fileContent'] == f"{paragraph}\n\n추가 문단"
+        assert b['normalization']['duplicateParagraphs'] == 0
@@ -0,0 +1,85 @@
+"""
+지식 파일 수집 단위 테스트
+"""
+import io
+import zipfile
+
+import pytest
+
+from services.file_store import FileStore, ObjectChunkStore
+from services.ingestion import IngestionService, LocalIngestionQueue, extract_text, normalize_text
+
+
+@pytest.fixture
+def ingestion(tmp_path, files_table):
+    """files 테이블 + 로컬 청크/큐 디렉터리 (스냅샷 생성은 호출 기록으로 대체)"""
+    store = FileStore(lambda: files_table, chunk_store=ObjectChunkStore(root=str(tmp_path / 'chunks')),
+                      inline_max_chars=8, chunk_chars=8)
+    captured = []
+    service = IngestionService(lambda: files_table, LocalIngestionQueue(str(tmp_path / 'queue')), store,
+                               capture=captured.append)
+    return service, store, captured
+
+
+def _docx(*paragraphs):
+    namespace = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+    body = ''.join(f'<w:p><w:r><w:t>{text}</w:t></w:r></w:p>' for text in paragraphs)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('word/document.xml', f'<w:document xmlns:w="{namespace}"><w:body>{body}</w:body></w:document>')
+    return buffer.getvalue()
+
+
+class TestIngestion:
+    """추출/정규화 + 큐 작업 처리 테스트"""
+
+    def test_extract_and_normalize(self):
+        """DOCX 문단, HTML 태그 제거, CP949 텍스트, 공백/빈 줄 정리"""
+        assert extract_text(_docx('첫 문단', '둘째 문단'), 'guide.docx') == '첫 문단\n\n둘째 문단'
+        html = '<html><style>p{}</style><p>본문</p><script>x()</script></html>'.encode('utf-8')
+        assert normalize_text(extract_text(html, 'page.html')) == '본문'
+        assert extract_text('한글'.encode('cp949'), 'legacy.txt') == '한글'
+        assert normalize_text('가 \r\n\r\n\r\n\r\n나\u200b') == '가\n\n나'
+
+    def test_queued_document_lands_in_file_store(self, ingestion):
+        """업로드 → 큐 → 처리 후 파일이 청크로 저장되고 진행 상황이 done, 재전달은 무시"""
+        service, store, captured = ingestion
+        job = service.submit('11', 'guide.docx', _docx('용어 사전 본문입니다', '두 번째 문단'))
+        assert job['status'] == 'queued' and 'raw' not in job
+
+        messages = service.queue.receive()
+        assert messages == [{'engineType': '11', 'jobId': job['jobId']}]
+        done = service.process('11', job['jobId'])
+
+        assert done['status'] == 'done' and done['progress'] == 100 and done['fileId'] == job['jobId']
+        files = store.list_files('11')
+        assert [f['fileContent'] for f in files] == ['용어 사전 본문입니다\n\n두 번째 문단']
+        assert files[0]['chunks'] and captured == ['11']
+
+        service.process('11', job['jobId'])
+        assert captured == ['11']
+        assert [j['jobId'] for j in service.jobs('11')] == [job['jobId']]
+
+    def test_unsupported_document_fails_without_retry(self, ingestion):
+        service, store, captured = ingestion
+        job = service.submit('11', 'image.png', b'\x89PNG')
+        failed = service.process('11', job['jobId'])
+        assert failed['status'] == 'failed' and 'png' in failed['error']
+        assert store.list_files('11') == [] and captured == []
+
+    def test_last_receive_marks_job_failed(self, ingestion, monkeypatch):
+        """추출 외 오류는 다시 던져 재시도, 마지막 수신이면 진행 중 상태로 남기지 않고 failed"""
+        service, store, captured = ingestion
+        job = service.submit('11', 'guide.txt', '본문'.encode('utf-8'))
+
+        def broken(*args, **kwargs):
+            raise RuntimeError('throttled')
+
+        monkeypatch.setattr(store, 'put_file', broken)
+        with pytest.raises(RuntimeError):
+            service.process('11', job['jobId'])
+        assert service.status('11', job['jobId'])['status'] == 'storing'
+
+        failed = service.process('11', job['jobId'], final_attempt=True)
+        assert failed['status'] == 'failed' and failed['error'] == 'throttled'
+        assert captured == []
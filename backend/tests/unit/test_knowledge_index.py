@@ -0,0 +1,37 @@
+"""
+지식 파일 검색 색인 단위 테스트
+"""
+from services.knowledge_index import KnowledgeIndex, split_passages, tokenize, use_retrieval
+
+
+class TestKnowledgeIndex:
+    """토큰화/구간 분할/BM25 검색 테스트"""
+
+    def test_tokenize_uses_hangul_bigrams_and_words(self):
+        """한글은 2글자 n-gram (조사가 붙어도 어간 일치), 영문/숫자는 단어"""
+        assert tokenize('경제기사를 GDP 2025') == ['경제', '제기', '기사', '사를', 'gdp', '2025']
+        assert set(tokenize('경제기사')) <= set(tokenize('경제기사를'))
+
+    def test_split_passages_packs_paragraphs(self):
+        """빈 줄 기준 문단을 한도 안에서 묶고, 긴 문단은 잘라냄"""
+        assert split_passages('가나\n\n다라\n\n' + '마' * 7, max_chars=6) == ['가나\n\n다라', '마마마마마마', '마']
+
+    def test_search_returns_relevant_passages_within_budget(self):
+        """질문과 겹치는 구간만 토큰 예산 안에서, 원래 순서로 반환 (JSON 왕복 후에도 동일)"""
+        files = [
+            {'fileName': 'style.txt', 'fileContent': '숫자 표기는 아라비아 숫자를 씁니다.\n\n인명은 처음 나올 때 직함을 붙입니다.'},
+            {'fileName': 'terms.txt', 'fileContent': '환율은 원/달러 기준으로 씁니다.\n\n' + '무관한 내용 ' * 50}
+        ]
+        index = KnowledgeIndex.build(files, passage_chars=40)
+
+        passages = KnowledgeIndex.from_json(index.to_json()).search('환율 표기와 숫자 표기 방법', top_k=2)
+        assert [p.file_name for p in passages] == ['style.txt', 'terms.txt']
+        assert '아라비아' in passages[0].text and '환율' in passages[1].text
+        assert index.search('환율', token_budget=0) == []
+        assert index.search('전혀 다른 질문') == []
+
+    def test_use_retrieval_excludes_always_include_files(self):
+        files = [{'fileContent': 'x' * 10, 'alwaysInclude': True}, {'fileContent': 'y' * 5}]
+        assert not use_retrieval(files, enabled=True, min_chars=10)
+        assert use_retrieval(files, enabled=True, min_chars=5)
+        assert not use_retrieval(files, enabled=False, min_chars=5)
@@ -0,0 +1,85 @@
+"""
+지식 파일 정규화 단위 테스트
+"""
+import unicodedata
+
+import pytest
+
+from services.file_store import FileStore, ObjectChunkStore
+from services.knowledge_normalizer import normalize_knowledge, paragraph_fingerprint
+
+PARAGRAPH = '코스피 지수는 외국인 순매수에 힘입어 전 거래일보다 1.2% 오른 2,650선에서 마감했다. 반도체 업종이 상승을 이끌었다.'
+
+
+@pytest.fixture
+def store(tmp_path, files_table):
+    return FileStore(lambda: files_table, chunk_store=ObjectChunkStore(root=str(tmp_path)), normalize=True)
+
+
+class TestKnowledgeNormalizer:
+    """NFC/공백/머리글 정리 + 문단 중복 제거 + 원본 보관"""
+
+    def test_normalize_text(self):
+        """자모 분리 한글/전각 공백/쪽 번호/반복 머리글/중복 문단 정리, 절감 토큰 보고"""
+        text = (unicodedata.normalize('NFD', '경제　용어') + '   사전\n\n- 1 -\n\n사내 대외비 2024\n'
+                + PARAGRAPH + '\n\n사내 대외비 2024\n\n' + PARAGRAPH.replace(' ', '  ') + '\n\n사내 대외비 2024\n\n\n\n끝')
+        result = normalize_knowledge(text)
+
+        assert result.text == f"경제 용어 사전\n\n사내 대외비 2024\n{PARAGRAPH}\n\n{PARAGRAPH}\n\n끝"
+        assert result.report['boilerplateLines'] == 3
+        # 머리글 줄이 붙은 첫 문단과 둘째 문단은 다른 문단
+        assert result.report['duplicateParagraphs'] == 0
+        assert result.report['savedTokens'] > 0
+
+        again = normalize_knowledge(f"{PARAGRAPH}\n\n{PARAGRAPH.replace(' ', chr(10))}")
+        assert again.text == PARAGRAPH and again.report['duplicateParagraphs'] == 1
+        assert again.fingerprints == [paragraph_fingerprint(PARAGRAPH)]
+
+    def test_numeric_tables_are_kept(self):
+        """숫자만 다른 줄(분기별 실적 표)과 표 안쪽의 같은 행은 머리글로 보지 않음"""
+        table = '\n'.join([
+            '1분기 매출 100억원', '1분기 영업이익 해당 없음', '2분기 매출 120억원', '2분기 영업이익 해당 없음',
+            '3분기 매출 150억원', '3분기 영업이익 해당 없음', '4분기 매출 170억원'
+        ])
+        rows = '\n'.join(['해당 없음 해당 없음', '해당 없음 해당 없음', '해당 없음 해당 없음', '합계 540억원'])
+        text = f"{table}\n\n2024년 실적\n\n2023년 실적\n\n2022년 실적\n\n연도별 합계\n{rows}"
+        result = normalize_knowledge(text)
+
+        assert result.text == text
+        assert result.report['boilerplateLines'] == 0
+
+    def test_file_store_dedups_across_files_and_keeps_original(self, store):
+        """다른 파일과 겹치는 문단은 제거하고 원본은 보관 (되돌리기 가능), 이름만 바꾸면 정규화 결과 유지"""
+        store.put_file('11', 'a', 'a.txt', PARAGRAPH, '2025-01-01T00:00:00Z')
+        raw = f"새 내용\n\n{PARAGRAPH}"
+        item = store.put_file('11', 'b', 'b.txt', raw, '2025-01-02T00:00:00Z')
+
+        assert item['fileContent'] == '새 내용'
+        assert item['normalization']['duplicateParagraphs'] == 1
+        assert store.get_original('11', 'b') == raw
+        assert [f.get('normalization', {}).get('duplicateParagraphs') for f in store.list_files('11')] == [0, 1]
+
+        renamed = store.update_file('11', 'b', file_name='b2.txt')
+        assert renamed['fileContent'] == '새 내용' and store.get_original('11', 'b') == raw
+
+        restored = store.update_file('11', 'b', content=raw, normalize=False)
+        assert restored['fileContent'] == raw and 'original' not in restored
+
+    def test_removed_paragraph_returns_to_deduped_file(self, store):
+        """중복 문단을 가진 파일을 지우거나 본문을 바꾸면, 그 문단을 중복으로 뺐던 파일에 다시 들어감"""
+        store.put_file('11', 'a', 'a.txt', PARAGRAPH, '2025-01-01T00:00:00Z')
+        store.put_file('11', 'b', 'b.txt', f"새 내용\n\n{PARAGRAPH}", '2025-01-02T00:00:00Z')
+        assert store.get_file('11', 'b')['fileContent'] == '새 내용'
+
+        store.update_file('11', 'a', content='다른 내용')
+        b = store.get_file('11', 'b')
+        assert b['fileContent'] == f"새 내용\n\n{PARAGRAPH}"
+        assert b['normalization']['duplicateParagraphs'] == 0
+
+        # 남은 파일에 같은 문단이 있으면 다시 빼고, 그 파일을 지우면 되살림
+        store.put_file('11', 'c', 'c.txt', PARAGRAPH, '2025-01-03T00:00:00Z')
+        assert store.get_file('11', 'c')['fileContent'] == ''
+        store.delete_file('11', 'b')
+        assert store.get_file('11', 'c')['fileContent'] == PARAGRAPH
+        store.delete_files('11', ['c'])
+        assert [f['fileId'] for f in store.list_files('11')] == ['a']
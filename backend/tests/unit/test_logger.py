@@ -0,0 +1,94 @@
+"""
+구조화 로깅 단위 테스트
+"""
+import json
+import logging
+from unittest.mock import Mock
+
+import pytest
+
+from utils import logger as log_utils
+from utils.logger import StreamLogSummary, log_event, summarize_event
+
+
+@pytest.fixture
+def capture(monkeypatch):
+    """샘플링 설정 초기화 + 기록된 메시지 수집"""
+    monkeypatch.delenv('LOG_SAMPLE_RATES', raising=False)
+    log_utils.reset_sample_rates()
+    records = []
+    test_logger = logging.getLogger('tests.logger')
+    test_logger.setLevel(logging.INFO)
+    handler = logging.Handler()
+    handler.emit = lambda record: records.append(record.getMessage())
+    test_logger.addHandler(handler)
+    yield test_logger, records
+    test_logger.removeHandler(handler)
+    log_utils.reset_sample_rates()
+
+
+class TestLogEvent:
+    """log_event 테스트"""
+
+    def test_structured_record(self, capture):
+        """이벤트 타입과 필드를 JSON 한 줄로 기록"""
+        test_logger, records = capture
+        log_event(test_logger, 'usage.tracked', engine='11', input_tokens=3)
+
+        assert json.loads(records[0]) == {'event': 'usage.tracked', 'engine': '11', 'input_tokens': 3}
+
+    def test_filtered_level_skips_lazy_fields(self, capture):
+        """레벨에서 걸러지면 지연 필드를 계산하지 않음"""
+        test_logger, records = capture
+        expensive = Mock(return_value=1)
+
+        assert log_event(test_logger, 'prompt.loaded', logging.DEBUG, size=expensive) is False
+        expensive.assert_not_called()
+        assert records == []
+
+    def test_sample_rate_zero_drops_event(self, capture, monkeypatch):
+        """샘플링 비율 0인 타입(접두사 포함)은 기록하지 않음"""
+        test_logger, records = capture
+        monkeypatch.setenv('LOG_SAMPLE_RATES', 'api.*=0,ws.message.event=1')
+        log_utils.reset_sample_rates()
+
+        log_event(test_logger, 'api.usage.event')
+        log_event(test_logger, 'ws.message.event')
+
+        assert [json.loads(r)['event'] for r in records] == ['ws.message.event']
+
+
+class TestSummarizeEvent:
+    """Lambda 이벤트 요약 테스트"""
+
+    def test_redacts_and_truncates(self):
+        """헤더 제외, 민감 키 마스킹, 긴 본문 절단"""
+        event = {
+            'requestContext': {'connectionId': 'abc', 'routeKey': 'sendMessage'},
+            'headers': {'Authorization': 'Bearer secret'},
+            'body': json.dumps({'message': '가' * 1000, 'token': 'secret'})
+        }
+
+        summary = summarize_event(event, max_chars=10)
+
+        assert 'headers' not in summary
+        assert summary['connectionId'] == 'abc'
+        assert summary['body']['token'] == '[REDACTED]'
+        assert summary['body']['message'] == '가' * 10 + '...(+990 chars)'
+
+
+class TestStreamLogSummary:
+    """스트림 요약 테스트"""
+
+    def test_one_record_per_stream(self, capture):
+        """청크 수와 관계없이 요약 1개"""
+        test_logger, records = capture
+        summary = StreamLogSummary(connection_id='conn')
+        for chunk in ['안녕', '하세요', '!']:
+            summary.add(chunk)
+        summary.emit(test_logger, truncated=False)
+
+        assert len(records) == 1
+        record = json.loads(records[0])
+        assert (record['chunks'], record['chars'], record['max_chunk_chars']) == (3, 6, 3)
+        assert record['connection_id'] == 'conn'
@@ -0,0 +1,39 @@
+"""
+가격 엔진 단위 테스트
+"""
+from decimal import Decimal
+
+from services import pricing
+from services.pricing import TokenUsage, calculate, model_family, price_for
+
+
+class TestPricing:
+    """버전별 단가/캐시 비용 테스트"""
+
+    def test_model_family_and_version(self):
+        """리전 접두사/날짜 접미사를 떼고 가장 긴 계열로 매칭, 적용일 기준 버전 선택"""
+        assert model_family('us.anthropic.claude-opus-4-1-20250805-v1:0') == 'claude-opus-4-1'
+        assert model_family('anthropic.claude-opus-4-20250514-v1:0') == 'claude-opus-4'
+
+        table = pricing.PRICE_TABLES['claude-sonnet-4']
+        pricing.PRICE_TABLES['claude-sonnet-4'] = table + [
+            ('2026-01-01', pricing.ModelPrice(Decimal('2'), Decimal('10'), Decimal('2.5'), Decimal('0.2')))
+        ]
+        try:
+            assert price_for('claude-sonnet-4-x', '2025-12-31')[0] == 'claude-sonnet-4@2025-05-22'
+            version, price = price_for('claude-sonnet-4-x', '2026-03-01')
+            assert version == 'claude-sonnet-4@2026-01-01' and price.input == Decimal('2')
+        finally:
+            pricing.PRICE_TABLES['claude-sonnet-4'] = table
+
+    def test_cache_read_and_write_priced_separately(self):
+        """캐시 쓰기는 할증, 캐시 읽기는 할인 단가 - 절감액은 일반 입력 단가 대비"""
+        cost = calculate(TokenUsage(input=1000, output=500, cache_read=100000, cache_write=10000),
+                         'us.anthropic.claude-sonnet-4-20250514-v1:0', '2025-06-01')
+
+        assert cost.input == Decimal('0.003')
+        assert cost.output == Decimal('0.0075')
+        assert cost.cache_read == Decimal('0.03')
+        assert cost.cache_write == Decimal('0.0375')
+        assert cost.savings == Decimal('0.33') - Decimal('0.0675')
+        assert cost.micros == 78000
@@ -0,0 +1,47 @@
+"""
+프롬프트 API 핸들러 단위 테스트
+"""
+import json
+
+import pytest
+
+from handlers.api import prompt
+from services import prompt_snapshots
+from services.file_store import FileStore, ObjectChunkStore
+from services.prompt_registry import PromptRegistry
+from services.prompt_snapshots import PromptSnapshots
+
+
+@pytest.fixture
+def api(monkeypatch, tmp_path, prompts_table, files_table):
+    """prompts/files 테이블에 연결한 핸들러 (CountTokens는 글자 수로 대체)"""
+    monkeypatch.setattr(prompt_snapshots, 'count_system_tokens', len)
+    tables = {'prompts': prompts_table, 'files': files_table}
+    registry = PromptRegistry(lambda: prompts_table, ttl_s=0)
+    store = FileStore(lambda: files_table, chunk_store=ObjectChunkStore(root=str(tmp_path)))
+    snapshots = PromptSnapshots(lambda: prompts_table, lambda: files_table, registry, store)
+    monkeypatch.setattr(prompt, 'prompts_table', prompts_table)
+    monkeypatch.setattr(prompt, 'get_prompt_registry', lambda: registry)
+    monkeypatch.setattr(prompt, 'get_file_store', lambda: store)
+    monkeypatch.setattr(prompt, 'get_prompt_snapshots', lambda: snapshots)
+    return tables, store
+
+
+def _call(method, path, path_params=None, body=None):
+    response = prompt.handler({'httpMethod': method, 'path': path, 'pathParameters': path_params or {},
+                               'body': json.dumps(body, ensure_ascii=False) if body is not None else None}, None)
+    return response['statusCode'], json.loads(response['body']) if response['body'] else None
+
+
+class TestPromptApi:
+    """프롬프트 목록/저장 라우트 테스트"""
+
+    def test_list_prompts_from_registry(self, api):
+        """GET /prompts는 레지스트리 목록 (저장한 엔진과 스냅샷 포인터 포함)"""
+        status, _ = _call('POST', '/prompts/11', {'promptId': '11'}, {'description': '기사', 'instruction': '지침'})
+        assert status in (200, 201)
+
+        status, data = _call('GET', '/prompts')
+        assert status == 200
+        assert [p['engineType'] for p in data['prompts']] == ['11']
+        assert data['prompts'][0]['snapshotId']
@@ -0,0 +1,39 @@
+"""
+시스템 프롬프트 압축 단위 테스트
+"""
+from lib.bedrock_client_enhanced import compaction_report, render_system_template
+from lib.prompt_compaction import compact_template, is_compact, normalize_whitespace
+
+
+def _render(role, compact, files=()):
+    return render_system_template({
+        'prompt': {'description': '기사 작성', 'instruction': '지침', 'compactPrompt': compact},
+        'files': list(files),
+        'userRole': role
+    }, '11')
+
+
+class TestPromptCompaction:
+    """장식/중복 제거 + 엔진별 스위치 테스트"""
+
+    def test_compact_template_strips_decoration_and_duplicates(self):
+        text = '━━━━━━\n## 🎯 [1. 사명]\n━━━━━━\n□ 출처 명시\n⚠️ 확신 없으면 재검토\n• 출처 명시\n\n\n\n현재 시간: {{current_datetime}}'
+        assert compact_template(text) == '## [1. 사명]\n- 출처 명시\n확신 없으면 재검토\n\n현재 시간: {{current_datetime}}'
+        assert normalize_whitespace('가  나 \n\n\n\n  다') == '가 나\n\n  다'
+
+    def test_compact_render_uses_role_security_rules(self):
+        """압축 렌더링은 더 짧고, 역할별 보안 규칙이 실제로 들어감 (기본 렌더링은 역할과 무관)"""
+        files = [{'fileName': 'a.txt', 'fileContent': '용어   사전\n\n\n\n끝'}]
+        assert _render('user', False, files) == _render('admin', False, files)
+        user, admin = _render('user', True, files), _render('admin', True, files)
+        assert len(user) < len(_render('user', False, files))
+        assert '관리자 모드' in admin and '관리자 모드' not in user
+        assert '━' not in user and '{{current_datetime}}' in user
+        assert '용어 사전\n\n끝' in user
+
+    def test_report_and_default(self, monkeypatch):
+        report = compaction_report('기사 작성', '지침', [], '11', count_tokens=len)
+        assert set(report) == {'user', 'admin'}
+        assert report['user']['saved'] == report['user']['full'] - report['user']['compact'] > 0
+        assert report['user']['counted']
+        assert not is_compact({}) and is_compact({'compactPrompt': True})
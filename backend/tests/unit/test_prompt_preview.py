@@ -0,0 +1,77 @@
+"""
+프롬프트 미리보기 단위 테스트
+"""
+import pytest
+
+from services import prompt_snapshots
+from services.prompt_preview import PromptPreview
+from services.prompt_registry import PromptRegistry
+from services.prompt_snapshots import PromptSnapshots
+
+
+@pytest.fixture
+def preview(monkeypatch, prompts_table, files_table):
+    """prompts/files 테이블 + 미리보기 (CountTokens는 글자 수로 대체)"""
+    monkeypatch.setattr(prompt_snapshots, 'count_system_tokens', len)
+    tables = {'prompts': prompts_table, 'files': files_table}
+    prompts_table.put_item(Item={'engineType': '11', 'promptId': '11',
+                                 'description': '기사 작성', 'instruction': '지침'})
+    for file_id, content in (('a', '짧은 사전'), ('b', '긴 예시 문단입니다. ' * 400)):
+        files_table.put_item(Item={'promptId': '11', 'fileId': file_id, 'fileName': f"{file_id}.txt",
+                                   'fileContent': content, 'createdAt': f"2025-01-0{len(file_id)}T00:00:00Z"})
+    snapshots = PromptSnapshots(lambda: prompts_table, lambda: files_table,
+                                PromptRegistry(lambda: prompts_table, ttl_s=0))
+    return PromptPreview(snapshots, file_budget=1000, hit_rate=0.9), snapshots, tables
+
+
+class TestPromptPreview:
+    """블록/파일 토큰, 캐시 지점, 비용, 스냅샷 기준 메모이제이션"""
+
+    def test_preview_reports_blocks_files_and_cost(self, preview):
+        """스냅샷이 없으면 먼저 만들고, 예산을 넘는 파일과 캐시 적용 시 더 싼 예상 비용을 보고"""
+        analyzer, snapshots, tables = preview
+        result = analyzer.preview('11')
+
+        base = tables['prompts'].get_item(Key={'engineType': '11', 'promptId': '11'})['Item']
+        assert result['snapshotId'] == base['snapshotId']
+        assert [f['fileId'] for f in result['files']] == ['a', 'b']
+        assert result['overBudget'] == ['b']
+        assert all(f['placement'] == 'system' for f in result['files'])
+
+        user = result['roles']['user']
+        assert [block['kind'] for block in user['blocks']] == ['system']
+        assert user['blocks'][0]['tokens'] == int(base['renderedTokens']['user'])
+        assert user['cacheBreakpoints'] == [{'block': 0, 'prefixTokens': user['totalTokens'], 'active': True}]
+        cost = user['costPer1kMessages']
+        assert float(cost['expected']) < float(cost['noCache'])
+
+    def test_preview_is_memoized_by_snapshot(self, preview):
+        """같은 스냅샷이면 다시 분석하지 않고, 저장으로 스냅샷이 바뀌면 새로 분석"""
+        analyzer, snapshots, tables = preview
+        first = analyzer.preview('11')
+        assert analyzer.preview('11') is first
+        assert 'text' in analyzer.preview('11', include_text=True)['roles']['admin']
+
+        tables['files'].delete_item(Key={'promptId': '11', 'fileId': 'b'})
+        snapshots.capture('11')
+        second = analyzer.preview('11')
+        assert second['snapshotId'] != first['snapshotId'] and second['overBudget'] == []
+
+    def test_missing_rendered_role_is_reported(self, preview, monkeypatch):
+        """렌더링 본문 저장에 실패한 역할은 KeyError 없이 missingRoles로 알리고 결과는 캐시하지 않음"""
+        analyzer, snapshots, tables = preview
+        put_blob = snapshots.file_store.put_blob
+
+        def failing(text):
+            if text.startswith('__admin__'):
+                raise RuntimeError('storage unavailable')
+            return put_blob(text)
+
+        monkeypatch.setattr(prompt_snapshots, 'render_system_templates',
+                            lambda *args: {'user': 'user 템플릿', 'admin': '__admin__ 템플릿'})
+        monkeypatch.setattr(snapshots.file_store, 'put_blob', failing)
+        result = analyzer.preview('11', include_text=True)
+
+        assert result['missingRoles'] == ['admin']
+        assert list(result['roles']) == ['user'] and result['roles']['user']['text'] == 'user 템플릿'
+        assert analyzer.preview('11') is not analyzer.preview('11')
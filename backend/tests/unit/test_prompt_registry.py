@@ -0,0 +1,102 @@
+"""
+프롬프트 레지스트리 단위 테스트
+"""
+import pytest
+
+from services import prompt_registry
+from services.prompt_registry import REGISTRY_KEY, PromptRegistry
+from services.prompt_service import Prompt, PromptConfig, PromptRepository
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def counted_prompts_table(prompts_table):
+    """engineType + promptId 복합 키 prompts 테이블 + 호출된 DynamoDB 오퍼레이션 기록"""
+    calls = []
+    prompts_table.meta.client.meta.events.register(
+        'before-call.dynamodb.*',
+        lambda model, **kwargs: calls.append(model.name)
+    )
+    return prompts_table, calls
+
+
+def _prompt(engine_type, instruction='지침', prompt_id=None, updated_at='2025-01-01T00:00:00Z'):
+    return {'engineType': engine_type, 'promptId': prompt_id or engine_type,
+            'description': f"{engine_type} 설명", 'instruction': instruction, 'updatedAt': updated_at}
+
+
+class TestPromptRegistry:
+    """레지스트리 목록/캐시 테스트"""
+
+    def test_scan_fallback_paginates_and_seeds_registry(self, counted_prompts_table):
+        """레지스트리가 없으면 모든 페이지를 scan, 엔진 기본 프롬프트 우선 - 이후에는 get_item만"""
+        table, calls = counted_prompts_table
+        # 항목당 ~100KB → scan 1페이지(1MB)를 넘김
+        for index in range(12):
+            table.put_item(Item=_prompt(f"e{index:02d}", instruction='x' * 100_000))
+        table.put_item(Item=_prompt('e00', prompt_id='user-copy', updated_at='2025-02-01T00:00:00Z'))
+
+        registry = PromptRegistry(lambda: table, ttl_s=30, clock=FakeClock())
+        prompts = registry.list()
+
+        assert [p['engineType'] for p in prompts] == [f"e{index:02d}" for index in range(12)]
+        assert prompts[0]['promptId'] == 'e00'
+        assert prompts[0]['instructionChars'] == 100_000 and 'instruction' not in prompts[0]
+        assert calls.count('Scan') >= 2
+
+        registry.invalidate()
+        calls.clear()
+        assert len(registry.list()) == 12
+        assert calls == ['GetItem']
+
+    def test_container_cache_with_version_check(self, counted_prompts_table):
+        """TTL 안에는 호출 없음, 이후에는 version만 확인하고 바뀐 경우에만 다시 읽음"""
+        table, calls = counted_prompts_table
+        clock = FakeClock()
+        writer = PromptRegistry(lambda: table)
+        reader = PromptRegistry(lambda: table, ttl_s=30, clock=clock)
+        writer.record(_prompt('11'))
+        writer.record(_prompt('22'))
+
+        assert [p['version'] for p in reader.list()] == [1, 1]
+        calls.clear()
+        reader.list()
+        assert calls == []
+
+        clock.now = 31
+        reader.list()
+        assert calls == ['GetItem']
+
+        # 다른 컨테이너의 쓰기 → 다음 버전 확인에서 다시 읽음
+        writer.record(_prompt('11', instruction='새 지침입니다'))
+        clock.now = 62
+        calls.clear()
+        prompts = reader.list()
+        assert calls == ['GetItem', 'GetItem']
+        assert prompts[0]['instructionChars'] == 7
+        assert prompts[0]['version'] == 2
+        assert table.get_item(Key=REGISTRY_KEY)['Item']['version'] == 3
+
+    def test_repository_save_records_only_engine_prompts(self, prompts_table, monkeypatch):
+        """uuid 프롬프트 저장은 엔진 항목(snapshotId 포인터)을 덮어쓰지 않음"""
+        registry = PromptRegistry(lambda: prompts_table, ttl_s=0)
+        registry.record({**_prompt('11'), 'snapshotId': 'snap-1'})
+        monkeypatch.setattr(prompt_registry, 'get_prompt_registry', lambda: registry)
+        repository = PromptRepository.__new__(PromptRepository)
+        repository.table = prompts_table
+
+        repository.save(Prompt(prompt_id='', user_id='kim', engine_type='11', prompt_name='초안',
+                               config=PromptConfig(description='초안', instruction='다른 지침')))
+        assert registry.get('11')['snapshotId'] == 'snap-1'
+        assert registry.get('11')['promptId'] == '11'
+
+        repository.save(Prompt(prompt_id='11', user_id='kim', engine_type='11', prompt_name='기본',
+                               config=PromptConfig(description='기본', instruction='새 지침')))
+        assert registry.get('11')['instructionChars'] == 4
@@ -0,0 +1,157 @@
+"""
+프롬프트 스냅샷 단위 테스트
+"""
+import pytest
+
+from lib.bedrock_client_enhanced import render_system_template
+from services import knowledge_index, prompt_snapshots
+from services.file_store import content_hash
+from services.prompt_registry import PromptRegistry
+from services.prompt_snapshots import PromptSnapshots, snapshot_id
+
+
+@pytest.fixture
+def snapshots(monkeypatch, prompts_table, files_table):
+    """prompts/files 테이블 + 스냅샷 저장소 (CountTokens는 글자 수로 대체)"""
+    monkeypatch.setattr(prompt_snapshots, 'count_system_tokens', len)
+    tables = {'prompts': prompts_table, 'files': files_table}
+    registry = PromptRegistry(lambda: prompts_table, ttl_s=0)
+    return PromptSnapshots(lambda: prompts_table, lambda: files_table, registry), tables, registry
+
+
+def _save_prompt(tables, instruction):
+    item = {'engineType': '11', 'promptId': '11', 'description': '기사 작성', 'instruction': instruction}
+    tables['prompts'].put_item(Item=item)
+    return item
+
+
+def _save_file(tables, file_id, content, created_at):
+    tables['files'].put_item(Item={'promptId': '11', 'fileId': file_id, 'fileName': f"{file_id}.txt",
+                                   'fileContent': content, 'createdAt': created_at})
+
+
+class TestPromptSnapshots:
+    """스냅샷 생성/포인터/롤백 테스트"""
+
+    def test_snapshot_id_is_content_addressed(self, snapshots):
+        """같은 내용이면 같은 ID (중복 저장 없음), 파일 순서/내용이 바뀌면 다른 ID"""
+        store, tables, registry = snapshots
+        _save_file(tables, 'a', '사전', '2025-01-01T00:00:00Z')
+        _save_file(tables, 'b', '예시', '2025-01-02T00:00:00Z')
+
+        first = store.capture('11', _save_prompt(tables, '지침 v1')).snapshot_id
+        assert store.capture('11').snapshot_id == first
+        assert first == snapshot_id('기사 작성', '지침 v1', [
+            {'fileName': 'a.txt', 'hash': content_hash('사전')},
+            {'fileName': 'b.txt', 'hash': content_hash('예시')}
+        ])
+        assert len(store.history('11')) == 1
+        assert registry.get('11')['snapshotId'] == first
+
+        _save_file(tables, 'b', '예시 수정', '2025-01-02T00:00:00Z')
+        second = store.capture('11').snapshot_id
+        assert second != first
+        assert tables['prompts'].get_item(Key={'engineType': '11', 'promptId': '11'})['Item']['snapshotId'] == second
+
+        loaded = store.load('11', first)
+        assert loaded['snapshotId'] == first and loaded['fileCount'] == 2
+
+    def test_rollback_moves_pointer_and_restores_content(self, snapshots):
+        """롤백하면 포인터, 기본 항목, 파일이 모두 이전 스냅샷으로 돌아감"""
+        store, tables, registry = snapshots
+        _save_file(tables, 'a', '사전', '2025-01-01T00:00:00Z')
+        first = store.capture('11', _save_prompt(tables, '지침 v1')).snapshot_id
+
+        _save_file(tables, 'c', '새 파일', '2025-01-03T00:00:00Z')
+        second = store.capture('11', _save_prompt(tables, '지침 v2')).snapshot_id
+        assert second != first
+
+        assert store.rollback('11', first)
+        base = tables['prompts'].get_item(Key={'engineType': '11', 'promptId': '11'})['Item']
+        assert base['instruction'] == '지침 v1' and base['snapshotId'] == first
+        files = tables['files'].query(KeyConditionExpression='promptId = :p',
+                                      ExpressionAttributeValues={':p': '11'})['Items']
+        assert [f['fileId'] for f in files] == ['a']
+        assert registry.get('11')['snapshotId'] == first
+        assert store.capture('11').snapshot_id == first
+        assert not store.rollback('11', 'missing')
+
+    def test_rollback_restores_normalization_and_original(self, snapshots):
+        """정규화된 파일은 보고서/원본 참조/문단 지문까지 복원 - 롤백 후에도 원본으로 되돌릴 수 있음"""
+        store, tables, _ = snapshots
+        raw = '사내 대외비\n\n' + '시장 동향 요약 문단입니다. ' * 6 + '\n\n- 1 -'
+        store.file_store.put_file('11', 'a', 'a.txt', raw, '2025-01-01T00:00:00Z', normalize=True)
+        normalized = store.file_store.get_file('11', 'a')
+        first = store.capture('11', _save_prompt(tables, '지침 v1')).snapshot_id
+
+        store.file_store.update_file('11', 'a', content=raw, normalize=False)
+        assert store.capture('11').snapshot_id != first
+
+        assert store.rollback('11', first)
+        restored = store.file_store.get_file('11', 'a')
+        assert restored['fileContent'] == normalized['fileContent'] != raw
+        for key in ('normalization', 'paragraphHashes', 'original'):
+            assert restored[key] == normalized[key]
+        assert store.file_store.get_original('11', 'a') == raw
+
+    def test_rendered_blocks_replace_message_path_rendering(self, snapshots, monkeypatch):
+        """저장 시 역할별 템플릿과 토큰 수 저장, 메시지 경로는 파일 대신 블록을 읽음 - 템플릿 버전이 바뀌면 파일로 대체"""
+        store, tables, registry = snapshots
+        _save_file(tables, 'a', '용어 사전 본문', '2025-01-01T00:00:00Z')
+        prompt = _save_prompt(tables, '지침 v1')
+
+        snapshot = store.capture('11', prompt)
+
+        assert set(snapshot.rendered) == {'user', 'admin'}
+        assert snapshot.rendered['user']['tokens'] == snapshot.rendered['user']['chars']
+        assert snapshot.rendered['user']['counted']
+        assert registry.get('11')['renderedTokens'] == {role: block['tokens'] for role, block in snapshot.rendered.items()}
+        loaded = store.load('11', snapshot.snapshot_id)
+        assert loaded['files'] == []
+        assert loaded['rendered']['admin'] == render_system_template({
+            'prompt': {'description': '기사 작성', 'instruction': '지침 v1'},
+            'files': [{'fileName': 'a.txt', 'fileContent': '용어 사전 본문'}],
+            'userRole': 'admin'
+        }, '11')
+        assert '{{current_datetime}}' in loaded['rendered']['user']
+
+        monkeypatch.setattr(prompt_snapshots, 'RENDER_VERSION', 'next')
+        stale = store.load('11', snapshot.snapshot_id)
+        assert 'rendered' not in stale
+        assert [f['fileContent'] for f in stale['files']] == ['용어 사전 본문']
+        # 같은 내용 재저장 시 새 버전으로 다시 렌더링
+        store.capture('11')
+        assert 'rendered' in store.load('11', snapshot.snapshot_id)
+
+    def test_retrieval_mode_renders_always_include_files_only(self, snapshots, monkeypatch):
+        """검색 모드에서는 alwaysInclude 파일만 템플릿에 들어가고 나머지는 색인으로 저장"""
+        monkeypatch.setattr(knowledge_index, 'KB_RETRIEVAL_ENABLED', True)
+        monkeypatch.setattr(knowledge_index, 'KB_RETRIEVAL_MIN_CHARS', 10)
+        store, tables, registry = snapshots
+        store.file_store.put_file('11', 'a', 'style.txt', '문체 규칙', '2025-01-01T00:00:00Z', always_include=True)
+        store.file_store.put_file('11', 'b', 'terms.txt', '코스피 지수는 소수 둘째 자리까지 씁니다.', '2025-01-02T00:00:00Z')
+
+        snapshot = store.capture('11', _save_prompt(tables, '지침'))
+        loaded = store.load('11', snapshot.snapshot_id)
+
+        assert '문체 규칙' in loaded['rendered']['user'] and '코스피' not in loaded['rendered']['user']
+        assert loaded['knowledgeIndex']['passages'] == 1
+        index = knowledge_index.load_index(loaded['knowledgeIndex'], store.file_store)
+        assert [p.file_name for p in index.search('코스피 표기')] == ['terms.txt']
+
+        monkeypatch.setattr(knowledge_index, 'KB_RETRIEVAL_ENABLED', False)
+        store.capture('11')
+        assert '코스피' in store.load('11', snapshot.snapshot_id)['rendered']['user']
+
+    def test_compact_switch_creates_separate_snapshot(self, snapshots):
+        """엔진별 압축 스위치를 켜면 다른 스냅샷(압축 렌더링), 끄면 이전 스냅샷으로 돌아감"""
+        store, tables, registry = snapshots
+        _save_file(tables, 'a', '사전', '2025-01-01T00:00:00Z')
+        prompt = _save_prompt(tables, '지침')
+        plain = store.capture('11', prompt)
+
+        compact = store.capture('11', {**prompt, 'compactPrompt': True})
+        assert compact.snapshot_id != plain.snapshot_id
+        assert compact.rendered['user']['tokens'] < plain.rendered['user']['tokens']
+        assert store.load('11', compact.snapshot_id)['compactPrompt']
+        assert store.capture('11', {**prompt, 'compactPrompt': False}).snapshot_id == plain.snapshot_id
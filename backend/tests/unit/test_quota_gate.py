@@ -0,0 +1,87 @@
+"""
+QuotaGate 단위 테스트
+"""
+from services.quota_gate import QuotaGate
+
+
+class FakeRepository:
+    """월 롤업 totalTokens만 돌려주는 저장소"""
+
+    def __init__(self, used=0, fail=False):
+        self.used = used
+        self.fail = fail
+        self.calls = 0
+
+    def get_rollup(self, user_id, sort_key):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("dynamodb unavailable")
+        return {'totals': {'totalTokens': self.used}, 'by_engine': {}, 'updatedAt': None}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _gate(repository, clock=None, monthly_tokens=1000, ttl_s=60):
+    return QuotaGate(repository_factory=lambda: repository, monthly_tokens=monthly_tokens,
+                     ttl_s=ttl_s, enabled=True, clock=clock or FakeClock())
+
+
+class TestQuotaGate:
+    """잔여량 버킷 테스트"""
+
+    def test_debits_from_cache_until_ttl(self):
+        """TTL 동안은 롤업을 다시 읽지 않고 메모리에서 차감"""
+        repository = FakeRepository(used=900)
+        clock = FakeClock()
+        gate = _gate(repository, clock)
+
+        first = gate.acquire('kim', estimated_tokens=60)
+        second = gate.acquire('kim', estimated_tokens=60)
+
+        assert first.allowed and first.remaining == 40
+        assert not second.allowed and second.reason == 'monthly_tokens'
+        assert repository.calls == 1
+
+        clock.now = 61
+        repository.used = 0
+        assert gate.acquire('kim', estimated_tokens=60).remaining == 940
+        assert repository.calls == 2
+
+    def test_reconcile_with_actual_tokens(self):
+        """선차감분을 실제 사용량(입력+출력)으로 보정"""
+        gate = _gate(FakeRepository(used=0))
+
+        decision = gate.acquire('kim', estimated_tokens=100)
+        gate.reconcile('kim', decision.reserved, 700)
+
+        assert gate.acquire('kim', estimated_tokens=0).remaining == 300
+        assert not gate.acquire('kim', estimated_tokens=301).allowed
+
+    def test_reconcile_after_refresh_does_not_credit_reservation(self):
+        """acquire와 reconcile 사이에 버킷이 새로 만들어지면 선차감분은 돌려주지 않고 실제 사용량만 차감"""
+        clock = FakeClock()
+        gate = _gate(FakeRepository(used=0), clock)
+
+        decision = gate.acquire('kim', estimated_tokens=500)
+        clock.now = 61
+        gate.acquire('kim', estimated_tokens=0)
+        gate.reconcile('kim', decision.reserved, 200, decision.generation)
+
+        assert gate.acquire('kim', estimated_tokens=0).remaining == 800
+
+    def test_fails_open_when_rollup_unavailable(self):
+        """롤업 조회 실패 시 허용하고 다음 호출에서 재시도"""
+        repository = FakeRepository(fail=True)
+        gate = _gate(repository)
+
+        decision = gate.acquire('kim', text='안녕하세요')
+
+        assert decision.allowed and decision.reason == 'unavailable'
+        gate.acquire('kim', estimated_tokens=1)
+        assert repository.calls == 2
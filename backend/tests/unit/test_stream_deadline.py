@@ -0,0 +1,66 @@
+"""
+스트리밍 마감 시간 처리 단위 테스트
+"""
+from unittest.mock import Mock
+
+from utils.deadline import StreamDeadline
+from handlers.websocket.message import stream_to_client
+
+
+class TestStreamDeadline:
+    """StreamDeadline 테스트"""
+
+    def test_not_expired_with_enough_time(self):
+        """남은 시간이 여유 시간보다 크면 계속 진행"""
+        context = Mock(get_remaining_time_in_millis=Mock(return_value=60000))
+        assert StreamDeadline(context, margin_ms=10000).expired() is False
+
+    def test_expired_within_margin(self):
+        """여유 시간 이내면 마감"""
+        context = Mock(get_remaining_time_in_millis=Mock(return_value=9000))
+        assert StreamDeadline(context, margin_ms=10000).expired() is True
+
+    def test_without_context_never_expires(self):
+        """context가 없으면 (로컬 실행) 마감하지 않음"""
+        deadline = StreamDeadline(None)
+        assert deadline.remaining_ms() is None
+        assert deadline.expired() is False
+
+
+class TestStreamToClient:
+    """stream_to_client 테스트"""
+
+    def _chunks(self, closed):
+        try:
+            for text in ['첫 ', '번째 ', '응답 ', '청크']:
+                yield text
+        finally:
+            closed.append(True)
+
+    def test_streams_all_chunks(self):
+        """마감 전이면 전체 청크 전송"""
+        closed = []
+        fanout = Mock(targets=[('conn', 'verbose')], connection_id='conn')
+        deadline = StreamDeadline(Mock(get_remaining_time_in_millis=Mock(return_value=60000)), margin_ms=1000)
+
+        total, count, truncated = stream_to_client(self._chunks(closed), fanout, deadline)
+
+        assert total == '첫 번째 응답 청크'
+        assert count == 4
+        assert truncated is False
+        assert fanout.send.call_count == 4
+
+    def test_stops_and_closes_stream_near_deadline(self):
+        """마감 임박 시 중단하고 스트림 생성기를 닫음"""
+        closed = []
+        remaining = iter([50000, 5000, 5000])
+        context = Mock(get_remaining_time_in_millis=Mock(side_effect=lambda: next(remaining)))
+
+        total, count, truncated = stream_to_client(
+            self._chunks(closed), Mock(targets=[('conn', 'verbose')], connection_id='conn'), StreamDeadline(context, margin_ms=10000)
+        )
+
+        assert total == '첫 번째 '
+        assert count == 2
+        assert truncated is True
+        assert closed == [True]
@@ -0,0 +1,60 @@
+"""
+토큰 추정기 단위 테스트
+"""
+from utils.token_estimator import (
+    FEATURES, calibrate, estimate_from_features, estimate_tokens, estimate_tokens_batch, features
+)
+
+
+class TestFeatures:
+    """문자 분류 테스트"""
+
+    def test_mixed_text(self):
+        """한글/영문/숫자/공백/특수문자 분류"""
+        vector = dict(zip(FEATURES, features('서울 Seoul 2024년!')))
+
+        assert vector == {
+            'hangul': 3, 'latin': 5, 'latin_words': 1, 'digit': 4,
+            'space': 2, 'punct': 1, 'other': 0
+        }
+
+    def test_non_hangul_unicode_is_other(self):
+        """한자/이모지 등은 other"""
+        vector = dict(zip(FEATURES, features('漢字😀')))
+        assert vector['hangul'] == 0
+        assert vector['other'] == 3
+
+
+class TestEstimate:
+    """추정 테스트"""
+
+    def test_empty_and_minimum(self):
+        """빈 문자열은 0, 그 외 최소 1"""
+        assert estimate_tokens('') == 0
+        assert estimate_tokens('a') == 1
+
+    def test_korean_ratio(self):
+        """기본 계수: 한글 2.5자당 1토큰"""
+        assert estimate_tokens('가' * 100) == 40
+
+    def test_batch_matches_single(self):
+        """배치 결과는 개별 추정과 동일"""
+        texts = ['안녕하세요', '', 'Hello, world', '가격은 3,000원']
+        assert estimate_tokens_batch(texts) == [estimate_tokens(t) for t in texts]
+
+
+class TestCalibrate:
+    """계수 보정 테스트"""
+
+    def test_recovers_known_coefficients(self):
+        """알려진 선형 관계의 계수를 복원"""
+        truth = {'hangul': 0.7, 'latin': 0.2, 'latin_words': 0.5, 'digit': 0.4,
+                 'space': 0.1, 'punct': 0.6, 'other': 1.0}
+        texts = ['뉴스 기사 본문입니다. ' * n + 'Breaking news 2024 ' * m + '☆' * k
+                 for n, m, k in [(1, 0, 0), (3, 2, 1), (0, 5, 2), (7, 1, 0), (2, 9, 4), (5, 5, 5), (9, 0, 3)]]
+        samples = [(features(t), sum(c * truth[n] for n, c in zip(FEATURES, features(t)))) for t in texts]
+
+        fitted = calibrate(samples)
+
+        for vector, tokens in samples:
+            assert abs(estimate_from_features(vector, fitted) - tokens) <= 1
@@ -0,0 +1,121 @@
+"""
+UsageAggregator 단위 테스트
+"""
+from unittest.mock import Mock
+
+from services.pricing import TokenUsage, calculate
+from services.usage_aggregator import UsageAggregator
+from services.usage_rollups import rebuild_rollups
+
+
+class LostResponseTable:
+    """첫 트랜잭션은 반영 후 응답 유실(예외)로 가장"""
+
+    def __init__(self, table):
+        self.name = table.name
+        self.calls = 0
+        self._client = table.meta.client
+        self.meta = Mock(client=Mock(transact_write_items=self._transact))
+
+    def _transact(self, **kwargs):
+        self.calls += 1
+        result = self._client.transact_write_items(**kwargs)
+        if self.calls == 1:
+            raise TimeoutError("response lost")
+        return result
+
+
+def _item(table, user_id='kim', key='2025-01-02#11'):
+    return table.get_item(Key={'userId': user_id, 'usageDate#engineType': key})['Item']
+
+
+class TestUsageAggregator:
+    """집계/flush 테스트"""
+
+    def test_coalesces_per_key(self, usage_table):
+        """같은 키의 여러 기록은 트랜잭션 1회로 반영"""
+        calls = []
+        usage_table.meta.client.meta.events.register(
+            'before-call.dynamodb.TransactWriteItems', lambda **kwargs: calls.append(1))
+        aggregator = UsageAggregator(lambda: usage_table, max_keys=10, interval_s=60)
+
+        for _ in range(3):
+            aggregator.record('kim', '11', 100, 50, usage_date='2025-01-02')
+        aggregator.record('kim', '22', 10, 5, usage_date='2025-01-02')
+
+        assert aggregator.flush() == 2
+        assert len(calls) == 2
+        item = _item(usage_table)
+        assert (item['inputTokens'], item['outputTokens'], item['messageCount']) == (300, 150, 3)
+
+    def test_size_threshold_flushes(self, usage_table):
+        """키 수 임계값에 도달하면 기록 시 바로 반영"""
+        aggregator = UsageAggregator(lambda: usage_table, max_keys=2, interval_s=60)
+
+        aggregator.record('kim', '11', 1, 1, usage_date='2025-01-02')
+        assert aggregator.pending_keys() == 1
+        aggregator.record('lee', '11', 1, 1, usage_date='2025-01-02')
+
+        assert aggregator.pending_keys() == 0
+
+    def test_retry_after_lost_response_is_not_double_counted(self, usage_table):
+        """반영 후 응답이 유실되어 재시도해도 한 번만 집계"""
+        table = LostResponseTable(usage_table)
+        aggregator = UsageAggregator(lambda: table, max_keys=10, interval_s=60)
+
+        aggregator.record('kim', '11', 100, 50, usage_date='2025-01-02')
+        assert aggregator.flush() == 0
+        assert aggregator.pending_keys() == 1
+
+        aggregator.record('kim', '11', 1, 1, usage_date='2025-01-02')
+        aggregator.flush()  # 재시도 배치는 조건 실패로 건너뜀, 새 증분은 대기
+        aggregator.flush()
+
+        assert aggregator.pending_keys() == 0
+        item = _item(usage_table)
+        assert (item['inputTokens'], item['messageCount']) == (101, 2)
+
+    def test_rollups_follow_raw_items(self, usage_table):
+        """일/월/누적 롤업이 원본과 함께 증가 (엔진별 평탄화 속성 포함)"""
+        aggregator = UsageAggregator(lambda: usage_table, max_keys=10, interval_s=60)
+        aggregator.record('kim', '11', 100, 50, usage_date='2025-01-02')
+        aggregator.record('kim', '22', 10, 5, usage_date='2025-01-03')
+        aggregator.flush()
+
+        month = _item(usage_table, key='rollup#month#2025-01')
+        assert month['totalTokens'] == 165
+        assert month['engine#11#totalTokens'] == 150
+        assert month['engine#22#messageCount'] == 1
+        assert _item(usage_table, key='rollup#day#2025-01-03')['totalTokens'] == 15
+        assert _item(usage_table, key='rollup#lifetime')['messageCount'] == 2
+
+    def test_cost_breakdown_is_stored(self, usage_table):
+        """캐시 토큰/비용/단가 버전이 원본과 롤업에 함께 기록"""
+        cost = calculate(TokenUsage(100, 50, 1000, 200), 'claude-sonnet-4', '2025-06-01')
+        aggregator = UsageAggregator(lambda: usage_table, max_keys=10, interval_s=60)
+        aggregator.record('kim', '11', 100, 50, usage_date='2025-01-02',
+                          cache_read_tokens=1000, cache_write_tokens=200, cost=cost)
+        aggregator.flush()
+
+        item = _item(usage_table)
+        assert item['totalTokens'] == 1350
+        assert item['costMicros'] == cost.micros
+        assert item['priceVersion'] == 'claude-sonnet-4@2025-05-22'
+        month = _item(usage_table, key='rollup#month#2025-01')
+        assert month['engine#11#cacheSavingsMicros'] == cost.savings_micros
+
+    def test_flush_sequence_lives_in_expiring_marker_item(self, usage_table):
+        """반영 순번은 원본 항목 속성이 아니라 TTL이 있는 별도 항목 - 롤업 재계산에서도 제외"""
+        for container_id in ('a', 'b', 'compact-2025-01-02T03'):
+            aggregator = UsageAggregator(lambda: usage_table, max_keys=10, interval_s=60, container_id=container_id)
+            aggregator.record('kim', '11', 100, 50, usage_date='2025-01-02')
+            aggregator.flush()
+
+        item = _item(usage_table)
+        assert item['messageCount'] == 3
+        assert not [name for name in item if name.startswith('flush#')]
+        marker = _item(usage_table, key='flush#b#2025-01-02#11')
+        assert marker['flushSeq'] == 1 and marker['ttl'] > 0
+
+        assert rebuild_rollups(usage_table, 'kim') == 3
+        assert _item(usage_table, key='rollup#month#2025-01')['messageCount'] == 3
@@ -0,0 +1,55 @@
+"""
+사용량 API 단위 테스트
+"""
+import pytest
+
+from handlers.api import usage
+from services.usage_aggregator import UsageAggregator
+from services.usage_events import UsageEventLog
+from services.usage_ledger import UsageLedger
+
+
+@pytest.fixture
+def usage_ledger(monkeypatch, usage_table, usage_events_table):
+    """원장 스키마 사용량 테이블 + 호출된 DynamoDB 오퍼레이션 기록"""
+    calls = []
+    usage_table.meta.client.meta.events.register(
+        'before-call.dynamodb.*',
+        lambda model, **kwargs: calls.append(model.name)
+    )
+    ledger = UsageLedger(lambda: usage_table, UsageAggregator(lambda: usage_table),
+                         UsageEventLog(lambda: usage_events_table))
+    monkeypatch.setattr(usage, 'get_usage_ledger', lambda: ledger)
+    return ledger, calls
+
+
+class TestUpdateUsage:
+    """update_usage 테스트"""
+
+    def test_post_is_single_read_and_does_not_count(self, usage_ledger):
+        """WebSocket 경로가 기록한 메시지를 REST POST가 다시 세지 않음 - 월 롤업 GetItem 1회로 합계 반환"""
+        ledger, calls = usage_ledger
+        ledger.record('kim@sedaily.com', '11', 100, 100, flush=True)
+        calls.clear()
+
+        result = usage.update_usage('kim@sedaily.com', '11', '가' * 250, 'a' * 400)
+
+        assert calls == ['GetItem']
+        assert result['tokensUsed'] == 200
+        assert result['usage']['totalTokens'] == 200
+        assert result['usage']['messageCount'] == 1
+        assert result['usage']['userId'] == 'kim@sedaily.com'
+        assert result['percentage'] == 2.0
+        assert result['remaining'] == 9800
+
+    def test_reads_share_the_same_counters(self, usage_ledger):
+        """REST 조회는 WebSocket 경로와 같은 월 롤업을 읽음"""
+        ledger, calls = usage_ledger
+        for engine_type in ('11', '22', '11'):
+            ledger.record('kim@sedaily.com', engine_type, 100, 0, flush=True)
+            usage.update_usage('kim@sedaily.com', engine_type, '가' * 250, '')
+
+        assert usage.get_usage('kim@sedaily.com', '11')['messageCount'] == 2
+        by_engine = usage.get_all_usage('kim@sedaily.com')
+        assert sorted(by_engine) == ['11', '22']
+        assert by_engine['11'][0]['totalTokens'] == 200
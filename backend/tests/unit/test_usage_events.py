@@ -0,0 +1,74 @@
+"""
+사용량 이벤트 로그/컴팩션 단위 테스트
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from services import usage_events
+from services.pricing import TokenUsage
+from services.usage_aggregator import UsageAggregator
+from services.usage_events import (
+    HOUR_FORMAT, UsageEvent, UsageEventLog, compact_hour, run_compaction, shard_for, to_item
+)
+from services.usage_ledger import UsageLedger
+
+
+@pytest.fixture
+def tables(usage_table, usage_events_table):
+    """usage 테이블 + usage-events 테이블"""
+    return usage_table, usage_events_table
+
+
+class TestUsageEventLog:
+    """이벤트 기록 테스트"""
+
+    def test_events_spread_over_shards_with_ttl(self):
+        """같은 시간 버킷의 요청들이 여러 샤드로 나뉘고 TTL이 붙음"""
+        shards = {shard_for('2025-01-02T10', f"req-{i}") for i in range(200)}
+        assert len(shards) == usage_events.USAGE_EVENT_SHARDS
+        assert all(shard.startswith('2025-01-02T10#') for shard in shards)
+
+        item = to_item(UsageEvent('req-1', 'kim', '11', 'claude-opus-4-1', TokenUsage(10, 20, 5, 0),
+                                  latency_ms=1200, created_at=datetime(2025, 1, 2, 10, 30)))
+        assert item['usageDate'] == '2025-01-02'
+        assert item['eventId'] == '2025-01-02T10:30:00#req-1'
+        assert item['ttl'] > datetime.now().timestamp() + 89 * 86400
+
+    def test_events_mode_counts_only_through_compaction(self, tables, monkeypatch):
+        """events 모드: 메시지 경로는 이벤트만 기록, 컴팩션이 카운터를 올리고 재실행해도 한 번만 반영"""
+        usage, events = tables
+        monkeypatch.setattr(usage_events, 'USAGE_COUNTERS_SOURCE', 'events')
+        ledger = UsageLedger(lambda: usage, UsageAggregator(lambda: usage), UsageEventLog(lambda: events))
+        for index in range(3):
+            ledger.record('kim', '11', 100, 50, cache_read_tokens=10, request_id=f"req-{index}")
+        ledger.flush()
+
+        today = datetime.now().strftime('%Y-%m-%d')
+        assert ledger.raw('kim', today, '11')['totalTokens'] == 0
+
+        later = datetime.now() + timedelta(hours=2)
+        assert run_compaction(events, usage, now=later)['applied'] == 1
+        counters = ledger.raw('kim', today, '11')
+        assert counters['totalTokens'] == 480
+        assert counters['messageCount'] == 3
+        assert counters['costMicros'] > 0
+        assert ledger.month('kim')['totals']['messageCount'] == 3
+
+        # 워터마크 이후 새 버킷 없음 + 같은 버킷 강제 재실행도 반영 안 됨
+        assert run_compaction(events, usage, now=later)['hours'] == 0
+        _, applied = compact_hour(events, usage, datetime.now().strftime(HOUR_FORMAT))
+        assert applied == 0
+        assert ledger.raw('kim', today, '11')['messageCount'] == 3
+
+    def test_hot_mode_skips_compaction(self, tables):
+        """hot 모드에서는 컴팩션이 카운터를 건드리지 않음 (이중 집계 방지)"""
+        usage, events = tables
+        ledger = UsageLedger(lambda: usage, UsageAggregator(lambda: usage), UsageEventLog(lambda: events))
+        ledger.record('kim', '11', 100, 50, request_id='req-1', flush=True)
+
+        result = run_compaction(events, usage, now=datetime.now() + timedelta(hours=2), source='hot')
+
+        assert result['applied'] == 0
+        assert ledger.raw('kim', datetime.now().strftime('%Y-%m-%d'), '11')['messageCount'] == 1
+        assert len(events.scan()['Items']) == 1
@@ -0,0 +1,55 @@
+"""
+UsageLeaderboard 단위 테스트
+"""
+from decimal import Decimal
+
+import pytest
+
+from services.usage_aggregator import UsageAggregator
+from services.usage_leaderboard import UsageLeaderboard, top_k
+from services.usage_service import UsageRepository, UsageService
+
+
+class TestUsageLeaderboard:
+    """상위 사용자 집계 테스트"""
+
+    def test_top_users_from_date_index(self, usage_table):
+        """기간 내 날짜별 인덱스 query만으로 합계/순위 계산 (롤업 제외, scan 없음)"""
+        aggregator = UsageAggregator(table_factory=lambda: usage_table)
+        aggregator.record('kim', '11', 100, 900, usage_date='2025-01-02')
+        aggregator.record('kim', '22', 100, 900, usage_date='2025-01-03')
+        aggregator.record('lee', '11', 50, 2500, usage_date='2025-01-03')
+        aggregator.record('park', '11', 10, 10, usage_date='2025-01-03')
+        aggregator.record('old', '11', 10**6, 0, usage_date='2024-12-01')
+        aggregator.flush()
+
+        repository = UsageRepository.__new__(UsageRepository)
+        repository.table = usage_table
+        service = UsageService(repository, UsageLeaderboard(repository.query_by_date, _cost))
+        calls = []
+        usage_table.meta.client.meta.events.register(
+            'before-call.dynamodb.*', lambda model, **kw: calls.append(model.name))
+
+        top = service.leaderboard.top_users(limit=2, period_days=7, end_date='2025-01-05')
+
+        assert [(u['userId'], u['tokens'], u['requests']) for u in top] == [('lee', 2550, 1), ('kim', 2000, 2)]
+        assert set(calls) == {'Query'} and len(calls) == 7
+
+        service.leaderboard.top_users(limit=1, period_days=7, metric='requests', end_date='2025-01-05')
+        assert len(calls) == 7
+
+    def test_top_k_by_cost(self):
+        """지표별 상위 k명, 알 수 없는 지표는 ValueError"""
+        totals = {
+            user: {'tokens': tokens, 'requests': 1, 'cost': Decimal(cost)}
+            for user, tokens, cost in [('a', 10, '5'), ('b', 30, '1'), ('c', 20, '3')]
+        }
+
+        assert [u['userId'] for u in top_k(totals, 2, 'cost')] == ['a', 'c']
+        assert top_k(totals, 1)[0] == {'userId': 'b', 'rank': 1, 'tokens': 30, 'requests': 1, 'cost': '1'}
+        with pytest.raises(ValueError):
+            top_k(totals, 1, 'latency')
+
+
+def _cost(engine_type, counters):
+    return Decimal(int(counters['inputTokens']) + int(counters['outputTokens'])) / 1000
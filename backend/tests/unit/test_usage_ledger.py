@@ -0,0 +1,55 @@
+"""
+사용량 원장 이관 단위 테스트
+"""
+from decimal import Decimal
+
+import pytest
+
+from services.usage_aggregator import UsageAggregator
+from services.usage_ledger import UsageLedger, migrate_legacy_usage
+
+
+@pytest.fixture
+def tables(dynamodb_resource, usage_table):
+    """원장 스키마 usage 테이블 + 이전 REST(PK/SK) 테이블"""
+    legacy = dynamodb_resource.create_table(
+        TableName='nexus-test-usage-rest-test',
+        KeySchema=[
+            {'AttributeName': 'PK', 'KeyType': 'HASH'},
+            {'AttributeName': 'SK', 'KeyType': 'RANGE'}
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'PK', 'AttributeType': 'S'},
+            {'AttributeName': 'SK', 'AttributeType': 'S'}
+        ],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    return usage_table, legacy
+
+
+class TestUsageLedgerMigration:
+    """이전 스키마 병합 테스트"""
+
+    def test_merges_both_legacy_schemas_once(self, tables):
+        """REST 월 합계는 큰 값에 맞추고, requestCount/cost는 원장 카운터로 합침 (재실행 시 변화 없음)"""
+        usage, legacy = tables
+        UsageAggregator(lambda: usage).record('kim', '11', 150, 50, usage_date='2025-01-02')
+        UsageAggregator(lambda: usage).flush()
+        usage.put_item(Item={'userId': 'kim', 'usageDate#engineType': '2025-01-03#22',
+                             'inputTokens': 30, 'outputTokens': 0, 'totalTokens': 30,
+                             'requestCount': 3, 'cost': Decimal('0.01'), 'date': '2025-01-03'})
+        legacy.put_item(Item={'PK': 'user#kim', 'SK': 'engine#11#2025-01', 'inputTokens': 400,
+                              'outputTokens': 100, 'totalTokens': 500, 'messageCount': 5})
+
+        stats = migrate_legacy_usage(usage, source_table=legacy)
+
+        assert stats == {'folded': 1, 'legacy': 1, 'adjusted': 1, 'users': 1}
+        month = UsageLedger(lambda: usage).month('kim', '2025-01')
+        assert month['by_engine']['11']['totalTokens'] == 500
+        assert month['by_engine']['11']['messageCount'] == 5
+        assert month['by_engine']['22']['messageCount'] == 3
+        assert month['by_engine']['22']['costMicros'] == 10000
+        assert legacy.scan()['Items'] == []
+
+        assert migrate_legacy_usage(usage, source_table=legacy)['folded'] == 0
+        assert UsageLedger(lambda: usage).month('kim', '2025-01')['totals']['totalTokens'] == 530
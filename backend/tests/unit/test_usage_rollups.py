@@ -0,0 +1,54 @@
+"""
+사용량 롤업 단위 테스트
+"""
+from datetime import datetime
+
+from services.usage_aggregator import UsageAggregator
+from services.usage_rollups import rebuild_rollups
+from services.usage_service import UsageRepository, UsageService
+
+
+def _service(table):
+    repository = UsageRepository.__new__(UsageRepository)
+    repository.table = table
+    return UsageService(repository)
+
+
+class TestUsageRollups:
+    """롤업 조회/백필 테스트"""
+
+    def test_current_month_is_single_get_item(self, usage_table):
+        """이번 달 사용량은 월 롤업 get_item 1회"""
+        today = datetime.now().strftime('%Y-%m-%d')
+        aggregator = UsageAggregator(lambda: usage_table)
+        aggregator.record('kim', '11', 1000, 1000, usage_date=today)
+        aggregator.record('kim', '22', 500, 0, usage_date=today)
+        aggregator.flush()
+
+        calls = []
+        usage_table.meta.client.meta.events.register(
+            'before-call.dynamodb.*', lambda model, **kwargs: calls.append(model.name))
+
+        usage = _service(usage_table).get_current_month_usage('kim')
+
+        assert calls == ['GetItem']
+        assert usage['total_tokens'] == 2500
+        assert usage['total_requests'] == 2
+        assert usage['by_engine']['11'] == {'requests': 1, 'tokens': 2000, 'cost': '0.0900'}
+
+    def test_backfill_matches_incremental(self, usage_table):
+        """원본으로 재계산한 롤업이 증분 롤업과 같음"""
+        aggregator = UsageAggregator(lambda: usage_table)
+        for day, engine, tokens in [('2025-01-02', '11', 10), ('2025-01-03', '11', 20), ('2025-02-01', '22', 5)]:
+            aggregator.record('kim', engine, tokens, 0, usage_date=day)
+        aggregator.flush()
+        before = {i['usageDate#engineType']: i for i in usage_table.scan()['Items']}
+
+        usage_table.delete_item(Key={'userId': 'kim', 'usageDate#engineType': 'rollup#lifetime'})
+        written = rebuild_rollups(usage_table)
+
+        after = {i['usageDate#engineType']: i for i in usage_table.scan()['Items']}
+        assert written == 6
+        for key in ('rollup#month#2025-01', 'rollup#lifetime', 'rollup#day#2025-02-01'):
+            assert after[key]['totalTokens'] == before.get(key, after[key])['totalTokens']
+        assert after['rollup#lifetime']['engine#11#totalTokens'] == 30
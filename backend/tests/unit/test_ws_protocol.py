@@ -0,0 +1,69 @@
+"""
+WebSocket 프레임 프로토콜 단위 테스트
+"""
+import json
+
+from utils.ws_protocol import (
+    DEFAULT_PROTOCOL, PROTOCOL_COMPACT_V1, PROTOCOL_VERBOSE,
+    decode_frame, encode_frame, negotiate_protocol
+)
+
+
+class TestNegotiateProtocol:
+    """프로토콜 협상 테스트"""
+
+    def test_default_is_verbose(self):
+        """쿼리 파라미터가 없으면 verbose"""
+        assert negotiate_protocol(None) == PROTOCOL_VERBOSE
+        assert negotiate_protocol({}) == DEFAULT_PROTOCOL
+
+    def test_compact_requested(self):
+        """compact 요청"""
+        assert negotiate_protocol({'protocol': 'C1'}) == PROTOCOL_COMPACT_V1
+
+    def test_unknown_protocol_falls_back(self):
+        """미지원 프로토콜은 verbose로 대체"""
+        assert negotiate_protocol({'protocol': 'c9'}) == PROTOCOL_VERBOSE
+
+
+class TestEncodeFrame:
+    """프레임 직렬화 테스트"""
+
+    def test_verbose_unchanged(self):
+        """verbose 포맷은 기존 직렬화와 동일"""
+        message = {'type': 'ai_chunk', 'chunk': '안녕', 'chunk_index': 0, 'timestamp': 'T'}
+        assert encode_frame(message) == json.dumps(message, ensure_ascii=False, default=str)
+
+    def test_compact_chunk_drops_timestamp(self):
+        """compact 청크 프레임은 짧은 코드를 쓰고 timestamp를 생략"""
+        message = {'type': 'ai_chunk', 'chunk': '안녕', 'chunk_index': 3, 'timestamp': 'T'}
+        frame = json.loads(encode_frame(message, PROTOCOL_COMPACT_V1))
+        assert frame == {'t': 'c', 'd': '안녕', 'i': 3}
+
+    def test_compact_end_keeps_timestamp(self):
+        """종료 프레임은 timestamp 유지"""
+        message = {'type': 'chat_end', 'total_chunks': 5, 'timestamp': 'T', 'extra': 1}
+        frame = json.loads(encode_frame(message, PROTOCOL_COMPACT_V1))
+        assert frame == {'t': 'e', 'n': 5, 'ts': 'T', 'extra': 1}
+
+    def test_compact_is_smaller(self):
+        """compact 프레임이 verbose보다 작음"""
+        message = {'type': 'ai_chunk', 'chunk': '오늘', 'chunk_index': 120, 'timestamp': '2025-01-01T00:00:00Z'}
+        assert len(encode_frame(message, PROTOCOL_COMPACT_V1)) < len(encode_frame(message))
+
+    def test_large_chunk_deflated_roundtrip(self):
+        """큰 청크는 deflate 후 원문으로 복원"""
+        chunk = '서울경제 기사 본문입니다. ' * 200
+        message = {'type': 'ai_chunk', 'chunk': chunk, 'chunk_index': 1}
+        data = encode_frame(message, PROTOCOL_COMPACT_V1, deflate_min_bytes=512)
+
+        assert '"z"' in data
+        assert len(data) < len(encode_frame(message))
+        assert decode_frame(data, PROTOCOL_COMPACT_V1) == message
+
+    def test_small_chunk_not_deflated(self):
+        """임계값 미만 청크는 압축하지 않음"""
+        message = {'type': 'ai_chunk', 'chunk': '짧은 청크', 'chunk_index': 0}
+        data = encode_frame(message, PROTOCOL_COMPACT_V1, deflate_min_bytes=512)
+        assert json.loads(data)['d'] == '짧은 청크'
+        assert decode_frame(data, PROTOCOL_COMPACT_V1) == message
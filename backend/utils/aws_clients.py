@@ -0,0 +1,93 @@
+"""
+AWS Client Utilities
+boto3 리소스/클라이언트/테이블 지연 생성 및 컨테이너 단위 재사용
+
+- 모듈 import 시점에는 세션 생성, 서비스 모델 로딩, 테이블 객체 생성을 하지 않음
+- 최초 사용 시 한 번 생성하고 Lambda 컨테이너 재사용 동안 유지
+- 생성 소요 시간은 INIT_TIMINGS에 기록 (콜드 스타트 프로파일러용)
+"""
+import threading
+import time
+from typing import Any, Callable, Dict
+
+from config.settings import settings
+
+_lock = threading.RLock()
+_cache: Dict[Any, Any] = {}
+
+# 생성 소요 시간 (ms) - benchmarks/cold_start_profile.py에서 사용
+INIT_TIMINGS: Dict[str, float] = {}
+
+
+def _get_or_create(key: Any, label: str, factory: Callable[[], Any]) -> Any:
+    """캐시 조회 후 없으면 생성 (스레드 안전)"""
+    value = _cache.get(key)
+    if value is not None:
+        return value
+
+    with _lock:
+        value = _cache.get(key)
+        if value is None:
+            start = time.perf_counter()
+            value = factory()
+            INIT_TIMINGS[label] = (time.perf_counter() - start) * 1000
+            _cache[key] = value
+    return value
+
+
+def get_dynamodb():
+    """DynamoDB 리소스"""
+    def factory():
+        import boto3
+        return boto3.resource('dynamodb', region_name=settings.AWS_REGION)
+
+    return _get_or_create(('resource', 'dynamodb'), 'resource:dynamodb', factory)
+
+
+def get_client(service_name: str, **kwargs):
+    """boto3 클라이언트 (서비스 + 생성 인자별 캐시)"""
+    def factory():
+        import boto3
+        return boto3.client(service_name, **kwargs)
+
+    key = ('client', service_name, tuple(sorted(kwargs.items())))
+    return _get_or_create(key, f"client:{service_name}", factory)
+
+
+def get_table(table_type: str):
+    """DynamoDB Table 객체 (config.database의 테이블 타입 이름)"""
+    def factory():
+        from config.database import get_table_name
+        return dynamodb.Table(get_table_name(table_type))
+
+    dynamodb = get_dynamodb()
+    return _get_or_create(('table', table_type), f"table:{table_type}", factory)
+
+
+class LazyTable:
+    """첫 속성 접근 시 Table 객체를 생성하는 프록시 (모듈 전역 테이블 변수용)"""
+
+    def __init__(self, table_type: str):
+        self.table_type = table_type
+
+    def resolve(self):
+        """실제 Table 객체"""
+        return get_table(self.table_type)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.resolve(), name)
+
+    def __repr__(self) -> str:
+        return f"LazyTable({self.table_type!r})"
+
+
+def lazy_table(table_type: str) -> LazyTable:
+    """지연 생성 테이블 프록시"""
+    return LazyTable(table_type)
+
+
+def reset_clients() -> None:
+    """캐시 초기화 (테스트/프로파일러용)"""
+    with _lock:
+        _cache.clear()
+        INIT_TIMINGS.clear()
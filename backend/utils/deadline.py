@@ -0,0 +1,31 @@
+"""
+Lambda Deadline Utilities
+Lambda 남은 실행 시간 기반 스트리밍 마감 판단
+"""
+import os
+from typing import Any, Optional
+
+# 스트리밍 중단 후 부분 응답 저장/사용량 기록/종료 프레임 전송에 필요한 여유 시간
+STREAM_DEADLINE_MARGIN_MS = int(os.environ.get('STREAM_DEADLINE_MARGIN_MS', '10000'))
+
+
+class StreamDeadline:
+    """Lambda context의 남은 시간으로 스트리밍 중단 시점 판단"""
+
+    def __init__(self, context: Any, margin_ms: int = STREAM_DEADLINE_MARGIN_MS):
+        self._get_remaining = getattr(context, 'get_remaining_time_in_millis', None)
+        self.margin_ms = margin_ms
+
+    def remaining_ms(self) -> Optional[int]:
+        """남은 실행 시간 (ms), context가 없으면 None"""
+        if not callable(self._get_remaining):
+            return None
+        try:
+            return int(self._get_remaining())
+        except (TypeError, ValueError):
+            return None
+
+    def expired(self) -> bool:
+        """안전 여유 시간 이내로 들어왔는지 여부"""
+        remaining = self.remaining_ms()
+        return remaining is not None and remaining <= self.margin_ms
@@ -1,13 +1,36 @@
 """
 Logging Utilities
 통합 로깅 설정 및 헬퍼 함수
+
+- 로그 레벨 기본값은 LOG_LEVEL 환경변수
+- log_event: 이벤트 타입별 샘플링 + 구조화(JSON) 레코드, 레벨/샘플링에서 걸러지면 직렬화하지 않음
+- summarize_event: Lambda 이벤트를 민감 값 마스킹/긴 값 절단 후 요약
+- StreamLogSummary: 스트리밍 응답 1건당 요약 레코드 1개 (청크별 로그 대체)
 """
 import logging
 import json
-from typing import Any, Dict
+import os
+import random
+import time
+from typing import Any, Callable, Dict, Optional
+
+# 이벤트 타입별 샘플링 비율 (예: "lambda.event=0.05,usage.tracked=0.2"), 미지정 타입은 1.0
+LOG_SAMPLE_RATES_ENV = 'LOG_SAMPLE_RATES'
+# 로그에 남기는 문자열 값 최대 길이
+LOG_MAX_FIELD_CHARS = int(os.environ.get('LOG_MAX_FIELD_CHARS', '256'))
+
+# 값을 남기지 않고 마스킹하는 키 (소문자 비교)
+REDACTED_KEYS = {
+    'authorization', 'cookie', 'set-cookie', 'x-api-key', 'password',
+    'token', 'idtoken', 'accesstoken', 'refreshtoken', 'secret', 'apikey'
+}
+REDACTED = '[REDACTED]'
 
+# 요약에 남기는 requestContext 필드
+_CONTEXT_FIELDS = ('requestId', 'routeKey', 'eventType', 'connectionId', 'stage', 'domainName')
 
-def setup_logger(name: str, level: str = 'INFO') -> logging.Logger:
+
+def setup_logger(name: str, level: Optional[str] = None) -> logging.Logger:
     """로거 설정"""
     logger = logging.getLogger(name)
 
@@ -19,20 +42,201 @@ def setup_logger(name: str, level: str = 'INFO') -> logging.Logger:
         handler.setFormatter(formatter)
         logger.addHandler(handler)
 
+    level = level or os.environ.get('LOG_LEVEL', 'INFO')
     logger.setLevel(getattr(logging, level.upper(), logging.INFO))
     return logger
 
 
-def get_logger(name: str, level: str = 'INFO') -> logging.Logger:
+def get_logger(name: str, level: Optional[str] = None) -> logging.Logger:
     """로거 가져오기 (setup_logger의 별칭)"""
     return setup_logger(name, level)
 
 
-def log_lambda_event(logger: logging.Logger, event: Dict[str, Any]) -> None:
-    """Lambda 이벤트 로깅"""
-    logger.info(f"Lambda Event: {json.dumps(event, default=str)}")
-    
-    # 주요 정보 추출 로깅
-    http_method = event.get('httpMethod', 'N/A')
-    path = event.get('path', event.get('rawPath', 'N/A'))
-    logger.info(f"Request: {http_method} {path}")
\ No newline at end of file
+class LazyMessage:
+    """출력 시점에만 문자열을 만드는 지연 메시지 (logger.debug("%s", LazyMessage(fn)))"""
+
+    __slots__ = ('_factory',)
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+
+    def __str__(self) -> str:
+        return str(self._factory())
+
+
+class _StructuredMessage:
+    """구조화 레코드 - 핸들러가 포맷할 때 JSON 직렬화"""
+
+    __slots__ = ('event_type', 'fields')
+
+    def __init__(self, event_type: str, fields: Dict[str, Any]):
+        self.event_type = event_type
+        self.fields = fields
+
+    def __str__(self) -> str:
+        record = {'event': self.event_type}
+        for key, value in self.fields.items():
+            record[key] = value() if callable(value) else value
+        return json.dumps(record, ensure_ascii=False, default=str)
+
+
+_sample_rates: Optional[Dict[str, float]] = None
+
+
+def sample_rate(event_type: str) -> float:
+    """이벤트 타입의 샘플링 비율 (LOG_SAMPLE_RATES, 접두사 일치 허용)"""
+    global _sample_rates
+    if _sample_rates is None:
+        _sample_rates = parse_sample_rates(os.environ.get(LOG_SAMPLE_RATES_ENV, ''))
+
+    if event_type in _sample_rates:
+        return _sample_rates[event_type]
+    prefix = event_type.split('.', 1)[0] + '.*'
+    return _sample_rates.get(prefix, _sample_rates.get('*', 1.0))
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """"a.b=0.1,c.*=0" 형식 파싱 (잘못된 항목은 무시)"""
+    rates = {}
+    for item in spec.split(','):
+        name, _, value = item.partition('=')
+        try:
+            rates[name.strip()] = min(1.0, max(0.0, float(value)))
+        except ValueError:
+            continue
+    return rates
+
+
+def reset_sample_rates() -> None:
+    """샘플링 설정 다시 읽기 (테스트용)"""
+    global _sample_rates
+    _sample_rates = None
+
+
+def log_event(
+    logger: logging.Logger,
+    event_type: str,
+    level: int = logging.INFO,
+    **fields: Any
+) -> bool:
+    """
+    구조화 이벤트 로깅
+
+    레벨이 꺼져 있거나 샘플링에서 제외되면 아무것도 만들지 않는다.
+    값으로 callable을 넘기면 실제로 출력될 때만 호출된다.
+
+    Returns:
+        bool: 기록 여부
+    """
+    if not logger.isEnabledFor(level):
+        return False
+
+    rate = sample_rate(event_type)
+    if rate <= 0 or (rate < 1 and random.random() >= rate):
+        return False
+    if rate < 1:
+        fields['sample_rate'] = rate
+
+    logger.log(level, _StructuredMessage(event_type, fields))
+    return True
+
+
+def truncate(value: str, max_chars: int = LOG_MAX_FIELD_CHARS) -> str:
+    """긴 문자열 절단 (잘린 길이 표시)"""
+    if len(value) <= max_chars:
+        return value
+    return f"{value[:max_chars]}...(+{len(value) - max_chars} chars)"
+
+
+def redact(value: Any, max_chars: int = LOG_MAX_FIELD_CHARS, depth: int = 0) -> Any:
+    """민감 키 마스킹 + 긴 문자열 절단 (중첩 dict/list)"""
+    if depth > 4:
+        return '...'
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if str(key).lower() in REDACTED_KEYS else redact(item, max_chars, depth + 1)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        items = [redact(item, max_chars, depth + 1) for item in value[:20]]
+        if len(value) > 20:
+            items.append(f"...(+{len(value) - 20} items)")
+        return items
+    if isinstance(value, str):
+        return truncate(value, max_chars)
+    return value
+
+
+def summarize_event(event: Dict[str, Any], max_chars: int = LOG_MAX_FIELD_CHARS) -> Dict[str, Any]:
+    """
+    Lambda 이벤트 요약 - 헤더는 제외, 식별 정보와 마스킹/절단된 본문만 유지
+    """
+    request_context = event.get('requestContext', {}) or {}
+    http = request_context.get('http', {}) or {}
+    summary = {key: request_context[key] for key in _CONTEXT_FIELDS if key in request_context}
+
+    method = event.get('httpMethod') or http.get('method')
+    path = event.get('path') or event.get('rawPath') or http.get('path')
+    if method:
+        summary['method'] = method
+    if path:
+        summary['path'] = path
+    if event.get('pathParameters'):
+        summary['pathParameters'] = redact(event['pathParameters'], max_chars)
+    if event.get('queryStringParameters'):
+        summary['query'] = redact(event['queryStringParameters'], max_chars)
+
+    body = event.get('body')
+    if body:
+        summary['body_chars'] = len(body)
+        try:
+            parsed = json.loads(body) if isinstance(body, str) else body
+            summary['body'] = redact(parsed, max_chars)
+        except (TypeError, ValueError):
+            summary['body'] = truncate(body, max_chars)
+
+    return summary
+
+
+def log_lambda_event(
+    logger: logging.Logger,
+    event: Dict[str, Any],
+    event_type: str = 'lambda.event',
+    level: int = logging.INFO
+) -> bool:
+    """Lambda 이벤트 로깅 (요약/마스킹, 샘플링 적용)"""
+    return log_event(logger, event_type, level, request=lambda: summarize_event(event))
+
+
+class StreamLogSummary:
+    """스트리밍 응답 요약 - 청크마다 로그 대신 종료 시 레코드 1개"""
+
+    def __init__(self, **fields: Any):
+        self.fields = fields
+        self.chunks = 0
+        self.chars = 0
+        self.max_chunk_chars = 0
+        self.started = time.perf_counter()
+        self.first_chunk_ms: Optional[float] = None
+
+    def add(self, chunk: str) -> None:
+        """청크 1개 집계"""
+        if self.first_chunk_ms is None:
+            self.first_chunk_ms = (time.perf_counter() - self.started) * 1000
+        self.chunks += 1
+        self.chars += len(chunk)
+        if len(chunk) > self.max_chunk_chars:
+            self.max_chunk_chars = len(chunk)
+
+    def emit(self, logger: logging.Logger, event_type: str = 'stream.summary', **fields: Any) -> bool:
+        """요약 레코드 기록"""
+        return log_event(
+            logger, event_type,
+            chunks=self.chunks,
+            chars=self.chars,
+            max_chunk_chars=self.max_chunk_chars,
+            first_chunk_ms=round(self.first_chunk_ms, 1) if self.first_chunk_ms is not None else None,
+            duration_ms=round((time.perf_counter() - self.started) * 1000, 1),
+            **self.fields,
+            **fields
+        )
@@ -0,0 +1,188 @@
+"""
+Token Estimator
+한글/영문 혼합 텍스트의 Claude 토큰 수 추정 (사용량 추적, 컨텍스트 예산, 쿼터 확인 공용)
+
+문자 분류는 문자 단위 파이썬 루프 대신 미리 만든 바이트 변환표로 처리한다.
+- ASCII: encode('ascii', 'ignore') 후 bytes.translate로 클래스 마커 치환, bytes.count
+- 한글: UTF-16 상위 바이트가 한글 음절(0xAC-0xD7)/자모(0x11) 영역인 코드 유닛 수
+- 영문 단어 수: 영문자 외를 공백으로 바꾼 뒤 split()
+
+토큰 수 = Σ(클래스별 문자 수 × 계수) + 단어 수 × 계수 (선형 모델)
+계수는 Bedrock이 보고한 실제 토큰 수로 calibrate()해서 교체한다.
+"""
+import json
+import os
+import string
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# 특징(feature) 순서 - 계수 dict 키와 동일
+FEATURES = ('hangul', 'latin', 'latin_words', 'digit', 'space', 'punct', 'other')
+
+# 기본 계수 (문자당 토큰) - 기존 경험적 비율(한글 2.5자, 영문 4자, 숫자 3.5자, 공백 4자, 특수문자 3자당 1토큰)
+# 실측 샘플로 보정한 값이 있으면 TOKEN_COEFFICIENTS_FILE(JSON)로 교체
+DEFAULT_COEFFICIENTS: Dict[str, float] = {
+    'hangul': 1 / 2.5,
+    'latin': 1 / 4,
+    'latin_words': 0.0,
+    'digit': 1 / 3.5,
+    'space': 1 / 4,
+    'punct': 1 / 3,
+    'other': 1 / 3,
+}
+
+_LETTER, _DIGIT, _SPACE, _PUNCT = b'\x01', b'\x02', b'\x03', b'\x04'
+
+
+def _byte_table(classes: Dict[bytes, str], default: bytes = b'\x00') -> bytes:
+    """ASCII 문자 → 클래스 마커 바이트 변환표"""
+    table = bytearray(default * 256)
+    for marker, chars in classes.items():
+        for char in chars:
+            table[ord(char)] = marker[0]
+    return bytes(table)
+
+
+_ASCII_CLASSES = _byte_table({
+    _LETTER: string.ascii_letters,
+    _DIGIT: string.digits,
+    _SPACE: string.whitespace,
+    _PUNCT: string.punctuation,
+})
+_LATIN_WORDS = _byte_table({b'a': string.ascii_letters}, default=b' ')
+# UTF-16 상위 바이트 중 한글이 아닌 값 (삭제 대상)
+_NON_HANGUL_HIGH_BYTES = bytes(b for b in range(256) if not (0xAC <= b <= 0xD7 or b == 0x11))
+
+
+def _load_coefficients() -> Dict[str, float]:
+    """TOKEN_COEFFICIENTS_FILE이 있으면 보정 계수 사용"""
+    path = os.environ.get('TOKEN_COEFFICIENTS_FILE')
+    if not path:
+        return dict(DEFAULT_COEFFICIENTS)
+    try:
+        with open(path, encoding='utf-8') as f:
+            loaded = json.load(f)
+        return {name: float(loaded.get('coefficients', loaded).get(name, DEFAULT_COEFFICIENTS[name]))
+                for name in FEATURES}
+    except Exception as e:
+        logger.error(f"Error loading token coefficients from {path}: {str(e)}")
+        return dict(DEFAULT_COEFFICIENTS)
+
+
+COEFFICIENTS = _load_coefficients()
+
+
+def features(text: str) -> Tuple[int, ...]:
+    """텍스트의 특징 벡터 (FEATURES 순서)"""
+    if not text:
+        return (0,) * len(FEATURES)
+
+    total = len(text)
+    ascii_bytes = text.encode('ascii', 'ignore')
+    hangul = 0
+    if len(ascii_bytes) < total:
+        high_bytes = text.encode('utf-16-be')[0::2]
+        hangul = len(high_bytes.translate(None, _NON_HANGUL_HIGH_BYTES))
+
+    marked = ascii_bytes.translate(_ASCII_CLASSES)
+    latin = marked.count(_LETTER)
+    digit = marked.count(_DIGIT)
+    space = marked.count(_SPACE)
+    punct = marked.count(_PUNCT)
+    latin_words = len(ascii_bytes.translate(_LATIN_WORDS).split()) if latin else 0
+
+    # 제어 문자 등 남은 ASCII는 other로
+    other = total - hangul - latin - digit - space - punct
+    return (hangul, latin, latin_words, digit, space, punct, other)
+
+
+def estimate_from_features(
+    vector: Sequence[int],
+    coefficients: Dict[str, float] = None
+) -> int:
+    """특징 벡터로 토큰 수 추정"""
+    coefficients = coefficients or COEFFICIENTS
+    if not any(vector):
+        return 0
+    total = sum(count * coefficients[name] for name, count in zip(FEATURES, vector))
+    return max(1, int(total))
+
+
+def estimate_tokens(text: str, coefficients: Dict[str, float] = None) -> int:
+    """텍스트 토큰 수 추정 (빈 문자열 0, 그 외 최소 1)"""
+    if not text:
+        return 0
+    return estimate_from_features(features(text), coefficients)
+
+
+def estimate_tokens_batch(texts: Iterable[str], coefficients: Dict[str, float] = None) -> List[int]:
+    """여러 텍스트 추정 (메시지 목록 등)"""
+    coefficients = coefficients or COEFFICIENTS
+    return [estimate_from_features(features(text), coefficients) if text else 0 for text in texts]
+
+
+def calibrate(
+    samples: Iterable[Tuple[Sequence[int], int]],
+    ridge: float = 1e-6
+) -> Dict[str, float]:
+    """
+    (특징 벡터, 실제 토큰 수) 샘플로 계수 재추정 - 음수 없는 최소제곱
+
+    음수 계수가 나오면 해당 특징을 0으로 고정하고 다시 푼다.
+    """
+    rows = [(list(vector), float(tokens)) for vector, tokens in samples]
+    if not rows:
+        raise ValueError("calibration needs at least one sample")
+
+    active = list(range(len(FEATURES)))
+    while True:
+        solution = _least_squares([[row[i] for i in active] for row, _ in rows],
+                                  [tokens for _, tokens in rows], ridge)
+        negative = [active[i] for i, value in enumerate(solution) if value < 0]
+        if not negative:
+            break
+        active = [i for i in active if i not in negative]
+        if not active:
+            solution = []
+            break
+
+    coefficients = {name: 0.0 for name in FEATURES}
+    for index, value in zip(active, solution):
+        coefficients[FEATURES[index]] = value
+    return coefficients
+
+
+def _least_squares(x: List[List[float]], y: List[float], ridge: float) -> List[float]:
+    """정규방정식 (XᵀX + λI)β = Xᵀy 가우스 소거 풀이"""
+    size = len(x[0]) if x else 0
+    a = [[ridge if i == j else 0.0 for j in range(size)] for i in range(size)]
+    b = [0.0] * size
+    for row, target in zip(x, y):
+        for i in range(size):
+            if row[i]:
+                b[i] += row[i] * target
+                for j in range(size):
+                    a[i][j] += row[i] * row[j]
+
+    for col in range(size):
+        pivot = max(range(col, size), key=lambda r: abs(a[r][col]))
+        a[col], a[pivot] = a[pivot], a[col]
+        b[col], b[pivot] = b[pivot], b[col]
+        if abs(a[col][col]) < 1e-12:
+            continue
+        for r in range(col + 1, size):
+            factor = a[r][col] / a[col][col]
+            if factor:
+                for c in range(col, size):
+                    a[r][c] -= factor * a[col][c]
+                b[r] -= factor * b[col]
+
+    solution = [0.0] * size
+    for row in range(size - 1, -1, -1):
+        if abs(a[row][row]) < 1e-12:
+            continue
+        solution[row] = (b[row] - sum(a[row][c] * solution[c] for c in range(row + 1, size))) / a[row][row]
+    return solution
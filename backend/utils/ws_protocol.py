@@ -0,0 +1,130 @@
+"""
+WebSocket Frame Protocol
+WebSocket 프레임 직렬화 - verbose(기본) / compact 프로토콜
+
+$connect 쿼리 파라미터 `protocol`로 협상하며, 지정하지 않은 구버전 클라이언트는
+기존 verbose 포맷을 그대로 받는다.
+
+compact v1 (protocol=c1):
+- 필드 이름을 짧은 코드로 치환 (type→t, chunk→d, chunk_index→i ...)
+- 타입 이름도 코드로 치환 (ai_chunk→c, ai_start→s, chat_end→e ...)
+- timestamp는 시작/종료 프레임에만 포함
+- 큰 청크는 raw deflate + base64로 압축 (`d` 대신 `z` 필드)
+"""
+import base64
+import json
+import os
+import zlib
+from typing import Any, Dict, Optional
+
+PROTOCOL_VERBOSE = 'verbose'
+PROTOCOL_COMPACT_V1 = 'c1'
+SUPPORTED_PROTOCOLS = (PROTOCOL_VERBOSE, PROTOCOL_COMPACT_V1)
+DEFAULT_PROTOCOL = PROTOCOL_VERBOSE
+
+# 이 크기(bytes) 이상의 청크만 deflate 시도 (작은 델타는 압축 이득이 없음)
+DEFLATE_MIN_BYTES = int(os.environ.get('WS_DEFLATE_MIN_BYTES', '1024'))
+
+# compact 타입 코드
+TYPE_CODES = {
+    'ai_start': 's',
+    'ai_chunk': 'c',
+    'chat_end': 'e',
+    'chat_truncated': 'r',
+    'error': 'x',
+    'history_cleared': 'h',
+}
+
+# compact 필드 코드 (정의되지 않은 필드는 원래 이름 그대로 전송)
+FIELD_CODES = {
+    'type': 't',
+    'chunk': 'd',
+    'chunk_index': 'i',
+    'timestamp': 'ts',
+    'conversationId': 'cid',
+    'engine': 'g',
+    'total_chunks': 'n',
+    'response_length': 'l',
+    'message': 'm',
+    'continuationToken': 'k',
+}
+
+DEFLATED_CHUNK_FIELD = 'z'
+
+# timestamp를 유지하는 프레임 타입
+TIMESTAMPED_TYPES = {'ai_start', 'chat_end', 'chat_truncated'}
+
+_TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+_FIELD_NAMES = {code: name for name, code in FIELD_CODES.items()}
+
+
+def negotiate_protocol(query_params: Optional[Dict[str, Any]]) -> str:
+    """$connect 쿼리 파라미터에서 프로토콜 결정 (미지원 값은 verbose)"""
+    requested = ((query_params or {}).get('protocol') or '').strip().lower()
+    if requested in SUPPORTED_PROTOCOLS:
+        return requested
+    return DEFAULT_PROTOCOL
+
+
+def encode_frame(
+    message: Dict[str, Any],
+    protocol: str = DEFAULT_PROTOCOL,
+    deflate_min_bytes: int = DEFLATE_MIN_BYTES
+) -> str:
+    """메시지를 협상된 프로토콜의 프레임 문자열로 직렬화"""
+    if protocol != PROTOCOL_COMPACT_V1:
+        return json.dumps(message, ensure_ascii=False, default=str)
+
+    message_type = message.get('type')
+    frame = {}
+    for key, value in message.items():
+        if key == 'timestamp' and message_type not in TIMESTAMPED_TYPES:
+            continue
+        if key == 'type':
+            value = TYPE_CODES.get(value, value)
+        elif key == 'chunk' and deflate_min_bytes and isinstance(value, str):
+            deflated = _deflate_chunk(value, deflate_min_bytes)
+            if deflated is not None:
+                frame[DEFLATED_CHUNK_FIELD] = deflated
+                continue
+        frame[FIELD_CODES.get(key, key)] = value
+
+    return json.dumps(frame, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+def decode_frame(data: str, protocol: str = DEFAULT_PROTOCOL) -> Dict[str, Any]:
+    """프레임 문자열을 verbose 메시지 형태로 복원 (클라이언트 참조 구현 / 테스트용)"""
+    frame = json.loads(data)
+    if protocol != PROTOCOL_COMPACT_V1:
+        return frame
+
+    message = {}
+    for key, value in frame.items():
+        if key == DEFLATED_CHUNK_FIELD:
+            message['chunk'] = _inflate_chunk(value)
+            continue
+        name = _FIELD_NAMES.get(key, key)
+        if name == 'type':
+            value = _TYPE_NAMES.get(value, value)
+        message[name] = value
+    return message
+
+
+def _deflate_chunk(text: str, min_bytes: int) -> Optional[str]:
+    """raw deflate + base64 압축 (이득이 없으면 None)"""
+    raw = text.encode('utf-8')
+    if len(raw) < min_bytes:
+        return None
+
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+    encoded = base64.b64encode(compressor.compress(raw) + compressor.flush()).decode('ascii')
+
+    # JSON 이스케이프 없는 base64가 원문보다 작을 때만 사용
+    if len(encoded) >= len(json.dumps(text, ensure_ascii=False).encode('utf-8')):
+        return None
+    return encoded
+
+
+def _inflate_chunk(encoded: str) -> str:
+    """_deflate_chunk의 역변환"""
+    return zlib.decompress(base64.b64decode(encoded), -zlib.MAX_WBITS).decode('utf-8')
@@ -178,6 +178,9 @@ export const useWebSocketChat = ({
         }
         break;
 
+      case "chat_truncated":
+        // Response cut off by the server time limit - finalize like chat_end
+        // (message.continuationToken can be sent back with action "continue")
       case "chat_end":
         // Streaming ended - save conversation ID
         if (message.conversationId && onConversationIdUpdate) {
@@ -215,7 +218,8 @@ export const useWebSocketChat = ({
             type: 'chat_end',
             messageId: messageIdToUpdate,
             content: finalContent,
-            conversationId: message.conversationId
+            conversationId: message.conversationId,
+            continuationToken: message.continuationToken
           };
         }
         setIsLoading(false);
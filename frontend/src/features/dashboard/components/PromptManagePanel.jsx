@@ -11,6 +11,10 @@ import {
 import clsx from "clsx";
 import * as promptService from '../../../shared/utils/promptService';
 
+// 수집 작업(큰 붙여넣기/원본 문서) 진행 상황 확인 주기
+const INGEST_POLL_INTERVAL_MS = 3000;
+const INGEST_POLL_MAX_ATTEMPTS = 100;
+
 const PromptManagePanel = ({ engineType = "T5" }) => {
   const [instructions, setInstructions] = useState("");
   const [files, setFiles] = useState([]);
@@ -24,6 +28,14 @@ const PromptManagePanel = ({ engineType = "T5" }) => {
   const [loading, setLoading] = useState(false);
   const [saving, setSaving] = useState(false);
   const fileDropdownRef = useRef(null);
+  const mountedRef = useRef(true);
+
+  useEffect(() => {
+    mountedRef.current = true;
+    return () => {
+      mountedRef.current = false;
+    };
+  }, []);
 
   // 엔진 타입 변경 시 데이터 로드
   useEffect(() => {
@@ -51,21 +63,78 @@ const PromptManagePanel = ({ engineType = "T5" }) => {
     const uploadedFiles = Array.from(event.target.files);
     setShowFileDropdown(false);
 
-    for (const file of uploadedFiles) {
+    if (uploadedFiles.length === 0) return;
+
+    try {
+      // 모두 읽은 뒤 한 요청으로 추가 (서버는 BatchWriteItem + 스냅샷 1회)
+      const contents = await Promise.all(uploadedFiles.map((file) => file.text()));
+      const results = await promptService.addFiles(
+        engineType,
+        uploadedFiles.map((file, index) => ({
+          fileName: file.name,
+          fileContent: contents[index],
+        }))
+      );
+      const created = results.filter((r) => r.status === "created").map((r) => r.file);
+      // 수집 작업으로 넘어간 파일은 처리 중 항목으로 표시하고 완료될 때까지 확인
+      const queued = results.filter((r) => r.status === "queued").map((r) => r.ingestion);
+      setFiles((prev) => [...prev, ...created, ...queued.map(pendingFile)]);
+      results
+        .filter((r) => r.status === "failed")
+        .forEach((r) => console.error("Failed to upload file:", r.error));
+      if (queued.length > 0) {
+        alert(`${queued.length}개 파일은 크기가 커서 처리 중입니다. 완료되면 목록에 반영됩니다.`);
+        queued.forEach((job) => pollIngestion(engineType, job.jobId));
+      }
+    } catch (error) {
+      console.error("Failed to upload files:", error);
+    }
+  };
+
+  const pendingFile = (job) => ({
+    fileId: job.jobId,
+    fileName: job.fileName,
+    size: job.bytes,
+    pending: true,
+    progress: job.progress || 0,
+  });
+
+  const pollIngestion = async (engine, jobId) => {
+    for (let attempt = 0; attempt < INGEST_POLL_MAX_ATTEMPTS; attempt++) {
+      await new Promise((resolve) => setTimeout(resolve, INGEST_POLL_INTERVAL_MS));
+      if (!mountedRef.current) return;
+
+      let job;
       try {
-        const reader = new FileReader();
-        reader.onload = async (e) => {
-          const content = e.target.result;
-          const newFile = await promptService.addFile(engineType, {
-            fileName: file.name,
-            fileContent: content,
-          });
-          setFiles((prev) => [...prev, newFile]);
-        };
-        reader.readAsText(file);
+        job = await promptService.getIngestion(engine, jobId);
       } catch (error) {
-        console.error("Failed to upload file:", error);
+        console.error("Failed to check ingestion:", error);
+        continue;
+      }
+      if (!mountedRef.current || !job) return;
+
+      if (job.status === "done") {
+        // 완료된 작업의 fileId = 저장된 파일
+        let file;
+        try {
+          const stored = await promptService.getFiles(engine);
+          file = stored.find((f) => f.fileId === job.fileId);
+        } catch (error) {
+          console.error("Failed to reload files:", error);
+        }
+        setFiles((prev) =>
+          prev.map((f) => (f.fileId === jobId ? file || { ...f, pending: false } : f))
+        );
+        return;
+      }
+      if (job.status === "failed") {
+        setFiles((prev) => prev.filter((f) => f.fileId !== jobId));
+        alert(`파일 처리 실패: ${job.fileName}${job.error ? ` - ${job.error}` : ""}`);
+        return;
       }
+      setFiles((prev) =>
+        prev.map((f) => (f.fileId === jobId ? { ...f, progress: job.progress || 0 } : f))
+      );
     }
   };
 
@@ -738,7 +807,11 @@ const FileCard = ({ file, onRemove, onClick }) => {
                 className="text-[10px] line-clamp-1 tracking-tighter break-words text-text-500"
                 style={{ opacity: 1 }}
               >
-                {isTextFile ? `${lines}줄` : `${Math.round(fileSize / 1024)}KB`}
+                {file.pending
+                  ? `처리 중 ${file.progress}%`
+                  : isTextFile
+                  ? `${lines}줄`
+                  : `${Math.round(fileSize / 1024)}KB`}
               </p>
             </div>
             <div>
@@ -23,6 +23,29 @@ export const getPrompt = async (engineType) => {
   }
 };
 
+// 시스템 프롬프트 토큰 예산 미리보기 (블록/파일별 토큰, 캐시 지점, 1,000 메시지당 비용)
+export const getPromptPreview = async (engineType, includeText = false) => {
+  try {
+    const query = includeText ? '?text=true' : '';
+    const response = await fetch(`${API_ENDPOINT}/prompts/${engineType}/preview${query}`, {
+      method: 'GET',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+    });
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const data = await response.json();
+    return data;
+  } catch (error) {
+    console.error('Error fetching prompt preview:', error);
+    throw error;
+  }
+};
+
 // 프롬프트 업데이트 (설명, 지침만)
 export const updatePrompt = async (engineType, updates) => {
   try {
@@ -108,6 +131,80 @@ export const addFile = async (engineType, file) => {
   }
 };
 
+// 파일 일괄 추가 (한 요청, 스냅샷 1회) - 입력 순서대로 [{fileId, status, file | ingestion | error}]
+export const addFiles = async (engineType, files) => {
+  try {
+    const response = await fetch(`${API_ENDPOINT}/prompts/${engineType}/files`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({
+        files: files.map((file) => ({
+          fileName: file.fileName,
+          fileContent: file.fileContent,
+        })),
+      }),
+    });
+
+    // 207 = 일부 실패 (항목별 status 확인)
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const data = await response.json();
+    return data.results || [];
+  } catch (error) {
+    console.error('Error adding files:', error);
+    throw error;
+  }
+};
+
+// 수집 작업 진행 상황 (큰 붙여넣기/원본 문서 - status: queued → ... → done | failed)
+export const getIngestion = async (engineType, jobId) => {
+  try {
+    const response = await fetch(`${API_ENDPOINT}/prompts/${engineType}/files/${jobId}`, {
+      method: 'GET',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+    });
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const data = await response.json();
+    return data.ingestion || null;
+  } catch (error) {
+    console.error('Error fetching ingestion:', error);
+    throw error;
+  }
+};
+
+// 파일 일괄 삭제
+export const deleteFiles = async (engineType, fileIds) => {
+  try {
+    const response = await fetch(`${API_ENDPOINT}/prompts/${engineType}/files`, {
+      method: 'DELETE',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({ fileIds }),
+    });
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const data = await response.json();
+    return data.results || [];
+  } catch (error) {
+    console.error('Error deleting files:', error);
+    throw error;
+  }
+};
+
 // 파일 수정
 export const updateFile = async (engineType, fileId, updates) => {
   try {